@@ -1,7 +1,7 @@
 import os
 import logging
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from flask import Flask, render_template, request, flash, redirect, url_for, session, jsonify, send_file
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -19,13 +19,9 @@ from models import (
     MealIngredient, SubstitutionRule, DietaryPreference, MealPlan,
     ActivityFeed, Goal, GoalMilestone, Achievement, ClientAchievement,
     FitnessResource, GoalProgress, Challenge, ChallengeParticipant,
-    LeaderboardEntry
+    LeaderboardEntry, Recipe, ClientAdherenceSummary
 )
-from utils import (
-    progression_tracker, workout_recommender, meal_generator,
-    workout_generator, meal_substitution, pdf_generator
-)
-from utils.ai_meal_planner import generate_ai_meal_plan
+from utils import workout_recommender, meal_generator, workout_generator, meal_substitution
 from utils.form_validator import (
     validate_client_registration,
     validate_meal_plan_request,
@@ -33,8 +29,20 @@ from utils.form_validator import (
     validate_challenge_creation
 )
 from utils.email_service import mail
+from utils.email_dispatcher import init_email_dispatcher
 from utils.scheduler import init_scheduler
+from utils.substitution_graph import init_substitution_graph
+from utils.leaderboard import init_leaderboard
+from utils.leaderboard_push import init_leaderboard_push
+from utils.share_image_cache import init_share_image_cache
+from utils.chart_pool import init_chart_pool
+from utils import report_jobs
+from utils.report_jobs import init_report_jobs, submit_report, get_report_job
+from utils import report_export
+from utils.report_export import init_report_export, export_client_reports, start_export
+from utils.challenge_stats import reconcile_challenge_stats
 import time
+import click
 from routes.client_portal import client_portal
 
 def configure_logging():
@@ -58,6 +66,7 @@ def create_app():
     csrf.init_app(app)
     cache.init_app(app)
     mail.init_app(app)
+    init_email_dispatcher(app, mail)
     socketio.init_app(app)
     CORS(app)
     
@@ -78,6 +87,21 @@ def create_app():
     with app.app_context():
         init_scheduler(app)
     
+    # Load the substitution graph cache
+    init_substitution_graph(app)
+    
+    # Pick the leaderboard ranking backend
+    init_leaderboard(app)
+    init_leaderboard_push(app)
+    
+    # Rendered share image cache
+    init_share_image_cache(app)
+    init_chart_pool(app)
+    
+    # Background PDF report jobs
+    init_report_jobs(app)
+    init_report_export(app)
+    
     # Register blueprints
     from routes.auth import auth_bp
     from routes.clients import clients_bp
@@ -349,7 +373,8 @@ def dashboard():
         return render_template(
             'dashboard.html',
             clients=clients,
-            recent_activities=recent_activities
+            recent_activities=recent_activities,
+            stats=current_user.get_client_stats()
         )
     except Exception as e:
         cache.delete_memoized(dashboard)
@@ -560,6 +585,221 @@ def delete_client(client_id):
         flash('An error occurred while deleting the client', 'error')
         return redirect(url_for('view_client', client_id=client_id))
 
+def report_job_response(job, status=200):
+    """Job status with the URLs to poll it and to download the finished file"""
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'error': job['error'],
+        'status_url': url_for('report_job_status', job_id=job['id']),
+        'download_url': url_for('download_report', job_id=job['id'])
+    }), status
+
+def report_range(start=None, end=None):
+    """Report dates from ISO strings, defaulting to the DEFAULT_REPORT_DAYS ending today"""
+    try:
+        end = date.fromisoformat(end) if end else date.today()
+        start = date.fromisoformat(start) if start else end - timedelta(days=report_jobs.DEFAULT_REPORT_DAYS - 1)
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD format')
+    if start > end:
+        raise ValueError('start must not be after end')
+    if (end - start).days + 1 > report_jobs.MAX_REPORT_DAYS:
+        raise ValueError(f'reports cover at most {report_jobs.MAX_REPORT_DAYS} days')
+    return start, end
+
+@app.route('/plans/pdf', methods=['POST'])
+@login_required
+def generate_pdf():
+    """Queue a fitness plan PDF for the previewed plan"""
+    data = request.get_json(silent=True) or {}
+    if not all(data.get(key) for key in ('client_data', 'workout_plan', 'meal_plan')):
+        return jsonify({'error': 'client_data, workout_plan and meal_plan are required'}), 400
+    payload = {key: data[key] for key in ('client_data', 'workout_plan', 'meal_plan')}
+    payload['trainer_id'] = current_user.id  # for the trainer's report branding
+    try:
+        job = submit_report(
+            'fitness_plan',
+            payload,
+            current_user.id,
+            f"fitness_plan_{data['client_data'].get('name', 'client')}.pdf"
+        )
+        return report_job_response(job, 202)
+    except Exception as e:
+        logging.error(f"Error queueing fitness plan PDF: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/clients/<int:client_id>/report')
+@login_required
+def generate_client_report(client_id):
+    """Queue a progress report PDF for one of the trainer's clients, over ?start=&end= (ISO dates)"""
+    client = Client.query.filter_by(id=client_id, trainer_id=current_user.id).first_or_404()
+    try:
+        start, end = report_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        job = submit_report(
+            'client_report',
+            {'client_id': client.id, 'start': start.isoformat(), 'end': end.isoformat()},
+            current_user.id,
+            f"progress_report_{client.name}_{start.isoformat()}_{end.isoformat()}.pdf"
+        )
+        return report_job_response(job, 202)
+    except Exception as e:
+        logging.error(f"Error queueing client report: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/reports/<job_id>')
+@login_required
+def report_job_status(job_id):
+    """Poll a report job"""
+    job = get_report_job(job_id, current_user.id)
+    if job is None:
+        return jsonify({'error': 'Report not found'}), 404
+    return report_job_response(job)
+
+@app.route('/reports/<job_id>/download')
+@login_required
+def download_report(job_id):
+    """Stream a finished report from the spool directory"""
+    job = get_report_job(job_id, current_user.id)
+    if job is None or job['status'] != report_jobs.DONE:
+        return jsonify({'error': 'Report not found'}), 404
+    try:
+        return send_file(
+            report_jobs.report_path(job['id']), mimetype='application/pdf',
+            as_attachment=True, download_name=job['filename']
+        )
+    except FileNotFoundError:
+        # Expired between the status check and the download
+        return jsonify({'error': 'Report expired, please generate it again'}), 410
+
+def report_export_response(status, code=200):
+    return jsonify({
+        'export_id': status['export_id'],
+        'status': status['status'],
+        'done': status['done'],
+        'total': status['total'],
+        'failed': status['failed'],
+        'status_url': url_for('report_export_status', export_id=status['export_id']),
+        'download_url': url_for('download_report_export', export_id=status['export_id'])
+    }), code
+
+def owned_export_status(export_id):
+    status = report_export.read_status(export_id)
+    if status is None or status['trainer_id'] != current_user.id:
+        return None
+    return status
+
+@app.route('/reports/exports', methods=['POST'])
+@login_required
+def export_all_client_reports():
+    """Start or resume a ZIP of every client's progress report over ?start=&end= (ISO dates)"""
+    try:
+        start, end = report_range(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return report_export_response(start_export(app, current_user.id, start, end), 202)
+    except Exception as e:
+        logging.error(f"Error starting client report export: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/reports/exports/<export_id>')
+@login_required
+def report_export_status(export_id):
+    """Poll a roster export; progress is also pushed as 'report_export' notifications"""
+    status = owned_export_status(export_id)
+    if status is None:
+        return jsonify({'error': 'Export not found'}), 404
+    return report_export_response(status)
+
+@app.route('/reports/exports/<export_id>/cancel', methods=['POST'])
+@login_required
+def cancel_report_export(export_id):
+    """Stop a running export; starting it again resumes where it stopped"""
+    status = owned_export_status(export_id)
+    if status is None:
+        return jsonify({'error': 'Export not found'}), 404
+    if report_export.is_active(status):
+        report_export.cancel_export(export_id)
+    return report_export_response(status, 202)
+
+@app.route('/reports/exports/<export_id>/download')
+@login_required
+def download_report_export(export_id):
+    """Stream a finished export's ZIP from disk"""
+    status = owned_export_status(export_id)
+    if status is None or status['status'] != report_export.COMPLETE:
+        return jsonify({'error': 'Export not found'}), 404
+    return send_file(
+        report_export.archive_path(export_id), mimetype='application/zip', as_attachment=True,
+        download_name=f"client_reports_{status['start']}_{status['end']}.zip"
+    )
+
+@app.cli.command('export-client-reports')
+@click.option('--trainer-id', type=int, required=True, help='Trainer whose roster is exported')
+@click.option('--start', default=None, help='First day (YYYY-MM-DD), default DEFAULT_REPORT_DAYS before --end')
+@click.option('--end', default=None, help='Last day (YYYY-MM-DD), default today')
+@click.option('--workers', type=int, default=None, help='Report processes, default REPORT_EXPORT_WORKERS')
+def export_client_reports_command(trainer_id, start, end, workers):
+    """Write every client's progress report into one ZIP; re-run to resume a stopped export"""
+    try:
+        start, end = report_range(start, end)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    try:
+        status = export_client_reports(app, trainer_id, start, end, max_workers=workers)
+    except report_export.ExportRunning:
+        raise click.ClickException('This export is already running')
+    click.echo(f"Export {status['status']}: {status['done']} of {status['total']} client reports")
+    if status['status'] == report_export.COMPLETE:
+        click.echo(report_export.archive_path(status['export_id']))
+    for client_id, error in status['failed'].items():
+        click.echo(f"  client {client_id}: {error}")
+
+@app.cli.command('run-report-worker')
+@click.option('--max-jobs', type=int, default=None, help='Exit after this many jobs')
+def run_report_worker(max_jobs):
+    """Render queued PDF reports from the Redis queue"""
+    if not isinstance(report_jobs.backend, report_jobs.RedisJobBackend):
+        raise click.ClickException('REPORT_QUEUE_REDIS_URL is not set; reports render in the web process')
+    total = report_jobs.backend.work(max_jobs=max_jobs)
+    click.echo(f"Rendered {total} reports")
+
+@app.cli.command('backfill-recipe-flags')
+@click.option('--chunk-size', default=500, show_default=True, help='Recipes recomputed per commit')
+def backfill_recipe_flags(chunk_size):
+    """Recompute stored dietary and allergen flags for every recipe"""
+    total = Recipe.recompute_all_flags(chunk_size=chunk_size)
+    click.echo(f"Recomputed flags for {total} recipes")
+
+@app.cli.command('rebuild-adherence-summaries')
+@click.option('--chunk-size', default=500, show_default=True, help='Clients rebuilt per commit')
+def rebuild_adherence_summaries(chunk_size):
+    """Recompute every client's adherence summary from their progress logs"""
+    total = ClientAdherenceSummary.rebuild_all(chunk_size=chunk_size)
+    click.echo(f"Rebuilt adherence summaries for {total} clients")
+
+@app.cli.command('analyze-progress')
+@click.option('--trainer-id', type=int, default=None, help='Only analyse this trainer\'s clients')
+@click.option('--chunk-size', default=200, show_default=True, help='Clients analysed per commit')
+def analyze_progress(trainer_id, chunk_size):
+    """Refresh stored progress insights for a trainer's roster or every client"""
+    # Imported here so web workers don't load numpy at start-up
+    from utils.progress_batch import analyze_progress_batch
+    total = analyze_progress_batch(trainer_id=trainer_id, chunk_size=chunk_size)
+    click.echo(f"Wrote progress insights for {total} clients")
+
+@app.cli.command('reconcile-challenge-stats')
+@click.option('--chunk-size', default=200, show_default=True, help='Challenges reconciled per commit')
+def reconcile_challenge_stats_command(chunk_size):
+    """Recompute participant counts and progress aggregates for every challenge"""
+    total = reconcile_challenge_stats(chunk_size=chunk_size)
+    click.echo(f"Corrected stats for {total} challenges")
+
 @app.before_first_request
 def initialize_database():
     """Initialize database tables"""
@@ -27,11 +27,51 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'noreply@fitfuel.com')
+    MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS', 2))  # SMTP connections per process
+    MAIL_BATCH_SIZE = 20
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_DELAY = 30  # seconds before the first retry, doubling after each failure
+    MAIL_IDLE_TIMEOUT = 30  # seconds an unused SMTP connection stays open
     
     # Cache
     CACHE_TYPE = 'simple'
     CACHE_DEFAULT_TIMEOUT = 300
     
+    # Leaderboards (optional Redis sorted sets, in-process index when unset)
+    LEADERBOARD_REDIS_URL = os.environ.get('LEADERBOARD_REDIS_URL')
+    # Live leaderboard change marks reach every worker and instance through Redis; required with more than one
+    LEADERBOARD_PUSH_REDIS_URL = os.environ.get('LEADERBOARD_PUSH_REDIS_URL')
+    
+    # Share images (rendered PNGs cached on local disk, LRU-evicted past the size budget)
+    SHARE_IMAGE_CACHE_DIR = os.environ.get(
+        'SHARE_IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'share_images')
+    )
+    SHARE_IMAGE_CACHE_MAX_BYTES = int(os.environ.get('SHARE_IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    SHARE_IMAGE_MAX_AGE = 300
+    
+    # Chart rendering worker processes (bounded; excess renders get a 503). Off by
+    # default: share images draw their charts natively, so nothing renders here
+    CHART_POOL_ENABLED = os.environ.get('CHART_POOL_ENABLED', 'false').lower() == 'true'
+    CHART_POOL_WORKERS = int(os.environ.get('CHART_POOL_WORKERS', 2))
+    CHART_POOL_MAX_PENDING = int(os.environ.get('CHART_POOL_MAX_PENDING', 8))
+    CHART_RENDER_TIMEOUT = float(os.environ.get('CHART_RENDER_TIMEOUT', 5))
+    
+    # PDF reports (rendered by background jobs into a spool directory, kept for REPORT_JOB_TTL seconds)
+    REPORT_SPOOL_DIR = os.environ.get(
+        'REPORT_SPOOL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'reports')
+    )
+    REPORT_JOB_TTL = int(os.environ.get('REPORT_JOB_TTL', 15 * 60))
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+    REPORT_QUEUE_REDIS_URL = os.environ.get('REPORT_QUEUE_REDIS_URL')  # run `flask run-report-worker` when set
+    
+    # Roster report exports (ZIPs built by a process pool, resumable after a cancel or failure,
+    # deleted REPORT_EXPORT_TTL seconds after they were last written)
+    REPORT_EXPORT_DIR = os.environ.get(
+        'REPORT_EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'exports')
+    )
+    REPORT_EXPORT_WORKERS = int(os.environ.get('REPORT_EXPORT_WORKERS', 2))
+    REPORT_EXPORT_TTL = int(os.environ.get('REPORT_EXPORT_TTL', 24 * 60 * 60))
+    
     # API Documentation
     API_TITLE = 'FitFuel API'
     API_VERSION = 'v1'
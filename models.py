@@ -1,8 +1,10 @@
 from datetime import datetime, timedelta
-from sqlalchemy import or_, func, desc
+from sqlalchemy import or_, func, event, inspect, case, cast
+from sqlalchemy.orm import Session, selectinload
 from flask_login import UserMixin
 import logging
 from extensions import db
+from utils.ingredient_classifier import classify_ingredients
 
 class Trainer(UserMixin, db.Model):
     __tablename__ = 'trainer'
@@ -59,15 +61,21 @@ class Trainer(UserMixin, db.Model):
 
     def get_client_stats(self):
         """Get statistics about the trainer's clients"""
-        total_clients = len(self.clients)
-        active_clients = sum(1 for c in self.clients if any(p.status == 'active' for p in c.plans))
-        total_plans = sum(len(c.plans) for c in self.clients)
-        
+        client_ids = db.session.query(Client.id).filter(Client.trainer_id == self.id)
+        total_clients = client_ids.count()
+        active_clients = db.session.query(func.count(func.distinct(Plan.client_id)))\
+            .filter(Plan.client_id.in_(client_ids), Plan.status == 'active')\
+            .scalar()
+        total_plans = db.session.query(func.count(Plan.id))\
+            .filter(Plan.client_id.in_(client_ids))\
+            .scalar()
+
         return {
             'total_clients': total_clients,
             'active_clients': active_clients,
             'total_plans': total_plans,
-            'success_rate': (active_clients / total_clients * 100) if total_clients > 0 else 0
+            'success_rate': (active_clients / total_clients * 100) if total_clients > 0 else 0,
+            **ClientAdherenceSummary.roster_adherence(client_ids)
         }
 
 class Client(db.Model):
@@ -116,10 +124,9 @@ class Client(db.Model):
 
     def get_global_rank(self):
         """Get client's global ranking"""
-        entry = LeaderboardEntry.query\
-            .filter_by(client_id=self.id, category='global')\
-            .first()
-        return entry.rank if entry else None
+        from utils.leaderboard_queries import global_leaderboard
+
+        return global_leaderboard.rank_of('global', self.id)
 
 class ActivityFeed(db.Model):
     __tablename__ = 'activity_feed'
@@ -146,6 +153,9 @@ class Plan(db.Model):
 
 class ProgressLog(db.Model):
     __tablename__ = 'progress_log'
+    __table_args__ = (
+        db.Index('idx_progress_log_client_date', 'client_id', 'log_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     log_date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -161,6 +171,232 @@ class ProgressLog(db.Model):
     sleep_quality = db.Column(db.Integer)
     workout_difficulty = db.Column(db.Integer)
 
+class ClientAdherenceSummary(db.Model):
+    """
+    Per-client workout adherence, maintained incrementally as progress logs change.
+    daily_counts holds {'YYYY-MM-DD': [logged, completed]} for the last ROLLING_DAYS days.
+    The window columns total daily_counts as of counted_on; they are refreshed with
+    every change and rolled forward daily, so roster stats aggregate them in SQL.
+    """
+    __tablename__ = 'client_adherence_summary'
+    ROLLING_DAYS = 30
+    RECENT_DAYS = 7
+
+    client_id = db.Column(db.Integer, db.ForeignKey('client.id'), primary_key=True)
+    current_streak = db.Column(db.Integer, nullable=False, default=0)  # Run ending on last_workout_date
+    best_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_workout_date = db.Column(db.Date)  # Most recent day with a completed workout
+    daily_counts = db.Column(db.JSON, default=dict)
+    counted_on = db.Column(db.Date)  # Day the window columns were counted for
+    week_completed = db.Column(db.Integer, nullable=False, default=0)  # Since Monday
+    recent_logged = db.Column(db.Integer, nullable=False, default=0)  # Last RECENT_DAYS days
+    recent_completed = db.Column(db.Integer, nullable=False, default=0)
+    window_logged = db.Column(db.Integer, nullable=False, default=0)  # Last ROLLING_DAYS days
+    window_completed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    client = db.relationship('Client', backref=db.backref('adherence_summary', uselist=False))
+
+    @staticmethod
+    def today():
+        """Adherence is counted in UTC days, the clock ProgressLog.log_date defaults to"""
+        return datetime.utcnow().date()
+
+    def streak_as_of(self, today=None):
+        """Current streak, 0 unless a workout was completed today"""
+        today = today or self.today()
+        return self.current_streak if self.last_workout_date == today else 0
+
+    def counts_since(self, start, today=None):
+        """(completed, logged) totals for days from start through today"""
+        today = today or self.today()
+        logged = completed = 0
+        for day, (day_logged, day_completed) in (self.daily_counts or {}).items():
+            if start.isoformat() <= day <= today.isoformat():
+                logged += day_logged
+                completed += day_completed
+        return completed, logged
+
+    def completion_rate(self, days=ROLLING_DAYS, today=None):
+        """Completion percentage over the last `days` days (at most ROLLING_DAYS)"""
+        today = today or self.today()
+        completed, logged = self.counts_since(today - timedelta(days=min(days, self.ROLLING_DAYS) - 1), today)
+        return round(completed / logged * 100, 1) if logged else 0
+
+    def week_counts(self, today=None):
+        """(completed, logged) since Monday of the current week"""
+        today = today or self.today()
+        return self.counts_since(today - timedelta(days=today.weekday()), today)
+
+    def count_window(self, today=None):
+        """Recount the window columns from daily_counts as of today"""
+        today = today or self.today()
+        self.week_completed = self.week_counts(today)[0]
+        self.recent_completed, self.recent_logged = self.counts_since(
+            today - timedelta(days=self.RECENT_DAYS - 1), today
+        )
+        self.window_completed, self.window_logged = self.counts_since(
+            today - timedelta(days=self.ROLLING_DAYS - 1), today
+        )
+        self.counted_on = today
+
+    def apply_change(self, day, logged_delta, completed_delta, today=None):
+        """
+        Fold one log's contribution into the summary.
+        Returns False when the streaks cannot be updated incrementally
+        (a completion removed or backdated) and a rebuild is required.
+        """
+        today = today or self.today()
+        window_start = (today - timedelta(days=self.ROLLING_DAYS - 1)).isoformat()
+        counts = {
+            key: value for key, value in (self.daily_counts or {}).items() if key >= window_start
+        }
+        key = day.isoformat()
+        day_logged, day_completed = counts.get(key, [0, 0])
+        if key >= window_start:
+            counts[key] = [day_logged + logged_delta, day_completed + completed_delta]
+            if counts[key][0] <= 0:
+                del counts[key]
+        self.daily_counts = counts
+
+        if completed_delta < 0:
+            # Only safe when the day still has another completed workout
+            return key >= window_start and day_completed + completed_delta > 0
+        if completed_delta > 0:
+            last = self.last_workout_date
+            if last is None or day > last + timedelta(days=1):
+                self.current_streak = 1
+            elif day == last + timedelta(days=1):
+                self.current_streak += 1
+            elif day < last:
+                return False
+            self.last_workout_date = max(day, last) if last else day
+            self.best_streak = max(self.best_streak or 0, self.current_streak)
+        return True
+
+    def rebuild(self, logs, today=None):
+        """Recompute every field from (log_date, workout_completed) pairs"""
+        today = today or self.today()
+        window_start = today - timedelta(days=self.ROLLING_DAYS - 1)
+        counts = {}
+        completed_days = set()
+        for log_date, completed in logs:
+            day = log_date.date() if isinstance(log_date, datetime) else log_date
+            if completed:
+                completed_days.add(day)
+            if day >= window_start:
+                day_counts = counts.setdefault(day.isoformat(), [0, 0])
+                day_counts[0] += 1
+                day_counts[1] += 1 if completed else 0
+
+        best_streak = current_streak = 0
+        previous = None
+        for day in sorted(completed_days):
+            current_streak = current_streak + 1 if previous and (day - previous).days == 1 else 1
+            best_streak = max(best_streak, current_streak)
+            previous = day
+
+        self.daily_counts = counts
+        self.current_streak = current_streak
+        self.best_streak = best_streak
+        self.last_workout_date = previous
+        self.count_window(today)
+
+    @classmethod
+    def roster_adherence(cls, client_ids, today=None):
+        """
+        Workouts completed this week, the mean ROLLING_DAYS completion rate and the
+        percentage of clients whose last RECENT_DAYS beat it, over clients with logs
+        in the window. Summed in SQL from the summaries' window columns; summaries
+        the daily roll hasn't reached yet are counted from their daily_counts.
+        """
+        today = today or cls.today()
+        # Numeric so round(x, 1) resolves on Postgres as well as SQLite
+        window_rate = func.round(cast(100.0 * cls.window_completed / cls.window_logged, db.Numeric), 1)
+        recent_rate = case(
+            (cls.recent_logged > 0,
+             func.round(cast(100.0 * cls.recent_completed / cls.recent_logged, db.Numeric), 1)),
+            else_=0
+        )
+        weekly_workouts, rate_total, improving, rated = db.session.query(
+            func.coalesce(func.sum(cls.week_completed), 0),
+            func.coalesce(func.sum(window_rate), 0),
+            func.coalesce(func.sum(case((recent_rate > window_rate, 1), else_=0)), 0),
+            func.count()
+        ).filter(cls.client_id.in_(client_ids), cls.counted_on == today, cls.window_logged > 0).one()
+        rate_total = float(rate_total)
+
+        for summary in cls.query.filter(cls.client_id.in_(client_ids),
+                                        or_(cls.counted_on.is_(None), cls.counted_on != today)):
+            monthly_rate = summary.completion_rate(today=today)
+            if not summary.counts_since(today - timedelta(days=cls.ROLLING_DAYS - 1), today)[1]:
+                continue
+            weekly_workouts += summary.week_counts(today)[0]
+            rate_total += monthly_rate
+            improving += 1 if summary.completion_rate(cls.RECENT_DAYS, today) > monthly_rate else 0
+            rated += 1
+
+        return {
+            'weekly_workouts': weekly_workouts,
+            'completion_rate': round(rate_total / rated, 1) if rated else 0,
+            'improving_clients': round(improving / rated * 100) if rated else 0
+        }
+
+    @classmethod
+    def roll_window(cls, chunk_size=500, today=None):
+        """Recount the window columns of summaries last counted before today, committing per chunk"""
+        today = today or cls.today()
+        total = 0
+        while True:
+            summaries = cls.query.filter(or_(cls.counted_on.is_(None), cls.counted_on < today))\
+                .order_by(cls.client_id).limit(chunk_size).all()
+            if not summaries:
+                break
+            for summary in summaries:
+                summary.count_window(today)
+            db.session.commit()
+            total += len(summaries)
+            db.session.expunge_all()
+        return total
+
+    @classmethod
+    def rebuild_all(cls, chunk_size=500):
+        """Recompute summaries for every client from their progress logs, committing per chunk"""
+        last_id = 0
+        total = 0
+        while True:
+            client_ids = [row[0] for row in db.session.query(Client.id)
+                          .filter(Client.id > last_id)
+                          .order_by(Client.id)
+                          .limit(chunk_size)]
+            if not client_ids:
+                break
+
+            logs = {}
+            rows = db.session.query(ProgressLog.client_id, ProgressLog.log_date, ProgressLog.workout_completed)\
+                .filter(ProgressLog.client_id.in_(client_ids), ProgressLog.log_date.isnot(None))
+            for client_id, log_date, completed in rows:
+                logs.setdefault(client_id, []).append((log_date, completed))
+
+            summaries = {
+                summary.client_id: summary
+                for summary in cls.query.filter(cls.client_id.in_(client_ids))
+            }
+            for client_id in client_ids:
+                summary = summaries.get(client_id)
+                if summary is None:
+                    summary = cls(client_id=client_id)
+                    db.session.add(summary)
+                summary.rebuild(logs.get(client_id, []))
+            db.session.commit()
+
+            total += len(client_ids)
+            last_id = client_ids[-1]
+            db.session.expunge_all()
+            logging.info(f"Rebuilt adherence summaries for {total} clients")
+
+        return total
+
 class ExerciseProgression(db.Model):
     __tablename__ = 'exercise_progression'
     id = db.Column(db.Integer, primary_key=True)
@@ -196,6 +432,30 @@ class SubstitutionRule(db.Model):
     cost_difference = db.Column(db.Float)  # Price difference per serving
     suitability_score = db.Column(db.Float)  # AI-calculated score for substitution
 
+class CacheVersion(db.Model):
+    """Version counters for in-process caches built from rarely changing tables"""
+    __tablename__ = 'cache_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def get(cls, name):
+        """Current version for a cache, 0 if it has never been bumped"""
+        version = db.session.query(cls.version).filter_by(name=name).scalar()
+        return version or 0
+
+    @classmethod
+    def bump(cls, session, name):
+        """Atomically increment a cache version within the session's transaction"""
+        result = session.execute(
+            cls.__table__.update()
+            .where(cls.name == name)
+            .values(version=cls.version + 1, updated_at=datetime.utcnow())
+        )
+        if result.rowcount == 0:
+            session.add(cls(name=name, version=1, updated_at=datetime.utcnow()))
+
 class DietaryPreference(db.Model):
     __tablename__ = 'dietary_preference'
     id = db.Column(db.Integer, primary_key=True)
@@ -281,146 +541,44 @@ class Achievement(db.Model):
     @classmethod
     def get_recommendations(cls, client_id, limit=3):
         """Get personalized achievement recommendations for a client"""
-        try:
-            # Get client info
-            client = Client.query.get(client_id)
-            if not client:
-                return []
-
-            # Get client's current achievements
-            completed_achievements = {
-                ca.achievement_id: ca.progress 
-                for ca in ClientAchievement.query.filter_by(client_id=client_id).all()
-            }
+        from utils.achievement_recommender import recommend_achievements
 
-            # Get all available achievements
-            all_achievements = cls.query.all()
-            recommendations = []
-
-            for achievement in all_achievements:
-                if achievement.id not in completed_achievements:
-                    # Calculate recommendation score
-                    score = achievement.calculate_compatibility_score(client)
-                    if score > 0:
-                        recommendations.append({
-                            'achievement': achievement,
-                            'score': score,
-                            'reason': achievement.get_recommendation_reason(client)
-                        })
-
-            # Sort by score and return top recommendations
-            recommendations.sort(key=lambda x: x['score'], reverse=True)
-            return recommendations[:limit]
+        try:
+            return recommend_achievements(client_id, limit)
 
         except Exception as e:
             logging.error(f"Error getting achievement recommendations: {str(e)}")
             return []
 
-    def calculate_compatibility_score(self, client):
+    def calculate_compatibility_score(self, client, activity=None):
         """Calculate how compatible this achievement is for the client"""
+        from utils.achievement_recommender import (
+            AchievementCatalog, NO_ACTIVITY, activity_bonus, client_level, load_activity_summaries
+        )
+
         try:
-            base_score = 100
-            logging.debug(f"Starting compatibility calculation for achievement {self.name} and client {client.id}")
-
-            # Adjust score based on client's fitness level
-            level_mapping = {'beginner': 1, 'intermediate': 2, 'advanced': 3}
-            client_level = level_mapping.get(client.fitness_level, 1)
-            level_diff = abs(client_level - self.difficulty)
-            level_adjustment = level_diff * 15  # Increased impact of level difference
-            base_score -= level_adjustment
-
-            logging.debug(f"After level adjustment ({level_diff} levels diff): {base_score}")
-
-            # Check if achievement type matches client's goal
-            goal_bonus = 0
-            if (self.type == 'workout' and client.goal == 'consistency') or \
-               (self.type == 'strength' and client.goal == 'muscle_gain') or \
-               (self.type == 'nutrition' and client.goal == 'weight_loss') or \
-               (self.type == 'endurance' and client.goal == 'endurance'):
-                goal_bonus = 25  # Increased bonus for matching goals
-                base_score += goal_bonus
-                logging.debug(f"Added goal bonus: +{goal_bonus}")
-
-            # Analyze recent activity patterns
-            recent_logs = ProgressLog.query.filter_by(client_id=client.id)\
-                .filter(ProgressLog.log_date >= datetime.utcnow() - timedelta(days=30))\
-                .order_by(desc(ProgressLog.log_date)).all()
-
-            activity_bonus = 0
-            if recent_logs:
-                # Calculate activity frequency
-                activity_days = len(recent_logs)
-                if activity_days >= 12:  # Active in last month
-                    activity_bonus = 20
-                elif activity_days >= 8:
-                    activity_bonus = 15
-                elif activity_days >= 4:
-                    activity_bonus = 10
-
-                base_score += activity_bonus
-                logging.debug(f"Added activity bonus: +{activity_bonus}")
-
-                # Check workout completion rate
-                completion_rate = sum(1 for log in recent_logs if log.workout_completed) / len(recent_logs)
-                completion_bonus = int(completion_rate * 15)  # Adjusted completion impact
-                base_score += completion_bonus
-                logging.debug(f"Added completion bonus: +{completion_bonus}")
-
-            final_score = max(0, min(base_score, 100))  # Keep score between 0-100
-            logging.debug(f"Final compatibility score: {final_score}")
-            return final_score
+            if activity is None:
+                activity = load_activity_summaries([client.id]).get(client.id, NO_ACTIVITY)
+            catalog = AchievementCatalog([(self.id, self.type, self.difficulty)])
+            scores = catalog.scores([client_level(client.fitness_level)], [client.goal], [activity_bonus(activity)])
+            return int(scores[0][0])
 
         except Exception as e:
             logging.error(f"Error calculating compatibility score: {str(e)}")
             return 0
 
-    def get_recommendation_reason(self, client):
+    def get_recommendation_reason(self, client, activity=None):
         """Get a personalized reason why this achievement is recommended"""
-        try:
-            recent_logs = ProgressLog.query.filter_by(client_id=client.id)\
-                .filter(ProgressLog.log_date >= datetime.utcnow() - timedelta(days=30))\
-                .all()
+        from utils.achievement_recommender import (
+            NO_ACTIVITY, client_level, load_activity_summaries, recommendation_reason
+        )
 
-            activity_count = len(recent_logs)
-            completion_rate = sum(1 for log in recent_logs if log.workout_completed) / max(1, activity_count)
-
-            # Dynamic reason based on multiple factors
-            reasons = []
-
-            # Match with client's goal
-            if self.type == client.goal:
-                reasons.append("Perfectly aligned with your fitness goals")
-
-            # Activity level based reason
-            if activity_count >= 12:
-                reasons.append("You're consistently active")
-            elif activity_count >= 8:
-                reasons.append("You're building a good workout routine")
-            elif activity_count >= 4:
-                reasons.append("Great for maintaining your progress")
-
-            # Completion rate based reason
-            if completion_rate >= 0.8:
-                reasons.append("You're excellent at completing workouts")
-            elif completion_rate >= 0.6:
-                reasons.append("You're committed to your training")
-
-            # Difficulty level based reason
-            level_mapping = {'beginner': 1, 'intermediate': 2, 'advanced': 3}
-            client_level = level_mapping.get(client.fitness_level, 1)
-
-            if self.difficulty == client_level:
-                reasons.append("Matches your current fitness level")
-            elif self.difficulty == client_level + 1:
-                reasons.append("A good challenge for your next step")
-            elif self.difficulty < client_level:
-                reasons.append("A quick win to boost your momentum")
-
-            # Select the most relevant reason
-            if reasons:
-                return reasons[0]
-
-            return "Recommended based on your profile"
+        try:
+            if activity is None:
+                activity = load_activity_summaries([client.id]).get(client.id, NO_ACTIVITY)
+            return recommendation_reason(
+                self.type, self.difficulty, client.goal, client_level(client.fitness_level), activity
+            )
 
         except Exception as e:
             logging.error(f"Error getting recommendation reason: {str(e)}")
@@ -502,15 +660,116 @@ class Challenge(db.Model):
                                lazy=True,
                                cascade='all, delete-orphan')
 
-    def get_leaderboard(self):
-        """Get current leaderboard for this challenge"""
-        return ChallengeParticipant.query\
-            .filter_by(challenge_id=self.id)\
-            .order_by(ChallengeParticipant.current_value.desc())\
-            .all()
+    def is_visible_to(self, client):
+        """Public challenges, and those created by a client of the same trainer"""
+        return self.visibility == 'public' or (
+            self.creator is not None and self.creator.trainer_id == client.trainer_id
+        )
+
+    def get_leaderboard(self, limit=50, after=None):
+        """
+        One page of this challenge's leaderboard as (participant, rank, position) rows,
+        plus the cursor to pass as `after` for the next page (None on the last page)
+        """
+        from utils.leaderboard_queries import challenge_leaderboard
+
+        return challenge_leaderboard.page(self.id, limit, after)
+
+class ChallengeStats(db.Model):
+    """
+    Per-challenge participation aggregates, updated by update_challenge_stats in the
+    same flush as each ChallengeParticipant change so pages never count participant rows.
+    Progress is ChallengeStats.progress_of(current_value, target_value);
+    progress_histogram holds participant counts per PROGRESS_BUCKETS equal bands of
+    progress percentage, with 100% in the last band.
+    """
+    __tablename__ = 'challenge_stats'
+    PROGRESS_BUCKETS = 10
+    COMPLETE = 100
+
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'), primary_key=True)
+    participant_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)  # Participants at 100%
+    progress_total = db.Column(db.Float, nullable=False, default=0)  # Sum of progress percentages
+    progress_histogram = db.Column(db.JSON)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    challenge = db.relationship('Challenge', backref=db.backref('stats', uselist=False))
+
+    @property
+    def average_progress(self):
+        return round(self.progress_total / self.participant_count, 1) if self.participant_count else 0
+
+    @classmethod
+    def bucket(cls, progress):
+        band = int((progress or 0) * cls.PROGRESS_BUCKETS // cls.COMPLETE)
+        return min(max(band, 0), cls.PROGRESS_BUCKETS - 1)
+
+    @classmethod
+    def progress_of(cls, value, target):
+        """Whole progress percentage towards a target, COMPLETE only once the target is reached"""
+        if not target:
+            return 0
+        if (value or 0) >= target:
+            return cls.COMPLETE
+        return min(max(int((value or 0) * cls.COMPLETE // target), 0), cls.COMPLETE - 1)
+
+    @classmethod
+    def for_update(cls, challenge_id):
+        """A challenge's stats row locked for this transaction, created if missing"""
+        stats = cls.query.filter_by(challenge_id=challenge_id).with_for_update().first()
+        if stats is None:
+            # Concurrent first users both try the insert; the loser waits on the lock instead of failing
+            db.session.execute(
+                _insert_ignoring_conflicts(cls.__table__, ['challenge_id']).values(
+                    challenge_id=challenge_id, participant_count=0, completed_count=0,
+                    progress_total=0, progress_histogram=[0] * cls.PROGRESS_BUCKETS
+                )
+            )
+            stats = cls.query.filter_by(challenge_id=challenge_id).with_for_update().populate_existing().one()
+        return stats
+
+    def reset(self):
+        self.participant_count = 0
+        self.completed_count = 0
+        self.progress_total = 0
+        self.progress_histogram = [0] * self.PROGRESS_BUCKETS
+
+    def _shift(self, progress, delta):
+        progress = progress or 0
+        histogram = list(self.progress_histogram or [0] * self.PROGRESS_BUCKETS)
+        histogram[self.bucket(progress)] += delta
+        # Reassign so the JSON column is seen as changed
+        self.progress_histogram = histogram
+        self.progress_total = (self.progress_total or 0) + progress * delta
+        if progress >= self.COMPLETE:
+            self.completed_count = (self.completed_count or 0) + delta
+
+    def add_participant(self, progress=0):
+        self.participant_count = (self.participant_count or 0) + 1
+        self._shift(progress, 1)
+
+    def remove_participant(self, progress):
+        self.participant_count = max((self.participant_count or 0) - 1, 0)
+        self._shift(progress, -1)
+
+    def update_progress(self, old_progress, new_progress):
+        """Move one participant from old_progress to new_progress"""
+        self._shift(old_progress, -1)
+        self._shift(new_progress, 1)
+
+    def rebuild(self, progress_counts):
+        """Recompute every aggregate from (progress percentage, participant count) pairs"""
+        self.reset()
+        for progress, count in progress_counts:
+            self.participant_count += count
+            self._shift(progress, count)
 
 class ChallengeParticipant(db.Model):
     __tablename__ = 'challenge_participant'
+    __table_args__ = (
+        db.Index('idx_challenge_participant_value', 'challenge_id', 'current_value'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'), nullable=False)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
@@ -524,10 +783,15 @@ class ChallengeParticipant(db.Model):
     challenge = db.relationship('Challenge', 
                             back_populates='participants')
     client = db.relationship('Client', 
-                         back_populates='challenge_participations')
+                         backref='challenge_participations')
+
+    @property
+    def progress_percentage(self):
+        """Whole percentage of the challenge target reached"""
+        return ChallengeStats.progress_of(self.current_value, self.challenge.target_value)
 
     def update_progress(self, new_value):
-        """Update participant's progress in the challenge"""
+        """Update participant's progress in the challenge; its stats follow on flush"""
         self.current_value = new_value
         self.last_updated = datetime.utcnow()
 
@@ -542,6 +806,9 @@ class ChallengeParticipant(db.Model):
 
 class LeaderboardEntry(db.Model):
     __tablename__ = 'leaderboard_entry'
+    __table_args__ = (
+        db.Index('idx_leaderboard_category_points', 'category', 'points'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     client_id = db.Column(db.Integer, db.ForeignKey('client.id'), nullable=False)
     category = db.Column(db.String(50), nullable=False)  # global, monthly, challenge
@@ -555,15 +822,10 @@ class LeaderboardEntry(db.Model):
 
     @classmethod
     def update_rankings(cls, category):
-        """Update rankings for a specific leaderboard category"""
-        entries = cls.query\
-            .filter_by(category=category)\
-            .order_by(cls.points.desc())\
-            .all()
+        """Reload a leaderboard category and persist the ranks that changed"""
+        from utils.leaderboard import rebuild_rankings
 
-        for index, entry in enumerate(entries, 1):
-            entry.rank = index
-            entry.last_updated = datetime.utcnow()
+        return rebuild_rankings(category)
 
 class ProgressMetric(db.Model):
     """Model for tracking various progress metrics"""
@@ -638,49 +900,69 @@ class Recipe(db.Model):
         self.is_low_fat = self.fat <= 3  # 3g or less per serving
         self.is_low_calorie = self.calories <= 400  # 400 calories or less per serving
 
-    def check_allergens(self):
+    def check_allergens(self, ingredient_names=None):
         """Update allergens list based on ingredients"""
-        allergen_keywords = {
-            'milk': ['milk', 'dairy', 'cheese', 'yogurt', 'cream', 'butter', 'whey'],
-            'eggs': ['egg', 'eggs', 'mayonnaise'],
-            'fish': ['fish', 'salmon', 'tuna', 'cod', 'tilapia'],
-            'shellfish': ['shrimp', 'crab', 'lobster', 'shellfish'],
-            'tree_nuts': ['almond', 'cashew', 'walnut', 'pecan', 'pistachio'],
-            'peanuts': ['peanut', 'peanuts'],
-            'wheat': ['wheat', 'flour', 'bread', 'pasta'],
-            'soy': ['soy', 'tofu', 'edamame']
-        }
-        
-        found_allergens = set()
-        for ingredient in self.ingredients:
-            ingredient_name = ingredient.name.lower()
-            for allergen, keywords in allergen_keywords.items():
-                if any(keyword in ingredient_name for keyword in keywords):
-                    found_allergens.add(allergen)
-        
-        self.allergens = list(found_allergens)
+        if ingredient_names is None:
+            ingredient_names = [i.name for i in self.ingredients]
+
+        self.allergens = sorted(classify_ingredients(ingredient_names).allergens)
 
-    def check_dietary_restrictions(self):
+    def check_dietary_restrictions(self, ingredient_names=None):
         """Update dietary restriction flags based on ingredients"""
-        non_vegetarian = ['chicken', 'beef', 'pork', 'fish', 'meat', 'gelatin']
-        non_vegan = non_vegetarian + ['milk', 'cheese', 'egg', 'honey', 'yogurt']
-        non_gluten_free = ['wheat', 'barley', 'rye', 'flour', 'pasta', 'bread']
-        non_dairy_free = ['milk', 'cheese', 'cream', 'yogurt', 'butter']
-        
-        ingredient_names = [i.name.lower() for i in self.ingredients]
-        
-        self.is_vegetarian = not any(any(non_veg in name for name in ingredient_names) 
-                                   for non_veg in non_vegetarian)
-        self.is_vegan = not any(any(non_veg in name for name in ingredient_names) 
-                               for non_veg in non_vegan)
-        self.is_gluten_free = not any(any(non_gf in name for name in ingredient_names) 
-                                     for non_gf in non_gluten_free)
-        self.is_dairy_free = not any(any(dairy in name for name in ingredient_names) 
-                                    for dairy in non_dairy_free)
+        if ingredient_names is None:
+            ingredient_names = [i.name for i in self.ingredients]
+
+        excluded_diets = classify_ingredients(ingredient_names).excluded_diets
+
+        self.is_vegetarian = 'vegetarian' not in excluded_diets
+        self.is_vegan = 'vegan' not in excluded_diets
+        self.is_gluten_free = 'gluten_free' not in excluded_diets
+        self.is_dairy_free = 'dairy_free' not in excluded_diets
         self.is_keto = self.carbs <= 10  # 10g or less net carbs per serving
         self.is_low_carb = self.carbs <= 20  # 20g or less net carbs per serving
         self.is_paleo = (self.is_gluten_free and self.is_dairy_free and 
-                        not any('processed' in name for name in ingredient_names))
+                        'paleo' not in excluded_diets)
+
+    def recompute_flags(self, ingredients=None):
+        """Recompute and store nutrition labels, allergens and dietary flags.
+
+        Called automatically on flush whenever a recipe's macros or ingredients
+        change, so reads can treat the stored columns as authoritative.
+        """
+        if ingredients is None:
+            ingredients = self.ingredients
+        ingredient_names = [i.name for i in ingredients]
+
+        self.update_nutrition_labels()
+        self.check_allergens(ingredient_names)
+        self.check_dietary_restrictions(ingredient_names)
+
+    @classmethod
+    def recompute_all_flags(cls, chunk_size=500):
+        """Recompute stored flags for every recipe, committing in chunks of chunk_size"""
+        last_id = 0
+        total = 0
+        while True:
+            recipes = cls.query\
+                .options(selectinload(cls.ingredients))\
+                .filter(cls.id > last_id)\
+                .order_by(cls.id)\
+                .limit(chunk_size)\
+                .all()
+            if not recipes:
+                break
+
+            for recipe in recipes:
+                recipe.recompute_flags()
+            db.session.commit()
+
+            total += len(recipes)
+            last_id = recipes[-1].id
+            # Keep memory flat across chunks
+            db.session.expunge_all()
+            logging.info(f"Recomputed flags for {total} recipes")
+
+        return total
 
 class RecipeIngredient(db.Model):
     __tablename__ = 'recipe_ingredients'
@@ -694,6 +976,216 @@ class RecipeIngredient(db.Model):
     def __repr__(self):
         return f'<RecipeIngredient {self.name}>'
 
+# Recipe columns whose changes invalidate the stored flags
+RECIPE_FLAG_SOURCES = ('calories', 'protein', 'carbs', 'fat')
+
+@event.listens_for(Session, 'before_flush')
+def recompute_changed_recipe_flags(session, flush_context, instances):
+    """Recompute stored recipe flags when a recipe or its ingredients change"""
+    stale_recipes = set()
+
+    for obj in session.new:
+        if isinstance(obj, Recipe):
+            stale_recipes.add(obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, Recipe):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.has_changes()
+                   for attr in RECIPE_FLAG_SOURCES + ('ingredients',)):
+                stale_recipes.add(obj)
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, RecipeIngredient):
+            recipe = obj.recipe
+            if recipe is None and obj.recipe_id is not None:
+                recipe = session.get(Recipe, obj.recipe_id)
+            if recipe is not None:
+                stale_recipes.add(recipe)
+
+    for recipe in stale_recipes:
+        if recipe in session.deleted:
+            continue
+        ingredients = [i for i in recipe.ingredients if i not in session.deleted]
+        # Pending rows attached by recipe_id alone are not in the collection yet
+        ingredients.extend(
+            obj for obj in session.new
+            if isinstance(obj, RecipeIngredient) and obj.recipe is None
+            and obj.recipe_id is not None and obj.recipe_id == recipe.id
+        )
+        recipe.recompute_flags(ingredients)
+
+def _previous_value(state, key):
+    """Value of an attribute as last loaded from the database"""
+    history = state.attrs[key].load_history()
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+def _log_day(log_date):
+    return (log_date or datetime.utcnow()).date()
+
+def _log_client_id(log):
+    if log.client_id is not None:
+        return log.client_id
+    return log.client.id if log.client is not None else None
+
+@event.listens_for(Session, 'before_flush')
+def update_adherence_summaries(session, flush_context, instances):
+    """Apply progress log inserts, updates and deletes to the clients' adherence summaries"""
+    changes = {}
+    rebuild = set()
+    pending_logs = []
+    changed_ids = set()
+
+    def add_change(client_id, log_date, logged_delta, completed):
+        if client_id is None:
+            return
+        completed_delta = logged_delta if completed else 0
+        changes.setdefault(client_id, []).append((_log_day(log_date), logged_delta, completed_delta))
+
+    for obj in session.new:
+        if isinstance(obj, ProgressLog):
+            add_change(_log_client_id(obj), obj.log_date, 1, obj.workout_completed)
+            pending_logs.append(obj)
+
+    for obj in session.dirty:
+        if not isinstance(obj, ProgressLog) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes()
+                   for key in ('client_id', 'log_date', 'workout_completed')):
+            continue
+        old_client_id = _previous_value(state, 'client_id')
+        add_change(old_client_id, _previous_value(state, 'log_date'), -1,
+                   _previous_value(state, 'workout_completed'))
+        add_change(obj.client_id, obj.log_date, 1, obj.workout_completed)
+        if old_client_id != obj.client_id:
+            rebuild.update(client_id for client_id in (old_client_id, obj.client_id) if client_id)
+        pending_logs.append(obj)
+        changed_ids.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, ProgressLog):
+            state = inspect(obj)
+            add_change(_previous_value(state, 'client_id'), _previous_value(state, 'log_date'), -1,
+                       _previous_value(state, 'workout_completed'))
+            changed_ids.add(obj.id)
+
+    today = ClientAdherenceSummary.today()
+    summaries = {}
+    for client_id, client_changes in changes.items():
+        summary = summaries[client_id] = session.get(ClientAdherenceSummary, client_id)
+        if summary is None:
+            summary = summaries[client_id] = ClientAdherenceSummary(
+                client_id=client_id, current_streak=0, best_streak=0
+            )
+            session.add(summary)
+            rebuild.add(client_id)
+        if client_id in rebuild:
+            continue
+        for day, logged_delta, completed_delta in client_changes:
+            if not summary.apply_change(day, logged_delta, completed_delta, today):
+                rebuild.add(client_id)
+                break
+        else:
+            summary.count_window(today)
+
+    for client_id in rebuild:
+        # Stored rows minus the ones being changed, plus their pending state
+        logs = [
+            (log_date, completed)
+            for log_id, log_date, completed in session.query(
+                ProgressLog.id, ProgressLog.log_date, ProgressLog.workout_completed
+            ).filter(ProgressLog.client_id == client_id, ProgressLog.log_date.isnot(None))
+            if log_id not in changed_ids
+        ]
+        logs.extend(
+            (obj.log_date or datetime.utcnow(), obj.workout_completed)
+            for obj in pending_logs if _log_client_id(obj) == client_id
+        )
+        summaries[client_id].rebuild(logs, today)
+
+def _insert_ignoring_conflicts(table, index_elements):
+    """INSERT that skips rows clashing on index_elements (Postgres and SQLite)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table).on_conflict_do_nothing(index_elements=index_elements)
+
+@event.listens_for(Session, 'before_flush')
+def update_challenge_stats(session, flush_context, instances):
+    """Apply participant joins, progress changes, departures and target changes to challenge stats"""
+    moves = []  # (challenge or challenge id, participant value, +1 joined / -1 left)
+    rebuild = {}  # challenge id -> challenge whose target changed
+    deleted_challenges = set()
+
+    for obj in session.new:
+        if isinstance(obj, Challenge) and obj.stats is None:
+            obj.stats = ChallengeStats()
+            obj.stats.reset()
+        elif isinstance(obj, ChallengeParticipant):
+            moves.append((obj.challenge if obj.challenge_id is None else obj.challenge_id, obj.current_value, 1))
+
+    for obj in session.deleted:
+        if isinstance(obj, Challenge):
+            deleted_challenges.add(obj.id)
+            stats = session.get(ChallengeStats, obj.id)
+            if stats is not None:
+                session.delete(stats)
+        elif isinstance(obj, ChallengeParticipant):
+            state = inspect(obj)
+            moves.append((_previous_value(state, 'challenge_id'), _previous_value(state, 'current_value'), -1))
+
+    for obj in session.dirty:
+        if obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if isinstance(obj, Challenge) and state.attrs.target_value.history.has_changes():
+            rebuild[obj.id] = obj
+        elif isinstance(obj, ChallengeParticipant) and any(
+                state.attrs[key].history.has_changes() for key in ('challenge_id', 'current_value')):
+            # A progress change leaves its old band and joins its new one
+            moves.append((_previous_value(state, 'challenge_id'), _previous_value(state, 'current_value'), -1))
+            moves.append((obj.challenge_id, obj.current_value, 1))
+
+    stats_by_challenge = {}
+    for challenge, value, delta in moves:
+        if not isinstance(challenge, Challenge):
+            if challenge is None or challenge in deleted_challenges or challenge in rebuild:
+                continue
+            challenge = session.get(Challenge, challenge)
+        if challenge is None or challenge in session.deleted:
+            continue
+        if challenge in session.new:
+            stats = challenge.stats
+        elif challenge.id in stats_by_challenge:
+            stats = stats_by_challenge[challenge.id]
+        else:
+            stats = stats_by_challenge[challenge.id] = ChallengeStats.for_update(challenge.id)
+        progress = ChallengeStats.progress_of(value, challenge.target_value)
+        if delta > 0:
+            stats.add_participant(progress)
+        else:
+            stats.remove_participant(progress)
+
+    for challenge_id, challenge in rebuild.items():
+        # Stored values, overridden by the pending state of participants changed in this flush
+        values = dict(session.query(ChallengeParticipant.id, ChallengeParticipant.current_value)
+                      .filter(ChallengeParticipant.challenge_id == challenge_id))
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, ChallengeParticipant):
+                key = obj.id if obj.id is not None else id(obj)
+                values.pop(key, None)
+                if obj not in session.deleted and obj.challenge_id == challenge_id:
+                    values[key] = obj.current_value
+        ChallengeStats.for_update(challenge_id).rebuild(
+            [(ChallengeStats.progress_of(value, challenge.target_value), 1) for value in values.values()]
+        )
+
 class CookingInstruction(db.Model):
     __tablename__ = 'cooking_instructions'
     
@@ -720,4 +1212,30 @@ class SharingAnalytics(db.Model):
     client = db.relationship('Client', backref=db.backref('sharing_activities', lazy=True))
     
     def __repr__(self):
-        return f'<SharingAnalytics {self.id} - {self.client_id} - {self.content_type} - {self.platform}>'
\ No newline at end of file
+        return f'<SharingAnalytics {self.id} - {self.client_id} - {self.content_type} - {self.platform}>'
+
+class EmailOutbox(db.Model):
+    """Outgoing email, stored before it is sent so it survives restarts and can be retried"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('idx_email_outbox_due', 'status', 'next_attempt_at'),
+        db.Index('idx_email_outbox_claim', 'claimed_by'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.JSON, nullable=False)
+    html = db.Column(db.Text)
+    body = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32))  # dispatcher worker holding a 'sending' row
+    lease_expires_at = db.Column(db.DateTime)  # after which a 'sending' row is reclaimed
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.status}>'
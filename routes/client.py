@@ -1,19 +1,17 @@
-from flask import Blueprint, render_template, request, jsonify, current_app, url_for, flash, redirect, send_file
+from flask import Blueprint, render_template, request, jsonify, current_app, url_for, flash, redirect
 from flask_login import login_required, current_user
-from models import WorkoutLog, MealPlan, ProgressMetric, ActivityFeed, ProgressPhoto, Goal, DietaryPreference, Recipe, Client, ProgressLog, Plan, Challenge, ChallengeParticipation, ChallengeGoal, GoalCompletion, Achievement, ChallengeWorkout, ChallengeRecipe, WorkoutPlan, SharingAnalytics
+from models import WorkoutLog, MealPlan, ProgressMetric, ActivityFeed, ProgressPhoto, Goal, DietaryPreference, Recipe, Client, ProgressLog, Plan, Challenge, ChallengeParticipant, ChallengeParticipation, ChallengeStats, Achievement, ChallengeWorkout, ChallengeRecipe, WorkoutPlan, SharingAnalytics
 from extensions import db
+from utils.meal_plan_assembler import assemble_weekly_meal_plan
+from utils.substitution_index import substitution_index
+from utils.challenge_feed import BUCKETS, build_challenge_feed
+from utils.leaderboard_push import load_standings
+from utils.share_image_cache import send_share_image
 from datetime import datetime, timedelta, date
 import json
 import os
 from werkzeug.utils import secure_filename
 from sqlalchemy import or_, and_
-from PIL import Image, ImageDraw, ImageFont
-import io
-import matplotlib
-matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
-import numpy as np
-from matplotlib.patches import Patch
 
 client = Blueprint('client', __name__)
 
@@ -683,41 +681,19 @@ def get_recipe_substitutions(item_id):
         # Get user's dietary preferences
         preferences = DietaryPreference.query.filter_by(client_id=current_user.id).first()
         
-        # Find similar recipes based on user preferences
-        calorie_range = (recipe.calories * 0.8, recipe.calories * 1.2)
-        
-        query = Recipe.query.filter(
-            Recipe.id != recipe.id,
-            Recipe.calories.between(calorie_range[0], calorie_range[1])
+        # Find the nearest recipes by macros under the user's diet and exclusions
+        substitute_ids = substitution_index.find_substitutes(
+            recipe,
+            diet_type=preferences.diet_type if preferences else None,
+            excluded_ingredients=preferences.excluded_ingredients if preferences else [],
+            k=5
         )
-        
-        # Filter by dietary preferences if available
-        if preferences:
-            # Apply the user's diet type if specified
-            if preferences.diet_type == 'vegetarian':
-                query = query.filter(Recipe.is_vegetarian == True)
-            elif preferences.diet_type == 'vegan':
-                query = query.filter(Recipe.is_vegan == True)
-            elif preferences.diet_type == 'keto':
-                query = query.filter(Recipe.is_keto == True)
-            elif preferences.diet_type == 'paleo':
-                query = query.filter(Recipe.is_paleo == True)
-            
-            # Respect excluded ingredients
-            if preferences.excluded_ingredients:
-                for ingredient in preferences.excluded_ingredients:
-                    query = query.filter(~Recipe.ingredients.any(RecipeIngredient.name.ilike(f'%{ingredient}%')))
-        
-        substitutions = query.limit(5).all()
+        recipes_by_id = {r.id: r for r in Recipe.query.filter(Recipe.id.in_(substitute_ids)).all()}
+        substitutions = [recipes_by_id[i] for i in substitute_ids if i in recipes_by_id]
         
         # Format substitutions for response
         results = []
         for sub in substitutions:
-            # Update dietary flags and allergens
-            sub.update_nutrition_labels()
-            sub.check_allergens()
-            sub.check_dietary_restrictions()
-            
             # Determine why this substitution is recommended
             description = _generate_substitution_description(sub, recipe)
             
@@ -797,183 +773,15 @@ def weekly_meal_plan():
         today = datetime.now().date()
         week_start = today - timedelta(days=today.weekday())
     
-    week_end = week_start + timedelta(days=6)
-    
-    # Initialize data structures
-    days = []
-    weekly_totals = {
-        'calories': 0,
-        'protein': 0,
-        'prep_time': '0 min',
-        'budget': 0,
-        'containers': 0
-    }
-    weekly_shopping_list = {}
-    prep_guide = {
-        'steps': [],
-        'storage': []
-    }
-    
-    # Get meal plans for each day of the week
-    for i in range(7):
-        current_date = week_start + timedelta(days=i)
-        meal_plan = MealPlan.query.filter_by(
-            client_id=current_user.id,
-            start_date=current_date
-        ).first()
-        
-        day_data = {
-            'date': current_date,
-            'meals': [],
-            'totals': {'calories': 0, 'protein': 0}
-        }
-        
-        if meal_plan:
-            daily_plan = meal_plan.daily_plans.get(current_date.strftime('%Y-%m-%d'), [])
-            
-            for meal_data in daily_plan:
-                meal_items = []
-                for item in meal_data['items']:
-                    # Get recipe details
-                    recipe = Recipe.query.get(item['id'])
-                    if recipe:
-                        # Update recipe flags
-                        recipe.update_nutrition_labels()
-                        recipe.check_allergens()
-                        recipe.check_dietary_restrictions()
-                        
-                        # Add to daily totals
-                        day_data['totals']['calories'] += item['calories']
-                        day_data['totals']['protein'] += item['nutrients']['protein']
-                        
-                        # Add to meal items with dietary and allergen info
-                        restrictions = []
-                        if recipe.is_vegetarian:
-                            restrictions.append('vegetarian')
-                        if recipe.is_vegan:
-                            restrictions.append('vegan')
-                        if recipe.is_gluten_free:
-                            restrictions.append('gluten-free')
-                        if recipe.is_dairy_free:
-                            restrictions.append('dairy-free')
-                        if recipe.is_keto:
-                            restrictions.append('keto')
-                        if recipe.is_paleo:
-                            restrictions.append('paleo')
-                        if recipe.is_low_carb:
-                            restrictions.append('low-carb')
-                            
-                        nutrition_labels = []
-                        if recipe.is_high_protein:
-                            nutrition_labels.append('high-protein')
-                        if recipe.is_low_fat:
-                            nutrition_labels.append('low-fat')
-                        if recipe.is_low_calorie:
-                            nutrition_labels.append('low-calorie')
-                        
-                        meal_items.append({
-                            'id': item['id'],
-                            'name': item['name'],
-                            'portion': f"{item['amount']} {item['unit']}",
-                            'calories': item['calories'],
-                            'completed': item.get('completed', False),
-                            'restrictions': restrictions,
-                            'allergens': recipe.allergens,
-                            'nutrition': nutrition_labels
-                        })
-                        
-                        # Add to shopping list
-                        category = item.get('category', 'Other')
-                        if category not in weekly_shopping_list:
-                            weekly_shopping_list[category] = []
-                        
-                        # Check if item already exists in shopping list
-                        existing_item = next(
-                            (x for x in weekly_shopping_list[category] if x['name'] == item['name']),
-                            None
-                        )
-                        
-                        if existing_item:
-                            existing_item['amount'] += item['amount']
-                        else:
-                            weekly_shopping_list[category].append({
-                                'id': item['id'],
-                                'name': item['name'],
-                                'amount': item['amount'],
-                                'unit': item['unit'],
-                                'allergens': recipe.allergens
-                            })
-                
-                day_data['meals'].append({
-                    'id': meal_data['id'],
-                    'name': meal_data['name'],
-                    'time': meal_data['time'],
-                    'items': meal_items
-                })
-        
-        days.append(day_data)
-        weekly_totals['calories'] += day_data['totals']['calories']
-        weekly_totals['protein'] += day_data['totals']['protein']
-    
-    # Calculate averages and format totals
-    weekly_totals['calories'] = round(weekly_totals['calories'] / 7)
-    weekly_totals['protein'] = round(weekly_totals['protein'] / 7)
-    
-    # Generate prep guide
-    all_recipes = set()
-    for day in days:
-        for meal in day['meals']:
-            for item in meal['items']:
-                recipe = Recipe.query.get(item['id'])
-                if recipe and recipe.prep_instructions:
-                    all_recipes.add(recipe)
-    
-    # Sort recipes by prep time for optimal ordering
-    sorted_recipes = sorted(all_recipes, key=lambda r: int(r.prep_time.split()[0]) if r.prep_time else 0)
-    
-    total_prep_minutes = 0
-    containers_needed = 0
-    
-    for recipe in sorted_recipes:
-        # Add prep steps
-        if recipe.prep_instructions:
-            for instruction in recipe.prep_instructions.split('\n'):
-                prep_guide['steps'].append({
-                    'text': instruction,
-                    'duration': None  # You could parse duration from instruction if available
-                })
-        
-        # Add storage instructions with allergen warnings
-        storage_text = 'Store in an airtight container in the refrigerator for up to 3 days.'
-        if recipe.allergens:
-            storage_text += f" Contains allergens: {', '.join(recipe.allergens)}."
-        
-        prep_guide['storage'].append({
-            'item': recipe.name,
-            'text': storage_text
-        })
-        
-        # Calculate totals
-        if recipe.prep_time:
-            total_prep_minutes += int(recipe.prep_time.split()[0])
-        containers_needed += 1
-    
-    weekly_totals['prep_time'] = f"{total_prep_minutes} min"
-    weekly_totals['containers'] = containers_needed
-    
-    # Calculate estimated budget
-    weekly_totals['budget'] = sum(
-        sum(item['amount'] * 2 for item in items)  # Rough estimate of $2 per unit
-        for items in weekly_shopping_list.values()
-    )
+    week = assemble_weekly_meal_plan(current_user.id, week_start)
     
     return render_template('client/weekly_meal_plan.html',
-                         week_start=week_start,
-                         week_end=week_end,
-                         days=days,
-                         weekly_totals=weekly_totals,
-                         weekly_shopping_list=weekly_shopping_list,
-                         prep_guide=prep_guide)
+                         week_start=week['week_start'],
+                         week_end=week['week_end'],
+                         days=week['days'],
+                         weekly_totals=week['weekly_totals'],
+                         weekly_shopping_list=week['weekly_shopping_list'],
+                         prep_guide=week['prep_guide'])
 
 @client.route('/api/weekly-meal-plan')
 @login_required
@@ -1098,11 +906,6 @@ def view_recipe(recipe_id):
     try:
         recipe = Recipe.query.get_or_404(recipe_id)
         
-        # Update recipe flags
-        recipe.update_nutrition_labels()
-        recipe.check_allergens()
-        recipe.check_dietary_restrictions()
-        
         # Get user's dietary preferences
         preferences = DietaryPreference.query.filter_by(client_id=current_user.id).first()
         
@@ -1157,10 +960,6 @@ def view_recipe(recipe_id):
             Recipe.calories.between(recipe.calories * 0.8, recipe.calories * 1.2)
         ).limit(3).all()
         
-        for similar in similar_recipes:
-            similar.update_nutrition_labels()
-            similar.check_dietary_restrictions()
-        
         return render_template('client/recipe_detail.html',
                              recipe=recipe,
                              warnings=warnings,
@@ -2394,124 +2193,16 @@ def view_challenges():
         # Get the current client
         current_client = get_current_client()
         
-        # Get current date for comparison
-        today = datetime.now().date()
-        
-        # Fetch all challenges for the client (joined or available)
-        challenges = Challenge.query.filter(
-            or_(
-                Challenge.trainer_id == current_client.trainer_id,  # Created by client's trainer
-                Challenge.is_public == True  # Public challenges
-            )
-        ).all()
-        
-        # Organize challenges into categories
-        active_challenges = []
-        upcoming_challenges = []
-        completed_challenges = []
-        
-        for challenge in challenges:
-            # Add extra data needed for the frontend
-            challenge_data = {
-                'id': challenge.id,
-                'title': challenge.title,
-                'description': challenge.description,
-                'category': challenge.category,  # 'workout', 'nutrition', or 'combined'
-                'start_date': challenge.start_date.strftime('%b %d, %Y'),
-                'end_date': challenge.end_date.strftime('%b %d, %Y'),
-                'duration_days': (challenge.end_date - challenge.start_date).days,
-                'is_public': challenge.is_public
-            }
-            
-            # Check if client has joined this challenge
-            participation = ChallengeParticipation.query.filter_by(
-                challenge_id=challenge.id,
-                client_id=current_client.id
-            ).first()
-            
-            challenge_data['joined'] = participation is not None
-            
-            # Get progress if joined
-            if challenge_data['joined']:
-                challenge_data['progress'] = participation.progress_percentage
-                challenge_data['completed_goals'] = participation.completed_goals
-                challenge_data['total_goals'] = participation.total_goals
-            
-            # Get challenge goals
-            goals = ChallengeGoal.query.filter_by(challenge_id=challenge.id).all()
-            challenge_data['goals'] = []
-            
-            for goal in goals:
-                goal_data = {
-                    'id': goal.id,
-                    'description': goal.description,
-                    'completed': False
-                }
-                
-                # Check if goal is completed by the client
-                if participation:
-                    goal_completion = GoalCompletion.query.filter_by(
-                        goal_id=goal.id,
-                        participation_id=participation.id
-                    ).first()
-                    goal_data['completed'] = goal_completion is not None
-                
-                challenge_data['goals'].append(goal_data)
-            
-            # Get challenge participants
-            participants = ChallengeParticipation.query.filter_by(
-                challenge_id=challenge.id
-            ).join(Client).all()
-            
-            challenge_data['participant_count'] = len(participants)
-            challenge_data['participants'] = []
-            
-            # Only include first 5 participants for the UI
-            for i, participation in enumerate(participants):
-                if i >= 5:
-                    break
-                
-                participant = {
-                    'name': participation.client.full_name,
-                    'avatar_url': participation.client.profile_image or '/static/images/default-avatar.png'
-                }
-                challenge_data['participants'].append(participant)
-            
-            # Categorize challenge based on dates
-            if challenge.start_date <= today <= challenge.end_date:
-                # Active challenge
-                challenge_data['days_remaining'] = (challenge.end_date - today).days
-                active_challenges.append(challenge_data)
-            elif challenge.start_date > today:
-                # Upcoming challenge
-                challenge_data['days_until_start'] = (challenge.start_date - today).days
-                upcoming_challenges.append(challenge_data)
-            else:
-                # Completed challenge
-                if participation:
-                    challenge_data['success'] = participation.progress_percentage >= 80
-                    challenge_data['completion_percentage'] = participation.progress_percentage
-                    
-                    # Get achievements earned
-                    achievements = Achievement.query.filter_by(
-                        client_id=current_client.id,
-                        related_challenge_id=challenge.id
-                    ).all()
-                    
-                    challenge_data['achievements'] = [achievement.title for achievement in achievements]
-                
-                completed_challenges.append(challenge_data)
-        
-        # Sort challenges
-        active_challenges.sort(key=lambda x: x['days_remaining'])
-        upcoming_challenges.sort(key=lambda x: x['days_until_start'])
-        completed_challenges.sort(key=lambda x: x['end_date'], reverse=True)
+        # Each bucket pages on its own, e.g. ?completed_page=2
+        pages = {bucket: request.args.get(f'{bucket}_page', 1, type=int) for bucket in BUCKETS}
+        feed = build_challenge_feed(current_client, pages)
         
         return render_template(
             'client/challenges.html',
-            active_challenges=active_challenges,
-            upcoming_challenges=upcoming_challenges,
-            completed_challenges=completed_challenges
+            active_challenges=feed['active']['challenges'],
+            upcoming_challenges=feed['upcoming']['challenges'],
+            completed_challenges=feed['completed']['challenges'],
+            pagination={bucket: {k: v for k, v in data.items() if k != 'challenges'} for bucket, data in feed.items()}
         )
     except Exception as e:
         current_app.logger.error(f"Error loading challenges: {str(e)}")
@@ -2529,46 +2220,29 @@ def view_challenge_detail(challenge_id):
         challenge = Challenge.query.get_or_404(challenge_id)
         
         # Check if the client has access to this challenge
-        if not challenge.is_public and challenge.trainer_id != current_client.trainer_id:
+        if not challenge.is_visible_to(current_client):
             flash("You don't have access to this challenge.", "error")
             return redirect(url_for('client.view_challenges'))
         
         # Get challenge participation
-        participation = ChallengeParticipation.query.filter_by(
+        participation = ChallengeParticipant.query.filter_by(
             challenge_id=challenge.id,
             client_id=current_client.id
         ).first()
         
-        # Get challenge goals
-        goals = ChallengeGoal.query.filter_by(challenge_id=challenge.id).all()
-        
-        # Get goal completions if the client has joined
-        goal_completions = {}
-        if participation:
-            completions = GoalCompletion.query.filter_by(
-                participation_id=participation.id
-            ).all()
-            
-            for completion in completions:
-                goal_completions[completion.goal_id] = completion
-        
-        # Get all participants
-        participants = ChallengeParticipation.query.filter_by(
-            challenge_id=challenge.id
-        ).join(Client).all()
+        # Counts and averages come from the denormalized stats row
+        stats = ChallengeStats.query.get(challenge.id)
+        participant_count = stats.participant_count if stats else 0
         
-        # Calculate leaderboard based on progress
+        # The same standings the live leaderboard pushes, so the page and its deltas agree
         leaderboard = []
-        for p in participants:
-            leaderboard.append({
-                'name': p.client.full_name,
-                'avatar_url': p.client.profile_image or '/static/images/default-avatar.png',
-                'progress': p.progress_percentage,
-                'is_current_user': p.client_id == current_client.id
-            })
-        
-        # Sort leaderboard by progress (highest first)
-        leaderboard.sort(key=lambda x: x['progress'], reverse=True)
+        if participant_count:
+            for row in load_standings(challenge.id):
+                leaderboard.append(dict(
+                    row,
+                    avatar_url='/static/images/default-avatar.png',
+                    is_current_user=row['client_id'] == current_client.id
+                ))
         
         # Determine if today is a challenge day (between start and end dates)
         today = datetime.now().date()
@@ -2612,9 +2286,8 @@ def view_challenge_detail(challenge_id):
             'client/challenge_detail.html',
             challenge=challenge,
             participation=participation,
-            goals=goals,
-            goal_completions=goal_completions,
-            participants=participants,
+            stats=stats,
+            participant_count=participant_count,
             leaderboard=leaderboard,
             is_active=is_active,
             is_upcoming=is_upcoming,
@@ -2646,11 +2319,11 @@ def join_challenge():
             return jsonify({'success': False, 'message': 'Challenge not found'}), 404
         
         # Check if the client has access to this challenge
-        if not challenge.is_public and challenge.trainer_id != current_client.trainer_id:
+        if not challenge.is_visible_to(current_client):
             return jsonify({'success': False, 'message': 'You don\'t have access to this challenge'}), 403
         
         # Check if the client has already joined
-        existing = ChallengeParticipation.query.filter_by(
+        existing = ChallengeParticipant.query.filter_by(
             challenge_id=challenge.id,
             client_id=current_client.id
         ).first()
@@ -2658,27 +2331,19 @@ def join_challenge():
         if existing:
             return jsonify({'success': False, 'message': 'You have already joined this challenge'}), 400
         
-        # Get the total number of goals for progress tracking
-        total_goals = ChallengeGoal.query.filter_by(challenge_id=challenge.id).count()
-        
-        # Create participation record
-        participation = ChallengeParticipation(
+        # Create participation record; its challenge stats are updated in the same flush
+        participation = ChallengeParticipant(
             challenge_id=challenge.id,
             client_id=current_client.id,
-            joined_date=datetime.now(),
-            progress_percentage=0,
-            completed_goals=0,
-            total_goals=total_goals
+            current_value=0
         )
-        
         db.session.add(participation)
         
         # Add entry to activity feed
         activity = ActivityFeed(
             client_id=current_client.id,
             activity_type='challenge_joined',
-            description=f"Joined the {challenge.title} challenge",
-            timestamp=datetime.now()
+            description=f"Joined the {challenge.name} challenge"
         )
         db.session.add(activity)
         
@@ -2690,108 +2355,68 @@ def join_challenge():
         current_app.logger.error(f"Error joining challenge: {str(e)}")
         return jsonify({'success': False, 'message': 'An error occurred while joining the challenge'}), 500
 
-@client.route('/api/challenges/complete-goal', methods=['POST'])
+@client.route('/api/challenges/progress', methods=['POST'])
 @login_required
-def complete_challenge_goal():
-    """API endpoint for marking a challenge goal as complete."""
+def log_challenge_progress():
+    """API endpoint for adding to a client's progress towards a challenge target."""
     try:
         data = request.get_json()
         
-        if not data or 'goal_id' not in data:
-            return jsonify({'success': False, 'message': 'Goal ID is required'}), 400
+        if not data or 'challenge_id' not in data or 'amount' not in data:
+            return jsonify({'success': False, 'message': 'Challenge ID and amount are required'}), 400
         
-        goal_id = data['goal_id']
-        current_client = get_current_client()
+        try:
+            amount = float(data['amount'])
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'Amount must be a number'}), 400
+        if amount <= 0:
+            return jsonify({'success': False, 'message': 'Amount must be positive'}), 400
         
-        # Check if the goal exists
-        goal = ChallengeGoal.query.get(goal_id)
-        if not goal:
-            return jsonify({'success': False, 'message': 'Goal not found'}), 404
+        current_client = get_current_client()
         
-        # Get the client's participation in this challenge
-        participation = ChallengeParticipation.query.filter_by(
-            challenge_id=goal.challenge_id,
+        # Get the client's participation in this challenge, locked so concurrent logs add up
+        participation = ChallengeParticipant.query.filter_by(
+            challenge_id=data['challenge_id'],
             client_id=current_client.id
-        ).first()
+        ).with_for_update().first()
         
         if not participation:
             return jsonify({'success': False, 'message': 'You have not joined this challenge'}), 400
         
-        # Check if the goal is already completed
-        existing = GoalCompletion.query.filter_by(
-            goal_id=goal.id,
-            participation_id=participation.id
-        ).first()
-        
-        if existing:
-            return jsonify({'success': False, 'message': 'Goal already completed'}), 400
-        
-        # Create goal completion record
-        completion = GoalCompletion(
-            goal_id=goal.id,
-            participation_id=participation.id,
-            completion_date=datetime.now()
-        )
-        
-        db.session.add(completion)
-        
-        # Update participation progress
-        participation.completed_goals += 1
-        participation.progress_percentage = round((participation.completed_goals / participation.total_goals) * 100)
+        # Stats and the live leaderboard follow the participant row
+        was_completed = participation.completed
+        participation.update_progress((participation.current_value or 0) + amount)
         
-        # Check if all goals are completed
-        if participation.completed_goals == participation.total_goals:
-            # Add entry to activity feed for completing the entire challenge
-            challenge = Challenge.query.get(goal.challenge_id)
+        if participation.completed and not was_completed:
             activity = ActivityFeed(
                 client_id=current_client.id,
                 activity_type='challenge_completed',
-                description=f"Completed all goals in the {challenge.title} challenge",
-                timestamp=datetime.now()
+                description=f"Completed the {participation.challenge.name} challenge",
+                is_milestone=True
             )
             db.session.add(activity)
-            
-            # Award achievement if this is the first challenge completed
-            completed_challenges = ChallengeParticipation.query.filter_by(
-                client_id=current_client.id
-            ).filter(ChallengeParticipation.progress_percentage == 100).count()
-            
-            if completed_challenges == 0:
-                achievement = Achievement(
-                    client_id=current_client.id,
-                    title="Challenge Champion",
-                    description="Completed your first fitness or nutrition challenge",
-                    award_date=datetime.now(),
-                    related_challenge_id=challenge.id
-                )
-                db.session.add(achievement)
-        
-        # Add entry to activity feed for completing this goal
-        activity = ActivityFeed(
-            client_id=current_client.id,
-            activity_type='goal_completed',
-            description=f"Completed a goal in the challenge: {goal.description}",
-            timestamp=datetime.now()
-        )
-        db.session.add(activity)
         
         db.session.commit()
         
         return jsonify({
             'success': True, 
-            'message': 'Goal marked as complete',
-            'progress': participation.progress_percentage
+            'message': 'Progress logged',
+            'progress': participation.progress_percentage,
+            'current_value': participation.current_value,
+            'completed': participation.completed
         })
     except Exception as e:
         db.session.rollback()
-        current_app.logger.error(f"Error completing challenge goal: {str(e)}")
-        return jsonify({'success': False, 'message': 'An error occurred while completing the goal'}), 500
+        current_app.logger.error(f"Error logging challenge progress: {str(e)}")
+        return jsonify({'success': False, 'message': 'An error occurred while logging progress'}), 500
 
 @client.route('/api/challenges/share-image/<int:challenge_id>')
 @login_required
 def generate_challenge_share_image(challenge_id):
     """Generate a shareable image for a challenge with the user's progress."""
     try:
+        from utils.share_images import challenge_spec
+        
         # Get the current client
         current_client = get_current_client()
         
@@ -2807,94 +2432,12 @@ def generate_challenge_share_image(challenge_id):
         if not participation:
             return jsonify({'success': False, 'message': 'You have not joined this challenge'}), 400
         
-        # Use Pillow to create an image with the challenge and progress info
-        import io
-        import os
-        
-        # Create a new image with a white background
-        width, height = 1200, 630  # Standard size for social media sharing
-        image = Image.new('RGB', (width, height), color=(255, 255, 255))
-        draw = ImageDraw.Draw(image)
-        
-        # Try to load fonts or use default
-        try:
-            # First try to load custom fonts if available
-            font_path = os.path.join(current_app.root_path, 'static', 'fonts')
-            title_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Bold.ttf'), 60)
-            subtitle_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-SemiBold.ttf'), 40)
-            body_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 30)
-        except IOError:
-            # If custom fonts are not available, use default
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            body_font = ImageFont.load_default()
-        
-        # Add a colored header
-        header_color = (79, 70, 229)  # Indigo-600
-        draw.rectangle([(0, 0), (width, 120)], fill=header_color)
-        
-        # Add app logo/name
-        draw.text((50, 40), "FitFuelGenerator", font=title_font, fill=(255, 255, 255))
-        
-        # Add challenge title
-        draw.text((50, 150), challenge.title, font=title_font, fill=(0, 0, 0))
-        
-        # Add challenge category
-        category_text = f"Category: {challenge.category.capitalize()}"
-        draw.text((50, 230), category_text, font=subtitle_font, fill=(107, 114, 128))  # Gray-500
-        
-        # Calculate progress bar
-        progress = participation.progress_percentage
-        bar_x = 50
-        bar_y = 300
-        bar_width = width - 100
-        bar_height = 40
-        bar_fill_width = int((bar_width * progress) / 100)
-        
-        # Draw progress bar background
-        draw.rectangle([(bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height)], 
-                       fill=(229, 231, 235))  # Gray-200
-        
-        # Draw progress bar fill
-        progress_color = (16, 185, 129)  # Green-500
-        if progress < 40:
-            progress_color = (239, 68, 68)  # Red-500
-        elif progress < 80:
-            progress_color = (79, 70, 229)  # Indigo-600
-            
-        draw.rectangle([(bar_x, bar_y), (bar_x + bar_fill_width, bar_y + bar_height)], 
-                       fill=progress_color)
-        
-        # Add progress text
-        progress_text = f"Progress: {progress}%"
-        draw.text((bar_x, bar_y + bar_height + 20), progress_text, font=subtitle_font, fill=(0, 0, 0))
-        
-        # Add goals completed text
-        goals_text = f"Goals Completed: {participation.completed_goals} / {participation.total_goals}"
-        draw.text((bar_x, bar_y + bar_height + 80), goals_text, font=body_font, fill=(0, 0, 0))
-        
-        # Add dates
-        date_format = "%b %d, %Y"
-        dates_text = f"Started: {challenge.start_date.strftime(date_format)} • Ends: {challenge.end_date.strftime(date_format)}"
-        draw.text((bar_x, bar_y + bar_height + 130), dates_text, font=body_font, fill=(107, 114, 128))
-        
-        # Add user name
-        user_text = f"Shared by: {current_client.full_name}"
-        draw.text((bar_x, bar_y + bar_height + 180), user_text, font=body_font, fill=(0, 0, 0))
-        
-        # Add a footer
-        footer_y = height - 80
-        draw.rectangle([(0, footer_y), (width, height)], fill=header_color)
-        website_text = "www.fitfuelgenerator.com"
-        draw.text((width // 2 - 150, footer_y + 25), website_text, font=body_font, fill=(255, 255, 255))
-        
-        # Convert the image to bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        
-        # Return the image
-        return send_file(img_byte_arr, mimetype='image/png')
+        return send_share_image(
+            'challenge', challenge_spec,
+            challenge.title, challenge.category, participation.progress_percentage,
+            participation.completed_goals, participation.total_goals,
+            challenge.start_date, challenge.end_date, current_client.full_name
+        )
     
     except Exception as e:
         current_app.logger.error(f"Error generating share image: {str(e)}")
@@ -2905,6 +2448,8 @@ def generate_challenge_share_image(challenge_id):
 def generate_meal_plan_share_image():
     """Generate a shareable image for the current meal plan."""
     try:
+        from utils.share_images import meal_plan_spec
+        
         # Get the current client
         current_client = get_current_client()
         
@@ -2918,139 +2463,17 @@ def generate_meal_plan_share_image():
         if not meal_plan:
             return jsonify({'success': False, 'message': 'No meal plan found for today'}), 400
         
-        # Use Pillow to create an image with the meal plan info
-        import io
-        import os
-        
-        # Create a new image with a white background
-        width, height = 1200, 630  # Standard size for social media sharing
-        image = Image.new('RGB', (width, height), color=(255, 255, 255))
-        draw = ImageDraw.Draw(image)
-        
-        # Try to load fonts or use default
-        try:
-            # First try to load custom fonts if available
-            font_path = os.path.join(current_app.root_path, 'static', 'fonts')
-            title_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Bold.ttf'), 60)
-            subtitle_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-SemiBold.ttf'), 40)
-            body_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 30)
-            small_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 24)
-        except IOError:
-            # If custom fonts are not available, use default
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            body_font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
-        
-        # Add a colored header
-        header_color = (79, 70, 229)  # Indigo-600
-        draw.rectangle([(0, 0), (width, 120)], fill=header_color)
-        
-        # Add app logo/name
-        draw.text((50, 40), "FitFuelGenerator", font=title_font, fill=(255, 255, 255))
-        
-        # Add date
-        draw.text((width - 300, 45), today.strftime("%B %d, %Y"), font=body_font, fill=(255, 255, 255))
-        
-        # Add title
-        draw.text((50, 150), "My Daily Meal Plan", font=title_font, fill=(0, 0, 0))
-        
-        # Calculate total nutrition
-        total_calories = 0
-        total_protein = 0
-        completed_items = 0
-        total_items = 0
-        
-        for meal in meal_plan.meals:
-            for item in meal.items:
-                total_items += 1
-                total_calories += item.calories
-                total_protein += item.protein
-                if item.completed:
-                    completed_items += 1
-        
-        # Add nutrition summary
-        draw.text((50, 230), f"Total Calories: {total_calories} kcal", font=subtitle_font, fill=(107, 114, 128))
-        draw.text((50, 280), f"Total Protein: {total_protein}g", font=subtitle_font, fill=(107, 114, 128))
-        
-        # Calculate progress
-        if total_items > 0:
-            progress = (completed_items / total_items) * 100
-        else:
-            progress = 0
-            
-        # Add completion progress
-        progress_text = f"Completion: {progress:.1f}%"
-        draw.text((50, 330), progress_text, font=subtitle_font, fill=(0, 0, 0))
-        
-        # Draw progress bar
-        bar_x = 50
-        bar_y = 380
-        bar_width = width - 100
-        bar_height = 40
-        bar_fill_width = int((bar_width * progress) / 100)
-        
-        # Draw progress bar background
-        draw.rectangle([(bar_x, bar_y), (bar_x + bar_width, bar_y + bar_height)], 
-                     fill=(229, 231, 235))  # Gray-200
-        
-        # Draw progress bar fill
-        progress_color = (16, 185, 129)  # Green-500
-        if progress < 40:
-            progress_color = (239, 68, 68)  # Red-500
-        elif progress < 80:
-            progress_color = (79, 70, 229)  # Indigo-600
-            
-        draw.rectangle([(bar_x, bar_y), (bar_x + bar_fill_width, bar_y + bar_height)], 
-                     fill=progress_color)
-        
-        # Add meal list
-        y_position = 450
-        for i, meal in enumerate(meal_plan.meals[:3]):  # Show up to 3 meals
-            if y_position > height - 150:
-                break
-                
-            meal_title = f"{meal.type.capitalize()}: {meal.title}"
-            draw.text((50, y_position), meal_title, font=subtitle_font, fill=(0, 0, 0))
-            y_position += 50
-            
-            for j, item in enumerate(meal.items[:2]):  # Show up to 2 items per meal
-                if y_position > height - 150:
-                    break
-                    
-                item_text = f"• {item.name} - {item.calories} kcal, {item.protein}g protein"
-                draw.text((70, y_position), item_text, font=small_font, 
-                        fill=(0, 0, 0) if not item.completed else (16, 185, 129))
-                y_position += 35
-                
-            if len(meal.items) > 2:
-                draw.text((70, y_position), f"• ... and {len(meal.items) - 2} more items", 
-                        font=small_font, fill=(107, 114, 128))
-                y_position += 35
-                
-            y_position += 10
-        
-        # Add a footer
-        footer_y = height - 80
-        draw.rectangle([(0, footer_y), (width, height)], fill=header_color)
-        website_text = "www.fitfuelgenerator.com"
-        shared_by_text = f"Shared by {current_client.full_name}"
-        
-        # Center website text
-        w_width = draw.textlength(website_text, font=body_font)
-        draw.text((width // 2 - w_width // 2, footer_y + 25), website_text, font=body_font, fill=(255, 255, 255))
-        
-        # Shared by text at right
-        s_width = draw.textlength(shared_by_text, font=small_font)
-        draw.text((width - 50 - s_width, footer_y + 30), shared_by_text, font=small_font, fill=(255, 255, 255))
-        
-        # Convert the image to bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        
-        # Return the image
-        return send_file(img_byte_arr, mimetype='image/png')
+        meals = [
+            {
+                'title': f"{meal.type.capitalize()}: {meal.title}",
+                'items': [
+                    {'name': item.name, 'calories': item.calories, 'protein': item.protein, 'completed': item.completed}
+                    for item in meal.items
+                ]
+            }
+            for meal in meal_plan.meals
+        ]
+        return send_share_image('meal_plan', meal_plan_spec, today, meals, current_client.full_name)
     
     except Exception as e:
         current_app.logger.error(f"Error generating meal plan share image: {str(e)}")
@@ -3061,6 +2484,8 @@ def generate_meal_plan_share_image():
 def generate_workout_nutrition_share_image():
     """Generate a shareable image for the workout and nutrition integration data."""
     try:
+        from utils.share_images import workout_nutrition_spec
+        
         # Get the current client
         current_client = get_current_client()
         
@@ -3085,160 +2510,9 @@ def generate_workout_nutrition_share_image():
         if not workout_nutrition_data:
             return jsonify({'success': False, 'message': 'Not enough data to generate recommendations'}), 400
         
-        # Use Pillow to create an image with the workout nutrition info
-        import io
-        import os
-        
-        # Create a new image with a white background
-        width, height = 1200, 630  # Standard size for social media sharing
-        image = Image.new('RGB', (width, height), color=(255, 255, 255))
-        draw = ImageDraw.Draw(image)
-        
-        # Try to load fonts or use default
-        try:
-            # First try to load custom fonts if available
-            font_path = os.path.join(current_app.root_path, 'static', 'fonts')
-            title_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Bold.ttf'), 60)
-            subtitle_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-SemiBold.ttf'), 40)
-            body_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 30)
-            small_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 24)
-        except IOError:
-            # If custom fonts are not available, use default
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            body_font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
-        
-        # Add a colored header
-        header_color = (79, 70, 229)  # Indigo-600
-        draw.rectangle([(0, 0), (width, 120)], fill=header_color)
-        
-        # Add app logo/name
-        draw.text((50, 40), "FitFuelGenerator", font=title_font, fill=(255, 255, 255))
-        
-        # Add title
-        draw.text((50, 150), "Workout & Nutrition Integration", font=title_font, fill=(0, 0, 0))
-        
-        # Add workout type
-        if workout_nutrition_data.get('workout_type'):
-            workout_type = workout_nutrition_data['workout_type'].replace('_', ' ').title()
-            draw.text((50, 220), f"Primary Workout Type: {workout_type}", font=subtitle_font, fill=(107, 114, 128))
-        
-        # Draw the calorie targets section
-        y_position = 300
-        draw.text((50, y_position), "Calorie Targets", font=subtitle_font, fill=(0, 0, 0))
-        y_position += 60
-        
-        # Training day card
-        card_width = (width - 150) // 3
-        card_height = 140
-        card_x = 50
-        card_y = y_position
-        
-        # Training day background
-        draw.rectangle([(card_x, card_y), (card_x + card_width, card_y + card_height)], 
-                      fill=(238, 242, 255))  # Indigo-50
-        
-        # Training day title
-        draw.text((card_x + 20, card_y + 15), "Training Day", font=body_font, fill=(67, 56, 202))  # Indigo-700
-        
-        # Training day calories
-        training_cals = workout_nutrition_data['calories']['training_day_target']
-        draw.text((card_x + 20, card_y + 60), f"{training_cals}", font=subtitle_font, fill=(67, 56, 202))
-        draw.text((card_x + 20, card_y + 100), "calories", font=small_font, fill=(107, 114, 128))
-        
-        # Rest day card
-        card_x += card_width + 25
-        
-        # Rest day background
-        draw.rectangle([(card_x, card_y), (card_x + card_width, card_y + card_height)], 
-                      fill=(243, 244, 246))  # Gray-100
-        
-        # Rest day title
-        draw.text((card_x + 20, card_y + 15), "Rest Day", font=body_font, fill=(107, 114, 128))  # Gray-500
-        
-        # Rest day calories
-        rest_cals = workout_nutrition_data['calories']['rest_day_target']
-        draw.text((card_x + 20, card_y + 60), f"{rest_cals}", font=subtitle_font, fill=(107, 114, 128))
-        draw.text((card_x + 20, card_y + 100), "calories", font=small_font, fill=(107, 114, 128))
-        
-        # Post workout card
-        card_x += card_width + 25
-        
-        # Post workout background
-        draw.rectangle([(card_x, card_y), (card_x + card_width, card_y + card_height)], 
-                      fill=(236, 253, 245))  # Green-50
-        
-        # Post workout title
-        draw.text((card_x + 20, card_y + 15), "Post-Workout", font=body_font, fill=(6, 95, 70))  # Green-800
-        
-        # Post workout calories
-        post_cals = workout_nutrition_data['calories']['post_workout']
-        draw.text((card_x + 20, card_y + 60), f"{post_cals}", font=subtitle_font, fill=(6, 95, 70))
-        draw.text((card_x + 20, card_y + 100), "intake", font=small_font, fill=(107, 114, 128))
-        
-        # Recovery metrics
-        y_position += card_height + 60
-        if workout_nutrition_data.get('recovery'):
-            draw.text((50, y_position), "Recovery Status", font=subtitle_font, fill=(0, 0, 0))
-            y_position += 60
-            
-            # Draw recovery metrics
-            recovery = workout_nutrition_data['recovery']
-            metrics = [
-                {
-                    'name': 'Muscle Recovery', 
-                    'value': f"{recovery['muscle_recovery']}%",
-                    'color': (16, 185, 129) if recovery['muscle_recovery'] >= 80 else 
-                             (251, 191, 36) if recovery['muscle_recovery'] >= 50 else 
-                             (239, 68, 68)
-                },
-                {
-                    'name': 'Energy Level', 
-                    'value': f"{recovery['energy_level']}%",
-                    'color': (16, 185, 129) if recovery['energy_level'] >= 80 else 
-                             (251, 191, 36) if recovery['energy_level'] >= 50 else 
-                             (239, 68, 68)
-                },
-                {
-                    'name': 'Protein Intake', 
-                    'value': f"{workout_nutrition_data['macros']['protein_goal_percent']}%",
-                    'color': (16, 185, 129) if workout_nutrition_data['macros']['protein_goal_percent'] >= 90 else 
-                             (251, 191, 36) if workout_nutrition_data['macros']['protein_goal_percent'] >= 70 else 
-                             (239, 68, 68)
-                }
-            ]
-            
-            for i, metric in enumerate(metrics):
-                metric_x = 50 + i * ((width - 100) // 3)
-                
-                # Draw metric name
-                draw.text((metric_x, y_position), metric['name'], font=body_font, fill=(0, 0, 0))
-                
-                # Draw metric value
-                draw.text((metric_x, y_position + 40), metric['value'], font=subtitle_font, fill=metric['color'])
-        
-        # Add a footer
-        footer_y = height - 80
-        draw.rectangle([(0, footer_y), (width, height)], fill=header_color)
-        website_text = "www.fitfuelgenerator.com"
-        shared_by_text = f"Shared by {current_client.full_name}"
-        
-        # Center website text
-        w_width = draw.textlength(website_text, font=body_font)
-        draw.text((width // 2 - w_width // 2, footer_y + 25), website_text, font=body_font, fill=(255, 255, 255))
-        
-        # Shared by text at right
-        s_width = draw.textlength(shared_by_text, font=small_font)
-        draw.text((width - 50 - s_width, footer_y + 30), shared_by_text, font=small_font, fill=(255, 255, 255))
-        
-        # Convert the image to bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        
-        # Return the image
-        return send_file(img_byte_arr, mimetype='image/png')
+        return send_share_image(
+            'workout_nutrition', workout_nutrition_spec, workout_nutrition_data, current_client.full_name
+        )
     
     except Exception as e:
         current_app.logger.error(f"Error generating workout nutrition share image: {str(e)}")
@@ -3249,6 +2523,8 @@ def generate_workout_nutrition_share_image():
 def generate_achievement_share_image(achievement_id):
     """Generate a shareable image for a user achievement."""
     try:
+        from utils.share_images import achievement_spec
+        
         # Get the current client
         current_client = get_current_client()
         
@@ -3258,108 +2534,10 @@ def generate_achievement_share_image(achievement_id):
             client_id=current_client.id
         ).first_or_404()
         
-        # Use Pillow to create an image with the achievement info
-        import io
-        import os
-        from datetime import datetime
-        
-        # Create a new image with a gradient background
-        width, height = 1200, 630  # Standard size for social media sharing
-        image = Image.new('RGB', (width, height), color=(255, 255, 255))
-        draw = ImageDraw.Draw(image)
-        
-        # Try to load fonts or use default
-        try:
-            # First try to load custom fonts if available
-            font_path = os.path.join(current_app.root_path, 'static', 'fonts')
-            title_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Bold.ttf'), 70)
-            subtitle_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-SemiBold.ttf'), 40)
-            body_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 30)
-            small_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 24)
-        except IOError:
-            # If custom fonts are not available, use default
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            body_font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
-        
-        # Create a gradient background
-        for y in range(height):
-            r = int(79 + (y / height) * (16 - 79))
-            g = int(70 + (y / height) * (185 - 70))
-            b = int(229 + (y / height) * (129 - 229))
-            for x in range(width):
-                draw.point((x, y), fill=(r, g, b))
-        
-        # Add a semi-transparent overlay in the center for content
-        overlay_margin = 80
-        overlay_width = width - (overlay_margin * 2)
-        overlay_height = height - (overlay_margin * 2)
-        overlay = Image.new('RGBA', (overlay_width, overlay_height), (255, 255, 255, 180))
-        image.paste(overlay, (overlay_margin, overlay_margin), overlay)
-        
-        # Add trophy icon
-        try:
-            icon_size = 120
-            trophy_icon = Image.open(os.path.join(current_app.root_path, 'static', 'images', 'trophy_icon.png')).resize((icon_size, icon_size))
-            icon_x = (width - icon_size) // 2
-            icon_y = overlay_margin + 50
-            image.paste(trophy_icon, (icon_x, icon_y), trophy_icon)
-        except:
-            # If trophy icon is not available, draw a circle
-            icon_size = 120
-            icon_x = (width - icon_size) // 2
-            icon_y = overlay_margin + 50
-            draw.ellipse([(icon_x, icon_y), (icon_x + icon_size, icon_y + icon_size)], fill=(255, 215, 0))
-        
-        # Add "Achievement Unlocked" text
-        text = "Achievement Unlocked!"
-        text_width = draw.textlength(text, font=subtitle_font)
-        text_x = (width - text_width) // 2
-        text_y = overlay_margin + icon_size + 70
-        draw.text((text_x, text_y), text, font=subtitle_font, fill=(0, 0, 0))
-        
-        # Add achievement title
-        title_y = text_y + 70
-        title_width = draw.textlength(achievement.title, font=title_font)
-        title_x = (width - title_width) // 2
-        draw.text((title_x, title_y), achievement.title, font=title_font, fill=(79, 70, 229))
-        
-        # Add achievement description
-        desc_y = title_y + 100
-        desc_text = achievement.description
-        desc_width = draw.textlength(desc_text, font=body_font)
-        desc_x = (width - desc_width) // 2
-        draw.text((desc_x, desc_y), desc_text, font=body_font, fill=(0, 0, 0))
-        
-        # Add achievement date
-        date_y = desc_y + 60
-        date_text = f"Achieved on {achievement.date_earned.strftime('%B %d, %Y')}"
-        date_width = draw.textlength(date_text, font=small_font)
-        date_x = (width - date_width) // 2
-        draw.text((date_x, date_y), date_text, font=small_font, fill=(107, 114, 128))
-        
-        # Add user name
-        user_y = height - overlay_margin - 50
-        user_text = f"Earned by {current_client.full_name}"
-        user_width = draw.textlength(user_text, font=body_font)
-        user_x = (width - user_width) // 2
-        draw.text((user_x, user_y), user_text, font=body_font, fill=(0, 0, 0))
-        
-        # Add FitFuelGenerator logo/text
-        logo_y = height - 40
-        logo_text = "FitFuelGenerator"
-        logo_width = draw.textlength(logo_text, font=small_font)
-        logo_x = (width - logo_width) // 2
-        draw.text((logo_x, logo_y), logo_text, font=small_font, fill=(255, 255, 255))
-        
-        # Convert the image to bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        
-        # Return the image
-        return send_file(img_byte_arr, mimetype='image/png')
+        return send_share_image(
+            'achievement', achievement_spec,
+            achievement.title, achievement.description, achievement.date_earned, current_client.full_name
+        )
     
     except Exception as e:
         current_app.logger.error(f"Error generating achievement share image: {str(e)}")
@@ -3370,6 +2548,8 @@ def generate_achievement_share_image(achievement_id):
 def generate_weekly_summary_share_image():
     """Generate a shareable image for weekly progress summary."""
     try:
+        from utils.share_images import weekly_summary_spec
+        
         # Get the current client
         current_client = get_current_client()
         
@@ -3396,60 +2576,20 @@ def generate_weekly_summary_share_image():
             ProgressLog.date >= week_start
         ).order_by(ProgressLog.date).all()
         
-        # Use Pillow to create an image with the weekly summary
-        import io
-        import os
-        import matplotlib
-        matplotlib.use('Agg')  # Non-interactive backend
-        import matplotlib.pyplot as plt
-        import numpy as np
-        from matplotlib.patches import Patch
-        
-        # Create a new image with a white background
-        width, height = 1200, 630  # Standard size for social media sharing
-        image = Image.new('RGB', (width, height), color=(255, 255, 255))
-        draw = ImageDraw.Draw(image)
-        
-        # Try to load fonts or use default
-        try:
-            # First try to load custom fonts if available
-            font_path = os.path.join(current_app.root_path, 'static', 'fonts')
-            title_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Bold.ttf'), 60)
-            subtitle_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-SemiBold.ttf'), 40)
-            body_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 30)
-            small_font = ImageFont.truetype(os.path.join(font_path, 'OpenSans-Regular.ttf'), 24)
-        except IOError:
-            # If custom fonts are not available, use default
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            body_font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
-        
-        # Add a colored header
-        header_color = (79, 70, 229)  # Indigo-600
-        draw.rectangle([(0, 0), (width, 120)], fill=header_color)
-        
-        # Add app logo/name and date range
-        draw.text((50, 40), "FitFuelGenerator", font=title_font, fill=(255, 255, 255))
-        date_range_text = f"{week_start.strftime('%b %d')} - {today.strftime('%b %d, %Y')}"
-        date_width = draw.textlength(date_range_text, font=body_font)
-        draw.text((width - 50 - date_width, 45), date_range_text, font=body_font, fill=(255, 255, 255))
-        
-        # Add title
-        draw.text((50, 150), "Weekly Progress Summary", font=title_font, fill=(0, 0, 0))
-        
         # Calculate workout stats
-        total_workouts = len(workouts)
-        total_duration = sum(w.duration for w in workouts) if workouts else 0
-        total_calories_burned = sum(w.calories_burned for w in workouts) if workouts else 0
+        workout_stats = {
+            'count': len(workouts),
+            'duration': sum(w.duration for w in workouts) if workouts else 0,
+            'calories_burned': sum(w.calories_burned for w in workouts) if workouts else 0
+        }
         
         # Calculate nutrition stats
         avg_calories = 0
         avg_protein = 0
         completion_rate = 0
+        daily_calories = []
         
         if meal_plans:
-            daily_calories = []
             daily_protein = []
             completion_rates = []
             
@@ -3479,6 +2619,12 @@ def generate_weekly_summary_share_image():
             if completion_rates:
                 completion_rate = sum(completion_rates) / len(completion_rates)
         
+        nutrition_stats = {
+            'avg_calories': avg_calories,
+            'avg_protein': avg_protein,
+            'completion_rate': completion_rate
+        }
+        
         # Calculate weight change if available
         weight_change = None
         if len(progress_logs) >= 2:
@@ -3487,91 +2633,14 @@ def generate_weekly_summary_share_image():
             if hasattr(first_log, 'weight') and hasattr(last_log, 'weight'):
                 weight_change = last_log.weight - first_log.weight
         
-        # Create workout and nutrition summary
-        summary_y = 230
-        
-        # Summary headings
-        workout_x = 50
-        nutrition_x = width // 2 + 50
-        
-        draw.text((workout_x, summary_y), "Workout Summary", font=subtitle_font, fill=(79, 70, 229))
-        draw.text((nutrition_x, summary_y), "Nutrition Summary", font=subtitle_font, fill=(16, 185, 129))
-        
-        # Key stats
-        stats_y = summary_y + 60
-        line_height = 50
-        
-        # Workout stats
-        draw.text((workout_x, stats_y), f"Workouts Completed: {total_workouts}", font=body_font, fill=(0, 0, 0))
-        draw.text((workout_x, stats_y + line_height), f"Total Duration: {total_duration} min", font=body_font, fill=(0, 0, 0))
-        draw.text((workout_x, stats_y + line_height * 2), f"Calories Burned: {total_calories_burned}", font=body_font, fill=(0, 0, 0))
-        
-        # Nutrition stats
-        draw.text((nutrition_x, stats_y), f"Avg. Daily Calories: {avg_calories:.0f}", font=body_font, fill=(0, 0, 0))
-        draw.text((nutrition_x, stats_y + line_height), f"Avg. Daily Protein: {avg_protein:.0f}g", font=body_font, fill=(0, 0, 0))
-        draw.text((nutrition_x, stats_y + line_height * 2), f"Meal Plan Completion: {completion_rate:.0f}%", font=body_font, fill=(0, 0, 0))
-        
-        # Add weight change if available
-        if weight_change is not None:
-            weight_y = stats_y + line_height * 3 + 20
-            prefix = "+" if weight_change > 0 else ""
-            weight_text = f"Weight Change: {prefix}{weight_change:.1f} lbs"
-            weight_color = (239, 68, 68) if weight_change > 0 and current_client.goal == 'weight_loss' else (16, 185, 129)
-            draw.text((workout_x, weight_y), weight_text, font=body_font, fill=weight_color)
-        
-        # Create workout activity chart if we have workouts
-        if workouts:
-            # Generate a simple workout activity chart
-            fig, ax = plt.subplots(figsize=(5, 3))
-            
-            # Get workout days and durations
-            dates = [w.completion_date.strftime('%a') for w in workouts]
-            durations = [w.duration for w in workouts]
-            
-            # Create chart
-            ax.bar(dates, durations, color='#4f46e5')
-            ax.set_ylabel('Minutes', fontsize=10)
-            ax.set_title('Workout Duration by Day', fontsize=12)
-            ax.tick_params(axis='both', which='major', labelsize=8)
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            
-            # Save chart to a buffer
-            chart_buffer = io.BytesIO()
-            fig.tight_layout()
-            fig.savefig(chart_buffer, format='png', dpi=100)
-            chart_buffer.seek(0)
-            
-            # Open the image and paste it
-            chart_img = Image.open(chart_buffer)
-            chart_x = 50
-            chart_y = stats_y + line_height * 4 + 20
-            image.paste(chart_img, (chart_x, chart_y))
-            plt.close(fig)
-        
-        # Add footer
-        footer_y = height - 80
-        draw.rectangle([(0, footer_y), (width, height)], fill=header_color)
-        
-        # Add sharing text and username
-        share_text = "Weekly Progress Summary"
-        user_text = f"Generated for {current_client.full_name}"
-        
-        # Center share text
-        share_width = draw.textlength(share_text, font=body_font)
-        draw.text((width // 2 - share_width // 2, footer_y + 25), share_text, font=body_font, fill=(255, 255, 255))
-        
-        # Right-align user text
-        user_width = draw.textlength(user_text, font=small_font)
-        draw.text((width - 50 - user_width, footer_y + 30), user_text, font=small_font, fill=(255, 255, 255))
-        
-        # Convert the image to bytes
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format='PNG')
-        img_byte_arr.seek(0)
-        
-        # Return the image
-        return send_file(img_byte_arr, mimetype='image/png')
+        # Workout days and durations for the activity chart
+        workout_minutes = [(w.completion_date.strftime('%a'), w.duration) for w in workouts]
+        
+        return send_share_image(
+            'weekly_summary', weekly_summary_spec,
+            week_start, today, workout_stats, nutrition_stats, weight_change,
+            current_client.goal == 'weight_loss', current_client.full_name, workout_minutes, daily_calories
+        )
     
     except Exception as e:
         current_app.logger.error(f"Error generating weekly summary share image: {str(e)}")
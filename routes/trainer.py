@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
-from models import Client, ProgressLog, Goal, ActivityFeed, Plan, WorkoutLog, SharingAnalytics
+from models import Client, ClientAdherenceSummary, ProgressLog, Goal, ActivityFeed, Plan, WorkoutLog, SharingAnalytics
 from extensions import db
 from datetime import datetime, timedelta
 from utils.notifications import send_notification
@@ -84,47 +84,23 @@ def view_client(client_id):
         thirty_days_ago = datetime.now() - timedelta(days=30)
         progress_logs = ProgressLog.query.filter(
             ProgressLog.client_id == client_id,
-            ProgressLog.created_at >= thirty_days_ago
-        ).order_by(ProgressLog.created_at.desc()).all()
+            ProgressLog.log_date >= thirty_days_ago
+        ).order_by(ProgressLog.log_date.desc()).all()
 
-        # Calculate completion rate
-        total_logs = len(progress_logs)
-        completed_workouts = sum(1 for log in progress_logs if log.workout_completed)
-        completion_rate = (completed_workouts / total_logs * 100) if total_logs > 0 else 0
-
-        # Calculate current streak
-        streak = 0
-        current_date = datetime.now().date()
-        completed_dates = {log.log_date.date() for log in progress_logs if log.workout_completed}
-        
-        while (current_date - timedelta(days=streak)) in completed_dates:
-            streak += 1
-
-        # Calculate weekly stats
-        week_start = current_date - timedelta(days=current_date.weekday())
-        weekly_logs = [log for log in progress_logs if log.log_date.date() >= week_start]
-        weekly_total = len(weekly_logs)
-        weekly_completed = sum(1 for log in weekly_logs if log.workout_completed)
+        # Adherence stats are maintained incrementally as logs change
+        today = ClientAdherenceSummary.today()
+        summary = client.adherence_summary or ClientAdherenceSummary(
+            client_id=client.id, current_streak=0, best_streak=0, daily_counts={}
+        )
+        weekly_completed, weekly_total = summary.week_counts(today)
         weekly_completion = (weekly_completed / weekly_total * 100) if weekly_total > 0 else 0
 
-        # Get best streak
-        best_streak = 0
-        temp_streak = 0
-        sorted_dates = sorted(completed_dates)
-        
-        for i in range(len(sorted_dates)):
-            if i > 0 and (sorted_dates[i] - sorted_dates[i-1]).days == 1:
-                temp_streak += 1
-            else:
-                temp_streak = 1
-            best_streak = max(best_streak, temp_streak)
-
         return render_template('view_client.html',
                              client=client,
                              progress_logs=progress_logs,
-                             completion_rate=round(completion_rate, 1),
-                             current_streak=streak,
-                             best_streak=best_streak,
+                             completion_rate=summary.completion_rate(today=today),
+                             current_streak=summary.streak_as_of(today),
+                             best_streak=summary.best_streak,
                              weekly_completion=round(weekly_completion, 1),
                              weekly_completed=weekly_completed,
                              weekly_total=weekly_total,
@@ -0,0 +1,62 @@
+"""Benchmark the compiled ingredient classifier against per-keyword substring scans"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ingredient_classifier import (
+    ALLERGEN_KEYWORDS, DIET_EXCLUSION_KEYWORDS, KeywordMatcher,
+    _build_keyword_labels, _classify_normalized, classify_ingredient
+)
+
+BASE_INGREDIENTS = [
+    'chicken breast', 'brown rice', 'whole wheat bread', 'greek yogurt', 'rolled oats',
+    'almond milk', 'peanut butter', 'cheddar cheese', 'salmon fillet', 'firm tofu',
+    'spinach', 'sweet potato', 'olive oil', 'shrimp', 'egg whites', 'quinoa',
+    'black beans', 'honey', 'processed ham', 'broccoli', 'pasta', 'walnuts', 'edamame'
+]
+MODIFIERS = ['', 'fresh', 'organic', 'frozen', 'low fat', 'diced', 'roasted', 'chopped']
+
+
+def naive_classify(name):
+    """Original approach: one substring scan per keyword per category"""
+    name = name.lower()
+    allergens = {allergen for allergen, keywords in ALLERGEN_KEYWORDS.items()
+                 if any(keyword in name for keyword in keywords)}
+    excluded = {diet for diet, keywords in DIET_EXCLUSION_KEYWORDS.items()
+                if any(keyword in name for keyword in keywords)}
+    return allergens, excluded
+
+
+def make_names(count, unique_ratio):
+    random.seed(42)
+    vocabulary = [
+        f"{random.choice(MODIFIERS)} {random.choice(BASE_INGREDIENTS)} {i}".strip()
+        for i in range(max(1, int(count * unique_ratio)))
+    ]
+    return [random.choice(vocabulary) for _ in range(count)]
+
+
+def run(label, func, names):
+    start = time.perf_counter()
+    for name in names:
+        func(name)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:8.3f}s  {len(names) / elapsed:>12,.0f} names/s")
+
+
+def main(count=100_000):
+    matcher = KeywordMatcher(_build_keyword_labels())
+    for unique_ratio in (1.0, 0.01):
+        names = make_names(count, unique_ratio)
+        print(f"\n{count:,} ingredient names, {unique_ratio:.0%} unique")
+        run('naive substring scan', naive_classify, names)
+        run('automaton (no memo)', matcher.match, names)
+        _classify_normalized.cache_clear()
+        run('classify_ingredient (memoized)', classify_ingredient, names)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
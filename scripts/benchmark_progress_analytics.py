@@ -0,0 +1,80 @@
+"""Benchmark the columnar progress analytics engine against the original list-of-dicts loops"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.progress_analytics import (
+    TREND_METRICS, ProgressFrame, completion_rate, completion_rates_by_client,
+    performance_trends, performance_trends_by_client
+)
+
+
+def naive_completion_rate(progress_logs):
+    """Original approach: parse every date, count in Python"""
+    total = len(progress_logs)
+    completed = sum(1 for log in progress_logs if log.get('workout_completed', False))
+    cutoff = datetime.utcnow() - timedelta(weeks=4)
+    recent = [log for log in progress_logs if datetime.fromisoformat(log['log_date']) > cutoff]
+    recent_completed = sum(1 for log in recent if log.get('workout_completed', False))
+    return completed / total * 100, (recent_completed / len(recent) * 100) if recent else 0
+
+
+def naive_weekly_metrics(progress_logs):
+    """Original approach: strftime week keys and per-week Python averages"""
+    weekly_metrics = {}
+    for log in progress_logs:
+        week_key = datetime.fromisoformat(log['log_date']).strftime('%Y-%W')
+        weekly_metrics.setdefault(week_key, []).append(log.get('metrics', {}))
+    return {
+        name: [sum(m.get(name, 0) for m in metrics) / len(metrics) for metrics in weekly_metrics.values()]
+        for name in TREND_METRICS
+    }
+
+
+def make_logs(count, clients):
+    random.seed(42)
+    start = datetime.utcnow() - timedelta(days=365)
+    logs = []
+    client_ids = []
+    for i in range(count):
+        logs.append({
+            'log_date': (start + timedelta(minutes=random.randint(0, 365 * 24 * 60))).isoformat(),
+            'workout_completed': random.random() < 0.7,
+            'metrics': {name: random.uniform(0, 10) for name in TREND_METRICS}
+        })
+        client_ids.append(i % clients)
+    logs.sort(key=lambda log: log['log_date'])
+    return logs, client_ids
+
+
+def run(label, func, *args):
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:8.3f}s")
+    return elapsed
+
+
+def main(count=1_000_000, clients=1000):
+    logs, client_ids = make_logs(count, clients)
+    print(f"\n{count:,} progress logs, {clients:,} clients")
+
+    run('naive completion rate', naive_completion_rate, logs)
+    run('naive weekly rollup', naive_weekly_metrics, logs)
+
+    start = time.perf_counter()
+    frame = ProgressFrame.from_logs(logs, client_ids=client_ids)
+    print(f"{'build ProgressFrame':<40} {time.perf_counter() - start:8.3f}s")
+
+    run('completion_rate', completion_rate, frame)
+    run('performance_trends', performance_trends, frame)
+    run('completion_rates_by_client', completion_rates_by_client, frame)
+    run('performance_trends_by_client', performance_trends_by_client, frame)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,61 @@
+"""
+Peak memory and time of the client progress report over 1 to 5 years of daily
+logs. Logs are fed to the weekly summary in STREAM_BATCH_SIZE chunks, as the
+database stream delivers them, so the peak should stay roughly flat as the
+range grows.
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.progress_report import STREAM_BATCH_SIZE, WeeklySummary
+from utils.report_generator import generate_client_report
+
+END = date(2024, 12, 31)
+CLIENT = SimpleNamespace(name='Alex', fitness_level='intermediate', goal='weight_loss', created_at=datetime(2019, 1, 1))
+
+
+def log_chunks(start: date, end: date):
+    """Daily logs in stream-sized chunks, never all in memory at once"""
+    chunk = []
+    for i in range((end - start).days + 1):
+        day = datetime.combine(start + timedelta(days=i), datetime.min.time())
+        chunk.append((day, i % 3 != 0, {'weight': 90 - i * 0.01, 'resting_hr': 62 + i % 7, 'notes': 'felt good'}))
+        if len(chunk) == STREAM_BATCH_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def report(years: int) -> int:
+    start = END - timedelta(days=365 * years - 1)
+    weekly = WeeklySummary(start, END)
+    for chunk in log_chunks(start, END):
+        weekly.add(chunk)
+    output = io.BytesIO()
+    generate_client_report(CLIENT, [], weekly, [], output)
+    return len(output.getvalue())
+
+
+def main():
+    report(1)  # warm imports, fonts and the theme cache
+    for years in (1, 2, 5):
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = report(years)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{years} year(s), {365 * years:5d} logs: {elapsed * 1000:7.1f} ms, "
+              f"peak {peak / 1024 / 1024:6.2f} MiB, PDF {size / 1024:6.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark per-report CPU time for 90-day reports with the cached report theme
+against rebuilding styles for every report (the theme cache cleared before each)
+"""
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pdf_generator import generate_pdf
+from utils.progress_report import WeeklySummary
+from utils.report_generator import generate_client_report
+from utils.report_templates import report_brand, report_theme
+
+DAYS = 90
+START = datetime(2024, 1, 1)
+BRAND = report_brand({'primary_color': '#0f766e', 'accent_color': '#ccfbf1'}, 'Peak Coaching')
+
+CLIENT = SimpleNamespace(name='Alex', fitness_level='intermediate', goal='muscle_gain', created_at=START)
+ACHIEVEMENTS = [
+    SimpleNamespace(achievement=SimpleNamespace(name=f'Milestone {i}'), progress=i * 10, completed=i >= 10)
+    for i in range(1, 13)
+]
+GOALS = [
+    SimpleNamespace(name=name, target_value=target, current_value=target * 0.6, target_date=START + timedelta(days=DAYS))
+    for name, target in (('Bench press', 100), ('Body fat', 15), ('5k time', 25))
+]
+WEEKLY = WeeklySummary(START.date(), (START + timedelta(days=DAYS - 1)).date())
+WEEKLY.add([
+    (START + timedelta(days=i), i % 3 != 0, {'weight': 80 - i * 0.05, 'body_fat': 20 - i * 0.02, 'resting_hr': 60 + i % 5})
+    for i in range(DAYS)
+])
+
+CLIENT_DATA = {
+    'name': 'Alex', 'goal': 'muscle_gain', 'fitness_level': 'intermediate',
+    'diet_preference': 'balanced', 'weekly_budget': 120, 'training_days': 4
+}
+WORKOUT_PLAN = {
+    f'Day {day}': {
+        'exercises': 'Rest Day' if day % 7 in (3, 0) else [
+            {'name': name, 'sets': 4, 'reps': '8-10'} for name in ('Squat', 'Bench press', 'Row', 'Plank')
+        ],
+        'motivation': 'Keep going'
+    }
+    for day in range(1, DAYS + 1)
+}
+MEAL_PLAN = {
+    f'Day {day}': {
+        'meals': {meal: {'name': f'{meal.capitalize()} bowl', 'cost': 4.5} for meal in ('breakfast', 'lunch', 'dinner')},
+        'total_cost': 13.5
+    }
+    for day in range(1, DAYS + 1)
+}
+
+REPORTS = {
+    'client report, 90 daily logs': lambda: generate_client_report(
+        CLIENT, ACHIEVEMENTS, WEEKLY, GOALS, io.BytesIO(), brand=BRAND
+    ),
+    'fitness plan, 90 days': lambda: generate_pdf(CLIENT_DATA, WORKOUT_PLAN, MEAL_PLAN, io.BytesIO(), brand=BRAND)
+}
+
+
+def cpu_time(func, repeat, cold):
+    func()  # warm imports and fonts
+    total = 0.0
+    for _ in range(repeat):
+        if cold:
+            report_theme.cache_clear()
+        start = time.process_time()
+        func()
+        total += time.process_time() - start
+    return total / repeat
+
+
+def main(repeat=20):
+    for label, func in REPORTS.items():
+        before = cpu_time(func, repeat, cold=True)
+        after = cpu_time(func, repeat, cold=False)
+        print(f"{label:<32} styles per report {before * 1000:7.1f} ms   cached theme {after * 1000:7.1f} ms   "
+              f"saved {(before - after) * 1000:5.1f} ms")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
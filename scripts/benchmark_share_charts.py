@@ -0,0 +1,62 @@
+"""Benchmark the weekly summary share image with native chart primitives against the matplotlib path"""
+import io
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from utils import chart_pool
+from utils.share_images import MARGIN, PNG_COMPRESS_LEVEL, compose, render_share_image, weekly_summary_spec
+
+WORKOUT_MINUTES = [('Mon', 30), ('Tue', 45), ('Wed', 20), ('Thu', 60), ('Fri', 40), ('Sat', 75), ('Sun', 50)]
+DAILY_CALORIES = [2000, 2300, 1900, 2150, 2400, 2050, 2200]
+STATS = (
+    date(2024, 1, 1), date(2024, 1, 7), {'count': 7, 'duration': 320, 'calories_burned': 2100},
+    {'avg_calories': 2143, 'avg_protein': 140, 'completion_rate': 80}, -1.2, True, 'Alex'
+)
+
+
+def native():
+    return render_share_image(weekly_summary_spec(*STATS, WORKOUT_MINUTES, DAILY_CALORIES))
+
+
+def matplotlib_chart():
+    """Previous path: draw the bars with matplotlib, encode, decode and paste onto the card"""
+    spec = weekly_summary_spec(*STATS, (), DAILY_CALORIES)
+    png = chart_pool.render_chart(chart_pool.BarChart(
+        [day for day, _ in WORKOUT_MINUTES], [minutes for _, minutes in WORKOUT_MINUTES],
+        'Workout Duration by Day', 'Minutes'
+    ))
+    image = compose(spec)
+    image.paste(Image.open(io.BytesIO(png)), (MARGIN, 440))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+def run(label, func, repeat):
+    func()  # warm caches and imports
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<40} {elapsed * 1000:8.1f} ms/image")
+    return elapsed
+
+
+def main(repeat=50):
+    start = time.perf_counter()
+    chart_pool._warm_worker()
+    print(f"{'matplotlib import':<40} {(time.perf_counter() - start) * 1000:8.1f} ms (once per process)")
+
+    matplotlib_time = run('weekly summary, matplotlib bar chart', matplotlib_chart, repeat)
+    native_time = run('weekly summary, native primitives', native, repeat)
+    print(f"{'speedup':<40} {matplotlib_time / native_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
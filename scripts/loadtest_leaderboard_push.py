@@ -0,0 +1,121 @@
+"""
+Load test for live challenge leaderboards: broadcasting on every progress change
+versus coalescing changes per window, with thousands of subscribed sockets
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask_login import LoginManager, UserMixin
+
+from extensions import db, socketio
+from models import Challenge, ChallengeParticipant, Client, Trainer
+from utils.leaderboard_push import COALESCE_WINDOW, broadcaster
+
+TABLES = ['trainer', 'client', 'challenge', 'challenge_participant']
+
+
+class LoadTestUser(UserMixin):
+    id = 1
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', SECRET_KEY='load-test')
+    db.init_app(app)
+    socketio.init_app(app, async_mode='threading')
+    login_manager = LoginManager(app)
+    login_manager.request_loader(lambda request: LoadTestUser())
+    return app
+
+
+def seed(participants):
+    db.metadata.create_all(db.engine, tables=[db.metadata.tables[name] for name in TABLES])
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    clients = [
+        Client(name=f'Client {i}', email=f'c{i}@example.com', trainer_id=trainer.id, fitness_level='beginner')
+        for i in range(participants)
+    ]
+    db.session.add_all(clients)
+    db.session.flush()
+    challenge = Challenge(
+        name='Load test', challenge_type='steps', target_value=100,
+        start_date=datetime.utcnow(), end_date=datetime.utcnow() + timedelta(days=30),
+        created_by=clients[0].id
+    )
+    db.session.add(challenge)
+    db.session.flush()
+    rows = [ChallengeParticipant(challenge_id=challenge.id, client_id=client.id, current_value=0) for client in clients]
+    db.session.add_all(rows)
+    db.session.commit()
+    return challenge.id, rows
+
+
+def drain(sockets):
+    """Packets and payload bytes delivered to every subscriber since the last drain"""
+    packets = size = 0
+    for sock in sockets:
+        for packet in sock.get_received():
+            packets += 1
+            size += len(repr(packet['args']))
+    return packets, size
+
+
+def run(label, sockets, rows, updates, per_flush):
+    random.seed(7)
+    drain(sockets)
+    emits = 0
+    start = time.perf_counter()
+    for i in range(updates):
+        participant = random.choice(rows)
+        participant.current_value = min(100, (participant.current_value or 0) + random.randint(1, 5))
+        db.session.commit()
+        if (i + 1) % per_flush == 0:
+            emits += broadcaster.flush()
+    emits += broadcaster.flush()
+    elapsed = time.perf_counter() - start
+    packets, size = drain(sockets)
+    print(f"{label:<34} {emits:6d} emits {packets:9d} packets {size / 1e6:8.1f} MB "
+          f"{elapsed:7.2f}s {updates / elapsed:9,.0f} updates/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--participants', type=int, default=200)
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--rate', type=int, default=200, help='Progress updates per second')
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        challenge_id, rows = seed(args.participants)
+        # Flushes are driven explicitly below instead of by the background task
+        broadcaster._app = None
+
+        start = time.perf_counter()
+        sockets = []
+        for _ in range(args.subscribers):
+            sock = socketio.test_client(app)
+            sock.emit('subscribe_leaderboard', {'challenge_id': challenge_id}, callback=True)
+            sockets.append(sock)
+        print(f"Subscribed {args.subscribers} sockets in {time.perf_counter() - start:.2f}s")
+
+        per_window = max(1, int(args.rate * COALESCE_WINDOW))
+        run('broadcast on every change', sockets, rows, args.updates, 1)
+        run(f'coalesced ({COALESCE_WINDOW}s, {per_window}/window)', sockets, rows, args.updates, per_window)
+
+        for sock in sockets:
+            sock.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Report what importing the app costs at worker start-up, using `python -X importtime`.
+Prints the slowest top-level packages, lists any heavy libraries that were loaded
+eagerly, and exits non-zero when the total is over the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only be imported by the code paths that need them
+HEAVY_MODULES = ('matplotlib', 'numpy', 'PIL', 'reportlab', 'openai')
+
+
+def import_times(module):
+    """{module: (self_us, cumulative_us)} for every module imported by `import module`"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='app', help='Module to import')
+    parser.add_argument('--top', type=int, default=20, help='Packages to list')
+    parser.add_argument('--budget-ms', type=float, default=None, help='Fail when the import takes longer')
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+
+    # Self time summed per top-level package, so a package's total excludes what it shares with others
+    packages = defaultdict(int)
+    for name, (self_us, _) in times.items():
+        packages[name.split('.')[0]] += self_us
+    total_ms = sum(packages.values()) / 1000
+
+    print(f"import {args.module}: {total_ms:.0f} ms, {len(times)} modules\n")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<30} {self_us / 1000:8.1f} ms")
+
+    eager = [name for name in HEAVY_MODULES if name in times]
+    if eager:
+        print(f"\nHeavy libraries imported at start-up: {', '.join(eager)}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        sys.exit(f"\nImport time {total_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if eager:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
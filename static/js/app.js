@@ -121,6 +121,31 @@ function showToast(message, type = 'info') {
     setTimeout(() => toast.remove(), 5000);
 }
 
+// Report downloads: start the render job, poll until it finishes, then download the file
+async function downloadReport(url, options = {}) {
+    showLoading();
+    try {
+        const response = await fetch(url, { headers: { 'Accept': 'application/json' }, ...options });
+        let job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Could not start the report');
+        }
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            job = await (await fetch(job.status_url)).json();
+        }
+        if (job.status !== 'done') {
+            throw new Error(job.error || 'The report could not be generated');
+        }
+        window.location = job.download_url;
+    } catch (error) {
+        console.error('Error downloading report:', error);
+        showToast(error.message, 'error');
+    } finally {
+        hideLoading();
+    }
+}
+
 // Form validation
 function validateForm(form) {
     const requiredFields = form.querySelectorAll('[required]');
@@ -60,4 +60,29 @@ def auth_client(app, client):
             'password': 'password123'
         }, follow_redirects=True)
         
-        return client 
\ No newline at end of file
+        return client 
+
+@pytest.fixture
+def query_counter(app):
+    """Count the SQL statements issued against the test database."""
+    from sqlalchemy import event
+
+    class QueryCounter:
+        def __init__(self):
+            self.statements = []
+
+        def __enter__(self):
+            event.listen(db.engine, 'before_cursor_execute', self._record)
+            return self
+
+        def __exit__(self, *exc_info):
+            event.remove(db.engine, 'before_cursor_execute', self._record)
+
+        def _record(self, conn, cursor, statement, parameters, context, executemany):
+            self.statements.append(statement)
+
+        @property
+        def count(self):
+            return len(self.statements)
+
+    return QueryCounter()
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Achievement, Client, ClientAchievement, ProgressLog, Trainer
+from utils.achievement_recommender import recommend_achievements_bulk
+
+
+def _setup(achievement_count):
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    clients = [
+        Client(name='Strong', email='s@example.com', trainer_id=trainer.id,
+               fitness_level='intermediate', goal='muscle_gain'),
+        Client(name='Steady', email='t@example.com', trainer_id=trainer.id,
+               fitness_level='beginner', goal='consistency')
+    ]
+    db.session.add_all(clients)
+    for i in range(achievement_count):
+        db.session.add(Achievement(
+            name=f'Achievement {i}', type=('strength', 'workout', 'nutrition')[i % 3],
+            difficulty=i % 5 + 1
+        ))
+    db.session.flush()
+    for days_ago in range(10):
+        db.session.add(ProgressLog(
+            client_id=clients[0].id,
+            log_date=datetime.utcnow() - timedelta(days=days_ago),
+            workout_completed=True
+        ))
+    db.session.commit()
+    return clients
+
+
+def test_recommendations_score_and_rank(app):
+    """Level and goal drive the score; earned achievements are skipped; ties keep id order."""
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    client = Client(name='Alex', email='a@example.com', trainer_id=trainer.id,
+                    fitness_level='advanced', goal='muscle_gain')
+    db.session.add(client)
+    achievements = [
+        Achievement(name='Heavy lifter', type='strength', difficulty=5),
+        Achievement(name='Regular', type='workout', difficulty=3),
+        Achievement(name='Meal prep', type='nutrition', difficulty=1),
+        Achievement(name='Strong start', type='strength', difficulty=3),
+        Achievement(name='First workout', type='workout', difficulty=1)
+    ]
+    db.session.add_all(achievements)
+    db.session.flush()
+    db.session.add(ClientAchievement(client_id=client.id, achievement_id=achievements[3].id))
+    db.session.commit()
+
+    recommendations = Achievement.get_recommendations(client.id, limit=3)
+
+    assert [(r['achievement'].name, r['score']) for r in recommendations] == [
+        ('Regular', 100), ('Heavy lifter', 95), ('Meal prep', 70)
+    ]
+    assert recommendations[0]['reason'] == 'Matches your current fitness level'
+    assert recommendations[2]['reason'] == 'A quick win to boost your momentum'
+
+
+def test_query_count_independent_of_catalogue_and_clients(app, query_counter):
+    """Single and batch recommendations run a fixed number of queries."""
+    client_ids = [client.id for client in _setup(achievement_count=200)]
+
+    with query_counter:
+        Achievement.get_recommendations(client_ids[0])
+    assert query_counter.count <= 5
+
+    query_counter.statements.clear()
+    with query_counter:
+        results = recommend_achievements_bulk(client_ids, limit=2)
+    assert query_counter.count <= 5
+    assert set(results) == set(client_ids)
+    assert all(len(recommendations) == 2 for recommendations in results.values())
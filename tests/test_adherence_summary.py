@@ -0,0 +1,142 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import Client, ClientAdherenceSummary, ProgressLog, Trainer
+
+
+def _create_client():
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    client = Client(name='Sam', email='sam@example.com', trainer_id=trainer.id, fitness_level='beginner')
+    db.session.add(client)
+    db.session.commit()
+    return client
+
+
+def _log(client, days_ago, completed=True):
+    log = ProgressLog(
+        client_id=client.id,
+        log_date=datetime.combine(ClientAdherenceSummary.today() - timedelta(days=days_ago), datetime.min.time()),
+        workout_completed=completed
+    )
+    db.session.add(log)
+    db.session.commit()
+    return log
+
+
+def _rebuilt(client_id):
+    summary = ClientAdherenceSummary(client_id=client_id)
+    summary.rebuild(db.session.query(ProgressLog.log_date, ProgressLog.workout_completed)
+                    .filter_by(client_id=client_id).all())
+    return summary
+
+
+def _window(summary):
+    return (summary.counted_on, summary.week_completed, summary.recent_logged, summary.recent_completed,
+            summary.window_logged, summary.window_completed)
+
+
+def test_streaks_extend_as_workouts_are_logged(app):
+    """Consecutive completed days extend the streak; a gap restarts it."""
+    client = _create_client()
+    for days_ago in (5, 4, 2, 1, 0):
+        _log(client, days_ago)
+    _log(client, 0, completed=False)
+
+    summary = db.session.get(ClientAdherenceSummary, client.id)
+    assert summary.streak_as_of() == 3
+    assert summary.best_streak == 3
+    assert summary.last_workout_date == ClientAdherenceSummary.today()
+    assert summary.completion_rate(7) == round(5 / 6 * 100, 1)
+
+
+def test_edits_and_deletes_match_full_rebuild(app):
+    """Random inserts, toggles, moves and deletes leave the summary equal to a rebuild."""
+    client = _create_client()
+    random.seed(7)
+    logs = []
+    for _ in range(60):
+        action = random.random()
+        if action < 0.5 or not logs:
+            logs.append(_log(client, random.randint(0, 40), random.random() < 0.7))
+        elif action < 0.7:
+            log = random.choice(logs)
+            log.workout_completed = not log.workout_completed
+            db.session.commit()
+        elif action < 0.85:
+            log = random.choice(logs)
+            log.log_date = log.log_date - timedelta(days=random.randint(-3, 3))
+            db.session.commit()
+        else:
+            log = logs.pop(random.randrange(len(logs)))
+            db.session.delete(log)
+            db.session.commit()
+
+        summary = db.session.get(ClientAdherenceSummary, client.id)
+        expected = _rebuilt(client.id)
+        assert (summary.current_streak, summary.best_streak, summary.last_workout_date) == \
+            (expected.current_streak, expected.best_streak, expected.last_workout_date)
+        assert summary.daily_counts == expected.daily_counts
+        assert _window(summary) == _window(expected)
+
+
+def test_rebuild_all_repairs_summaries(app):
+    """The rebuild command recreates missing summaries from the logs."""
+    client = _create_client()
+    client_id = client.id
+    _log(client, 1)
+    _log(client, 0)
+    db.session.query(ClientAdherenceSummary).delete()
+    db.session.commit()
+
+    assert ClientAdherenceSummary.rebuild_all() == 1
+    summary = db.session.get(ClientAdherenceSummary, client_id)
+    assert summary.streak_as_of() == 2
+
+
+def test_roster_adherence_matches_summaries(app):
+    """Roster-wide adherence aggregated in SQL matches the per-client summaries."""
+    client = _create_client()
+    others = [Client(name=f'Client {i}', email=f'c{i}@example.com', trainer_id=client.trainer_id,
+                     fitness_level='beginner') for i in range(3)]
+    db.session.add_all(others)
+    db.session.commit()
+    random.seed(11)
+    for member in [client] + others[:2]:
+        for _ in range(15):
+            _log(member, random.randint(0, ClientAdherenceSummary.ROLLING_DAYS + 5), random.random() < 0.6)
+
+    today = ClientAdherenceSummary.today()
+    summaries = [db.session.get(ClientAdherenceSummary, member.id) for member in [client] + others[:2]]
+    rates = [(summary.completion_rate(7, today), summary.completion_rate(today=today)) for summary in summaries]
+    stats = ClientAdherenceSummary.roster_adherence([member.id for member in [client] + others], today)
+
+    assert stats['weekly_workouts'] == sum(summary.week_counts(today)[0] for summary in summaries)
+    assert stats['completion_rate'] == pytest.approx(sum(rate for _, rate in rates) / len(rates), abs=0.1)
+    assert stats['improving_clients'] == round(sum(1 for week, month in rates if week > month) / len(rates) * 100)
+
+
+def test_roster_adherence_counts_summaries_not_yet_rolled(app):
+    """Summaries counted on an earlier day are recounted until the daily roll catches up."""
+    client = _create_client()
+    client_id = client.id
+    for days_ago in (8, 6, 3, 1):
+        _log(client, days_ago, completed=days_ago != 6)
+    _log(client, 0, completed=False)
+    today = ClientAdherenceSummary.today()
+    fresh = ClientAdherenceSummary.roster_adherence([client_id], today)
+
+    # Tomorrow the 6-days-ago miss leaves the last week, which then beats the month
+    tomorrow = today + timedelta(days=1)
+    stale = ClientAdherenceSummary.roster_adherence([client_id], tomorrow)
+    assert ClientAdherenceSummary.roll_window(today=tomorrow) == 1
+    assert db.session.get(ClientAdherenceSummary, client_id).counted_on == tomorrow
+    assert ClientAdherenceSummary.roster_adherence([client_id], tomorrow) == stale
+    assert ClientAdherenceSummary.roll_window(today=tomorrow) == 0
+
+    assert fresh['completion_rate'] == stale['completion_rate'] == round(3 / 5 * 100, 1)
+    assert (fresh['improving_clients'], stale['improving_clients']) == (0, 100)
@@ -0,0 +1,92 @@
+import pytest
+from datetime import date, datetime, timedelta
+from extensions import db
+from models import Challenge, ChallengeParticipant, Client, Trainer
+from utils.challenge_feed import build_challenge_feed
+
+TODAY = date(2024, 3, 15)
+
+
+def _at(days):
+    return datetime.combine(TODAY, datetime.min.time()) + timedelta(days=days)
+
+
+def _create_challenges(count):
+    """`count` challenges in each bucket, each joined by three clients; returns the viewing client."""
+    trainer = Trainer(username='coach', email='coach@example.com')
+    other_trainer = Trainer(username='other', email='other@example.com')
+    db.session.add_all([trainer, other_trainer])
+    db.session.flush()
+    clients = [
+        Client(name=f'Client {i}', email=f'c{i}@example.com', trainer_id=trainer.id,
+               fitness_level='beginner', points=0)
+        for i in range(3)
+    ]
+    outsider = Client(name='Outsider', email='o@example.com', trainer_id=other_trainer.id,
+                      fitness_level='beginner', points=0)
+    db.session.add_all(clients + [outsider])
+    db.session.flush()
+
+    for i in range(count):
+        for start, end in ((-3, 3 + i), (2 + i, 9), (-10 - i, -2)):
+            challenge = Challenge(
+                name=f'Steps {start}/{i}', challenge_type='steps', target_value=1000,
+                start_date=_at(start), end_date=_at(end), created_by=clients[0].id, visibility='private'
+            )
+            db.session.add(challenge)
+            db.session.flush()
+            db.session.add_all([
+                ChallengeParticipant(challenge_id=challenge.id, client_id=client.id, current_value=value)
+                for client, value in zip(clients, (850, 400, 1000))
+            ])
+    # Private to another trainer's clients
+    db.session.add(Challenge(
+        name='Hidden', challenge_type='steps', target_value=10,
+        start_date=_at(-1), end_date=_at(1), created_by=outsider.id, visibility='private'
+    ))
+    db.session.commit()
+    db.session.expire_all()
+    return clients[0]
+
+
+@pytest.mark.parametrize('count', [2, 10])
+def test_challenge_feed_query_budget(app, query_counter, count):
+    """The page costs the same seven statements however many challenges each bucket holds."""
+    client = _create_challenges(count)
+    client.trainer_id  # loaded by the login before the page runs
+
+    with query_counter:
+        feed = build_challenge_feed(client, today=TODAY)
+
+    # bucket counts, three bucket pages, participations, stats, top participants
+    assert query_counter.count == 7
+    assert [feed[bucket]['total'] for bucket in ('active', 'upcoming', 'completed')] == [count] * 3
+
+
+def test_challenge_feed_cards(app):
+    """Cards carry the client's progress, stats counts and bucket-specific dates."""
+    client = _create_challenges(2)
+
+    feed = build_challenge_feed(client, today=TODAY)
+
+    active = feed['active']['challenges'][0]
+    assert active['title'] == 'Steps -3/0'
+    assert (active['progress'], active['participant_count'], active['days_remaining']) == (85, 3, 3)
+    assert [p['name'] for p in active['participants']] == ['Client 0', 'Client 1', 'Client 2']
+    assert active['goals'] == [{'description': 'Reach 1000 (steps)', 'completed': False}]
+    assert feed['upcoming']['challenges'][0]['days_until_start'] == 2
+    finished = feed['completed']['challenges'][0]
+    assert (finished['success'], finished['completion_percentage']) == (True, 85)
+    assert all(card['title'] != 'Hidden' for data in feed.values() for card in data['challenges'])
+
+
+def test_challenge_feed_pages_each_bucket(app):
+    """Buckets page separately and out-of-range pages clamp to the last page."""
+    client = _create_challenges(3)
+
+    feed = build_challenge_feed(client, pages={'completed': 5}, per_page=2, today=TODAY)
+
+    assert (feed['active']['page'], feed['active']['pages'], len(feed['active']['challenges'])) == (1, 2, 2)
+    assert (feed['completed']['page'], len(feed['completed']['challenges'])) == (2, 1)
+    # Most recently ended first
+    assert feed['completed']['challenges'][0]['title'] == 'Steps -12/2'
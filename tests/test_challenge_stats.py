@@ -0,0 +1,152 @@
+import random
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Challenge, ChallengeParticipant, ChallengeStats, Client, Trainer, _insert_ignoring_conflicts
+from utils.challenge_stats import reconcile_challenge_stats
+
+
+def _create_challenge(clients=1):
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    client_ids = []
+    for i in range(clients):
+        client = Client(name=f'Client {i}', email=f'c{i}@example.com', trainer_id=trainer.id,
+                        fitness_level='beginner', points=0)
+        db.session.add(client)
+        db.session.flush()
+        client_ids.append(client.id)
+    challenge = Challenge(
+        name='Steps', challenge_type='steps', target_value=1000,
+        start_date=datetime.utcnow(), end_date=datetime.utcnow() + timedelta(days=7),
+        created_by=client_ids[0]
+    )
+    db.session.add(challenge)
+    db.session.commit()
+    if clients == 1:
+        return challenge.id
+    return challenge.id, client_ids
+
+
+def _stats(challenge_id):
+    db.session.expire_all()
+    stats = ChallengeStats.query.get(challenge_id)
+    return stats.participant_count, stats.completed_count, stats.progress_total, stats.progress_histogram
+
+
+def test_incremental_updates_match_rebuild(app):
+    """Joins and progress moves give the same aggregates as a full recount."""
+    random.seed(7)
+    challenge_id = _create_challenge()
+    progress = []
+    for _ in range(200):
+        stats = ChallengeStats.for_update(challenge_id)
+        if not progress or random.random() < 0.3:
+            progress.append(0)
+            stats.add_participant(0)
+        else:
+            i = random.randrange(len(progress))
+            new = random.choice([0, 25, 33, 50, 67, 75, 99, 100])
+            stats.update_progress(progress[i], new)
+            progress[i] = new
+        db.session.commit()
+
+    stats = ChallengeStats.query.get(challenge_id)
+    assert stats.participant_count == len(progress)
+    assert stats.completed_count == progress.count(100)
+    assert stats.average_progress == round(sum(progress) / len(progress), 1)
+    assert sum(stats.progress_histogram) == len(progress)
+    assert stats.progress_histogram[-1] == sum(1 for p in progress if p >= 90)
+
+    incremental = (stats.participant_count, stats.completed_count, stats.progress_total, stats.progress_histogram)
+    stats.rebuild([(p, progress.count(p)) for p in set(progress)])
+    assert (stats.participant_count, stats.completed_count, stats.progress_total, stats.progress_histogram) == incremental
+
+
+def test_new_stats_row_starts_empty(app):
+    """for_update creates a zeroed row; removing a participant reverses a join."""
+    challenge_id = _create_challenge()
+    stats = ChallengeStats.for_update(challenge_id)
+    assert (stats.participant_count, stats.average_progress) == (0, 0)
+    stats.add_participant(100)
+    stats.remove_participant(100)
+    db.session.commit()
+
+    stats = ChallengeStats.query.get(challenge_id)
+    assert (stats.participant_count, stats.completed_count, stats.progress_total) == (0, 0, 0)
+    assert stats.progress_histogram == [0] * ChallengeStats.PROGRESS_BUCKETS
+
+
+def test_participant_changes_keep_stats_current(app):
+    """Joining, update_progress, leaving and a new target all update the stats row on flush."""
+    challenge_id, client_ids = _create_challenge(clients=3)
+    assert _stats(challenge_id) == (0, 0, 0, [0] * ChallengeStats.PROGRESS_BUCKETS)
+
+    participants = [ChallengeParticipant(challenge_id=challenge_id, client_id=client_id, current_value=0)
+                    for client_id in client_ids]
+    db.session.add_all(participants)
+    db.session.commit()
+    assert _stats(challenge_id)[:3] == (3, 0, 0)
+
+    participants[0].update_progress(455)
+    participants[1].update_progress(1200)
+    db.session.commit()
+    count, completed, total, histogram = _stats(challenge_id)
+    assert (count, completed, total) == (3, 1, 145)
+    assert participants[0].progress_percentage == 45
+    assert histogram[0] == 1 and histogram[4] == 1 and histogram[-1] == 1
+
+    db.session.delete(participants[1])
+    db.session.commit()
+    assert _stats(challenge_id)[:3] == (2, 0, 45)
+
+    Challenge.query.get(challenge_id).target_value = 500
+    db.session.commit()
+    assert _stats(challenge_id)[:3] == (2, 0, 91)
+
+
+def test_first_join_without_stats_row(app):
+    """A challenge missing its stats row gets one on first join, and a clashing insert is ignored."""
+    challenge_id, client_ids = _create_challenge(clients=2)
+    db.session.delete(ChallengeStats.query.get(challenge_id))
+    db.session.commit()
+
+    db.session.add(ChallengeParticipant(challenge_id=challenge_id, client_id=client_ids[0], current_value=1000))
+    db.session.commit()
+    assert _stats(challenge_id)[:2] == (1, 1)
+
+    # A concurrent first join that lost the race re-runs the insert: it is skipped, not an IntegrityError
+    db.session.execute(_insert_ignoring_conflicts(ChallengeStats.__table__, ['challenge_id']).values(
+        challenge_id=challenge_id, participant_count=0, completed_count=0, progress_total=0
+    ))
+    db.session.add(ChallengeParticipant(challenge_id=challenge_id, client_id=client_ids[1], current_value=0))
+    db.session.commit()
+    assert _stats(challenge_id)[:2] == (2, 1)
+
+
+def test_reconcile_corrects_drifted_and_missing_stats(app):
+    """reconcile_challenge_stats recounts from participant rows, chunk by chunk."""
+    challenge_id, client_ids = _create_challenge(clients=3)
+    for client_id, value in zip(client_ids, (0, 500, 1000)):
+        db.session.add(ChallengeParticipant(challenge_id=challenge_id, client_id=client_id, current_value=value))
+    other = Challenge(
+        name='Water', challenge_type='nutrition', target_value=10,
+        start_date=datetime.utcnow(), end_date=datetime.utcnow() + timedelta(days=7),
+        created_by=client_ids[0]
+    )
+    db.session.add(other)
+    db.session.commit()
+    expected = _stats(challenge_id)
+
+    assert reconcile_challenge_stats(chunk_size=1) == 0
+
+    stats = ChallengeStats.query.get(challenge_id)
+    stats.participant_count = 7
+    stats.progress_histogram = [7] + [0] * (ChallengeStats.PROGRESS_BUCKETS - 1)
+    db.session.delete(ChallengeStats.query.get(other.id))
+    db.session.commit()
+
+    assert reconcile_challenge_stats(chunk_size=1) == 2
+    assert _stats(challenge_id) == expected
+    assert _stats(other.id) == (0, 0, 0, [0] * ChallengeStats.PROGRESS_BUCKETS)
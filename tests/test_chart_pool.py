@@ -0,0 +1,61 @@
+import io
+import threading
+from concurrent.futures import Future
+
+import pytest
+from PIL import Image
+
+from utils.chart_pool import BarChart, ChartPool, ChartPoolBusy, ChartRenderTimeout
+
+
+class _PausedExecutor:
+    """Executor whose tasks finish only when the test releases them"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        future = Future()
+
+        def finish():
+            self.release.wait()
+            future.set_result(b'png')
+        threading.Thread(target=finish, daemon=True).start()
+        return future
+
+
+def test_pool_renders_png_in_worker_process():
+    """A bar chart spec comes back as PNG bytes rendered in a warm worker process."""
+    pool = ChartPool(workers=1, max_pending=2, timeout=60)
+    try:
+        pool.start()
+        png = pool.render(BarChart(['Mon', 'Wed'], [30, 45], 'Workout Duration by Day', 'Minutes'))
+    finally:
+        pool.shutdown()
+    image = Image.open(io.BytesIO(png))
+    assert image.format == 'PNG' and image.size == (500, 300)
+
+
+def test_full_pool_refuses_instead_of_queueing(monkeypatch):
+    """Past max_pending, renders fail fast; timed-out renders keep their slot until done."""
+    pool = ChartPool(workers=1, max_pending=2, timeout=0.05)
+    executor = _PausedExecutor()
+    monkeypatch.setattr(pool, '_ensure_executor', lambda: executor)
+    spec = BarChart(['Mon'], [30], 'Title', 'Minutes')
+
+    for _ in range(2):
+        with pytest.raises(ChartRenderTimeout):
+            pool.render(spec)
+    with pytest.raises(ChartPoolBusy):
+        pool.render(spec)
+    assert executor.submitted == 2
+
+    executor.release.set()
+    for _ in range(50):
+        if pool._slots.acquire(timeout=0.1):
+            pool._slots.release()
+            break
+    pool.timeout = 5
+    assert pool.render(spec) == b'png'
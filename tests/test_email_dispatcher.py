@@ -0,0 +1,142 @@
+import socket
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from flask_mail import Mail
+
+from extensions import db
+from models import EmailOutbox
+from utils import email_dispatcher
+from utils.email_dispatcher import FAILED, PENDING, SENDING, SENT, EmailDispatcher, enqueue_email, retry_delay
+
+aiosmtpd_controller = pytest.importorskip('aiosmtpd.controller')
+
+
+class RecordingHandler:
+    """Local SMTP stand-in: records messages and sessions, and can refuse recipients"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+        self.refuse = {}  # address -> replies to give, in order, before accepting
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions.add(id(session))
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if self.refuse.get(address):
+            return self.refuse[address].pop(0)
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content))
+        return '250 Message accepted'
+
+
+@pytest.fixture
+def smtp_server(app, monkeypatch):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    mail = Mail()
+    monkeypatch.setitem(app.extensions, 'mail', mail.init_mail({'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': port}))
+    monkeypatch.setattr(email_dispatcher, 'dispatcher', None)
+    yield handler, mail
+    controller.stop()
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        db.session.expire_all()
+        if condition():
+            return
+        time.sleep(0.05)
+    raise AssertionError('timed out')
+
+
+def test_burst_is_sent_over_one_connection_per_worker(app, smtp_server):
+    handler, mail = smtp_server
+    for i in range(30):
+        enqueue_email(f'Update {i}', 'noreply@fitfuel.com', [f'trainer{i}@example.com'], html='<p>Hi</p>')
+    db.session.commit()
+    dispatcher = EmailDispatcher(app, mail, workers=2, batch_size=5, idle_timeout=5, poll_interval=0.1)
+
+    dispatcher.wake()
+    try:
+        _wait_for(lambda: EmailOutbox.query.filter_by(status=SENT).count() == 30)
+    finally:
+        dispatcher.stop(timeout=5)
+
+    assert len(handler.messages) == 30
+    assert 1 <= len(handler.sessions) <= 2
+
+
+def test_refused_mail_is_retried_with_backoff_or_given_up(app, smtp_server):
+    """4xx replies are retried after the backoff, 5xx replies fail at once."""
+    handler, mail = smtp_server
+    handler.refuse = {'busy@example.com': ['451 Try again later'], 'gone@example.com': ['550 No such user']}
+    busy = enqueue_email('Reminder', 'noreply@fitfuel.com', ['busy@example.com'], body='Hi')
+    gone = enqueue_email('Reminder', 'noreply@fitfuel.com', ['gone@example.com'], body='Hi')
+    db.session.commit()
+    dispatcher = EmailDispatcher(app, mail, workers=1, retry_base=0.2, poll_interval=0.05)
+
+    dispatcher.wake()
+    try:
+        _wait_for(lambda: db.session.get(EmailOutbox, busy.id).status == SENT
+                  and db.session.get(EmailOutbox, gone.id).status == FAILED)
+    finally:
+        dispatcher.stop(timeout=5)
+
+    busy, gone = db.session.get(EmailOutbox, busy.id), db.session.get(EmailOutbox, gone.id)
+    assert busy.attempts == 2 and busy.sent_at is not None
+    assert gone.attempts == 1 and '550' in gone.last_error
+    assert [rcpt for rcpt, _ in handler.messages] == [['busy@example.com']]
+    assert retry_delay(1, 30) == 30 and retry_delay(3, 30) == 120 and retry_delay(20, 30) == 3600
+
+
+def test_outbox_survives_restart_and_abandoned_claims(app, smtp_server):
+    """Mail queued with no dispatcher running, or held by a dead worker, goes out on the next start."""
+    handler, mail = smtp_server
+    queued = enqueue_email('Welcome', 'noreply@fitfuel.com', ['new@example.com'], body='Hi')
+    abandoned = enqueue_email('Update', 'noreply@fitfuel.com', ['old@example.com'], body='Hi')
+    abandoned.status = SENDING
+    abandoned.claimed_by = 'dead-worker'
+    abandoned.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert db.session.get(EmailOutbox, queued.id).status == PENDING
+
+    dispatcher = EmailDispatcher(app, mail, workers=1, poll_interval=0.05)
+    dispatcher.wake()
+    try:
+        _wait_for(lambda: EmailOutbox.query.filter_by(status=SENT).count() == 2)
+    finally:
+        dispatcher.stop(timeout=5)
+
+    assert sorted(rcpt[0] for rcpt, _ in handler.messages) == ['new@example.com', 'old@example.com']
+
+
+def test_mail_waits_for_the_callers_commit(app, smtp_server, monkeypatch):
+    """Queued mail is sent only when the surrounding transaction commits, and dropped on rollback."""
+    handler, mail = smtp_server
+    dispatcher = EmailDispatcher(app, mail, workers=1, poll_interval=60)
+    monkeypatch.setattr(email_dispatcher, 'dispatcher', dispatcher)
+    try:
+        enqueue_email('Dropped', 'noreply@fitfuel.com', ['dropped@example.com'], body='Hi')
+        db.session.rollback()
+        enqueue_email('Kept', 'noreply@fitfuel.com', ['kept@example.com'], body='Hi')
+        assert dispatcher._threads == []
+        db.session.commit()
+        _wait_for(lambda: EmailOutbox.query.filter_by(status=SENT).count() == 1)
+    finally:
+        dispatcher.stop(timeout=5)
+
+    assert EmailOutbox.query.count() == 1
+    assert [rcpt for rcpt, _ in handler.messages] == [['kept@example.com']]
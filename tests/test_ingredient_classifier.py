@@ -0,0 +1,25 @@
+from utils.ingredient_classifier import KeywordMatcher, classify_ingredient, classify_ingredients
+
+
+def test_matcher_finds_overlapping_keywords():
+    """Keywords nested inside other keywords are all reported."""
+    matcher = KeywordMatcher({'fish': ['fish'], 'shellfish': ['shellfish'], 'he': ['he']})
+
+    assert matcher.match('shellfish stock') == {'fish', 'shellfish', 'he'}
+    assert matcher.match('rice') == frozenset()
+
+
+def test_classify_ingredient_all_categories_in_one_pass():
+    """Allergens and diet exclusions come back from a single classification."""
+    result = classify_ingredient('  Peanut  BUTTER ')
+
+    assert result.allergens == {'peanuts', 'milk'}
+    assert result.excluded_diets == {'dairy_free'}
+
+
+def test_classify_ingredients_combines_names():
+    """A recipe's ingredient list is the union of its ingredients."""
+    result = classify_ingredients(['Chicken breast', 'Whole wheat pasta', 'Spinach'])
+
+    assert result.allergens == {'wheat'}
+    assert result.excluded_diets == {'vegetarian', 'vegan', 'gluten_free'}
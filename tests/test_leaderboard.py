@@ -0,0 +1,115 @@
+import random
+
+import pytest
+
+from extensions import db
+from models import Client, LeaderboardEntry, Trainer
+from utils import leaderboard
+from utils.leaderboard import flush_rank_changes, get_rank, get_top, reset_rankings
+
+
+def _create_entries(count):
+    reset_rankings()
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    clients = [
+        Client(name=f'Client {i}', email=f'c{i}@example.com', trainer_id=trainer.id, fitness_level='beginner')
+        for i in range(count)
+    ]
+    db.session.add_all(clients)
+    db.session.flush()
+    entries = [
+        LeaderboardEntry(client_id=client.id, category='global', points=random.randint(0, 50))
+        for client in clients
+    ]
+    db.session.add_all(entries)
+    db.session.commit()
+    return entries
+
+
+def _expected_ranks():
+    """RANK() semantics: one plus the number of entries with strictly more points"""
+    entries = LeaderboardEntry.query.filter_by(category='global').all()
+    return {
+        entry.id: 1 + sum(1 for other in entries if other.points > entry.points)
+        for entry in entries
+    }
+
+
+def _check_rankings_under_point_changes():
+    random.seed(3)
+    entries = _create_entries(40)
+    LeaderboardEntry.update_rankings('global')
+
+    for _ in range(100):
+        entry = random.choice(entries)
+        entry.points = random.randint(0, 60)
+        db.session.commit()
+
+        expected = _expected_ranks()
+        for candidate in random.sample(entries, 5):
+            assert get_rank('global', candidate.client_id) == expected[candidate.id]
+        top = get_top('global', 3)
+        assert [row['entry_id'] for row in top] == sorted(expected, key=lambda i: (expected[i], i))[:3]
+        assert [row['rank'] for row in top] == [expected[row['entry_id']] for row in top]
+
+        if random.random() < 0.3:
+            flush_rank_changes()
+            db.session.expire_all()
+            assert {entry.id: entry.rank for entry in entries} == expected
+
+    flush_rank_changes()
+    db.session.expire_all()
+    assert {entry.id: entry.rank for entry in entries} == _expected_ranks()
+
+
+def test_rankings_stay_correct_under_point_changes(app):
+    """Rank lookups, top-K and persisted ranks match a full re-sort after random updates."""
+    _check_rankings_under_point_changes()
+
+
+def test_redis_rankings_stay_correct_under_point_changes(app, monkeypatch):
+    """The Redis sorted-set backend gives the same ranks as the in-process index."""
+    fakeredis = pytest.importorskip('fakeredis')
+    monkeypatch.setattr(leaderboard, 'ranking_index', leaderboard.RedisRankingIndex(fakeredis.FakeRedis()))
+    _check_rankings_under_point_changes()
+
+
+def test_single_point_change_writes_only_moved_rows(app):
+    """Moving one entry up a few places rewrites only the ranks that changed."""
+    random.seed(5)
+    entries = _create_entries(30)
+    LeaderboardEntry.update_rankings('global')
+    assert flush_rank_changes() == 0
+
+    expected = _expected_ranks()
+    ordered = sorted(entries, key=lambda entry: expected[entry.id])
+    mover, target = ordered[10], ordered[7]
+    mover.points = target.points + 1
+    db.session.commit()
+
+    moved = _expected_ranks()
+    changed = sum(1 for entry_id, rank in moved.items() if expected[entry_id] != rank)
+    assert 0 < changed < 10
+    assert flush_rank_changes() == changed
+    assert get_rank('global', mover.client_id) == moved[mover.id]
+
+
+def test_new_and_deleted_entries(app):
+    """Inserts and deletes shift the ranks below them."""
+    random.seed(9)
+    entries = _create_entries(10)
+    LeaderboardEntry.update_rankings('global')
+
+    client_id = entries[0].client_id
+    db.session.delete(entries[0])
+    db.session.add(LeaderboardEntry(client_id=client_id, category='global', points=1000))
+    db.session.commit()
+    flush_rank_changes()
+
+    db.session.expire_all()
+    expected = _expected_ranks()
+    assert get_rank('global', client_id) == 1
+    assert {entry.id: entry.rank for entry in LeaderboardEntry.query.all()} == expected
+    assert isinstance(leaderboard.ranking_index, leaderboard.MemoryRankingIndex)
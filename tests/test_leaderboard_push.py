@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask import request
+
+from extensions import db
+from models import Challenge, ChallengeParticipant, Client, Trainer
+from utils import leaderboard_push
+from utils.leaderboard_push import LeaderboardBroadcaster, load_standings, room_name
+
+
+def _create_challenge(values):
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    clients = [
+        Client(name=f'Client {i}', email=f'c{i}@example.com', trainer_id=trainer.id, fitness_level='beginner')
+        for i in range(len(values))
+    ]
+    db.session.add_all(clients)
+    db.session.flush()
+    challenge = Challenge(
+        name='Steps', challenge_type='steps', target_value=200,
+        start_date=datetime.utcnow(), end_date=datetime.utcnow() + timedelta(days=7),
+        created_by=clients[0].id
+    )
+    db.session.add(challenge)
+    db.session.flush()
+    participants = [
+        ChallengeParticipant(challenge_id=challenge.id, client_id=client.id, current_value=value)
+        for client, value in zip(clients, values)
+    ]
+    db.session.add_all(participants)
+    db.session.commit()
+    return challenge.id, participants
+
+
+def test_changes_coalesce_into_one_delta(app, monkeypatch):
+    """Several progress changes within a window produce one emit with only the moved rows."""
+    emitted = []
+    monkeypatch.setattr(leaderboard_push.socketio, 'emit', lambda *args, **kwargs: emitted.append((args, kwargs)))
+    monkeypatch.setattr(leaderboard_push.broadcaster, '_app', None)
+    challenge_id, participants = _create_challenge([100, 80, 60, 40])
+
+    broadcaster = LeaderboardBroadcaster()
+    snapshot = broadcaster.subscribe('sid-1', challenge_id)
+    assert [(row['rank'], row['progress']) for row in snapshot] == [(1, 50), (2, 40), (3, 30), (4, 20)]
+
+    participants[3].current_value = 90
+    db.session.commit()
+    participants[3].current_value = 120
+    db.session.commit()
+    broadcaster.mark_changed(challenge_id)
+    broadcaster.mark_changed(challenge_id)
+    assert broadcaster.flush() == 1
+
+    (event, payload), kwargs = emitted[0]
+    assert event == 'leaderboard_delta' and kwargs['to'] == room_name(challenge_id)
+    moved = {row['client_id']: (row['rank'], row['progress']) for row in payload['changed']}
+    assert moved == {
+        participants[3].client_id: (1, 60),
+        participants[0].client_id: (2, 50),
+        participants[1].client_id: (3, 40),
+        participants[2].client_id: (4, 30)
+    }
+    assert payload['removed'] == []
+
+    # Nothing dirty, nothing emitted
+    assert broadcaster.flush() == 0
+    assert len(emitted) == 1
+
+
+def test_unwatched_challenges_are_ignored(app, monkeypatch):
+    """Commits mark only subscribed challenges, and unsubscribing drops the cached standings."""
+    monkeypatch.setattr(leaderboard_push.broadcaster, '_app', None)
+    challenge_id, participants = _create_challenge([10, 20])
+    broadcaster = leaderboard_push.broadcaster
+
+    participants[0].current_value = 30
+    db.session.commit()
+    assert challenge_id not in broadcaster._dirty
+
+    broadcaster.subscribe('sid-1', challenge_id)
+    participants[0].update_progress(40)
+    db.session.commit()
+    assert challenge_id in broadcaster._dirty
+
+    broadcaster.unsubscribe('sid-1')
+    assert challenge_id not in broadcaster._dirty
+    assert challenge_id not in broadcaster._last
+
+
+def test_standings_match_participant_progress(app):
+    """Pushed progress is the participant's own progress_percentage, so page and deltas agree."""
+    challenge_id, participants = _create_challenge([0, 150, 199])
+    participants[0].update_progress(250)
+    db.session.commit()
+
+    standings = load_standings(challenge_id)
+    assert [row['progress'] for row in standings] == [100, 99, 75]
+    assert {row['client_id']: row['progress'] for row in standings} == {
+        p.client_id: p.progress_percentage for p in participants
+    }
+
+
+def test_dirty_marks_reach_other_processes(app, monkeypatch):
+    """With Redis fan-out, a commit in one process dirties the challenge where its subscribers are."""
+    fakeredis = pytest.importorskip('fakeredis')
+    monkeypatch.setattr(leaderboard_push.socketio, 'start_background_task',
+                        lambda target: threading.Thread(target=target, daemon=True).start())
+    challenge_id, _ = _create_challenge([10, 20])
+    server = fakeredis.FakeServer()
+
+    committing = LeaderboardBroadcaster()
+    committing.init_app(None, fakeredis.FakeRedis(server=server))
+    watching = LeaderboardBroadcaster()
+    watching.init_app(None, fakeredis.FakeRedis(server=server))
+    watching.subscribe('sid-1', challenge_id)
+
+    # The listeners subscribe in the background, so publish until the mark arrives
+    deadline = time.time() + 5
+    while challenge_id not in watching._dirty and time.time() < deadline:
+        committing.mark_changed(challenge_id)
+        time.sleep(0.05)
+    assert challenge_id in watching._dirty
+    assert challenge_id not in committing._dirty
+
+
+def test_private_standings_are_refused_to_outsiders(app, monkeypatch):
+    """A client of another trainer can't join a private challenge's room or read its standings."""
+    challenge_id, participants = _create_challenge([10, 20])
+    db.session.get(Challenge, challenge_id).visibility = 'private'
+    other = Trainer(username='rival', email='rival@example.com')
+    db.session.add(other)
+    db.session.flush()
+    outsider = Client(name='Outsider', email='out@example.com', trainer_id=other.id, fitness_level='beginner')
+    db.session.add(outsider)
+    db.session.commit()
+
+    joined = []
+    monkeypatch.setattr(leaderboard_push, 'join_room', joined.append)
+    monkeypatch.setattr(leaderboard_push.broadcaster, '_app', None)
+    with app.test_request_context():
+        monkeypatch.setattr(leaderboard_push, 'current_user', SimpleNamespace(is_authenticated=True, id=outsider.id))
+        refused = leaderboard_push.handle_subscribe({'challenge_id': challenge_id})
+        missing = leaderboard_push.handle_subscribe({'challenge_id': challenge_id + 1})
+
+        monkeypatch.setattr(leaderboard_push, 'current_user',
+                            SimpleNamespace(is_authenticated=True, id=participants[1].client_id))
+        request.sid = 'sid-1'
+        allowed = leaderboard_push.handle_subscribe({'challenge_id': challenge_id})
+
+    assert refused == missing == {'success': False, 'message': 'Challenge not found'}
+    assert joined == [room_name(challenge_id)]
+    assert [row['client_id'] for row in allowed['standings']] == [participants[1].client_id, participants[0].client_id]
+    leaderboard_push.broadcaster.unsubscribe('sid-1')
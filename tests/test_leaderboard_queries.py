@@ -0,0 +1,73 @@
+import random
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Challenge, ChallengeParticipant, Client, LeaderboardEntry, Trainer
+from utils.leaderboard_queries import challenge_leaderboard, global_leaderboard
+
+
+def _create_clients(count):
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    clients = [
+        Client(name=f'Client {i}', email=f'c{i}@example.com', trainer_id=trainer.id, fitness_level='beginner')
+        for i in range(count)
+    ]
+    db.session.add_all(clients)
+    db.session.flush()
+    return clients
+
+
+def test_global_rank_uses_rank_semantics(app):
+    """Tied points share a rank and the next rank skips, like SQL RANK()."""
+    clients = _create_clients(5)
+    for client, points in zip(clients, [30, 50, 30, None, 10]):
+        db.session.add(LeaderboardEntry(client_id=client.id, category='global', points=points))
+    db.session.add(LeaderboardEntry(client_id=clients[3].id, category='monthly', points=5))
+    db.session.commit()
+
+    assert [client.get_global_rank() for client in clients] == [2, 1, 2, 5, 4]
+    assert global_leaderboard.ranks_for_client(clients[3].id) == {'global': 5, 'monthly': 1}
+    assert Client(name='New', email='n@example.com').get_global_rank() is None
+
+
+def test_challenge_leaderboard_pages_and_neighbours(app):
+    """Keyset pages cover every participant once in rank order; around() is centred on the client."""
+    random.seed(4)
+    clients = _create_clients(23)
+    challenge = Challenge(
+        name='Steps', challenge_type='steps', target_value=1000,
+        start_date=datetime.utcnow(), end_date=datetime.utcnow() + timedelta(days=7),
+        created_by=clients[0].id
+    )
+    db.session.add(challenge)
+    db.session.flush()
+    for client in clients:
+        db.session.add(ChallengeParticipant(
+            challenge_id=challenge.id, client_id=client.id, current_value=random.randint(0, 8)
+        ))
+    db.session.commit()
+
+    participants = ChallengeParticipant.query.all()
+    ordered = sorted(participants, key=lambda p: (-p.current_value, p.id))
+
+    rows, cursor, pages = [], None, 0
+    while True:
+        page, cursor = challenge.get_leaderboard(limit=5, after=cursor)
+        rows.extend(page)
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 5
+    assert [row.entry.id for row in rows] == [p.id for p in ordered]
+    assert [row.position for row in rows] == list(range(1, 24))
+    for row in rows:
+        assert row.rank == 1 + sum(1 for p in participants if p.current_value > row.entry.current_value)
+
+    middle = ordered[12]
+    around = challenge_leaderboard.around(challenge.id, middle.client_id)
+    assert [row.entry.id for row in around] == [p.id for p in ordered[7:18]]
+    top = challenge_leaderboard.around(challenge.id, ordered[1].client_id)
+    assert [row.entry.id for row in top] == [p.id for p in ordered[:7]]
+
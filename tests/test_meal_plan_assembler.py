@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from extensions import db
+from models import MealPlan, Recipe, RecipeIngredient
+from utils.meal_plan_assembler import assemble_weekly_meal_plan
+
+WEEK_START = date(2024, 1, 1)
+
+
+def _create_week(client_id=1):
+    """Create two recipes and a meal plan for every day of the test week."""
+    oats = Recipe(name='Overnight Oats', calories=300, protein=10, carbs=50, fat=5,
+                  prep_time='5 min', prep_instructions='Soak oats\nAdd berries')
+    oats.ingredients = [
+        RecipeIngredient(name='Rolled oats', amount=50, unit='g'),
+        RecipeIngredient(name='Milk', amount=200, unit='ml')
+    ]
+    chicken = Recipe(name='Grilled Chicken', calories=500, protein=40, carbs=5, fat=10,
+                     prep_time='20 min', prep_instructions='Grill chicken')
+    chicken.ingredients = [RecipeIngredient(name='Chicken breast', amount=200, unit='g')]
+    db.session.add_all([oats, chicken])
+    db.session.commit()
+
+    for i in range(7):
+        day = WEEK_START + timedelta(days=i)
+        db.session.add(MealPlan(
+            client_id=client_id,
+            start_date=day,
+            end_date=day,
+            daily_plans={day.isoformat(): [
+                {'id': 1, 'name': 'Breakfast', 'time': '08:00', 'items': [
+                    {'id': oats.id, 'name': oats.name, 'amount': 1, 'unit': 'bowl',
+                     'calories': 300, 'nutrients': {'protein': 10}, 'category': 'Grains'}
+                ]},
+                {'id': 2, 'name': 'Dinner', 'time': '19:00', 'items': [
+                    {'id': chicken.id, 'name': chicken.name, 'amount': 1, 'unit': 'plate',
+                     'calories': 500, 'nutrients': {'protein': 40}, 'category': 'Protein'}
+                ]}
+            ]}
+        ))
+    db.session.commit()
+    db.session.expire_all()
+
+
+def test_weekly_meal_plan_query_budget(app, query_counter):
+    """The whole week renders in at most two SQL statements."""
+    _create_week()
+
+    with query_counter:
+        week = assemble_weekly_meal_plan(1, WEEK_START)
+
+    assert query_counter.count <= 2
+    assert len(week['days']) == 7
+    assert all(len(day['meals']) == 2 for day in week['days'])
+
+
+def test_weekly_meal_plan_totals_and_prep_guide(app):
+    """Totals, shopping list and prep guide are built from the same pass."""
+    _create_week()
+
+    week = assemble_weekly_meal_plan(1, WEEK_START)
+
+    assert week['weekly_totals']['calories'] == 800
+    assert week['weekly_totals']['protein'] == 50
+    assert week['weekly_totals']['containers'] == 2
+    assert week['weekly_totals']['prep_time'] == '25 min'
+    assert week['weekly_shopping_list']['Grains'][0]['amount'] == 7
+    assert [s['item'] for s in week['prep_guide']['storage']] == ['Overnight Oats', 'Grilled Chicken']
+    assert week['days'][0]['meals'][0]['items'][0]['allergens'] == ['milk']
+
+
+def test_weekly_meal_plan_empty_week(app, query_counter):
+    """A week without plans skips the recipe lookup entirely."""
+    with query_counter:
+        week = assemble_weekly_meal_plan(1, WEEK_START)
+
+    assert query_counter.count == 1
+    assert week['weekly_totals']['calories'] == 0
+    assert week['weekly_shopping_list'] == {}
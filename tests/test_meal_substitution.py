@@ -0,0 +1,130 @@
+import pytest
+from extensions import db
+from models import CacheVersion, MealIngredient, SubstitutionRule
+from utils import substitution_graph
+from utils.meal_substitution import (
+    find_substitutes, find_substitutes_bulk, find_substitution_chains, validate_substitution
+)
+
+
+def _ingredient(name, cost=2.0, allergens=None):
+    ingredient = MealIngredient(
+        name=name,
+        category='protein',
+        nutrition_per_100g={},
+        common_allergens=allergens or [],
+        estimated_cost=cost
+    )
+    db.session.add(ingredient)
+    db.session.flush()
+    return ingredient
+
+
+def _rule(original, substitute, score, tags=None):
+    db.session.add(SubstitutionRule(
+        ingredient_id=original.id,
+        substitute_id=substitute.id,
+        conversion_ratio=1.0,
+        preference_tags=tags or [],
+        nutrition_difference={'protein': 0.1},
+        cost_difference=0.0,
+        suitability_score=score
+    ))
+
+
+@pytest.fixture
+def shopping_list(app):
+    names = []
+    for i in range(10):
+        original = _ingredient(f'Ingredient {i}')
+        _rule(original, _ingredient(f'Tofu {i}'), 0.9, ['vegan'])
+        _rule(original, _ingredient(f'Greek yogurt {i}', allergens=['milk']), 0.7)
+        _rule(original, _ingredient(f'Premium option {i}', cost=20.0), 0.8)
+        names.append(original.name)
+    db.session.commit()
+    return names
+
+
+def test_bulk_lookup_uses_constant_queries(shopping_list, query_counter):
+    """Ten ingredients with three rules each cost at most the graph load."""
+    with query_counter:
+        results = find_substitutes_bulk(shopping_list, {'diet_type': 'vegan'})
+        cold_queries = query_counter.count
+        find_substitutes_bulk(shopping_list, {'diet_type': 'vegan'})
+
+    # Version check, ingredients and rules; the warm call is served from memory
+    assert cold_queries <= 3
+    assert query_counter.count == cold_queries
+    assert set(results) == set(shopping_list)
+    assert all(len(subs) == 3 for subs in results.values())
+
+
+def test_bulk_matches_single_lookup(shopping_list):
+    """Each entry has the same ranked structure as find_substitutes."""
+    preferences = {'diet_type': 'vegan'}
+    bulk = find_substitutes_bulk(shopping_list, preferences, allergies=['milk'], budget_constraint=5)
+
+    for name in shopping_list:
+        assert bulk[name] == find_substitutes(name, preferences, allergies=['milk'], budget_constraint=5)
+        assert [s['ingredient'] for s in bulk[name]] == [f"Tofu {name.split()[-1]}"]
+
+
+def test_bulk_unknown_ingredients(shopping_list):
+    """Unknown names map to an empty list."""
+    results = find_substitutes_bulk(['Unobtainium', shopping_list[0]], {})
+
+    assert results['Unobtainium'] == []
+    assert len(results[shopping_list[0]]) == 3
+
+
+def test_graph_swapped_when_version_changes(shopping_list, monkeypatch):
+    """Writes from another process are picked up once the version row moves."""
+    graph = substitution_graph.get_substitution_graph()
+    assert substitution_graph.get_substitution_graph() is graph
+
+    # Simulate another worker: change the data and bump the version without ORM events
+    db.session.execute(MealIngredient.__table__.update()
+                       .where(MealIngredient.name == 'Tofu 0')
+                       .values(name='Tempeh 0'))
+    CacheVersion.bump(db.session, substitution_graph.VERSION_NAME)
+    db.session.commit()
+    monkeypatch.setattr(substitution_graph, '_checked_at', 0.0)
+
+    reloaded = substitution_graph.get_substitution_graph()
+    assert reloaded is not graph
+    assert reloaded.version == CacheVersion.get(substitution_graph.VERSION_NAME)
+    assert reloaded.find('Tempeh 0') is not None
+
+
+def test_substitution_chains_multiply_ratios(app):
+    """A -> B -> C chains carry the product of the conversion ratios."""
+    butter = _ingredient('Butter')
+    oil = _ingredient('Olive oil')
+    avocado = _ingredient('Avocado')
+    _rule(butter, oil, 0.8)
+    _rule(oil, avocado, 0.5)
+    db.session.commit()
+    SubstitutionRule.query.filter_by(ingredient_id=butter.id).update({'conversion_ratio': 0.75})
+    SubstitutionRule.query.filter_by(ingredient_id=oil.id).update({'conversion_ratio': 2.0})
+    db.session.commit()
+
+    chains = find_substitution_chains('Butter', {})
+
+    assert [(c['path'], c['conversion_ratio']) for c in chains] == [
+        (['Butter', 'Olive oil'], 0.75),
+        (['Butter', 'Olive oil', 'Avocado'], 1.5)
+    ]
+    assert chains[1]['suitability_score'] == pytest.approx(0.4)
+
+
+def test_validate_substitution_reads_graph(shopping_list, query_counter):
+    """Validation is answered from the cached graph."""
+    substitution_graph.get_substitution_graph()
+
+    with query_counter:
+        result = validate_substitution('Ingredient 0', 'Tofu 0', 200)
+
+    assert query_counter.count == 0
+    assert result['valid']
+    assert result['conversion_amount'] == 200
+    assert not validate_substitution('Tofu 0', 'Ingredient 0', 1)['valid']
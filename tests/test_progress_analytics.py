@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.progress_analytics import (
+    ProgressFrame, completion_rates_by_client, performance_trends,
+    performance_trends_by_client, week_keys
+)
+from utils.progression_tracker import calculate_completion_rate
+
+
+def make_logs(start, weekly_values, completed=True):
+    return [
+        {
+            'log_date': (start + timedelta(weeks=week)).isoformat(),
+            'workout_completed': completed,
+            'metrics': {'intensity': value, 'volume': value, 'consistency': 5}
+        }
+        for week, value in enumerate(weekly_values)
+    ]
+
+
+def test_week_keys_match_strftime():
+    """Vectorized week keys agree with strftime('%Y%W'), including year boundaries."""
+    dates = [datetime(2023, 12, 25) + timedelta(days=i) for i in range(400)]
+    keys = week_keys(np.array(dates, dtype='datetime64[us]'))
+
+    assert keys.tolist() == [int(d.strftime('%Y%W')) for d in dates]
+
+
+def test_performance_trends_from_weekly_averages():
+    """Rising intensity and volume make the overall trend improving."""
+    logs = make_logs(datetime(2024, 1, 1), [1, 2, 3])
+
+    result = performance_trends(ProgressFrame.from_logs(logs))
+
+    assert result['indicators'] == {
+        'intensity': 'improving', 'volume': 'improving', 'consistency': 'neutral'
+    }
+    assert result['trend'] == 'improving'
+
+
+def test_multi_client_results_match_single_client():
+    """Grouped multi-client analytics equal running each client on its own."""
+    now = datetime.utcnow()
+    first = make_logs(now - timedelta(weeks=6), [1, 2, 3, 4])
+    second = make_logs(now - timedelta(weeks=3), [5, 4, 3], completed=False)
+    frame = ProgressFrame.from_logs(first + second, client_ids=[7] * 4 + [9] * 3)
+
+    trends = performance_trends_by_client(frame)
+    rates = completion_rates_by_client(frame, now)
+
+    assert trends[7] == performance_trends(ProgressFrame.from_logs(first))
+    assert trends[9]['indicators']['intensity'] == 'declining'
+    assert rates[7] == calculate_completion_rate(first)
+    assert rates[9] == {'rate': 0.0, 'trend': 'stable', 'recent_rate': 0.0}
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from extensions import db
+from models import Client, ExerciseProgression, ProgressLog, Trainer
+from utils import progress_batch
+from utils.progress_analytics import ProgressFrame
+from utils.progress_batch import INSIGHTS_KEY, analyze_progress_batch, load_progress_frame
+from utils.progression_tracker import analyze_client_progress
+
+
+def _create_client(trainer, name, weekly_intensity):
+    client = Client(name=name, email=f'{name}@example.com', trainer_id=trainer.id, fitness_level='beginner')
+    db.session.add(client)
+    db.session.flush()
+
+    start = datetime(2024, 1, 1)
+    for week, value in enumerate(weekly_intensity):
+        db.session.add(ProgressLog(
+            client_id=client.id,
+            log_date=start + timedelta(weeks=week),
+            workout_completed=week % 2 == 0,
+            metrics={'intensity': value, 'volume': value}
+        ))
+    db.session.add(ExerciseProgression(
+        client_id=client.id,
+        exercise_name='Squat',
+        progression_data=[{'performance': 50}, {'performance': 60}],
+        current_level='intermediate'
+    ))
+    return client
+
+
+def _serialized_logs(client_id):
+    logs = ProgressLog.query.filter_by(client_id=client_id).order_by(ProgressLog.log_date).all()
+    return [
+        {'log_date': log.log_date.isoformat(), 'workout_completed': log.workout_completed, 'metrics': log.metrics}
+        for log in logs
+    ]
+
+
+def test_batch_matches_per_client_analysis(app):
+    """Batch insights equal analyze_client_progress and land on the latest log only."""
+    trainer = Trainer(username='coach', email='coach@example.com')
+    other_trainer = Trainer(username='other', email='other@example.com')
+    db.session.add_all([trainer, other_trainer])
+    db.session.flush()
+    rising = _create_client(trainer, 'rising', [1, 2, 3])
+    falling = _create_client(trainer, 'falling', [3, 2, 1, 0])
+    outsider = _create_client(other_trainer, 'outsider', [1, 2])
+    db.session.commit()
+
+    latest = ProgressLog.query.filter_by(client_id=rising.id).order_by(ProgressLog.log_date.desc()).first()
+    latest.ai_insights = {'workout_recommendations': ['keep going']}
+    db.session.commit()
+
+    assert analyze_progress_batch(trainer_id=trainer.id, chunk_size=1) == 2
+
+    for client in (rising, falling):
+        expected = analyze_client_progress(client.id, _serialized_logs(client.id), [{
+            'exercise_name': 'Squat',
+            'progression_data': [{'performance': 50}, {'performance': 60}],
+            'current_level': 'intermediate',
+            'next_milestone': {}
+        }])
+        logs = ProgressLog.query.filter_by(client_id=client.id).order_by(ProgressLog.log_date).all()
+        stored = dict(logs[-1].ai_insights[INSIGHTS_KEY])
+        stored.pop('generated_at')
+        expected.pop('generated_at')
+        assert stored == expected
+        assert all(log.ai_insights is None for log in logs[:-1])
+
+    latest = db.session.get(ProgressLog, latest.id)
+    assert latest.ai_insights['workout_recommendations'] == ['keep going']
+    assert all(log.ai_insights is None for log in ProgressLog.query.filter_by(client_id=outsider.id))
+
+
+def test_frame_streamed_in_batches_matches_single_read(app, monkeypatch):
+    """Concatenating the per-batch columns gives the same frame as reading every row at once."""
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    clients = [_create_client(trainer, 'rising', [1, 2, 3]), _create_client(trainer, 'falling', [3, 2, 1, 0])]
+    db.session.commit()
+    client_ids = [client.id for client in clients]
+    monkeypatch.setattr(progress_batch, 'STREAM_BATCH_SIZE', 2)
+
+    frame = load_progress_frame(client_ids)
+    rows = db.session.query(ProgressLog.client_id, ProgressLog.log_date,
+                            ProgressLog.workout_completed, ProgressLog.metrics)\
+        .order_by(ProgressLog.client_id, ProgressLog.log_date, ProgressLog.id).all()
+    expected = ProgressFrame.from_rows(rows)
+
+    assert len(frame) == 7
+    assert np.array_equal(frame.client_ids, expected.client_ids)
+    assert np.array_equal(frame.dates, expected.dates)
+    assert np.array_equal(frame.completed, expected.completed)
+    for name in expected.metrics:
+        assert np.array_equal(frame.metric(name), expected.metric(name), equal_nan=True)
+    assert len(load_progress_frame([])) == 0
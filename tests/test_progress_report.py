@@ -0,0 +1,60 @@
+import math
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from extensions import db
+from models import Client, ProgressLog, Trainer
+from utils.progress_report import WeeklySummary, load_weekly_summary
+from utils.report_generator import generate_client_report
+
+
+def test_logs_stream_into_weekly_summary(app):
+    """Only the client's logs within the range count; metrics average over the logs that recorded them."""
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    client = Client(name='alex', email='alex@example.com', trainer_id=trainer.id, fitness_level='beginner')
+    other = Client(name='sam', email='sam@example.com', trainer_id=trainer.id, fitness_level='beginner')
+    db.session.add_all([client, other])
+    db.session.flush()
+    db.session.add_all([
+        # Monday 2024-01-01 starts the first week
+        ProgressLog(client_id=client.id, log_date=datetime(2024, 1, 1, 7), workout_completed=True,
+                    metrics={'weight': 80, 'mood': 'good'}),
+        ProgressLog(client_id=client.id, log_date=datetime(2024, 1, 3, 18), workout_completed=False,
+                    metrics={'weight': 79}),
+        ProgressLog(client_id=client.id, log_date=datetime(2024, 1, 10, 23, 59), workout_completed=True,
+                    metrics={'resting_hr': 60}),
+        ProgressLog(client_id=client.id, log_date=datetime(2024, 1, 11), workout_completed=True,
+                    metrics={'weight': 70}),
+        ProgressLog(client_id=other.id, log_date=datetime(2024, 1, 2), workout_completed=True,
+                    metrics={'weight': 100}),
+    ])
+    db.session.commit()
+
+    weekly = load_weekly_summary(client.id, date(2024, 1, 1), date(2024, 1, 10), batch_size=2)
+
+    assert [str(day) for day in weekly.week_starts] == ['2024-01-01', '2024-01-08']
+    assert weekly.logs.tolist() == [2, 1] and weekly.completed.tolist() == [1, 1]
+    assert weekly.metric_names() == ['resting_hr', 'weight']
+    assert weekly.means('weight')[0] == 79.5 and math.isnan(weekly.means('weight')[1])
+    assert np.isnan(weekly.means('missing')).all()
+
+
+def test_five_years_of_logs_render_as_weekly_report():
+    start, end = date(2020, 1, 1), date(2024, 12, 31)
+    weekly = WeeklySummary(start, end)
+    days = (end - start).days + 1
+    for offset in range(0, days, 500):
+        weekly.add([
+            (datetime(2020, 1, 1) + timedelta(days=i), i % 2 == 0, {'weight': 90 - i * 0.01})
+            for i in range(offset, min(offset + 500, days))
+        ])
+    client = SimpleNamespace(name='Alex', fitness_level='beginner', goal='weight_loss', created_at=None)
+
+    pdf = generate_client_report(client, [], weekly, []).getvalue()
+
+    assert weekly.total_logs == days and len(weekly) == 262
+    assert pdf.startswith(b'%PDF-') and pdf.count(b'/Type /Page\n') > 1
@@ -0,0 +1,72 @@
+from extensions import db
+from models import Recipe, RecipeIngredient
+
+
+def _create_recipe(*ingredient_names, **macros):
+    values = {'calories': 350, 'protein': 30, 'carbs': 8, 'fat': 12}
+    values.update(macros)
+    recipe = Recipe(name='Test Recipe', **values)
+    recipe.ingredients = [
+        RecipeIngredient(name=name, amount=100, unit='g') for name in ingredient_names
+    ]
+    db.session.add(recipe)
+    db.session.commit()
+    return recipe
+
+
+def test_flags_computed_on_insert(app):
+    """Flags are stored when a recipe is first flushed."""
+    recipe = _create_recipe('Tofu', 'Spinach')
+
+    assert recipe.is_vegan
+    assert recipe.is_dairy_free
+    assert recipe.is_high_protein
+    assert recipe.is_keto
+    assert recipe.allergens == ['soy']
+
+
+def test_flags_recomputed_when_ingredients_change(app):
+    """Adding, renaming or deleting an ingredient invalidates the stored flags."""
+    recipe = _create_recipe('Tofu')
+
+    db.session.add(RecipeIngredient(recipe=recipe, name='Cheddar cheese', amount=30, unit='g'))
+    db.session.commit()
+    assert not recipe.is_vegan
+    assert not recipe.is_dairy_free
+    assert 'milk' in recipe.allergens
+
+    cheese = next(i for i in recipe.ingredients if i.name == 'Cheddar cheese')
+    db.session.delete(cheese)
+    db.session.commit()
+    db.session.refresh(recipe)
+    assert recipe.is_vegan
+    assert 'milk' not in recipe.allergens
+
+    recipe.ingredients[0].name = 'Chicken'
+    db.session.commit()
+    assert not recipe.is_vegetarian
+
+
+def test_flags_recomputed_when_macros_change(app):
+    """Changing macros refreshes the nutrition labels."""
+    recipe = _create_recipe('Rice', carbs=60)
+    assert not recipe.is_keto
+
+    recipe.carbs = 5
+    db.session.commit()
+    assert recipe.is_keto
+    assert recipe.is_low_carb
+
+
+def test_recompute_all_flags_backfills_in_chunks(app):
+    """The backfill recomputes rows written without going through the ORM."""
+    for _ in range(5):
+        _create_recipe('Chicken')
+    db.session.execute(Recipe.__table__.update().values(is_vegetarian=True, allergens=['fish']))
+    db.session.commit()
+
+    assert Recipe.recompute_all_flags(chunk_size=2) == 5
+
+    recipes = Recipe.query.all()
+    assert all(not r.is_vegetarian for r in recipes)
+    assert all(r.allergens == [] for r in recipes)
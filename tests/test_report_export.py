@@ -0,0 +1,126 @@
+import os
+import time
+import zipfile
+from datetime import date
+from functools import partial
+
+import pytest
+
+from extensions import db
+from models import Client, Trainer
+from utils import report_export
+from utils.report_export import CANCELLED, COMPLETE, FAILED, ExportRunning, export_client_reports, export_key
+
+START, END = date(2024, 1, 1), date(2024, 1, 31)
+
+
+def _roster(names):
+    trainer = Trainer(username='coach', email='coach@example.com')
+    db.session.add(trainer)
+    db.session.flush()
+    clients = [Client(name=name, email=f'{name}@example.com', trainer_id=trainer.id, fitness_level='beginner')
+               for name in names]
+    db.session.add_all(clients)
+    db.session.commit()
+    return trainer, clients
+
+
+def _fake_render(renders_log, fail, cancel, payload, output):
+    """Renderer for the worker processes; renders are logged to a file since they run in other processes"""
+    with open(renders_log, 'a') as log:
+        log.write(f"{payload['client_id']}\n")
+    if payload['client_id'] in fail:
+        raise ValueError('render failed')
+    output.write(b'%PDF-fake ' + str(payload['client_id']).encode())
+    if cancel and payload['client_id'] == cancel[0]:
+        report_export.cancel_export(cancel[1])
+
+
+def _setup(app, monkeypatch, tmp_path, fail=(), cancel=None):
+    """Point the export at tmp_path; returns the sent notifications and a picklable fake renderer"""
+    notifications = []
+    monkeypatch.setattr(report_export, 'export_dir', str(tmp_path / 'exports'))
+    monkeypatch.setattr(report_export, 'send_notification', lambda *args: notifications.append(args))
+    return notifications, partial(_fake_render, str(tmp_path / 'renders.log'), frozenset(fail), cancel)
+
+
+def _archive_entries(path):
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_failed_reports_are_retried_on_resume(app, monkeypatch, tmp_path):
+    """A failed export keeps its valid partial ZIP; the next run renders only what is missing."""
+    trainer, (alex, sam) = _roster(['alex', 'sam'])
+    _, render = _setup(app, monkeypatch, tmp_path, fail={sam.id})
+
+    first = export_client_reports(app, trainer.id, START, END, max_workers=2, render=render)
+
+    assert first['status'] == FAILED and first['done'] == 1 and list(first['failed']) == [str(sam.id)]
+    part = report_export._part_path(first['export_id'])
+    assert list(_archive_entries(part)) == [f'{alex.id:06d}_alex.pdf']
+
+    os.remove(tmp_path / 'renders.log')
+    notifications, render = _setup(app, monkeypatch, tmp_path)
+    second = export_client_reports(app, trainer.id, START, END, max_workers=2, render=render)
+
+    assert second['status'] == COMPLETE and second['done'] == 2
+    assert (tmp_path / 'renders.log').read_text().split() == [str(sam.id)]
+    assert _archive_entries(report_export.archive_path(second['export_id'])) == {
+        f'{alex.id:06d}_alex.pdf': f'%PDF-fake {alex.id}'.encode(),
+        f'{sam.id:06d}_sam.pdf': f'%PDF-fake {sam.id}'.encode()
+    }
+    assert notifications[-1][1] == 'report_export' and notifications[-1][3]['status'] == COMPLETE
+
+
+def test_cancelled_export_stops_and_resumes(app, monkeypatch, tmp_path):
+    trainer, clients = _roster(['alex', 'sam', 'kim', 'lee'])
+    _, render = _setup(app, monkeypatch, tmp_path, cancel=(clients[0].id, export_key(trainer.id, START, END)))
+
+    cancelled = export_client_reports(app, trainer.id, START, END, max_workers=1, render=render)
+
+    assert cancelled['status'] == CANCELLED and cancelled['done'] < len(clients)
+    assert not [name for name in os.listdir(tmp_path / 'exports') if name.endswith('.pdf.tmp')]
+
+    _, render = _setup(app, monkeypatch, tmp_path)
+    resumed = export_client_reports(app, trainer.id, START, END, max_workers=2, render=render)
+
+    assert resumed['status'] == COMPLETE
+    assert len(_archive_entries(report_export.archive_path(resumed['export_id']))) == len(clients)
+
+
+def test_second_run_of_an_export_is_refused(app, monkeypatch, tmp_path):
+    """While one run holds an export's lock, another can't write to its archive."""
+    trainer, _ = _roster(['alex'])
+    _, render = _setup(app, monkeypatch, tmp_path)
+    os.makedirs(report_export.export_dir)
+    lock = report_export._lock(export_key(trainer.id, START, END))
+    try:
+        with pytest.raises(ExportRunning):
+            export_client_reports(app, trainer.id, START, END, max_workers=1, render=render)
+    finally:
+        os.close(lock)
+
+    assert export_client_reports(app, trainer.id, START, END, max_workers=1, render=render)['status'] == COMPLETE
+
+
+def test_old_exports_expire_unless_running(app, monkeypatch, tmp_path):
+    trainer, _ = _roster(['alex'])
+    _, render = _setup(app, monkeypatch, tmp_path)
+    monkeypatch.setattr(report_export, '_last_expiry', 0.0)
+    finished = export_client_reports(app, trainer.id, START, END, max_workers=1, render=render)['export_id']
+    running = export_key(trainer.id, START, date(2024, 2, 29))
+    with open(report_export._part_path(running), 'w'):
+        pass
+
+    old = time.time() - report_export.export_ttl - 60
+    for name in os.listdir(report_export.export_dir):
+        os.utime(os.path.join(report_export.export_dir, name), (old, old))
+    lock = report_export._lock(running)
+    try:
+        report_export.expire_exports()
+    finally:
+        os.close(lock)
+
+    assert sorted(os.listdir(report_export.export_dir)) == [f'{running}.lock', f'{running}.zip.part']
+    assert report_export.read_status(finished) is None
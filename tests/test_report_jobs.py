@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+import time
+
+from utils import report_jobs
+from utils.report_jobs import DONE, FAILED, LocalJobBackend, get_report_job, report_path, submit_report
+
+PLAN = {
+    'client_data': {
+        'name': 'Alex', 'goal': 'weight_loss', 'fitness_level': 'beginner',
+        'diet_preference': 'balanced', 'weekly_budget': 80, 'training_days': 3
+    },
+    'workout_plan': {
+        'Monday': {'exercises': [{'name': 'Squat', 'sets': 3, 'reps': '10'}]},
+        'Tuesday': {'exercises': 'Rest Day'}
+    },
+    'meal_plan': {
+        'Monday': {'meals': {'breakfast': {'name': 'Oats', 'cost': 1.5}}, 'total_cost': 1.5}
+    }
+}
+
+
+def _use_backend(app, monkeypatch, tmp_path):
+    backend = LocalJobBackend(app, workers=2, directory=str(tmp_path / 'jobs'))
+    monkeypatch.setattr(report_jobs, 'backend', backend)
+    monkeypatch.setattr(report_jobs, 'spool_dir', str(tmp_path))
+    return backend
+
+
+def _wait(job_id, owner_id):
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        job = get_report_job(job_id, owner_id)
+        if job['status'] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError('report job did not finish')
+
+
+def test_identical_requests_share_one_render(app, monkeypatch, tmp_path):
+    """Submits with the same inputs while a job is pending or fresh reuse it; other owners don't see it."""
+    _use_backend(app, monkeypatch, tmp_path)
+    release = threading.Event()
+    renders = []
+
+    def render(payload, output):
+        renders.append(payload)
+        release.wait(5)
+        output.write(b'%PDF-fake')
+    monkeypatch.setitem(report_jobs.RENDERERS, 'fake', render)
+
+    first = submit_report('fake', {'client_id': 1}, 7, 'report.pdf')
+    second = submit_report('fake', {'client_id': 1}, 7, 'report.pdf')
+    release.set()
+    done = _wait(first['id'], 7)
+    third = submit_report('fake', {'client_id': 1}, 7, 'report.pdf')
+
+    assert first['id'] == second['id'] == third['id']
+    assert third['status'] == DONE and len(renders) == 1
+    with open(report_path(done['id']), 'rb') as f:
+        assert f.read() == b'%PDF-fake'
+    assert get_report_job(first['id'], 8) is None
+
+
+def test_failed_render_reports_error_and_leaves_no_file(app, monkeypatch, tmp_path):
+    _use_backend(app, monkeypatch, tmp_path)
+
+    def render(payload, output):
+        output.write(b'partial')
+        raise ValueError('Client 1 not found')
+    monkeypatch.setitem(report_jobs.RENDERERS, 'fake', render)
+
+    job = _wait(submit_report('fake', {'client_id': 1}, 7, 'report.pdf')['id'], 7)
+
+    assert job['status'] == FAILED and job['error'] == 'Client 1 not found'
+    assert [path.name for path in tmp_path.iterdir()] == ['jobs']
+
+
+def test_job_records_are_shared_between_processes(app, monkeypatch, tmp_path):
+    """A job submitted through one web worker's backend can be polled through another's."""
+    _use_backend(app, monkeypatch, tmp_path)
+    monkeypatch.setitem(report_jobs.RENDERERS, 'fake', lambda payload, output: output.write(b'%PDF-fake'))
+
+    job = _wait(submit_report('fake', {'client_id': 1}, 7, 'report.pdf')['id'], 7)
+    monkeypatch.setattr(report_jobs, 'backend', LocalJobBackend(app, workers=1, directory=str(tmp_path / 'jobs')))
+
+    assert get_report_job(job['id'], 7) == job
+    report_jobs.backend.expire(time.time() + 1)
+    assert get_report_job(job['id'], 7) is None
+
+
+def test_orphaned_pending_job_is_replaced_and_expired(app, monkeypatch, tmp_path):
+    """A job left queued by a worker that died is rendered again once it is older than the TTL."""
+    backend = _use_backend(app, monkeypatch, tmp_path)
+    monkeypatch.setitem(report_jobs.RENDERERS, 'fake', lambda payload, output: output.write(b'%PDF-fake'))
+    job_id = report_jobs.job_key('fake', {'client_id': 1}, 7)
+    orphan = {
+        'id': job_id, 'kind': 'fake', 'owner_id': 7, 'filename': 'report.pdf', 'status': 'queued',
+        'error': None, 'created_at': time.time() - report_jobs.job_ttl - 60, 'finished_at': None
+    }
+    os.makedirs(backend.directory)
+    with open(os.path.join(backend.directory, f'{job_id}.json'), 'w') as f:
+        json.dump(orphan, f)
+
+    backend.expire(time.time() - report_jobs.job_ttl)
+    assert get_report_job(job_id, 7) is None
+
+    with open(os.path.join(backend.directory, f'{job_id}.json'), 'w') as f:
+        json.dump(orphan, f)
+    job = _wait(submit_report('fake', {'client_id': 1}, 7, 'report.pdf')['id'], 7)
+    assert job['status'] == DONE and job['created_at'] > orphan['created_at']
+
+
+def test_fitness_plan_renders_pdf_to_spool(app, monkeypatch, tmp_path):
+    _use_backend(app, monkeypatch, tmp_path)
+
+    job = _wait(submit_report('fitness_plan', PLAN, 7, 'fitness_plan_Alex.pdf')['id'], 7)
+
+    assert job['status'] == DONE, job['error']
+    with open(report_path(job['id']), 'rb') as f:
+        assert f.read(5) == b'%PDF-'
@@ -0,0 +1,31 @@
+from utils.pdf_generator import generate_pdf
+from utils.report_templates import DEFAULT_BRAND, report_brand, report_theme
+
+
+def test_brand_settings_fall_back_to_defaults():
+    assert report_brand(None) == DEFAULT_BRAND
+    brand = report_brand({'primary_color': '#0F766E', 'accent_color': 'teal'}, 'Peak Coaching')
+    assert brand == ('Peak Coaching', '#0f766e', DEFAULT_BRAND.accent_color)
+
+
+def test_theme_is_built_once_per_brand():
+    brand = report_brand({'primary_color': '#0f766e'}, 'Peak Coaching')
+    assert report_theme(brand) is report_theme(report_brand({'primary_color': '#0F766E'}, 'Peak Coaching'))
+    assert report_theme(brand) is not report_theme(DEFAULT_BRAND)
+
+
+def test_branded_plan_renders_with_shared_styles():
+    """Reports reuse the cached theme without mutating it."""
+    brand = report_brand({'primary_color': '#0f766e'}, 'Peak Coaching')
+    theme = report_theme(brand)
+    style_names = sorted(theme.styles.byName)
+    plan = ({'name': 'Alex', 'goal': 'strength', 'fitness_level': 'beginner', 'diet_preference': 'balanced',
+             'weekly_budget': 80, 'training_days': 3},
+            {'Monday': {'exercises': [{'name': 'Squat', 'sets': 3, 'reps': '10'}]}},
+            {'Monday': {'meals': {'lunch': {'name': 'Rice bowl', 'cost': 4.0}}, 'total_cost': 4.0}})
+
+    first = generate_pdf(*plan, brand=brand).getvalue()
+    second = generate_pdf(*plan, brand=brand).getvalue()
+
+    assert first.startswith(b'%PDF-') and second.startswith(b'%PDF-')
+    assert sorted(theme.styles.byName) == style_names
@@ -0,0 +1,63 @@
+import os
+from datetime import date
+
+from utils import share_image_cache as cache_module
+from utils.share_image_cache import (
+    SHARE_IMAGE_CACHE_HITS, SHARE_IMAGE_CACHE_MISSES, SHARE_IMAGE_NOT_MODIFIED, ShareImageCache,
+    send_share_image, share_image_key
+)
+from utils.share_images import achievement_spec
+
+
+def test_conditional_requests_skip_rendering(app, monkeypatch, tmp_path):
+    """A miss renders and stores, a repeat is read from disk, a matching ETag gets a 304."""
+    monkeypatch.setattr(cache_module, 'share_image_cache', ShareImageCache(str(tmp_path)))
+    renders = []
+
+    def build(*inputs):
+        renders.append(inputs)
+        return achievement_spec(*inputs)
+
+    inputs = ('First Steps', 'Completed a workout', date(2024, 1, 3), 'Alex')
+    key = share_image_key('achievement', inputs)
+    counts = [metric.labels(kind='achievement')._value.get()
+              for metric in (SHARE_IMAGE_CACHE_MISSES, SHARE_IMAGE_CACHE_HITS, SHARE_IMAGE_NOT_MODIFIED)]
+
+    with app.test_request_context():
+        first = send_share_image('achievement', build, *inputs)
+        first.direct_passthrough = False
+        png = first.get_data()
+    with app.test_request_context():
+        second = send_share_image('achievement', build, *inputs)
+        second.direct_passthrough = False
+        assert second.get_data() == png
+        second.close()
+    with app.test_request_context(headers={'If-None-Match': f'"{key}"'}):
+        third = send_share_image('achievement', build, *inputs)
+
+    assert len(renders) == 1
+    assert [first.status_code, second.status_code, third.status_code] == [200, 200, 304]
+    assert first.get_etag() == second.get_etag() == third.get_etag() == (key, False)
+    assert third.get_data() == b''
+    assert first.cache_control.private and first.cache_control.max_age == cache_module.max_age
+    assert [metric.labels(kind='achievement')._value.get()
+            for metric in (SHARE_IMAGE_CACHE_MISSES, SHARE_IMAGE_CACHE_HITS, SHARE_IMAGE_NOT_MODIFIED)] == \
+        [counts[0] + 1, counts[1] + 1, counts[2] + 1]
+
+    # Any input change, including the brand, is a different image
+    assert share_image_key('achievement', inputs[:3] + ('Sam',)) != key
+    assert share_image_key('achievement', inputs, ('Other', (0, 0, 0), 'example.com')) != key
+
+
+def test_least_recently_used_images_are_evicted(tmp_path):
+    """Past the size budget the cache drops the images read longest ago."""
+    cache = ShareImageCache(str(tmp_path), max_bytes=3500)
+    for i, key in enumerate(['aa1', 'bb2', 'cc3']):
+        cache.put(key, b'x' * 1000)
+        os.utime(cache.path(key), (i, i))
+
+    cache.get('aa1')  # now the most recently used
+    cache.put('dd4', b'x' * 1000)
+
+    assert cache.get('bb2') is None
+    assert cache.get('aa1') and cache.get('cc3') and cache.get('dd4')
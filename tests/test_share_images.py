@@ -0,0 +1,108 @@
+import io
+import os
+from datetime import date
+
+import pytest
+from PIL import Image, ImageChops, ImageDraw
+
+from utils import share_images
+from utils.share_images import (
+    AMBER_500, GOLD, GREEN_500, HEIGHT, INDIGO_600, WHITE, WIDTH, BarChart, ProgressRing, ShareImage,
+    Sparkline, StackedBar, Text, achievement_spec, base_layer, challenge_spec, compose, draw_element,
+    get_font, meal_plan_spec, render_share_image, weekly_summary_spec, workout_nutrition_spec
+)
+
+REFERENCE_DIR = os.path.join(os.path.dirname(__file__), 'reference_images')
+
+# Unlabelled so the references don't depend on the installed fonts
+CHART_REFERENCES = {
+    'bar_chart': BarChart((20, 20, 360, 160), [30, 45, 0, 60, 20, 75, 50]),
+    'progress_ring': ProgressRing((200, 100), 80, 14, 65),
+    'sparkline': Sparkline((20, 20, 360, 160), [2000, 2300, 1900, 2150, 2400, 2050, 2200], GREEN_500),
+    'stacked_bar': StackedBar((20, 80, 360, 40), [
+        (None, 30, INDIGO_600), (None, 45, GREEN_500), (None, 25, AMBER_500)
+    ])
+}
+
+
+def _decode(png):
+    image = Image.open(io.BytesIO(png))
+    assert image.size == (WIDTH, HEIGHT)
+    return image.convert('RGB')
+
+
+def test_every_spec_renders():
+    """All five endpoint specs render to full-size PNGs without touching the cached layers."""
+    layer = base_layer('banner').copy()
+    specs = [
+        challenge_spec('10k Steps', 'workout', 65, 2, 3, date(2024, 1, 1), date(2024, 1, 31), 'Alex'),
+        meal_plan_spec(date(2024, 1, 2), [
+            {'title': 'Breakfast: Oats', 'items': [
+                {'name': 'Oats', 'calories': 300, 'protein': 10, 'completed': True},
+                {'name': 'Berries', 'calories': 50, 'protein': 1, 'completed': False},
+                {'name': 'Milk', 'calories': 120, 'protein': 8, 'completed': False}
+            ]}
+        ], 'Alex'),
+        workout_nutrition_spec({
+            'workout_type': 'strength_training',
+            'calories': {'training_day_target': 2600, 'rest_day_target': 2200, 'post_workout': 500},
+            'recovery': {'muscle_recovery': 85, 'energy_level': 60},
+            'macros': {'protein_goal_percent': 65}
+        }, 'Alex'),
+        achievement_spec('First Steps', 'Completed a workout', date(2024, 1, 3), 'Alex'),
+        weekly_summary_spec(
+            date(2024, 1, 1), date(2024, 1, 7), {'count': 3, 'duration': 120, 'calories_burned': 900},
+            {'avg_calories': 2100, 'avg_protein': 140, 'completion_rate': 75}, 1.5, True, 'Alex',
+            [('Mon', 30), ('Wed', 45), ('Fri', 60)], [2000, 2300, 1900, 2150]
+        )
+    ]
+    for spec in specs:
+        _decode(render_share_image(spec))
+
+    assert list(base_layer('banner').getdata()) == list(layer.getdata())
+
+
+def test_layers_and_fonts_are_built_once():
+    """Repeated renders reuse the cached fonts and static layer; dynamic text lands on a copy."""
+    base_layer.cache_clear()
+    get_font.cache_clear()
+    spec = ShareImage('banner', [Text((50, 150), 'Hello', share_images.TITLE)])
+    for _ in range(3):
+        image = compose(spec)
+
+    assert base_layer.cache_info().misses == 1
+    assert get_font.cache_info().currsize <= 3
+    assert image.getpixel((5, 5)) == INDIGO_600
+    assert image.getpixel((5, HEIGHT - 5)) == INDIGO_600
+
+
+def test_celebration_layer_matches_original_gradient():
+    """The row-wise gradient reproduces the original per-pixel colours."""
+    layer = base_layer('celebration')
+    for y in (0, 40, HEIGHT - 1):
+        expected = (
+            int(79 + (y / HEIGHT) * (16 - 79)),
+            int(70 + (y / HEIGHT) * (185 - 70)),
+            int(229 + (y / HEIGHT) * (129 - 229))
+        )
+        assert layer.getpixel((10, y)) == expected
+        assert layer.getpixel((WIDTH - 1, y)) == expected
+    assert layer.getpixel((WIDTH // 2, share_images.ICON_Y + share_images.ICON_SIZE // 2)) == GOLD
+
+
+@pytest.mark.parametrize('name', sorted(CHART_REFERENCES))
+def test_chart_primitives_match_reference_images(name):
+    """
+    Each primitive matches its reference image within anti-aliasing noise.
+    Regenerate with UPDATE_REFERENCE_IMAGES=1 after an intended change.
+    """
+    image = Image.new('RGB', (400, 200), WHITE)
+    draw_element(ImageDraw.Draw(image), CHART_REFERENCES[name])
+    path = os.path.join(REFERENCE_DIR, f'{name}.png')
+    if os.environ.get('UPDATE_REFERENCE_IMAGES'):
+        image.save(path)
+
+    reference = Image.open(path).convert('RGB')
+    diff = ImageChops.difference(image, reference).convert('L').point(lambda value: 255 if value > 24 else 0)
+    changed = diff.histogram()[255]
+    assert changed <= image.width * image.height * 0.001, f"{changed} pixels differ from {name}.png"
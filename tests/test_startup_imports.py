@@ -0,0 +1,86 @@
+import ast
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('matplotlib', 'numpy', 'PIL', 'reportlab', 'openai')
+
+# Modules a web worker imports at start-up, directly or through app and its blueprints
+STARTUP_MODULES = (
+    'models', 'utils.email_dispatcher', 'utils.scheduler', 'utils.substitution_graph', 'utils.leaderboard',
+    'utils.leaderboard_push', 'utils.share_image_cache', 'utils.chart_pool', 'utils.report_jobs',
+    'utils.report_export', 'utils.challenge_stats', 'utils.challenge_feed', 'utils.meal_plan_assembler',
+    'utils.substitution_index'
+)
+
+
+def _module_file(name):
+    path = os.path.join(ROOT, *name.split('.'))
+    for candidate in (path + '.py', os.path.join(path, '__init__.py')):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def _module_level_imports(path):
+    """Names imported when the module loads; imports inside functions are skipped"""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = []
+
+    def visit(nodes):
+        for node in nodes:
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.append(node.module)
+                names.extend(f"{node.module}.{alias.name}" for alias in node.names)
+            elif isinstance(node, (ast.If, ast.Try)):
+                visit(node.body)
+                visit(node.orelse)
+                visit(getattr(node, 'finalbody', []))
+                for handler in getattr(node, 'handlers', []):
+                    visit(handler.body)
+
+    visit(tree.body)
+    return names
+
+
+def _heavy_imports(start):
+    """(heavy module, import chain) pairs reachable from `start` through this repo's modules"""
+    found, seen, queue = [], set(), [(start, [start])]
+    while queue:
+        name, chain = queue.pop()
+        path = _module_file(name)
+        if path is None or name in seen:
+            continue
+        seen.add(name)
+        for imported in _module_level_imports(path):
+            if imported.split('.')[0] in HEAVY_MODULES:
+                found.append((imported, ' -> '.join(chain)))
+            else:
+                queue.append((imported, chain + [imported]))
+    return found
+
+
+@pytest.mark.parametrize('module', ['app', 'routes.client', 'routes.client_portal', 'routes.trainer'])
+def test_startup_modules_import_heavy_libraries_lazily(module):
+    """Web workers only load matplotlib, numpy, PIL, reportlab and openai when a request needs them."""
+    assert _heavy_imports(module) == []
+
+
+def test_importing_startup_modules_skips_heavy_libraries():
+    # A fresh interpreter, since the test session has usually imported them already
+    result = subprocess.run(
+        [sys.executable, '-c',
+         f"import importlib, sys\n"
+         f"for name in {STARTUP_MODULES!r}: importlib.import_module(name)\n"
+         f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert result.stdout.split() == []
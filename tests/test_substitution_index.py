@@ -0,0 +1,81 @@
+import pytest
+from extensions import db
+from models import Recipe, RecipeIngredient
+from utils.substitution_index import RecipeSubstitutionIndex
+
+
+def _recipe(name, calories, protein, carbs, fat, *ingredient_names):
+    recipe = Recipe(name=name, calories=calories, protein=protein, carbs=carbs, fat=fat)
+    recipe.ingredients = [RecipeIngredient(name=n, amount=100, unit='g') for n in ingredient_names]
+    db.session.add(recipe)
+    return recipe
+
+
+@pytest.fixture
+def recipes(app):
+    created = {
+        'bowl': _recipe('Chicken Bowl', 500, 40, 45, 15, 'Chicken breast', 'Rice'),
+        'tofu': _recipe('Tofu Bowl', 480, 30, 50, 14, 'Tofu', 'Rice'),
+        'pasta': _recipe('Cheese Pasta', 520, 18, 70, 20, 'Pasta', 'Cheddar cheese'),
+        'steak': _recipe('Steak Salad', 510, 45, 8, 25, 'Beef', 'Lettuce'),
+        'shake': _recipe('Protein Shake', 200, 30, 10, 3, 'Whey', 'Milk'),
+    }
+    db.session.commit()
+    return created
+
+
+def test_nearest_orders_by_macro_distance(recipes):
+    """Neighbours inside the calorie window come back nearest first."""
+    index = RecipeSubstitutionIndex()
+
+    ids = index.find_substitutes(recipes['bowl'], k=5)
+
+    assert ids[0] == recipes['tofu'].id
+    assert recipes['shake'].id not in ids
+    assert recipes['bowl'].id not in ids
+
+
+def test_diet_and_exclusions_are_respected(recipes):
+    """Diet buckets and excluded ingredients filter the candidates."""
+    index = RecipeSubstitutionIndex()
+
+    vegetarian = index.find_substitutes(recipes['bowl'], diet_type='vegetarian')
+    assert set(vegetarian) == {recipes['tofu'].id, recipes['pasta'].id}
+
+    no_rice = index.find_substitutes(recipes['steak'], excluded_ingredients=['RICE'])
+    assert no_rice == [recipes['pasta'].id]
+
+
+def test_index_refreshes_changed_recipes_after_commit(recipes, monkeypatch):
+    """The committing process applies its changes incrementally on the next query, without a rebuild."""
+    index = RecipeSubstitutionIndex(version_check_interval=0)
+    index.ensure_fresh()
+    builds = []
+    monkeypatch.setattr(index, 'build', lambda: builds.append(1))
+
+    from utils import substitution_index as module
+    original, module.substitution_index = module.substitution_index, index
+    try:
+        recipes['shake'].calories = 495
+        new_recipe = _recipe('Lentil Stew', 505, 28, 55, 10, 'Lentils')
+        db.session.commit()
+    finally:
+        module.substitution_index = original
+
+    ids = index.find_substitutes(recipes['bowl'], diet_type='vegan')
+    assert set(ids) == {recipes['tofu'].id, new_recipe.id}
+    assert recipes['shake'].id in index.find_substitutes(recipes['bowl'])
+    assert builds == []
+
+
+def test_changes_from_other_processes_rebuild_the_index(recipes):
+    """A recipe change committed elsewhere reaches the index once it sees the version bump."""
+    index = RecipeSubstitutionIndex(version_check_interval=0)
+    assert recipes['tofu'].id in index.find_substitutes(recipes['bowl'], diet_type='vegetarian')
+
+    # Committed through the module's index, as another worker process would
+    recipes['tofu'].ingredients.append(RecipeIngredient(name='Peanut sauce', amount=30, unit='g'))
+    db.session.commit()
+
+    assert index.find_substitutes(recipes['bowl'], diet_type='vegetarian', excluded_ingredients=['peanut']) == \
+        [recipes['pasta'].id]
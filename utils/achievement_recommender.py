@@ -0,0 +1,214 @@
+"""
+Achievement Recommender for FitFuel
+Scores the whole achievement catalogue against a client's 30-day activity in
+one vectorized pass, for a single client or a batch of clients at once
+"""
+
+import heapq
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import case, func
+from extensions import db
+from models import Achievement, Client, ClientAchievement, ProgressLog
+
+LEVEL_MAPPING = {'beginner': 1, 'intermediate': 2, 'advanced': 3}
+
+# Client goal -> achievement type that earns the goal bonus
+GOAL_ACHIEVEMENT_TYPES = {
+    'consistency': 'workout',
+    'muscle_gain': 'strength',
+    'weight_loss': 'nutrition',
+    'endurance': 'endurance'
+}
+
+BASE_SCORE = 100
+LEVEL_PENALTY = 15
+GOAL_BONUS = 25
+COMPLETION_WEIGHT = 15
+
+ACTIVITY_WINDOW = timedelta(days=30)
+
+ActivitySummary = namedtuple('ActivitySummary', ['activity_count', 'completed_count'])
+
+NO_ACTIVITY = ActivitySummary(0, 0)
+
+
+def client_level(fitness_level: Optional[str]) -> int:
+    return LEVEL_MAPPING.get(fitness_level, 1)
+
+
+def activity_bonus(activity: ActivitySummary) -> int:
+    """Bonus for logging activity often, plus a bonus for completing what was logged"""
+    count = activity.activity_count
+    if not count:
+        return 0
+    if count >= 12:
+        bonus = 20
+    elif count >= 8:
+        bonus = 15
+    elif count >= 4:
+        bonus = 10
+    else:
+        bonus = 0
+    return bonus + int(activity.completed_count / count * COMPLETION_WEIGHT)
+
+
+def load_activity_summaries(client_ids: Iterable[int], now: Optional[datetime] = None) -> Dict[int, ActivitySummary]:
+    """30-day logged and completed counts for many clients in one grouped query"""
+    since = (now or datetime.utcnow()) - ACTIVITY_WINDOW
+    rows = db.session.query(
+        ProgressLog.client_id,
+        func.count(ProgressLog.id),
+        func.sum(case((ProgressLog.workout_completed.is_(True), 1), else_=0))
+    ).filter(
+        ProgressLog.client_id.in_(list(client_ids)),
+        ProgressLog.log_date >= since
+    ).group_by(ProgressLog.client_id)
+
+    return {
+        client_id: ActivitySummary(count, int(completed or 0))
+        for client_id, count, completed in rows
+    }
+
+
+class AchievementCatalog:
+    """Achievement ids, types and difficulties as parallel arrays, ordered by id"""
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.types = np.array([row[1] or '' for row in rows], dtype=object)
+        # A missing difficulty makes the achievement unscorable, as before
+        self.difficulty = np.array(
+            [np.nan if row[2] is None else row[2] for row in rows], dtype=float
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls) -> 'AchievementCatalog':
+        return cls(
+            db.session.query(Achievement.id, Achievement.type, Achievement.difficulty)
+            .order_by(Achievement.id)
+        )
+
+    def scores(self, levels: np.ndarray, goals: List[Optional[str]], bonuses: np.ndarray) -> np.ndarray:
+        """Compatibility scores, one row per client and one column per achievement"""
+        levels = np.asarray(levels, dtype=float)[:, None]
+        bonuses = np.asarray(bonuses, dtype=float)[:, None]
+        goal_types = np.array([GOAL_ACHIEVEMENT_TYPES.get(goal, None) for goal in goals], dtype=object)[:, None]
+
+        scores = BASE_SCORE - np.abs(levels - self.difficulty[None, :]) * LEVEL_PENALTY
+        scores += np.where(self.types[None, :] == goal_types, GOAL_BONUS, 0)
+        scores += bonuses
+        scores = np.clip(scores, 0, BASE_SCORE)
+        return np.nan_to_num(scores, nan=0.0)
+
+
+def recommendation_reason(achievement_type: str, difficulty: Optional[int], goal: Optional[str],
+                          level: int, activity: ActivitySummary) -> str:
+    """Most relevant personalized reason for recommending an achievement"""
+    count = activity.activity_count
+    completion_rate = activity.completed_count / max(1, count)
+
+    reasons = []
+    if achievement_type == goal:
+        reasons.append("Perfectly aligned with your fitness goals")
+
+    if count >= 12:
+        reasons.append("You're consistently active")
+    elif count >= 8:
+        reasons.append("You're building a good workout routine")
+    elif count >= 4:
+        reasons.append("Great for maintaining your progress")
+
+    if completion_rate >= 0.8:
+        reasons.append("You're excellent at completing workouts")
+    elif completion_rate >= 0.6:
+        reasons.append("You're committed to your training")
+
+    if difficulty is not None:
+        if difficulty == level:
+            reasons.append("Matches your current fitness level")
+        elif difficulty == level + 1:
+            reasons.append("A good challenge for your next step")
+        elif difficulty < level:
+            reasons.append("A quick win to boost your momentum")
+
+    return reasons[0] if reasons else "Recommended based on your profile"
+
+
+def recommend_achievements_bulk(client_ids: Iterable[int], limit: int = 3,
+                                catalog: Optional[AchievementCatalog] = None) -> Dict[int, List[Dict]]:
+    """
+    Top achievement recommendations for many clients (e.g. the nightly digest).
+    Runs a fixed number of queries regardless of client or achievement count.
+    """
+    client_ids = list(dict.fromkeys(client_ids))
+    if not client_ids:
+        return {}
+
+    clients = db.session.query(Client.id, Client.fitness_level, Client.goal)\
+        .filter(Client.id.in_(client_ids))\
+        .order_by(Client.id)\
+        .all()
+    if not clients:
+        return {}
+    catalog = catalog or AchievementCatalog.load()
+    if not len(catalog):
+        return {client.id: [] for client in clients}
+
+    earned = {}
+    for client_id, achievement_id in db.session.query(
+        ClientAchievement.client_id, ClientAchievement.achievement_id
+    ).filter(ClientAchievement.client_id.in_(client_ids)):
+        earned.setdefault(client_id, set()).add(achievement_id)
+
+    activity = load_activity_summaries(client_ids)
+    activities = [activity.get(client.id, NO_ACTIVITY) for client in clients]
+    levels = [client_level(client.fitness_level) for client in clients]
+    scores = catalog.scores(levels, [client.goal for client in clients],
+                            [activity_bonus(summary) for summary in activities])
+
+    columns = {achievement_id: i for i, achievement_id in enumerate(catalog.ids.tolist())}
+    top_positions = {}
+    for row, client in enumerate(clients):
+        client_scores = scores[row]
+        for achievement_id in earned.get(client.id, ()):
+            position = columns.get(achievement_id)
+            if position is not None:
+                client_scores[position] = 0
+        candidates = np.flatnonzero(client_scores > 0).tolist()
+        # Bounded heap; ties keep catalogue order like a stable sort
+        top_positions[client.id] = heapq.nlargest(limit, candidates, key=client_scores.__getitem__)
+
+    needed_ids = {int(catalog.ids[i]) for positions in top_positions.values() for i in positions}
+    achievements = {
+        achievement.id: achievement
+        for achievement in Achievement.query.filter(Achievement.id.in_(needed_ids))
+    } if needed_ids else {}
+
+    results = {}
+    for row, client in enumerate(clients):
+        recommendations = []
+        for position in top_positions[client.id]:
+            achievement = achievements.get(int(catalog.ids[position]))
+            if achievement is None:
+                continue
+            recommendations.append({
+                'achievement': achievement,
+                'score': int(scores[row][position]),
+                'reason': recommendation_reason(
+                    achievement.type, achievement.difficulty, client.goal, levels[row], activities[row]
+                )
+            })
+        results[client.id] = recommendations
+    return results
+
+
+def recommend_achievements(client_id: int, limit: int = 3) -> List[Dict]:
+    """Top achievement recommendations for one client"""
+    return recommend_achievements_bulk([client_id], limit).get(client_id, [])
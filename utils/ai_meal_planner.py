@@ -6,10 +6,15 @@ import json
 import logging
 from typing import Dict, List
 from datetime import datetime, timedelta
-import openai
+from functools import lru_cache
 from models import DietaryPreference, MealPlan
 
-openai.api_key = os.environ.get('OPENAI_API_KEY')
+@lru_cache(maxsize=None)
+def get_openai():
+    """The openai module, imported and configured on first use (it takes about a second to import)"""
+    import openai
+    openai.api_key = os.environ.get('OPENAI_API_KEY')
+    return openai
 
 def generate_ai_meal_plan(
     client_preferences: DietaryPreference,
@@ -23,7 +28,7 @@ def generate_ai_meal_plan(
         prompt = _construct_meal_plan_prompt(client_preferences, duration_weeks)
         
         # Call OpenAI API
-        response = openai.ChatCompletion.create(
+        response = get_openai().ChatCompletion.create(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are a professional nutritionist helping to create personalized meal plans."},
@@ -0,0 +1,202 @@
+"""
+Challenge Feed Assembler for FitFuel
+Builds the client challenges page (active, upcoming and completed buckets) with
+a fixed number of grouped queries per page instead of several per challenge
+and per participant, and pages each bucket on the server
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import and_, case, func, or_, select
+from extensions import db
+from models import Challenge, ChallengeParticipant, ChallengeStats, Client
+
+BUCKETS = ('active', 'upcoming', 'completed')
+
+# Challenges per bucket page
+PAGE_SIZE = 12
+
+# Participant avatars shown on each challenge card
+TOP_PARTICIPANTS = 5
+
+DEFAULT_AVATAR = '/static/images/default-avatar.png'
+
+# Progress percentage counted as a successful finish
+SUCCESS_PROGRESS = 80
+
+
+def visible_challenges(client: Client):
+    """Public challenges, and those created by a client of the same trainer (see Challenge.is_visible_to)"""
+    return Challenge.query\
+        .outerjoin(Client, Client.id == Challenge.created_by)\
+        .filter(or_(
+            Challenge.visibility == 'public',
+            Client.trainer_id == client.trainer_id
+        ))
+
+
+def bucket_condition(bucket: str, today: date):
+    """Challenges running on, starting after, or ended before `today` (their dates are datetimes)"""
+    day_start = datetime.combine(today, time.min)
+    next_day = day_start + timedelta(days=1)
+    if bucket == 'active':
+        return and_(Challenge.start_date < next_day, Challenge.end_date >= day_start)
+    if bucket == 'upcoming':
+        return Challenge.start_date >= next_day
+    return Challenge.end_date < day_start
+
+
+def bucket_order(bucket: str):
+    """Soonest ending first, soonest starting first, most recently ended first"""
+    if bucket == 'active':
+        return (Challenge.end_date, Challenge.id)
+    if bucket == 'upcoming':
+        return (Challenge.start_date, Challenge.id)
+    return (Challenge.end_date.desc(), Challenge.id)
+
+
+def bucket_counts(client: Client, today: date) -> Dict[str, int]:
+    """Number of visible challenges in each bucket, in one grouped query"""
+    bucket = case(
+        (bucket_condition('upcoming', today), 'upcoming'),
+        (bucket_condition('completed', today), 'completed'),
+        else_='active'
+    )
+    rows = visible_challenges(client)\
+        .with_entities(bucket, func.count(Challenge.id))\
+        .group_by(bucket)
+    counts = dict.fromkeys(BUCKETS, 0)
+    counts.update(dict(rows.all()))
+    return counts
+
+
+def load_bucket_page(client: Client, bucket: str, page: int, per_page: int, today: date) -> List[Challenge]:
+    return visible_challenges(client)\
+        .filter(bucket_condition(bucket, today))\
+        .order_by(*bucket_order(bucket))\
+        .offset((page - 1) * per_page)\
+        .limit(per_page)\
+        .all()
+
+
+def load_top_participants(challenge_ids: List[int]) -> Dict[int, List[Dict]]:
+    """First TOP_PARTICIPANTS participants to join each challenge, window-limited in SQL"""
+    numbered = select(
+        ChallengeParticipant.challenge_id.label('challenge_id'),
+        ChallengeParticipant.client_id.label('client_id'),
+        func.row_number().over(
+            partition_by=ChallengeParticipant.challenge_id,
+            order_by=ChallengeParticipant.id
+        ).label('position')
+    ).where(ChallengeParticipant.challenge_id.in_(challenge_ids)).subquery()
+
+    rows = db.session.execute(
+        select(numbered.c.challenge_id, Client.name)
+        .join(Client, Client.id == numbered.c.client_id)
+        .where(numbered.c.position <= TOP_PARTICIPANTS)
+        .order_by(numbered.c.challenge_id, numbered.c.position)
+    )
+    participants = {}
+    for challenge_id, name in rows:
+        participants.setdefault(challenge_id, []).append({
+            'name': name,
+            'avatar_url': DEFAULT_AVATAR
+        })
+    return participants
+
+
+def assemble_challenges(client: Client, challenges: List[Challenge], today: date) -> List[Dict]:
+    """
+    Card data for a page of challenges. Runs three queries however many
+    challenges and participants there are.
+    """
+    if not challenges:
+        return []
+    challenge_ids = [challenge.id for challenge in challenges]
+
+    participations = {
+        participation.challenge_id: participation
+        for participation in ChallengeParticipant.query.filter(
+            ChallengeParticipant.challenge_id.in_(challenge_ids),
+            ChallengeParticipant.client_id == client.id
+        )
+    }
+    participant_counts = dict(db.session.execute(
+        select(ChallengeStats.challenge_id, ChallengeStats.participant_count)
+        .where(ChallengeStats.challenge_id.in_(challenge_ids))
+    ).all())
+    top_participants = load_top_participants(challenge_ids)
+
+    cards = []
+    for challenge in challenges:
+        participation = participations.get(challenge.id)
+        progress = ChallengeStats.progress_of(participation.current_value, challenge.target_value) \
+            if participation else None
+        card = {
+            'id': challenge.id,
+            'title': challenge.name,
+            'description': challenge.description,
+            'category': challenge.challenge_type,  # 'workout', 'steps' or 'nutrition'
+            'start_date': challenge.start_date.strftime('%b %d, %Y'),
+            'end_date': challenge.end_date.strftime('%b %d, %Y'),
+            'duration_days': (challenge.end_date - challenge.start_date).days,
+            'is_public': challenge.visibility == 'public',
+            'joined': participation is not None,
+            # The target is the challenge's one goal
+            'goals': [{
+                'description': f"Reach {challenge.target_value:g} ({challenge.challenge_type})",
+                'completed': bool(participation and participation.completed)
+            }],
+            'participant_count': participant_counts.get(challenge.id, 0),
+            'participants': top_participants.get(challenge.id, [])
+        }
+        if participation:
+            card['progress'] = progress
+            card['current_value'] = participation.current_value or 0
+            card['target_value'] = challenge.target_value
+
+        start, end = challenge.start_date.date(), challenge.end_date.date()
+        if start <= today <= end:
+            card['days_remaining'] = (end - today).days
+        elif start > today:
+            card['days_until_start'] = (start - today).days
+        elif participation:
+            card['success'] = progress >= SUCCESS_PROGRESS
+            card['completion_percentage'] = progress
+        cards.append(card)
+    return cards
+
+
+def build_challenge_feed(client: Client, pages: Optional[Dict[str, int]] = None,
+                         per_page: int = PAGE_SIZE, today: Optional[date] = None) -> Dict[str, Dict]:
+    """
+    One page of each bucket: {bucket: {'challenges', 'page', 'pages', 'total'}}.
+    `pages` maps bucket name to a 1-based page number (default 1).
+    """
+    today = today or datetime.now().date()
+    pages = pages or {}
+    counts = bucket_counts(client, today)
+
+    page_challenges = {}
+    for bucket in BUCKETS:
+        total_pages = max(1, -(-counts[bucket] // per_page))
+        page = min(max(1, pages.get(bucket) or 1), total_pages)
+        page_challenges[bucket] = (page, total_pages, load_bucket_page(client, bucket, page, per_page, today)
+                                   if counts[bucket] else [])
+
+    # Assemble all three buckets together so the per-page queries run once
+    cards = assemble_challenges(
+        client, [c for _, _, challenges in page_challenges.values() for c in challenges], today
+    )
+    cards_by_id = {card['id']: card for card in cards}
+
+    return {
+        bucket: {
+            'challenges': [cards_by_id[challenge.id] for challenge in challenges],
+            'page': page,
+            'pages': total_pages,
+            'total': counts[bucket]
+        }
+        for bucket, (page, total_pages, challenges) in page_challenges.items()
+    }
+
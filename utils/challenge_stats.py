@@ -0,0 +1,90 @@
+"""
+Challenge Stats Reconciliation for FitFuel
+Recomputes the denormalized per-challenge aggregates from participant rows in
+challenge chunks and corrects any that drifted from the incremental updates
+"""
+
+import logging
+from typing import Dict, List
+from sqlalchemy import func, select
+from extensions import db
+from models import Challenge, ChallengeParticipant, ChallengeStats
+
+# Challenges reconciled (and committed) per chunk
+CHUNK_SIZE = 200
+
+
+def _snapshot(stats: ChallengeStats):
+    return (stats.participant_count, stats.completed_count,
+            round(stats.progress_total or 0, 6), list(stats.progress_histogram or []))
+
+
+def load_progress_counts(challenge_ids: List[int]) -> Dict[int, List[tuple]]:
+    """(progress percentage, participant count) pairs per challenge, in one grouped query"""
+    rows = db.session.execute(
+        select(
+            ChallengeParticipant.challenge_id,
+            Challenge.target_value,
+            ChallengeParticipant.current_value,
+            func.count(ChallengeParticipant.id)
+        ).join(
+            Challenge, Challenge.id == ChallengeParticipant.challenge_id
+        ).where(
+            ChallengeParticipant.challenge_id.in_(challenge_ids)
+        ).group_by(
+            ChallengeParticipant.challenge_id, Challenge.target_value, ChallengeParticipant.current_value
+        )
+    )
+    progress_counts = {}
+    for challenge_id, target, value, count in rows:
+        progress_counts.setdefault(challenge_id, []).append((ChallengeStats.progress_of(value, target), count))
+    return progress_counts
+
+
+def reconcile_chunk(challenge_ids: List[int]) -> int:
+    """Rebuild the chunk's stats, returning how many rows were corrected or created"""
+    progress_counts = load_progress_counts(challenge_ids)
+    existing = {
+        stats.challenge_id: stats
+        for stats in ChallengeStats.query.filter(ChallengeStats.challenge_id.in_(challenge_ids)).with_for_update()
+    }
+
+    corrected = 0
+    for challenge_id in challenge_ids:
+        stats = existing.get(challenge_id)
+        if stats is None:
+            stats = ChallengeStats(challenge_id=challenge_id)
+            db.session.add(stats)
+            before = None
+        else:
+            before = _snapshot(stats)
+        stats.rebuild(progress_counts.get(challenge_id, []))
+        if _snapshot(stats) != before:
+            corrected += 1
+    return corrected
+
+
+def reconcile_challenge_stats(chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Recompute stats for every challenge, committing per chunk.
+    Returns the number of stats rows that were corrected or created.
+    """
+    last_id = 0
+    total = 0
+    while True:
+        challenge_ids = db.session.scalars(
+            select(Challenge.id).where(Challenge.id > last_id).order_by(Challenge.id).limit(chunk_size)
+        ).all()
+        if not challenge_ids:
+            break
+        try:
+            total += reconcile_chunk(challenge_ids)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error reconciling stats for challenges {challenge_ids[0]}-{challenge_ids[-1]}: {str(e)}")
+        last_id = challenge_ids[-1]
+
+    if total:
+        logging.info(f"Corrected stats for {total} challenges")
+    return total
@@ -0,0 +1,181 @@
+"""
+Chart Rendering Pool for FitFuel
+Charts are rendered to PNG in a small pool of worker processes that import
+matplotlib once at start-up, so web workers never import or run it and
+pyplot's global state never meets request threads. Submissions are bounded:
+when every slot is taken, or a render overruns its timeout, callers get
+ChartUnavailable and should answer 503 rather than queue more work
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+DEFAULT_WORKERS = 2
+
+# Renders running or waiting per web worker before new ones are refused
+DEFAULT_MAX_PENDING = 8
+
+# Seconds a request waits for its chart
+DEFAULT_TIMEOUT = 5.0
+
+# Seconds clients are told to wait before retrying a refused render
+RETRY_AFTER = 5
+
+# Workers start from a clean interpreter rather than a fork of a threaded web
+# worker. They re-import the main module, so the pool is only enabled under an
+# entry point whose start-up sits behind `if __name__ == '__main__'` (gunicorn's)
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+BarChart = namedtuple(
+    'BarChart', ['labels', 'values', 'title', 'ylabel', 'color', 'size', 'dpi'],
+    defaults=('#4f46e5', (5, 3), 100)
+)
+
+
+class ChartUnavailable(Exception):
+    """The pool could not render a chart in time"""
+
+
+class ChartPoolBusy(ChartUnavailable):
+    """Every render slot is taken"""
+
+
+class ChartRenderTimeout(ChartUnavailable):
+    """The render did not finish within the timeout"""
+
+
+def _warm_worker():
+    """Pool initializer: pay matplotlib's import once per worker process"""
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: F401
+    from matplotlib.figure import Figure  # noqa: F401
+
+
+def _ping():
+    return os.getpid()
+
+
+def _render_bar_chart(spec: BarChart, figure):
+    ax = figure.subplots()
+    ax.bar(list(spec.labels), list(spec.values), color=spec.color)
+    ax.set_ylabel(spec.ylabel, fontsize=10)
+    ax.set_title(spec.title, fontsize=12)
+    ax.tick_params(axis='both', which='major', labelsize=8)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+
+
+RENDERERS = {
+    'BarChart': _render_bar_chart
+}
+
+
+def render_chart(spec) -> bytes:
+    """PNG bytes for a chart spec; runs in a pool worker"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    # Figure objects rather than pyplot, so no global figure state is kept
+    figure = Figure(figsize=spec.size)
+    FigureCanvasAgg(figure)
+    RENDERERS[type(spec).__name__](spec, figure)
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png', dpi=spec.dpi)
+    return buffer.getvalue()
+
+
+class ChartPool:
+    """Process pool with a bounded number of outstanding renders"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def start(self):
+        """Start the worker processes and wait until each has imported matplotlib"""
+        with self._lock:
+            executor = self._ensure_executor()
+        for future in [executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        # A forked web worker must not reuse its parent's pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=_warm_worker
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def render(self, spec) -> bytes:
+        """PNG bytes for `spec`, raising ChartUnavailable instead of waiting behind a backlog"""
+        if not self._slots.acquire(blocking=False):
+            raise ChartPoolBusy(f"{self.max_pending} charts already pending")
+        try:
+            with self._lock:
+                future = self._ensure_executor().submit(render_chart, spec)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the worker is actually done, even after a timeout
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise ChartRenderTimeout(f"Chart render exceeded {self.timeout}s")
+        except BrokenProcessPool as e:
+            logging.error(f"Chart worker died, restarting the pool: {str(e)}")
+            with self._lock:
+                self._executor = None
+            raise ChartUnavailable("Chart worker died")
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+chart_pool = ChartPool()
+
+
+def init_chart_pool(app):
+    global chart_pool
+
+    if not app.config.get('CHART_POOL_ENABLED'):
+        return
+    chart_pool = ChartPool(
+        workers=app.config.get('CHART_POOL_WORKERS', DEFAULT_WORKERS),
+        max_pending=app.config.get('CHART_POOL_MAX_PENDING', DEFAULT_MAX_PENDING),
+        timeout=app.config.get('CHART_RENDER_TIMEOUT', DEFAULT_TIMEOUT)
+    )
+    # Start the workers in the background so app start-up doesn't wait on matplotlib
+    threading.Thread(target=_start_pool, args=(chart_pool,), daemon=True).start()
+
+
+def _start_pool(pool: ChartPool):
+    try:
+        pool.start()
+    except Exception as e:
+        logging.error(f"Error starting chart rendering pool: {str(e)}")
+
+
+def render_chart_png(spec) -> bytes:
+    return chart_pool.render(spec)
@@ -0,0 +1,254 @@
+"""
+Email Dispatch for FitFuel
+Outgoing mail is written to the email_outbox table and delivered by a small,
+fixed pool of worker threads. Each worker claims a batch of due messages and
+sends them over one SMTP connection, which it keeps open while there is work
+and closes after it has been idle for a while. Failed messages are retried
+with exponential backoff; permanent (5xx) rejections and messages out of
+attempts are marked failed. Claims are leases, so messages held by a process
+that died are picked up again, and delivery is at least once
+"""
+
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+from flask_mail import Message
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models import EmailOutbox
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+
+DEFAULT_WORKERS = 2
+
+# Messages claimed and sent per connection round
+DEFAULT_BATCH_SIZE = 20
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Seconds before the first retry; doubles per attempt up to MAX_RETRY_DELAY
+DEFAULT_RETRY_DELAY = 30
+MAX_RETRY_DELAY = 60 * 60
+
+# Seconds a worker keeps an unused SMTP connection open
+DEFAULT_IDLE_TIMEOUT = 30
+
+# Seconds an idle worker waits, unless woken, before looking for due retries
+DEFAULT_POLL_INTERVAL = 30
+
+# Seconds a claimed batch is reserved for its worker
+CLAIM_LEASE = 5 * 60
+
+# Sent messages kept this long for reference
+SENT_RETENTION = timedelta(days=30)
+
+# session.info flag: the open transaction has queued mail
+QUEUED_MAIL_KEY = 'email_outbox_queued'
+
+
+def retry_delay(attempts: int, base: float = DEFAULT_RETRY_DELAY) -> float:
+    """Backoff before the next try of a message that has failed `attempts` times"""
+    return min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies won't succeed on retry; everything else (4xx, network) might"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+    else:
+        codes = [getattr(error, 'smtp_code', None)]
+    return bool(codes) and all(isinstance(code, int) and 500 <= code < 600 for code in codes)
+
+
+def enqueue_email(subject: str, sender: str, recipients: List[str], html: Optional[str] = None,
+                  body: Optional[str] = None) -> EmailOutbox:
+    """
+    Add a message to the outbox in the caller's transaction. Nothing is committed
+    here; the dispatcher is woken once the caller commits, and the message is
+    dropped if it rolls back.
+    """
+    message = EmailOutbox(subject=subject, sender=sender, recipients=list(recipients), html=html, body=body)
+    db.session.add(message)
+    db.session.flush()
+    db.session.info[QUEUED_MAIL_KEY] = True
+    return message
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_for_committed_mail(session):
+    if session.info.pop(QUEUED_MAIL_KEY, False) and dispatcher is not None:
+        dispatcher.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_queued_mail(session):
+    session.info.pop(QUEUED_MAIL_KEY, None)
+
+
+def claim_due(worker_id: str, limit: int, now: Optional[datetime] = None) -> List[EmailOutbox]:
+    """Lease up to `limit` due messages to a worker; safe to run from several processes"""
+    now = now or datetime.utcnow()
+    due = or_(
+        and_(EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == SENDING, EmailOutbox.lease_expires_at < now)
+    )
+    ids = db.session.scalars(
+        select(EmailOutbox.id).where(due).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(limit)
+    ).all()
+    if not ids:
+        return []
+    # Re-checking `due` in the UPDATE leaves rows another worker took in the meantime alone
+    db.session.execute(
+        update(EmailOutbox).where(EmailOutbox.id.in_(ids), due).values(
+            status=SENDING, claimed_by=worker_id, lease_expires_at=now + timedelta(seconds=CLAIM_LEASE)
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return db.session.scalars(
+        select(EmailOutbox).where(EmailOutbox.claimed_by == worker_id, EmailOutbox.status == SENDING)
+        .order_by(EmailOutbox.id)
+    ).all()
+
+
+def purge_sent(now: Optional[datetime] = None) -> int:
+    """Delete sent messages older than SENT_RETENTION"""
+    cutoff = (now or datetime.utcnow()) - SENT_RETENTION
+    result = db.session.execute(delete(EmailOutbox).where(EmailOutbox.status == SENT, EmailOutbox.sent_at < cutoff))
+    db.session.commit()
+    return result.rowcount
+
+
+class EmailDispatcher:
+    """Fixed pool of threads delivering the outbox, started on first use"""
+
+    def __init__(self, app, mail, workers: int = DEFAULT_WORKERS, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, retry_base: float = DEFAULT_RETRY_DELAY,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.app = app
+        self.mail = mail
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def wake(self):
+        """Start the workers if needed and have an idle one look for mail now"""
+        with self._lock:
+            if not self._threads:
+                self._stop.clear()
+                self._threads = [
+                    threading.Thread(target=self._work, name=f'email-dispatch-{i}', daemon=True)
+                    for i in range(self.workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the workers after their current batch; unsent mail stays in the outbox"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stop.set()
+        self._wake.set()
+        for thread in threads:
+            thread.join(timeout)
+
+    def _work(self):
+        worker_id = uuid.uuid4().hex
+        connection = None
+        last_used = time.monotonic()
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    batch = claim_due(worker_id, self.batch_size)
+                    if batch:
+                        connection = self._deliver(batch, connection)
+                        last_used = time.monotonic()
+                        continue
+                except Exception as e:
+                    logging.error(f"Error dispatching email: {str(e)}")
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+                if connection is not None and time.monotonic() - last_used >= self.idle_timeout:
+                    connection = self._close(connection)
+                self._wake.wait(min(self.poll_interval, self.idle_timeout) if connection else self.poll_interval)
+                self._wake.clear()
+            self._close(connection)
+
+    def _deliver(self, batch: List[EmailOutbox], connection):
+        """Send a claimed batch over one connection, reconnecting after a failure; returns the connection"""
+        for message in batch:
+            try:
+                if connection is None:
+                    # Opening the context connects (and logs in) without closing afterwards
+                    connection = self.mail.connect().__enter__()
+                connection.send(Message(
+                    message.subject, sender=message.sender, recipients=message.recipients,
+                    html=message.html, body=message.body
+                ))
+            except Exception as e:
+                connection = self._close(connection)
+                self._record_failure(message, e)
+            else:
+                message.status = SENT
+                message.sent_at = datetime.utcnow()
+                message.claimed_by = None
+                message.last_error = None
+            message.attempts += 1
+            db.session.commit()
+        return connection
+
+    def _record_failure(self, message: EmailOutbox, error: Exception):
+        attempts = message.attempts + 1
+        message.last_error = str(error)
+        message.claimed_by = None
+        if _is_permanent(error) or attempts >= self.max_attempts:
+            logging.error(f"Giving up on email {message.id} after {attempts} attempts: {str(error)}")
+            message.status = FAILED
+        else:
+            message.status = PENDING
+            message.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(attempts, self.retry_base))
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None and connection.host is not None:
+            try:
+                connection.host.quit()
+            except smtplib.SMTPException:
+                connection.host.close()
+            except OSError:
+                pass
+        return None
+
+
+dispatcher: Optional[EmailDispatcher] = None
+
+
+def init_email_dispatcher(app, mail):
+    global dispatcher
+
+    dispatcher = EmailDispatcher(
+        app, mail,
+        workers=app.config.get('MAIL_WORKERS', DEFAULT_WORKERS),
+        batch_size=app.config.get('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        max_attempts=app.config.get('MAIL_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+        retry_base=app.config.get('MAIL_RETRY_DELAY', DEFAULT_RETRY_DELAY),
+        idle_timeout=app.config.get('MAIL_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT)
+    )
@@ -1,28 +1,17 @@
 from flask import current_app, render_template_string
-from flask_mail import Mail, Message
-from threading import Thread
+from flask_mail import Mail
+from utils.email_dispatcher import enqueue_email
 
 mail = Mail()
 
-def send_async_email(app, msg):
-    """Send email asynchronously"""
-    with app.app_context():
-        mail.send(msg)
-
 def send_email(subject, recipient, template, **kwargs):
-    """Send an email using a template"""
-    msg = Message(
+    """Send an email using a template; it is queued in the outbox and sent once the caller commits"""
+    return enqueue_email(
         subject,
-        sender=current_app.config['MAIL_DEFAULT_SENDER'],
-        recipients=[recipient]
+        current_app.config['MAIL_DEFAULT_SENDER'],
+        [recipient],
+        html=render_template_string(template, **kwargs)
     )
-    msg.html = render_template_string(template, **kwargs)
-    
-    # Send email asynchronously
-    Thread(
-        target=send_async_email,
-        args=(current_app._get_current_object(), msg)
-    ).start()
 
 def send_welcome_email(trainer):
     """Send welcome email to new trainer"""
@@ -0,0 +1,142 @@
+"""
+Ingredient Classifier for FitFuel
+Compiles the allergen and diet keyword tables into a single Aho-Corasick
+automaton so an ingredient name is classified against every category in one pass
+"""
+
+from collections import deque, namedtuple
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+# Allergen -> keywords that indicate it (matched as substrings of the ingredient name)
+ALLERGEN_KEYWORDS = {
+    'milk': ['milk', 'dairy', 'cheese', 'yogurt', 'cream', 'butter', 'whey'],
+    'eggs': ['egg', 'eggs', 'mayonnaise'],
+    'fish': ['fish', 'salmon', 'tuna', 'cod', 'tilapia'],
+    'shellfish': ['shrimp', 'crab', 'lobster', 'shellfish'],
+    'tree_nuts': ['almond', 'cashew', 'walnut', 'pecan', 'pistachio'],
+    'peanuts': ['peanut', 'peanuts'],
+    'wheat': ['wheat', 'flour', 'bread', 'pasta'],
+    'soy': ['soy', 'tofu', 'edamame']
+}
+
+NON_VEGETARIAN = ['chicken', 'beef', 'pork', 'fish', 'meat', 'gelatin']
+
+# Diet -> keywords that rule an ingredient out of it
+DIET_EXCLUSION_KEYWORDS = {
+    'vegetarian': NON_VEGETARIAN,
+    'vegan': NON_VEGETARIAN + ['milk', 'cheese', 'egg', 'honey', 'yogurt'],
+    'gluten_free': ['wheat', 'barley', 'rye', 'flour', 'pasta', 'bread'],
+    'dairy_free': ['milk', 'cheese', 'cream', 'yogurt', 'butter'],
+    'paleo': ['processed']
+}
+
+IngredientClass = namedtuple('IngredientClass', ['allergens', 'excluded_diets'])
+
+EMPTY_CLASS = IngredientClass(frozenset(), frozenset())
+
+ALLERGEN = 'allergen'
+DIET = 'diet'
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern substring matcher (Aho-Corasick).
+    Each keyword carries one or more labels; match() returns the labels of every
+    keyword occurring anywhere in the text, including overlapping occurrences.
+    """
+
+    def __init__(self, keyword_labels: Dict[str, Iterable]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet] = [frozenset()]
+
+        outputs = [set()]
+        for keyword, labels in keyword_labels.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].update(labels)
+
+        # Breadth-first pass to wire failure links and merge their outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                outputs[next_state].update(outputs[self._fail[next_state]])
+
+        self._output = [frozenset(labels) for labels in outputs]
+
+    def match(self, text: str) -> FrozenSet:
+        """Return the labels of all keywords found in text"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return frozenset(found)
+
+
+def _build_keyword_labels() -> Dict[str, List[Tuple[str, str]]]:
+    keyword_labels = {}
+    for allergen, keywords in ALLERGEN_KEYWORDS.items():
+        for keyword in keywords:
+            keyword_labels.setdefault(keyword, []).append((ALLERGEN, allergen))
+    for diet, keywords in DIET_EXCLUSION_KEYWORDS.items():
+        for keyword in keywords:
+            keyword_labels.setdefault(keyword, []).append((DIET, diet))
+    return keyword_labels
+
+
+_matcher = KeywordMatcher(_build_keyword_labels())
+
+
+def normalize_ingredient_name(name: str) -> str:
+    """Normalize an ingredient name for matching and memoization"""
+    return ' '.join((name or '').lower().split())
+
+
+@lru_cache(maxsize=65536)
+def _classify_normalized(name: str) -> IngredientClass:
+    labels = _matcher.match(name)
+    if not labels:
+        return EMPTY_CLASS
+    return IngredientClass(
+        allergens=frozenset(value for kind, value in labels if kind == ALLERGEN),
+        excluded_diets=frozenset(value for kind, value in labels if kind == DIET)
+    )
+
+
+def classify_ingredient(name: str) -> IngredientClass:
+    """Classify an ingredient name against every allergen and diet table in one pass"""
+    return _classify_normalized(normalize_ingredient_name(name))
+
+
+def classify_ingredients(names: Iterable[str]) -> IngredientClass:
+    """Combined classification for a list of ingredient names (e.g. a recipe)"""
+    allergens = set()
+    excluded_diets = set()
+    for name in names:
+        ingredient_class = classify_ingredient(name)
+        allergens.update(ingredient_class.allergens)
+        excluded_diets.update(ingredient_class.excluded_diets)
+    return IngredientClass(frozenset(allergens), frozenset(excluded_diets))
@@ -0,0 +1,524 @@
+"""
+Leaderboard Ranking Engine for FitFuel
+Keeps an ordered index of leaderboard entries per category so rank lookups and
+top-K reads are O(log N), and writes rank changes back to the database lazily
+in batches instead of rewriting every row on each point change.
+Ranks follow SQL RANK() semantics (ties share a rank), matching the window
+function queries in utils.leaderboard_queries
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sortedcontainers import SortedList
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models import LeaderboardEntry
+
+try:
+    import redis
+except ImportError:  # Redis backend is optional
+    redis = None
+
+# Full reload interval for the in-process backend, picks up point changes
+# committed by other worker processes
+RELOAD_INTERVAL = 300
+
+# How often (seconds) the scheduler persists pending rank changes
+FLUSH_INTERVAL = 30
+
+RankChange = Tuple[int, int]  # (entry id, rank)
+
+
+def _rank_changes(rows: Iterable[Tuple[int, int]], start: int, above, persisted) -> List[RankChange]:
+    """
+    RANK() values for consecutive (entry id, points) rows beginning at position
+    `start`, keeping only those that differ from the persisted rank
+    """
+    changes = []
+    rank = previous = None
+    for position, (entry_id, points) in enumerate(rows, start):
+        if rank is None:
+            rank = above(points) + 1
+        elif points != previous:
+            rank = position + 1
+        previous = points
+        if persisted(entry_id) != rank:
+            changes.append((entry_id, rank))
+    return changes
+
+
+class DirtyRanges:
+    """Per-category [low, high] span of rank positions that may have changed"""
+
+    def __init__(self):
+        self._ranges: Dict[str, Tuple[int, int]] = {}
+
+    def mark(self, category: str, low: int, high: int):
+        current = self._ranges.get(category)
+        if current:
+            low, high = min(low, current[0]), max(high, current[1])
+        self._ranges[category] = (low, high)
+
+    def pop(self, category: str) -> Optional[Tuple[int, int]]:
+        return self._ranges.pop(category, None)
+
+    def categories(self) -> List[str]:
+        return list(self._ranges)
+
+
+class _CategoryIndex:
+    """Entries of one category ordered by (-points, entry id)"""
+
+    def __init__(self):
+        self.order = SortedList()
+        self.entries: Dict[int, Tuple[int, int]] = {}  # entry id -> (client id, points)
+        self.by_client: Dict[int, int] = {}  # client id -> their most recently set entry id
+        self.persisted: Dict[int, Optional[int]] = {}  # entry id -> rank stored in the database
+
+    @staticmethod
+    def key(entry_id: int, points: int) -> Tuple[int, int]:
+        return (-(points or 0), entry_id)
+
+    def above(self, points: int) -> int:
+        """Number of entries with strictly more points"""
+        return self.order.bisect_left((-points, 0))
+
+    def at_or_above(self, points: int) -> int:
+        """Number of entries with at least `points`"""
+        return self.order.bisect_right((-points, float('inf')))
+
+    def remove(self, entry_id: int) -> Optional[int]:
+        """Drop an entry, returning its former points"""
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return None
+        client_id, points = entry
+        self.order.remove(self.key(entry_id, points))
+        if self.by_client.get(client_id) == entry_id:
+            del self.by_client[client_id]
+        self.persisted.pop(entry_id, None)
+        return points
+
+    def set(self, entry_id: int, client_id: int, points: int) -> Optional[int]:
+        """Insert or move an entry, returning its former points (None when new)"""
+        persisted = self.persisted.get(entry_id)
+        old_points = self.remove(entry_id)
+        self.order.add(self.key(entry_id, points))
+        self.entries[entry_id] = (client_id, points or 0)
+        self.by_client[client_id] = entry_id
+        self.persisted[entry_id] = persisted
+        return old_points
+
+
+class MemoryRankingIndex:
+    """In-process ranking index backed by sortedcontainers.SortedList"""
+
+    def __init__(self, reload_interval: int = RELOAD_INTERVAL):
+        self.reload_interval = reload_interval
+        self._lock = threading.RLock()
+        self._categories: Dict[str, _CategoryIndex] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._dirty = DirtyRanges()
+
+    def load(self, category: str, rows: Iterable[Tuple[int, int, int, Optional[int]]]):
+        """Replace a category from (entry id, client id, points, stored rank) rows"""
+        index = _CategoryIndex()
+        keys = []
+        for entry_id, client_id, points, rank in rows:
+            keys.append(index.key(entry_id, points))
+            index.entries[entry_id] = (client_id, points or 0)
+            index.by_client[client_id] = entry_id
+            index.persisted[entry_id] = rank
+        index.order.update(keys)
+
+        with self._lock:
+            self._categories[category] = index
+            self._loaded_at[category] = time.monotonic()
+            if len(index.order):
+                # Stored ranks are only trusted after one comparison pass
+                self._dirty.mark(category, 0, len(index.order) - 1)
+
+    def clear(self):
+        with self._lock:
+            self._categories = {}
+            self._loaded_at = {}
+            self._dirty = DirtyRanges()
+
+    def is_loaded(self, category: str) -> bool:
+        with self._lock:
+            loaded_at = self._loaded_at.get(category)
+            return loaded_at is not None and time.monotonic() - loaded_at <= self.reload_interval
+
+    def set_points(self, category: str, entry_id: int, client_id: int, points: int):
+        with self._lock:
+            index = self._categories.get(category)
+            if index is None:
+                return
+            points = points or 0
+            old_points = index.set(entry_id, client_id, points)
+            if old_points is None:
+                # Everything scoring less than a new entry moves down one rank
+                self._dirty.mark(category, index.above(points), len(index.order) - 1)
+            else:
+                # Ranks change for the mover and every entry scoring in [lower, higher)
+                lower, higher = sorted((old_points, points))
+                self._dirty.mark(category, index.above(higher), index.at_or_above(lower) - 1)
+
+    def remove(self, category: str, entry_id: int):
+        with self._lock:
+            index = self._categories.get(category)
+            if index is None:
+                return
+            points = index.remove(entry_id)
+            if points is None:
+                return
+            position = index.above(points)
+            if position < len(index.order):
+                self._dirty.mark(category, position, len(index.order) - 1)
+
+    def rank(self, category: str, client_id: int) -> Optional[int]:
+        """1-based rank of a client's entry, O(log N)"""
+        with self._lock:
+            index = self._categories.get(category)
+            entry_id = index.by_client.get(client_id) if index else None
+            if entry_id is None:
+                return None
+            _, points = index.entries[entry_id]
+            return index.above(points) + 1
+
+    def top(self, category: str, limit: int) -> List[Tuple[int, int, int]]:
+        """(entry id, client id, points) of the top `limit` entries"""
+        with self._lock:
+            index = self._categories.get(category)
+            if index is None:
+                return []
+            return [
+                (entry_id, *index.entries[entry_id])
+                for _, entry_id in index.order.islice(0, limit)
+            ]
+
+    def dirty_categories(self) -> List[str]:
+        with self._lock:
+            return self._dirty.categories()
+
+    def pending_rank_changes(self, category: str) -> List[RankChange]:
+        """Entries in the dirty span whose rank differs from the stored one"""
+        with self._lock:
+            index = self._categories.get(category)
+            span = self._dirty.pop(category)
+            if index is None or span is None:
+                return []
+            low, high = span[0], min(span[1], len(index.order) - 1)
+            return _rank_changes(
+                ((entry_id, -negated) for negated, entry_id in index.order.islice(low, high + 1)),
+                low, index.above, index.persisted.get
+            )
+
+    def mark_persisted(self, category: str, changes: List[RankChange]):
+        with self._lock:
+            index = self._categories.get(category)
+            if index is None:
+                return
+            for entry_id, rank in changes:
+                if entry_id in index.entries:
+                    index.persisted[entry_id] = rank
+
+    def restore_dirty(self, category: str, changes: List[RankChange]):
+        """Re-mark positions whose write failed so the next flush retries them"""
+        if changes:
+            with self._lock:
+                index = self._categories.get(category)
+                if index is not None and len(index.order):
+                    # A tie group can sit past its rank, so retry through to the end
+                    self._dirty.mark(category, min(rank for _, rank in changes) - 1, len(index.order) - 1)
+
+
+class RedisRankingIndex:
+    """
+    Ranking index kept in Redis sorted sets, shared by every worker process.
+    Scores are negated points so ZRANK order matches (-points, entry id) with
+    zero-padded entry ids as members.
+    """
+
+    def __init__(self, client, prefix: str = 'leaderboard'):
+        self.redis = client
+        self.prefix = prefix
+        self._lock = threading.RLock()
+        self._dirty = DirtyRanges()
+
+    def _keys(self, category: str):
+        base = f"{self.prefix}:{category}"
+        return base, f"{base}:clients", f"{base}:entries", f"{base}:persisted"
+
+    @staticmethod
+    def _member(entry_id: int) -> str:
+        return f"{entry_id:012d}"
+
+    def load(self, category: str, rows: Iterable[Tuple[int, int, int, Optional[int]]]):
+        ranking, clients, entries, persisted = self._keys(category)
+        pipe = self.redis.pipeline()
+        pipe.delete(ranking, clients, entries, persisted)
+        count = 0
+        for entry_id, client_id, points, rank in rows:
+            member = self._member(entry_id)
+            pipe.zadd(ranking, {member: -(points or 0)})
+            pipe.hset(clients, client_id, entry_id)
+            pipe.hset(entries, member, client_id)
+            if rank is not None:
+                pipe.hset(persisted, member, rank)
+            count += 1
+        pipe.execute()
+        if count:
+            with self._lock:
+                self._dirty.mark(category, 0, count - 1)
+
+    def clear(self):
+        keys = list(self.redis.scan_iter(f"{self.prefix}:*"))
+        if keys:
+            self.redis.delete(*keys)
+        with self._lock:
+            self._dirty = DirtyRanges()
+
+    def is_loaded(self, category: str) -> bool:
+        return bool(self.redis.exists(self._keys(category)[0]))
+
+    def _above(self, ranking: str, points) -> int:
+        """Number of members with strictly more points"""
+        return self.redis.zcount(ranking, '-inf', f"({-points}")
+
+    def _at_or_above(self, ranking: str, points) -> int:
+        return self.redis.zcount(ranking, '-inf', -points)
+
+    def set_points(self, category: str, entry_id: int, client_id: int, points: int):
+        ranking, clients, entries, _ = self._keys(category)
+        member = self._member(entry_id)
+        points = points or 0
+        old_score = self.redis.zscore(ranking, member)
+        pipe = self.redis.pipeline()
+        pipe.zadd(ranking, {member: -points})
+        pipe.hset(clients, client_id, entry_id)
+        pipe.hset(entries, member, client_id)
+        pipe.zcard(ranking)
+        size = pipe.execute()[-1]
+        if old_score is None:
+            low, high = self._above(ranking, points), size - 1
+        else:
+            lower, higher = sorted((int(-old_score), points))
+            low, high = self._above(ranking, higher), self._at_or_above(ranking, lower) - 1
+        with self._lock:
+            self._dirty.mark(category, low, high)
+
+    def remove(self, category: str, entry_id: int):
+        ranking, clients, entries, persisted = self._keys(category)
+        member = self._member(entry_id)
+        score = self.redis.zscore(ranking, member)
+        if score is None:
+            return
+        client_id = self.redis.hget(entries, member)
+        pipe = self.redis.pipeline()
+        pipe.zrem(ranking, member)
+        pipe.hdel(entries, member)
+        pipe.hdel(persisted, member)
+        pipe.zcard(ranking)
+        size = pipe.execute()[-1]
+        if client_id is not None and self.redis.hget(clients, client_id) == str(entry_id).encode():
+            self.redis.hdel(clients, client_id)
+        position = self._above(ranking, int(-score))
+        if position < size:
+            with self._lock:
+                self._dirty.mark(category, position, size - 1)
+
+    def rank(self, category: str, client_id: int) -> Optional[int]:
+        ranking, clients, _, _ = self._keys(category)
+        entry_id = self.redis.hget(clients, client_id)
+        if entry_id is None:
+            return None
+        score = self.redis.zscore(ranking, self._member(int(entry_id)))
+        return None if score is None else self._above(ranking, int(-score)) + 1
+
+    def top(self, category: str, limit: int) -> List[Tuple[int, int, int]]:
+        ranking, _, entries, _ = self._keys(category)
+        rows = self.redis.zrange(ranking, 0, limit - 1, withscores=True)
+        if not rows:
+            return []
+        client_ids = self.redis.hmget(entries, [member for member, _ in rows])
+        return [
+            (int(member), int(client_id), int(-score))
+            for (member, score), client_id in zip(rows, client_ids)
+        ]
+
+    def dirty_categories(self) -> List[str]:
+        with self._lock:
+            return self._dirty.categories()
+
+    def pending_rank_changes(self, category: str) -> List[RankChange]:
+        ranking, _, _, persisted = self._keys(category)
+        with self._lock:
+            span = self._dirty.pop(category)
+        if span is None:
+            return []
+        rows = self.redis.zrange(ranking, span[0], span[1], withscores=True)
+        if not rows:
+            return []
+        stored = dict(zip(
+            (int(member) for member, _ in rows),
+            self.redis.hmget(persisted, [member for member, _ in rows])
+        ))
+        return _rank_changes(
+            ((int(member), int(-score)) for member, score in rows),
+            span[0], lambda points: self._above(ranking, points),
+            lambda entry_id: None if stored[entry_id] is None else int(stored[entry_id])
+        )
+
+    def mark_persisted(self, category: str, changes: List[RankChange]):
+        if changes:
+            self.redis.hset(self._keys(category)[3], mapping={
+                self._member(entry_id): rank for entry_id, rank in changes
+            })
+
+    def restore_dirty(self, category: str, changes: List[RankChange]):
+        if changes:
+            size = self.redis.zcard(self._keys(category)[0])
+            if size:
+                with self._lock:
+                    self._dirty.mark(category, min(rank for _, rank in changes) - 1, size - 1)
+
+
+ranking_index = MemoryRankingIndex()
+
+
+def init_leaderboard(app):
+    """Use the Redis backend when LEADERBOARD_REDIS_URL is configured and redis is installed"""
+    global ranking_index
+
+    url = app.config.get('LEADERBOARD_REDIS_URL')
+    if not url:
+        return
+    if redis is None:
+        logging.error("LEADERBOARD_REDIS_URL is set but the redis package is not installed")
+        return
+    ranking_index = RedisRankingIndex(redis.Redis.from_url(url))
+    logging.info("Leaderboard rankings use Redis sorted sets")
+
+
+def reset_rankings():
+    """Drop every cached category; they are reloaded from the database on next use"""
+    ranking_index.clear()
+
+
+def load_category(category: str):
+    """(Re)load a category's entries from the database into the index"""
+    rows = db.session.query(
+        LeaderboardEntry.id, LeaderboardEntry.client_id,
+        LeaderboardEntry.points, LeaderboardEntry.rank
+    ).filter(LeaderboardEntry.category == category)
+    ranking_index.load(category, rows)
+
+
+def ensure_loaded(category: str):
+    if not ranking_index.is_loaded(category):
+        load_category(category)
+
+
+def get_rank(category: str, client_id: int) -> Optional[int]:
+    """Current rank of a client in a category"""
+    ensure_loaded(category)
+    return ranking_index.rank(category, client_id)
+
+
+def get_top(category: str, limit: int = 10) -> List[Dict]:
+    """Top entries of a category as dicts with rank, entry and client ids and points"""
+    ensure_loaded(category)
+    rows = []
+    for position, (entry_id, client_id, points) in enumerate(ranking_index.top(category, limit), 1):
+        rank = rows[-1]['rank'] if rows and rows[-1]['points'] == points else position
+        rows.append({'rank': rank, 'entry_id': entry_id, 'client_id': client_id, 'points': points})
+    return rows
+
+
+def flush_rank_changes(category: Optional[str] = None) -> int:
+    """Persist pending rank changes with one bulk UPDATE per category"""
+    categories = [category] if category else ranking_index.dirty_categories()
+    written = 0
+    for name in categories:
+        changes = ranking_index.pending_rank_changes(name)
+        if not changes:
+            continue
+        now = datetime.utcnow()
+        try:
+            db.session.execute(update(LeaderboardEntry), [
+                {'id': entry_id, 'rank': rank, 'last_updated': now}
+                for entry_id, rank in changes
+            ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            ranking_index.restore_dirty(name, changes)
+            logging.error(f"Error persisting leaderboard ranks for {name}: {str(e)}")
+            continue
+        ranking_index.mark_persisted(name, changes)
+        written += len(changes)
+    return written
+
+
+def rebuild_rankings(category: str) -> int:
+    """Reload a category from the database and persist every rank that differs"""
+    load_category(category)
+    return flush_rank_changes(category)
+
+
+def run_rank_flush(app):
+    """Scheduler job: persist pending rank changes"""
+    with app.app_context():
+        try:
+            written = flush_rank_changes()
+            if written:
+                logging.info(f"Persisted {written} leaderboard rank changes")
+
+        except Exception as e:
+            logging.error(f"Error flushing leaderboard ranks: {str(e)}")
+
+
+PENDING_POINTS_KEY = 'leaderboard_pending_points'
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_point_changes(session, flush_context):
+    """Remember entry point changes until the transaction commits"""
+    pending = session.info.setdefault(PENDING_POINTS_KEY, {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, LeaderboardEntry) and obj not in session.deleted:
+            state = inspect(obj)
+            if obj in session.new or any(
+                state.attrs[key].history.has_changes() for key in ('points', 'category', 'client_id')
+            ):
+                history = state.attrs.category.history
+                old_category = history.deleted[0] if history.deleted else None
+                pending[obj.id] = (obj.category, obj.client_id, obj.points, old_category)
+    for obj in session.deleted:
+        if isinstance(obj, LeaderboardEntry):
+            pending[obj.id] = (None, obj.client_id, None, obj.category)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_committed_points(session):
+    pending = session.info.pop(PENDING_POINTS_KEY, None)
+    if not pending:
+        return
+    for entry_id, (category, client_id, points, old_category) in pending.items():
+        try:
+            if old_category and old_category != category:
+                ranking_index.remove(old_category, entry_id)
+            if category:
+                ranking_index.set_points(category, entry_id, client_id, points)
+        except Exception as e:
+            logging.error(f"Error updating leaderboard index: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_point_changes(session):
+    session.info.pop(PENDING_POINTS_KEY, None)
@@ -0,0 +1,282 @@
+"""
+Live Challenge Leaderboards for FitFuel
+Clients subscribe to a challenge room over Socket.IO. Progress changes only mark
+the challenge dirty; a background task wakes every COALESCE_WINDOW seconds,
+recomputes each dirty challenge's standings once and emits just the rows whose
+rank or progress changed.
+Each process pushes to its own sockets, so a commit must reach every process:
+with LEADERBOARD_PUSH_REDIS_URL set, dirty marks are published over Redis to all
+web workers and instances; without it, pushes only work with a single process
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Set
+from flask import request
+from flask_login import current_user
+from flask_socketio import join_room, leave_room
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from extensions import db, socketio
+from models import Challenge, ChallengeParticipant, ChallengeStats, Client
+from utils.leaderboard_queries import challenge_leaderboard
+
+try:
+    import redis
+except ImportError:  # Redis fan-out is optional
+    redis = None
+
+# Seconds of progress changes folded into one broadcast
+COALESCE_WINDOW = 0.5
+
+# Standings pushed per challenge
+LIVE_LEADERBOARD_SIZE = 50
+
+# Redis channel carrying dirty challenge ids to every process
+DIRTY_CHANNEL = 'leaderboard_push:dirty'
+
+Standing = Dict  # {'client_id', 'name', 'rank', 'progress'}
+
+
+def room_name(challenge_id: int) -> str:
+    return f"challenge_{challenge_id}_leaderboard"
+
+
+def load_standings(challenge_id: int, limit: int = LIVE_LEADERBOARD_SIZE) -> List[Standing]:
+    """Top standings with RANK() and progress as a percentage of the challenge target"""
+    target = db.session.scalar(select(Challenge.target_value).where(Challenge.id == challenge_id))
+    ranked = challenge_leaderboard.ranked(challenge_id)
+    rows = db.session.execute(
+        select(ranked.c.client_id, Client.name, ranked.c.rank, ranked.c.score)
+        .join(Client, Client.id == ranked.c.client_id)
+        .order_by(ranked.c.position)
+        .limit(limit)
+    )
+    return [
+        {
+            'client_id': client_id,
+            'name': name,
+            'rank': rank,
+            'progress': ChallengeStats.progress_of(score, target)
+        }
+        for client_id, name, rank, score in rows
+    ]
+
+
+def standings_delta(previous: List[Standing], current: List[Standing]) -> Dict:
+    """Rows that are new or changed rank/progress, and clients that dropped off"""
+    before = {row['client_id']: row for row in previous}
+    changed = [row for row in current if before.get(row['client_id']) != row]
+    current_ids = {row['client_id'] for row in current}
+    removed = [client_id for client_id in before if client_id not in current_ids]
+    return {'changed': changed, 'removed': removed}
+
+
+class LeaderboardBroadcaster:
+    """Tracks subscribed challenges, coalesces change marks and emits rank deltas"""
+
+    def __init__(self, window: float = COALESCE_WINDOW, loader=load_standings):
+        self.window = window
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._dirty: Set[int] = set()
+        self._last: Dict[int, List[Standing]] = {}  # challenge id -> standings last emitted
+        self._subscribers: Dict[int, int] = {}  # challenge id -> subscriber count
+        self._rooms_by_sid: Dict[str, Set[int]] = {}
+        self._app = None
+        self._redis = None
+        self._running = False
+
+    def init_app(self, app, redis_client=None):
+        """Fan dirty marks out through redis_client when given, listening in a background task"""
+        self._app = app
+        self._redis = redis_client
+        if redis_client is not None:
+            socketio.start_background_task(self._listen)
+
+    def subscribe(self, sid: str, challenge_id: int) -> List[Standing]:
+        """Register a subscriber and return the current standings as its snapshot"""
+        with self._lock:
+            rooms = self._rooms_by_sid.setdefault(sid, set())
+            if challenge_id not in rooms:
+                rooms.add(challenge_id)
+                self._subscribers[challenge_id] = self._subscribers.get(challenge_id, 0) + 1
+            snapshot = self._last.get(challenge_id)
+        if snapshot is None:
+            snapshot = self.loader(challenge_id)
+            with self._lock:
+                self._last.setdefault(challenge_id, snapshot)
+        return snapshot
+
+    def unsubscribe(self, sid: str, challenge_id: Optional[int] = None):
+        """Drop one subscription, or all of a disconnected socket's when challenge_id is None"""
+        with self._lock:
+            rooms = self._rooms_by_sid.get(sid, set())
+            for room in [challenge_id] if challenge_id is not None else list(rooms):
+                if room not in rooms:
+                    continue
+                rooms.discard(room)
+                self._subscribers[room] -= 1
+                if self._subscribers[room] <= 0:
+                    del self._subscribers[room]
+                    self._last.pop(room, None)
+                    self._dirty.discard(room)
+            if not rooms:
+                self._rooms_by_sid.pop(sid, None)
+
+    def mark_changed(self, challenge_id: int):
+        """Note a progress change, in every process when Redis fan-out is configured"""
+        if self._redis is not None:
+            try:
+                self._redis.publish(DIRTY_CHANNEL, challenge_id)
+                return
+            except redis.RedisError as e:
+                logging.error(f"Error publishing leaderboard change, pushing locally only: {str(e)}")
+        self._mark_local(challenge_id)
+
+    def _mark_local(self, challenge_id: int):
+        """
+        Mark a challenge dirty in this process. Ignored unless it has subscribers
+        here, so unwatched challenges cost nothing.
+        """
+        with self._lock:
+            if challenge_id not in self._subscribers:
+                return
+            self._dirty.add(challenge_id)
+            start = not self._running and self._app is not None
+            self._running = self._running or start
+        if start:
+            socketio.start_background_task(self._run)
+
+    def flush(self) -> int:
+        """Emit deltas for every dirty challenge, returning the number of emits"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        emitted = 0
+        for challenge_id in dirty:
+            try:
+                current = self.loader(challenge_id)
+            except Exception as e:
+                logging.error(f"Error loading standings for challenge {challenge_id}: {str(e)}")
+                continue
+            with self._lock:
+                if challenge_id not in self._subscribers:
+                    continue
+                previous = self._last.get(challenge_id, [])
+                self._last[challenge_id] = current
+            delta = standings_delta(previous, current)
+            if delta['changed'] or delta['removed']:
+                socketio.emit('leaderboard_delta', {'challenge_id': challenge_id, **delta},
+                              to=room_name(challenge_id))
+                emitted += 1
+        return emitted
+
+    def _listen(self):
+        """Background task: apply dirty marks published by any process, resubscribing after errors"""
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(DIRTY_CHANNEL)
+                for message in pubsub.listen():
+                    self._mark_local(int(message['data']))
+            except Exception as e:
+                logging.error(f"Error receiving leaderboard changes: {str(e)}")
+                socketio.sleep(1)
+
+    def _run(self):
+        """Background task: flush every window until nothing is dirty"""
+        while True:
+            socketio.sleep(self.window)
+            with self._app.app_context():
+                try:
+                    self.flush()
+                except Exception as e:
+                    logging.error(f"Error broadcasting leaderboard updates: {str(e)}")
+                finally:
+                    db.session.remove()
+            with self._lock:
+                if not self._dirty:
+                    self._running = False
+                    return
+
+
+broadcaster = LeaderboardBroadcaster()
+
+
+def init_leaderboard_push(app):
+    """Publish dirty marks over Redis when LEADERBOARD_PUSH_REDIS_URL is configured and redis is installed"""
+    url = app.config.get('LEADERBOARD_PUSH_REDIS_URL')
+    if not url:
+        logging.warning("LEADERBOARD_PUSH_REDIS_URL is not set; live leaderboards only reach sockets "
+                        "connected to the process that committed the change")
+        broadcaster.init_app(app)
+        return
+    if redis is None:
+        logging.error("LEADERBOARD_PUSH_REDIS_URL is set but the redis package is not installed")
+        broadcaster.init_app(app)
+        return
+    broadcaster.init_app(app, redis.Redis.from_url(url))
+
+
+def mark_leaderboard_changed(challenge_id: int):
+    broadcaster.mark_changed(challenge_id)
+
+
+@socketio.on('subscribe_leaderboard')
+def handle_subscribe(data):
+    if not current_user.is_authenticated:
+        return {'success': False, 'message': 'Login required'}
+    try:
+        challenge_id = int((data or {}).get('challenge_id'))
+    except (TypeError, ValueError):
+        return {'success': False, 'message': 'Challenge ID is required'}
+
+    # Same access rule as the challenge page: standings name the participants
+    challenge = db.session.get(Challenge, challenge_id)
+    client = db.session.get(Client, current_user.id)
+    if challenge is None or client is None or not challenge.is_visible_to(client):
+        return {'success': False, 'message': 'Challenge not found'}
+
+    join_room(room_name(challenge_id))
+    standings = broadcaster.subscribe(request.sid, challenge_id)
+    return {'success': True, 'challenge_id': challenge_id, 'standings': standings}
+
+
+@socketio.on('unsubscribe_leaderboard')
+def handle_unsubscribe(data):
+    try:
+        challenge_id = int((data or {}).get('challenge_id'))
+    except (TypeError, ValueError):
+        return
+    leave_room(room_name(challenge_id))
+    broadcaster.unsubscribe(request.sid, challenge_id)
+
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    broadcaster.unsubscribe(request.sid)
+
+
+PENDING_CHALLENGES_KEY = 'leaderboard_push_challenges'
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_progress_changes(session, flush_context):
+    """Remember challenges whose participant progress changed until commit"""
+    pending = session.info.setdefault(PENDING_CHALLENGES_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ChallengeParticipant):
+            state = inspect(obj)
+            if obj in session.new or obj in session.deleted or state.attrs.current_value.history.has_changes():
+                pending.add(obj.challenge_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _push_committed_progress(session):
+    for challenge_id in session.info.pop(PENDING_CHALLENGES_KEY, ()):
+        broadcaster.mark_changed(challenge_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_progress_changes(session):
+    session.info.pop(PENDING_CHALLENGES_KEY, None)
@@ -0,0 +1,123 @@
+"""
+Leaderboard Queries for FitFuel
+Ranks computed on demand with SQL window functions (RANK / ROW_NUMBER), with
+keyset pagination and "around me" slices. Works on SQLite (3.25+) and Postgres;
+the stored LeaderboardEntry.rank column is only a cache of these values
+"""
+
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import and_, func, or_, select
+from extensions import db
+from models import ChallengeParticipant, LeaderboardEntry
+
+# How many places above and below a client "around me" shows
+NEIGHBOUR_RADIUS = 5
+
+DEFAULT_PAGE_SIZE = 50
+
+# entry: the ORM row; rank: RANK() (ties share a rank); position: ROW_NUMBER()
+RankedRow = namedtuple('RankedRow', ['entry', 'rank', 'position'])
+
+# (score, id) of the last row on a page, passed back as `after` for the next page
+Cursor = Tuple[float, int]
+
+
+class RankedQuery:
+    """
+    Window-function ranking over one model: rows are partitioned by
+    partition_column and ordered by score descending, ties broken by id.
+    """
+
+    def __init__(self, model, partition_column, score_column, client_column):
+        self.model = model
+        self.partition_column = partition_column
+        self.score_column = score_column
+        self.score = func.coalesce(score_column, 0)
+        self.client_column = client_column
+
+    def ranked(self, partition_value=None):
+        """Subquery of id, client id, partition, score, rank and position"""
+        order = (self.score.desc(), self.model.id)
+        query = select(
+            self.model.id.label('id'),
+            self.client_column.label('client_id'),
+            self.partition_column.label('partition'),
+            self.score.label('score'),
+            func.rank().over(
+                partition_by=self.partition_column, order_by=self.score.desc()
+            ).label('rank'),
+            func.row_number().over(
+                partition_by=self.partition_column, order_by=order
+            ).label('position')
+        )
+        if partition_value is not None:
+            query = query.where(self.partition_column == partition_value)
+        return query.subquery()
+
+    def _rows(self, ranked, *criteria, limit: Optional[int] = None) -> List[RankedRow]:
+        query = select(self.model, ranked.c.rank, ranked.c.position)\
+            .join(ranked, self.model.id == ranked.c.id)\
+            .where(*criteria)\
+            .order_by(ranked.c.position)
+        if limit is not None:
+            query = query.limit(limit)
+        return [RankedRow(entry, rank, position) for entry, rank, position in db.session.execute(query)]
+
+    def rank_of(self, partition_value, client_id: int) -> Optional[int]:
+        """RANK() of a client within one partition, None when absent"""
+        ranked = self.ranked(partition_value)
+        return db.session.execute(
+            select(func.min(ranked.c.rank)).where(ranked.c.client_id == client_id)
+        ).scalar()
+
+    def ranks_for_client(self, client_id: int) -> Dict:
+        """{partition value: RANK()} for every partition the client appears in"""
+        ranked = self.ranked()
+        rows = db.session.execute(
+            select(ranked.c.partition, func.min(ranked.c.rank))
+            .where(ranked.c.client_id == client_id)
+            .group_by(ranked.c.partition)
+        )
+        return dict(rows.all())
+
+    def page(self, partition_value, limit: int = DEFAULT_PAGE_SIZE,
+             after: Optional[Cursor] = None) -> Tuple[List[RankedRow], Optional[Cursor]]:
+        """
+        One page in rank order plus the cursor for the next page (None on the last page).
+        Keyset on (score, id) so pages stay stable while ranks above them change.
+        """
+        ranked = self.ranked(partition_value)
+        criteria = []
+        if after is not None:
+            score, last_id = after
+            criteria.append(or_(
+                ranked.c.score < score,
+                and_(ranked.c.score == score, ranked.c.id > last_id)
+            ))
+        rows = self._rows(ranked, *criteria, limit=limit + 1)
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1].entry
+            next_cursor = (getattr(last, self.score_column.key) or 0, last.id)
+        return rows, next_cursor
+
+    def around(self, partition_value, client_id: int, radius: int = NEIGHBOUR_RADIUS) -> List[RankedRow]:
+        """The client's row with up to `radius` rows above and below it"""
+        ranked = self.ranked(partition_value)
+        me = select(func.min(ranked.c.position))\
+            .where(ranked.c.client_id == client_id)\
+            .scalar_subquery()
+        return self._rows(ranked, ranked.c.position.between(me - radius, me + radius))
+
+
+global_leaderboard = RankedQuery(
+    LeaderboardEntry, LeaderboardEntry.category, LeaderboardEntry.points, LeaderboardEntry.client_id
+)
+
+challenge_leaderboard = RankedQuery(
+    ChallengeParticipant, ChallengeParticipant.challenge_id,
+    ChallengeParticipant.current_value, ChallengeParticipant.client_id
+)
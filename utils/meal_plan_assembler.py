@@ -0,0 +1,221 @@
+"""
+Weekly Meal Plan Assembler for FitFuel
+Builds the weekly meal plan view (days, totals, shopping list and prep guide)
+from a fixed number of queries instead of one query per day and per meal item
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, Iterable, List
+from models import MealPlan, Recipe
+
+# Rough estimate of $2 per unit used for the weekly budget figure
+COST_PER_UNIT = 2
+
+STORAGE_TEXT = 'Store in an airtight container in the refrigerator for up to 3 days.'
+
+
+def load_week_meal_plans(client_id: int, week_start: date) -> Dict[date, MealPlan]:
+    """Load the client's meal plans for the week in one range query, keyed by start date"""
+    week_end = week_start + timedelta(days=6)
+    meal_plans = MealPlan.query.filter(
+        MealPlan.client_id == client_id,
+        MealPlan.start_date >= week_start,
+        MealPlan.start_date <= week_end
+    ).order_by(MealPlan.id).all()
+
+    plans_by_date = {}
+    for plan in meal_plans:
+        # Keep the first plan per day, matching the old per-day .first() lookup
+        plans_by_date.setdefault(plan.start_date, plan)
+    return plans_by_date
+
+
+def load_recipes(recipe_ids: Iterable[int]) -> Dict[int, Recipe]:
+    """Load recipes with one batched IN query"""
+    recipe_ids = {recipe_id for recipe_id in recipe_ids if recipe_id is not None}
+    if not recipe_ids:
+        return {}
+
+    recipes = Recipe.query.filter(Recipe.id.in_(recipe_ids)).all()
+    return {recipe.id: recipe for recipe in recipes}
+
+
+def get_recipe_restrictions(recipe: Recipe) -> List[str]:
+    """Dietary restriction tags shown on a meal item"""
+    restrictions = []
+    if recipe.is_vegetarian:
+        restrictions.append('vegetarian')
+    if recipe.is_vegan:
+        restrictions.append('vegan')
+    if recipe.is_gluten_free:
+        restrictions.append('gluten-free')
+    if recipe.is_dairy_free:
+        restrictions.append('dairy-free')
+    if recipe.is_keto:
+        restrictions.append('keto')
+    if recipe.is_paleo:
+        restrictions.append('paleo')
+    if recipe.is_low_carb:
+        restrictions.append('low-carb')
+    return restrictions
+
+
+def get_recipe_nutrition_labels(recipe: Recipe) -> List[str]:
+    """Nutrition label tags shown on a meal item"""
+    nutrition_labels = []
+    if recipe.is_high_protein:
+        nutrition_labels.append('high-protein')
+    if recipe.is_low_fat:
+        nutrition_labels.append('low-fat')
+    if recipe.is_low_calorie:
+        nutrition_labels.append('low-calorie')
+    return nutrition_labels
+
+
+def _parse_prep_minutes(recipe: Recipe) -> int:
+    return int(recipe.prep_time.split()[0]) if recipe.prep_time else 0
+
+
+def assemble_weekly_meal_plan(client_id: int, week_start: date) -> Dict:
+    """
+    Assemble the weekly meal plan view for a client.
+    Issues at most two SQL statements: the meal plan range query and the recipe
+    IN query. Recipe flags are read from their stored columns.
+    """
+    try:
+        week_end = week_start + timedelta(days=6)
+        week_dates = [week_start + timedelta(days=i) for i in range(7)]
+        plans_by_date = load_week_meal_plans(client_id, week_start)
+
+        # Collect each day's meals and every referenced recipe id up front
+        daily_meals = {}
+        recipe_ids = set()
+        for current_date in week_dates:
+            meal_plan = plans_by_date.get(current_date)
+            if not meal_plan or not meal_plan.daily_plans:
+                daily_meals[current_date] = []
+                continue
+            meals = meal_plan.daily_plans.get(current_date.strftime('%Y-%m-%d'), [])
+            daily_meals[current_date] = meals
+            for meal_data in meals:
+                recipe_ids.update(item['id'] for item in meal_data['items'])
+
+        # Stored recipe flags are authoritative (see Recipe.recompute_flags)
+        recipes = load_recipes(recipe_ids)
+
+        days = []
+        weekly_totals = {
+            'calories': 0,
+            'protein': 0,
+            'prep_time': '0 min',
+            'budget': 0,
+            'containers': 0
+        }
+        weekly_shopping_list = {}
+        shopping_index = {}
+        used_recipes = {}
+
+        for current_date in week_dates:
+            day_data = {
+                'date': current_date,
+                'meals': [],
+                'totals': {'calories': 0, 'protein': 0}
+            }
+
+            for meal_data in daily_meals[current_date]:
+                meal_items = []
+                for item in meal_data['items']:
+                    recipe = recipes.get(item['id'])
+                    if not recipe:
+                        continue
+
+                    day_data['totals']['calories'] += item['calories']
+                    day_data['totals']['protein'] += item['nutrients']['protein']
+
+                    meal_items.append({
+                        'id': item['id'],
+                        'name': item['name'],
+                        'portion': f"{item['amount']} {item['unit']}",
+                        'calories': item['calories'],
+                        'completed': item.get('completed', False),
+                        'restrictions': get_recipe_restrictions(recipe),
+                        'allergens': recipe.allergens,
+                        'nutrition': get_recipe_nutrition_labels(recipe)
+                    })
+
+                    # Merge into the shopping list by (category, name)
+                    category = item.get('category', 'Other')
+                    key = (category, item['name'])
+                    existing_item = shopping_index.get(key)
+                    if existing_item:
+                        existing_item['amount'] += item['amount']
+                    else:
+                        shopping_item = {
+                            'id': item['id'],
+                            'name': item['name'],
+                            'amount': item['amount'],
+                            'unit': item['unit'],
+                            'allergens': recipe.allergens
+                        }
+                        shopping_index[key] = shopping_item
+                        weekly_shopping_list.setdefault(category, []).append(shopping_item)
+
+                    if recipe.prep_instructions:
+                        used_recipes[recipe.id] = recipe
+
+                day_data['meals'].append({
+                    'id': meal_data['id'],
+                    'name': meal_data['name'],
+                    'time': meal_data['time'],
+                    'items': meal_items
+                })
+
+            days.append(day_data)
+            weekly_totals['calories'] += day_data['totals']['calories']
+            weekly_totals['protein'] += day_data['totals']['protein']
+
+        # Calculate averages
+        weekly_totals['calories'] = round(weekly_totals['calories'] / 7)
+        weekly_totals['protein'] = round(weekly_totals['protein'] / 7)
+
+        # Build the prep guide, shortest prep first
+        prep_guide = {'steps': [], 'storage': []}
+        total_prep_minutes = 0
+        for recipe in sorted(used_recipes.values(), key=_parse_prep_minutes):
+            for instruction in recipe.prep_instructions.split('\n'):
+                prep_guide['steps'].append({
+                    'text': instruction,
+                    'duration': None
+                })
+
+            storage_text = STORAGE_TEXT
+            if recipe.allergens:
+                storage_text += f" Contains allergens: {', '.join(recipe.allergens)}."
+            prep_guide['storage'].append({
+                'item': recipe.name,
+                'text': storage_text
+            })
+
+            total_prep_minutes += _parse_prep_minutes(recipe)
+
+        weekly_totals['prep_time'] = f"{total_prep_minutes} min"
+        weekly_totals['containers'] = len(used_recipes)
+        weekly_totals['budget'] = sum(
+            item['amount'] * COST_PER_UNIT
+            for items in weekly_shopping_list.values()
+            for item in items
+        )
+
+        return {
+            'week_start': week_start,
+            'week_end': week_end,
+            'days': days,
+            'weekly_totals': weekly_totals,
+            'weekly_shopping_list': weekly_shopping_list,
+            'prep_guide': prep_guide
+        }
+
+    except Exception as e:
+        logging.error(f"Error assembling weekly meal plan: {str(e)}")
+        raise
@@ -4,8 +4,10 @@ Handles ingredient substitutions based on dietary preferences, allergies, and nu
 """
 
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from models import MealIngredient, SubstitutionRule
+from utils.ingredient_classifier import classify_ingredient, normalize_ingredient_name
+from utils.substitution_graph import IngredientNode, SubstitutionEdge, get_substitution_graph
 
 def find_substitutes(
     ingredient_name: str,
@@ -16,52 +18,153 @@ def find_substitutes(
     """
     Find suitable substitutes for an ingredient based on client preferences and constraints
     """
+    return find_substitutes_bulk(
+        [ingredient_name],
+        client_preferences,
+        allergies,
+        budget_constraint
+    ).get(ingredient_name, [])
+
+def find_substitutes_bulk(
+    ingredient_names: List[str],
+    client_preferences: Dict,
+    allergies: List[str] = None,
+    budget_constraint: Optional[float] = None
+) -> Dict[str, List[Dict]]:
+    """
+    Find substitutes for many ingredients at once (e.g. a whole shopping list).
+    Reads from the cached substitution graph, so the query count does not
+    depend on the list size.
+    Returns {ingredient_name: ranked substitutes} in the same shape as find_substitutes.
+    """
     try:
-        # Get the original ingredient
-        original = MealIngredient.query.filter_by(name=ingredient_name).first()
+        names = list(dict.fromkeys(ingredient_names))
+        if not names:
+            return {}
+
+        graph = get_substitution_graph()
+
+        missing = [name for name in names if graph.find(name) is None]
+        if missing:
+            logging.warning(f"Ingredients not found: {', '.join(missing)}")
+
+        results = {}
+        for name in names:
+            original = graph.find(name)
+            if not original:
+                results[name] = []
+                continue
+            results[name] = rank_substitutes(
+                graph.substitutes(original.id),
+                client_preferences,
+                allergies,
+                budget_constraint
+            )
+        return results
+
+    except Exception as e:
+        logging.error(f"Error finding substitutes: {str(e)}")
+        return {}
+
+def rank_substitutes(
+    rules: List[Tuple[SubstitutionEdge, IngredientNode]],
+    client_preferences: Dict,
+    allergies: List[str] = None,
+    budget_constraint: Optional[float] = None
+) -> List[Dict]:
+    """Filter and rank (rule, substitute) pairs for one ingredient"""
+    suitable_substitutes = []
+    for rule, substitute in rules:
+        # Check for allergens
+        if allergies and has_allergen(substitute, allergies):
+            continue
+            
+        # Check budget constraint
+        if budget_constraint and substitute.estimated_cost > budget_constraint:
+            continue
+            
+        # Calculate match score based on preferences
+        preference_score = calculate_preference_match(
+            substitute,
+            rule,
+            client_preferences
+        )
+        
+        if preference_score > 0:
+            suitable_substitutes.append({
+                'ingredient': substitute.name,
+                'conversion_ratio': rule.conversion_ratio,
+                'nutrition_difference': rule.nutrition_difference,
+                'cost_difference': rule.cost_difference,
+                'suitability_score': preference_score,
+                'preference_tags': rule.preference_tags
+            })
+    
+    # Sort by suitability score
+    return sorted(suitable_substitutes, key=lambda x: x['suitability_score'], reverse=True)
+
+def find_substitution_chains(
+    ingredient_name: str,
+    client_preferences: Dict,
+    allergies: List[str] = None,
+    budget_constraint: Optional[float] = None,
+    max_hops: int = 2
+) -> List[Dict]:
+    """
+    Find multi-hop substitutions (A -> B -> C) for an ingredient.
+    Conversion ratios are multiplied along the chain; allergy and budget
+    constraints apply to the final substitute.
+    """
+    try:
+        graph = get_substitution_graph()
+        original = graph.find(ingredient_name)
         if not original:
             logging.warning(f"Ingredient not found: {ingredient_name}")
             return []
 
-        # Get all possible substitutes
-        substitution_rules = SubstitutionRule.query.filter_by(ingredient_id=original.id).all()
-        
-        suitable_substitutes = []
-        for rule in substitution_rules:
-            substitute = MealIngredient.query.get(rule.substitute_id)
-            
-            # Check for allergens
-            if allergies and any(allergen in substitute.common_allergens for allergen in allergies):
+        chains = []
+        for chain in graph.paths(original.id, max_hops=max_hops):
+            substitute = graph.node(chain['substitute_id'])
+            if allergies and has_allergen(substitute, allergies):
                 continue
-                
-            # Check budget constraint
             if budget_constraint and substitute.estimated_cost > budget_constraint:
                 continue
-                
-            # Calculate match score based on preferences
-            preference_score = calculate_preference_match(
-                substitute,
-                rule,
-                client_preferences
-            )
-            
-            if preference_score > 0:
-                suitable_substitutes.append({
-                    'ingredient': substitute.name,
-                    'conversion_ratio': rule.conversion_ratio,
-                    'nutrition_difference': rule.nutrition_difference,
-                    'cost_difference': rule.cost_difference,
-                    'suitability_score': preference_score,
-                    'preference_tags': rule.preference_tags
-                })
-        
-        # Sort by suitability score
-        return sorted(suitable_substitutes, key=lambda x: x['suitability_score'], reverse=True)
-        
+
+            if chain['hops'] == 1:
+                # Direct rules keep the same weighting as find_substitutes
+                rule = graph.rule(original.id, substitute.id)
+                score = calculate_preference_match(substitute, rule, client_preferences)
+            else:
+                score = chain['suitability_score']
+            if score <= 0:
+                continue
+
+            chains.append({
+                'ingredient': substitute.name,
+                'path': chain['path'],
+                'hops': chain['hops'],
+                'conversion_ratio': chain['conversion_ratio'],
+                'cost_difference': chain['cost_difference'],
+                'suitability_score': score
+            })
+
+        return sorted(chains, key=lambda x: (x['hops'], -x['suitability_score']))
+
     except Exception as e:
-        logging.error(f"Error finding substitutes: {str(e)}")
+        logging.error(f"Error finding substitution chains: {str(e)}")
         return []
 
+def get_ingredient_allergens(ingredient: MealIngredient) -> set:
+    """Stored allergens of an ingredient plus any detected from its name"""
+    allergens = {normalize_ingredient_name(a) for a in (ingredient.common_allergens or [])}
+    allergens.update(classify_ingredient(ingredient.name).allergens)
+    return allergens
+
+def has_allergen(ingredient: MealIngredient, allergies: List[str]) -> bool:
+    """Check whether an ingredient contains any of the given allergies"""
+    allergens = get_ingredient_allergens(ingredient)
+    return any(normalize_ingredient_name(allergy) in allergens for allergy in allergies)
+
 def calculate_preference_match(
     substitute: MealIngredient,
     rule: SubstitutionRule,
@@ -103,8 +206,9 @@ def validate_substitution(
     Returns validation result with any warnings
     """
     try:
-        orig = MealIngredient.query.filter_by(name=original).first()
-        sub = MealIngredient.query.filter_by(name=substitute).first()
+        graph = get_substitution_graph()
+        orig = graph.find(original)
+        sub = graph.find(substitute)
         
         if not orig or not sub:
             return {
@@ -112,10 +216,7 @@ def validate_substitution(
                 'message': 'One or both ingredients not found'
             }
             
-        rule = SubstitutionRule.query.filter_by(
-            ingredient_id=orig.id,
-            substitute_id=sub.id
-        ).first()
+        rule = graph.rule(orig.id, sub.id)
         
         if not rule:
             return {
@@ -1,27 +1,24 @@
 import logging
-from flask import make_response
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from io import BytesIO
 
-def generate_pdf(client_data, workout_plan, meal_plan):
-    """Generate PDF with workout and meal plans"""
+def generate_pdf(client_data, workout_plan, meal_plan, output=None, brand=None):
+    """
+    Write a PDF with workout and meal plans to `output` (a binary file, or a
+    new BytesIO when omitted) and return it
+    """
+    # reportlab is imported on first use so app start-up doesn't pay for it
+    from reportlab.platypus import Paragraph, Spacer, Table
+    from utils.report_templates import DEFAULT_BRAND, build_report, report_theme
+
     try:
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
+        buffer = output if output is not None else BytesIO()
+        theme = report_theme(brand or DEFAULT_BRAND)
+        styles = theme.styles
+        table_style = theme.table_styles['plain']
         story = []
 
         # Add title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30
-        )
-        story.append(Paragraph(f"Fitness Plan for {client_data['name']}", title_style))
+        story.append(Paragraph(f"Fitness Plan for {client_data['name']}", styles['CustomTitle']))
         story.append(Spacer(1, 12))
 
         # Add client information
@@ -35,13 +32,7 @@ def generate_pdf(client_data, workout_plan, meal_plan):
         ]
         
         client_table = Table(client_info, colWidths=[100, 300])
-        client_table.setStyle(TableStyle([
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ]))
+        client_table.setStyle(table_style)
         story.append(client_table)
         story.append(Spacer(1, 20))
 
@@ -55,13 +46,7 @@ def generate_pdf(client_data, workout_plan, meal_plan):
                 exercise_data = [[ex['name'], f"{ex['sets']} sets", ex['reps']] 
                                for ex in workout['exercises']]
                 exercise_table = Table(exercise_data, colWidths=[200, 100, 100])
-                exercise_table.setStyle(TableStyle([
-                    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ]))
+                exercise_table.setStyle(table_style)
                 story.append(exercise_table)
             story.append(Paragraph(f"Motivation: {workout.get('motivation', '')}", styles['Italic']))
             story.append(Spacer(1, 12))
@@ -75,27 +60,16 @@ def generate_pdf(client_data, workout_plan, meal_plan):
                 meal_data.append([meal_type.capitalize(), meal['name'], f"${meal['cost']:.2f}"])
             
             meal_table = Table(meal_data, colWidths=[100, 300, 100])
-            meal_table.setStyle(TableStyle([
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ]))
+            meal_table.setStyle(table_style)
             story.append(meal_table)
             story.append(Paragraph(f"Daily Total: ${meals['total_cost']:.2f}", styles['Normal']))
             story.append(Spacer(1, 12))
 
         # Generate PDF
-        doc.build(story)
-        buffer.seek(0)
-        
-        # Create response
-        response = make_response(buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename=fitness_plan_{client_data["name"]}.pdf'
-        
-        return response
+        build_report(buffer, story, theme, f"Fitness Plan for {client_data['name']}")
+        if output is None:
+            buffer.seek(0)
+        return buffer
 
     except Exception as e:
         logging.error(f"Error generating PDF: {str(e)}")
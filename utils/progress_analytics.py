@@ -0,0 +1,294 @@
+"""
+Progress Analytics Engine for FitFuel
+Columnar (NumPy) core for completion rates, weekly rollups and trend
+classification over one or many clients' progress logs
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+import numpy as np
+
+TREND_METRICS = ('intensity', 'volume', 'consistency')
+
+# How far back the "recent" completion rate looks
+RECENT_WINDOW = timedelta(weeks=4)
+
+DATE_DTYPE = 'datetime64[us]'
+
+# week_keys() values (YYYYWW) fit below this, so client ids can be packed above it
+WEEK_KEY_SPAN = 1_000_000
+
+
+class ProgressFrame:
+    """
+    Progress logs stored column-wise.
+
+    dates      datetime64[us] array of log dates
+    completed  bool array, workout completed
+    metrics    {metric name: float array}, NaN where a log lacks the metric
+    client_ids int array, one entry per log (all zeros for single-client frames)
+    """
+
+    def __init__(
+        self,
+        dates: np.ndarray,
+        completed: np.ndarray,
+        metrics: Optional[Dict[str, np.ndarray]] = None,
+        client_ids: Optional[np.ndarray] = None
+    ):
+        self.dates = np.asarray(dates, dtype=DATE_DTYPE)
+        self.completed = np.asarray(completed, dtype=bool)
+        self.metrics = {name: np.asarray(values, dtype=float) for name, values in (metrics or {}).items()}
+        if client_ids is None:
+            client_ids = np.zeros(len(self.dates), dtype=np.int64)
+        self.client_ids = np.asarray(client_ids, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @classmethod
+    def from_logs(
+        cls,
+        progress_logs: Sequence[Dict],
+        metric_names: Iterable[str] = TREND_METRICS,
+        client_ids: Optional[Sequence[int]] = None
+    ) -> 'ProgressFrame':
+        """Build a frame from serialized progress logs (log_date as ISO string or datetime)"""
+        metric_names = tuple(metric_names)
+        count = len(progress_logs)
+        dates = np.array([log['log_date'] for log in progress_logs], dtype=DATE_DTYPE)
+        completed = np.fromiter(
+            (bool(log.get('workout_completed', False)) for log in progress_logs),
+            dtype=bool, count=count
+        )
+        log_metrics = [log.get('metrics') or {} for log in progress_logs]
+        metrics = {
+            name: np.fromiter(
+                (m.get(name, np.nan) for m in log_metrics), dtype=float, count=count
+            )
+            for name in metric_names
+        }
+        return cls(dates, completed, metrics, client_ids)
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: Sequence[Tuple],
+        metric_names: Iterable[str] = TREND_METRICS
+    ) -> 'ProgressFrame':
+        """Build a multi-client frame from (client_id, log_date, workout_completed, metrics) rows"""
+        metric_names = tuple(metric_names)
+        count = len(rows)
+        client_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+        dates = np.array([row[1] for row in rows], dtype=DATE_DTYPE)
+        completed = np.fromiter((bool(row[2]) for row in rows), dtype=bool, count=count)
+        row_metrics = [row[3] or {} for row in rows]
+        metrics = {
+            name: np.fromiter(
+                (m.get(name, np.nan) for m in row_metrics), dtype=float, count=count
+            )
+            for name in metric_names
+        }
+        return cls(dates, completed, metrics, client_ids)
+
+    @classmethod
+    def concat(cls, frames: Sequence['ProgressFrame']) -> 'ProgressFrame':
+        """Join frames end to end; metrics missing from a frame are NaN for its logs"""
+        if not frames:
+            return cls.from_rows([])
+        if len(frames) == 1:
+            return frames[0]
+        names = {name for frame in frames for name in frame.metrics}
+        return cls(
+            np.concatenate([frame.dates for frame in frames]),
+            np.concatenate([frame.completed for frame in frames]),
+            {name: np.concatenate([frame.metric(name) for frame in frames]) for name in names},
+            np.concatenate([frame.client_ids for frame in frames])
+        )
+
+    def metric(self, name: str) -> np.ndarray:
+        """Metric column with missing values as NaN"""
+        values = self.metrics.get(name)
+        if values is None:
+            return np.full(len(self), np.nan)
+        return values
+
+
+def to_datetime64(value: Optional[datetime]) -> np.datetime64:
+    if value is None:
+        value = datetime.utcnow()
+    return np.datetime64(value, 'us')
+
+
+def week_keys(dates: np.ndarray) -> np.ndarray:
+    """
+    Vectorized equivalent of int(date.strftime('%Y%W')): Monday-based week
+    numbers that restart at week 0 on January 1st.
+    """
+    days = dates.astype('datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    day_of_year = (days - years.astype('datetime64[D]')).astype(np.int64)
+    # 1970-01-01 was a Thursday; shift so Monday == 0
+    weekday = (days.astype(np.int64) + 3) % 7
+    week = (day_of_year + 7 - weekday) // 7
+    return (years.astype(np.int64) + 1970) * 100 + week
+
+
+def classify_trend(values: np.ndarray, flat: str = 'neutral') -> str:
+    """Trend over the last three values: strictly rising, strictly falling or flat"""
+    if len(values) < 2:
+        return 'neutral'
+    steps = np.diff(values[-3:])
+    if np.all(steps > 0):
+        return 'improving'
+    if np.all(steps < 0):
+        return 'declining'
+    return flat
+
+
+def completion_rate(frame: ProgressFrame, now: Optional[datetime] = None) -> Dict:
+    """Overall and recent (last 4 weeks) completion rate with trend"""
+    total = len(frame)
+    if total == 0:
+        return {'rate': 0, 'trend': 'neutral', 'recent_rate': 0}
+
+    rate = frame.completed.mean() * 100
+
+    recent = frame.dates > to_datetime64(now) - np.timedelta64(RECENT_WINDOW)
+    recent_count = np.count_nonzero(recent)
+    recent_rate = frame.completed[recent].mean() * 100 if recent_count else 0
+
+    trend = 'improving' if recent_rate > rate else 'declining' if recent_rate < rate else 'stable'
+    return {
+        'rate': round(float(rate), 1),
+        'trend': trend,
+        'recent_rate': round(float(recent_rate), 1)
+    }
+
+
+def weekly_rollup(frame: ProgressFrame, metric_names: Iterable[str] = TREND_METRICS) -> Dict:
+    """
+    Per-week averages for each metric, weeks in order of first appearance in
+    the logs (callers pass logs sorted by date). Logs missing a metric count
+    as 0 towards that week's average.
+    """
+    if len(frame) == 0:
+        return {'weeks': np.array([], dtype=np.int64), 'counts': np.array([]), 'metrics': {}}
+
+    weeks, first, inverse, counts = np.unique(
+        week_keys(frame.dates), return_index=True, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+    order = np.argsort(first, kind='stable')
+    averages = {}
+    for name in metric_names:
+        values = np.nan_to_num(frame.metric(name), nan=0.0)
+        sums = np.bincount(inverse, weights=values, minlength=len(weeks))
+        averages[name] = (sums / counts)[order]
+    return {'weeks': weeks[order], 'counts': counts[order], 'metrics': averages}
+
+
+def performance_trends(frame: ProgressFrame, metric_names: Iterable[str] = TREND_METRICS) -> Dict:
+    """Trend per metric from weekly averages; overall improving when most metrics improve"""
+    metric_names = tuple(metric_names)
+    if len(frame) == 0:
+        return {
+            'trend': 'neutral',
+            'indicators': {name: 'neutral' for name in metric_names}
+        }
+
+    rollup = weekly_rollup(frame, metric_names)
+    indicators = {name: classify_trend(rollup['metrics'][name]) for name in metric_names}
+    improving_count = sum(1 for trend in indicators.values() if trend == 'improving')
+    return {
+        'trend': 'improving' if improving_count > 1 else 'neutral',
+        'indicators': indicators
+    }
+
+
+def split_by_client(frame: ProgressFrame) -> Dict[int, ProgressFrame]:
+    """Partition a multi-client frame into one frame per client"""
+    order = np.argsort(frame.client_ids, kind='stable')
+    sorted_ids = frame.client_ids[order]
+    client_ids, starts = np.unique(sorted_ids, return_index=True)
+    ends = np.append(starts[1:], len(sorted_ids))
+
+    frames = {}
+    for client_id, start, end in zip(client_ids, starts, ends):
+        rows = order[start:end]
+        frames[int(client_id)] = ProgressFrame(
+            frame.dates[rows],
+            frame.completed[rows],
+            {name: values[rows] for name, values in frame.metrics.items()},
+            frame.client_ids[rows]
+        )
+    return frames
+
+
+def completion_rates_by_client(frame: ProgressFrame, now: Optional[datetime] = None) -> Dict[int, Dict]:
+    """completion_rate() for every client in a multi-client frame in one vectorized pass"""
+    if len(frame) == 0:
+        return {}
+
+    client_ids, inverse = np.unique(frame.client_ids, return_inverse=True)
+    size = len(client_ids)
+    totals = np.bincount(inverse, minlength=size)
+    completed = np.bincount(inverse, weights=frame.completed, minlength=size)
+
+    recent = frame.dates > to_datetime64(now) - np.timedelta64(RECENT_WINDOW)
+    recent_totals = np.bincount(inverse[recent], minlength=size)
+    recent_completed = np.bincount(inverse[recent], weights=frame.completed[recent], minlength=size)
+
+    rates = completed / totals * 100
+    with np.errstate(invalid='ignore', divide='ignore'):
+        recent_rates = np.where(recent_totals > 0, recent_completed / recent_totals * 100, 0.0)
+
+    results = {}
+    for i, client_id in enumerate(client_ids):
+        rate, recent_rate = rates[i], recent_rates[i]
+        trend = 'improving' if recent_rate > rate else 'declining' if recent_rate < rate else 'stable'
+        results[int(client_id)] = {
+            'rate': round(float(rate), 1),
+            'trend': trend,
+            'recent_rate': round(float(recent_rate), 1)
+        }
+    return results
+
+
+def performance_trends_by_client(
+    frame: ProgressFrame,
+    metric_names: Iterable[str] = TREND_METRICS
+) -> Dict[int, Dict]:
+    """performance_trends() for every client, with one grouped rollup over (client, week)"""
+    metric_names = tuple(metric_names)
+    if len(frame) == 0:
+        return {}
+
+    # Group rows by a packed (client, week) key, then order each client's
+    # weeks by first appearance
+    group_keys = frame.client_ids * WEEK_KEY_SPAN + week_keys(frame.dates)
+    groups, first, inverse, counts = np.unique(
+        group_keys, return_index=True, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+    group_clients = groups // WEEK_KEY_SPAN
+    order = np.lexsort((first, group_clients))
+    group_clients = group_clients[order]
+    averages = {}
+    for name in metric_names:
+        values = np.nan_to_num(frame.metric(name), nan=0.0)
+        sums = np.bincount(inverse, weights=values, minlength=len(counts))
+        averages[name] = (sums / counts)[order]
+
+    client_ids, starts = np.unique(group_clients, return_index=True)
+    ends = np.append(starts[1:], len(group_clients))
+
+    results = {}
+    for client_id, start, end in zip(client_ids, starts, ends):
+        indicators = {name: classify_trend(averages[name][start:end]) for name in metric_names}
+        improving_count = sum(1 for trend in indicators.values() if trend == 'improving')
+        results[int(client_id)] = {
+            'trend': 'improving' if improving_count > 1 else 'neutral',
+            'indicators': indicators
+        }
+    return results
@@ -0,0 +1,163 @@
+"""
+Batch Progress Analysis for FitFuel
+Computes progress insights for a trainer's whole roster (or every client) in
+client chunks: logs are streamed from a server-side cursor, analysed with one
+vectorized pass per chunk and written back with bulk updates
+"""
+
+import logging
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import func, select, update
+from extensions import db
+from models import Client, ExerciseProgression, ProgressLog
+from utils.progress_analytics import (
+    ProgressFrame, completion_rates_by_client, performance_trends_by_client
+)
+from utils.progression_tracker import build_progress_insights
+
+# Clients analysed (and committed) per chunk
+CHUNK_SIZE = 200
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 5000
+
+# Key under ProgressLog.ai_insights that holds the batch analysis
+INSIGHTS_KEY = 'progress_analysis'
+
+
+def iter_client_id_chunks(trainer_id: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[List[int]]:
+    """Yield client ids in ascending chunks, optionally limited to one trainer"""
+    last_id = 0
+    while True:
+        query = select(Client.id).where(Client.id > last_id)
+        if trainer_id is not None:
+            query = query.where(Client.trainer_id == trainer_id)
+        client_ids = db.session.scalars(query.order_by(Client.id).limit(chunk_size)).all()
+        if not client_ids:
+            return
+        yield client_ids
+        last_id = client_ids[-1]
+
+
+def load_progress_frame(client_ids: List[int]) -> ProgressFrame:
+    """
+    Stream the chunk's progress logs into a multi-client frame, oldest first per client.
+    Each batch of STREAM_BATCH_SIZE rows becomes NumPy columns before the next is
+    fetched, so only one batch of row tuples is held at a time.
+    """
+    query = select(
+        ProgressLog.client_id, ProgressLog.log_date,
+        ProgressLog.workout_completed, ProgressLog.metrics
+    ).where(
+        ProgressLog.client_id.in_(client_ids),
+        ProgressLog.log_date.isnot(None)
+    ).order_by(
+        ProgressLog.client_id, ProgressLog.log_date, ProgressLog.id
+    ).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    result = db.session.execute(query)
+    return ProgressFrame.concat([ProgressFrame.from_rows(rows) for rows in result.partitions()])
+
+
+def load_exercise_progressions(client_ids: List[int]) -> Dict[int, List[Dict]]:
+    """Exercise progressions for the chunk, grouped by client"""
+    query = select(
+        ExerciseProgression.client_id, ExerciseProgression.exercise_name,
+        ExerciseProgression.progression_data, ExerciseProgression.current_level,
+        ExerciseProgression.next_milestone
+    ).where(
+        ExerciseProgression.client_id.in_(client_ids)
+    ).order_by(
+        ExerciseProgression.client_id, ExerciseProgression.id
+    ).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    progressions = {}
+    for client_id, exercise_name, progression_data, current_level, next_milestone in db.session.execute(query):
+        progression = {
+            'exercise_name': exercise_name,
+            'progression_data': progression_data or [],
+            'next_milestone': next_milestone or {}
+        }
+        if current_level:
+            progression['current_level'] = current_level
+        progressions.setdefault(client_id, []).append(progression)
+    return progressions
+
+
+def load_latest_logs(client_ids: List[int]) -> Dict[int, tuple]:
+    """(log id, current ai_insights) of each client's most recent progress log"""
+    latest = select(
+        ProgressLog.client_id,
+        func.max(ProgressLog.log_date).label('log_date')
+    ).where(
+        ProgressLog.client_id.in_(client_ids)
+    ).group_by(ProgressLog.client_id).subquery()
+
+    query = select(
+        ProgressLog.client_id, ProgressLog.id, ProgressLog.ai_insights
+    ).join(
+        latest,
+        (ProgressLog.client_id == latest.c.client_id) & (ProgressLog.log_date == latest.c.log_date)
+    ).order_by(ProgressLog.client_id, ProgressLog.id)
+
+    latest_logs = {}
+    for client_id, log_id, ai_insights in db.session.execute(query):
+        # Ties on log_date resolve to the highest id
+        latest_logs[client_id] = (log_id, ai_insights)
+    return latest_logs
+
+
+def analyze_client_chunk(client_ids: List[int]) -> Dict[int, Dict]:
+    """Progress insights for every client in the chunk that has progress logs"""
+    frame = load_progress_frame(client_ids)
+    if len(frame) == 0:
+        return {}
+
+    completion_rates = completion_rates_by_client(frame)
+    performance = performance_trends_by_client(frame)
+    progressions = load_exercise_progressions(client_ids)
+
+    return {
+        client_id: build_progress_insights(
+            completion_rates[client_id],
+            performance[client_id],
+            progressions.get(client_id, [])
+        )
+        for client_id in completion_rates
+    }
+
+
+def save_client_insights(insights: Dict[int, Dict]) -> int:
+    """Store insights on each client's latest progress log with one bulk UPDATE"""
+    if not insights:
+        return 0
+
+    updates = []
+    for client_id, (log_id, ai_insights) in load_latest_logs(list(insights)).items():
+        updates.append({
+            'id': log_id,
+            'ai_insights': {**(ai_insights or {}), INSIGHTS_KEY: insights[client_id]}
+        })
+    if updates:
+        db.session.execute(update(ProgressLog), updates)
+    return len(updates)
+
+
+def analyze_progress_batch(trainer_id: Optional[int] = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Analyse progress for a trainer's clients (or every client when trainer_id is None).
+    Only column tuples are loaded (no ORM instances) and each chunk is committed
+    on its own, so memory stays flat regardless of roster size.
+    Returns the number of clients whose insights were written.
+    """
+    total = 0
+    for client_ids in iter_client_id_chunks(trainer_id, chunk_size):
+        try:
+            total += save_client_insights(analyze_client_chunk(client_ids))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error analyzing progress for clients {client_ids[0]}-{client_ids[-1]}: {str(e)}")
+
+    logging.info(f"Wrote progress insights for {total} clients")
+    return total
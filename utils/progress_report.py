@@ -0,0 +1,111 @@
+"""
+Progress Report Data for FitFuel
+Weekly summaries of a client's progress logs over a date range, for the PDF
+progress report. Logs are streamed from the database in chunks and folded into
+per-week NumPy accumulators, so memory depends on the number of weeks and
+metrics in the range rather than on how many logs the client has
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from sqlalchemy import select
+from extensions import db
+from models import ProgressLog
+from utils.progress_analytics import DATE_DTYPE
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+
+class WeeklySummary:
+    """
+    Progress logs aggregated by Monday-based week, covering start..end.
+
+    week_starts  datetime64[D] array, the Monday of each week
+    logs         int array, logs per week
+    completed    int array, completed workouts per week
+    Numeric metrics are averaged over the logs that recorded them; see means().
+    """
+
+    def __init__(self, start: date, end: date):
+        self.start = start
+        self.end = end
+        first_monday = start - timedelta(days=start.weekday())
+        weeks = max((end - first_monday).days // 7 + 1, 0)
+        self.week_starts = np.datetime64(first_monday, 'D') + np.arange(weeks) * 7
+        self.logs = np.zeros(weeks, dtype=np.int64)
+        self.completed = np.zeros(weeks, dtype=np.int64)
+        self._sums: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.week_starts)
+
+    def add(self, rows: Sequence[Tuple]):
+        """Fold in a chunk of (log_date, workout_completed, metrics) rows dated within the range"""
+        if not rows:
+            return
+        count = len(rows)
+        days = np.array([row[0] for row in rows], dtype=DATE_DTYPE).astype('datetime64[D]')
+        weeks = (days - self.week_starts[0]).astype(np.int64) // 7
+        completed = np.fromiter((bool(row[1]) for row in rows), dtype=bool, count=count)
+        self.logs += np.bincount(weeks, minlength=len(self))
+        self.completed += np.bincount(weeks[completed], minlength=len(self))
+
+        # Metrics are free-form JSON; only numbers are averaged
+        columns: Dict[str, Tuple[List[int], List[float]]] = {}
+        for week, row in zip(weeks.tolist(), rows):
+            for name, value in (row[2] or {}).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    column = columns.setdefault(name, ([], []))
+                    column[0].append(week)
+                    column[1].append(value)
+
+        for name, (metric_weeks, values) in columns.items():
+            if name not in self._sums:
+                self._sums[name] = np.zeros(len(self))
+                self._counts[name] = np.zeros(len(self), dtype=np.int64)
+            self._sums[name] += np.bincount(metric_weeks, weights=values, minlength=len(self))
+            self._counts[name] += np.bincount(metric_weeks, minlength=len(self))
+
+    @property
+    def total_logs(self) -> int:
+        return int(self.logs.sum())
+
+    @property
+    def total_completed(self) -> int:
+        return int(self.completed.sum())
+
+    def completion_rates(self) -> np.ndarray:
+        """Percent of each week's logs with a completed workout, NaN for weeks without logs"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.logs > 0, self.completed * 100.0 / self.logs, np.nan)
+
+    def metric_names(self) -> List[str]:
+        """Metrics recorded in the range, those logged in the most weeks first"""
+        return sorted(self._sums, key=lambda name: (-np.count_nonzero(self._counts[name]), name))
+
+    def means(self, name: str) -> np.ndarray:
+        """Weekly average of a metric, NaN for weeks where it wasn't recorded"""
+        if name not in self._sums:
+            return np.full(len(self), np.nan)
+        counts = self._counts[name]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(counts > 0, self._sums[name] / counts, np.nan)
+
+
+def load_weekly_summary(client_id: int, start: date, end: date, batch_size: int = STREAM_BATCH_SIZE) -> WeeklySummary:
+    """Stream a client's logs dated start..end (inclusive) into a weekly summary"""
+    summary = WeeklySummary(start, end)
+    query = select(
+        ProgressLog.log_date, ProgressLog.workout_completed, ProgressLog.metrics
+    ).where(
+        ProgressLog.client_id == client_id,
+        ProgressLog.log_date >= datetime.combine(start, time.min),
+        ProgressLog.log_date < datetime.combine(end + timedelta(days=1), time.min)
+    ).execution_options(yield_per=batch_size)
+
+    for rows in db.session.execute(query).partitions():
+        summary.add(rows)
+    return summary
@@ -1,69 +1,55 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List
 import json
+import numpy as np
+from utils.progress_analytics import (
+    ProgressFrame, classify_trend, completion_rate, performance_trends
+)
 
 def analyze_client_progress(client_id: int, progress_logs: List[Dict], exercise_progressions: List[Dict]) -> Dict:
     """
     Analyze client's progress data and generate AI-powered insights
     """
     try:
-        # Analyze completion rate
-        completion_rate = calculate_completion_rate(progress_logs)
-
-        # Analyze exercise progression
-        exercise_insights = {}
-        for progression in exercise_progressions:
-            exercise_name = progression['exercise_name']
-            exercise_insights[exercise_name] = analyze_exercise_progression(progression)
-
-        # Generate performance trends
-        performance_trends = calculate_performance_trends(progress_logs)
-
-        # Generate adaptive recommendations
-        recommendations = generate_adaptive_recommendations(
-            completion_rate,
-            exercise_insights,
-            performance_trends
-        )
+        # Convert the logs to columns once and share them between analyses
+        frame = ProgressFrame.from_logs(progress_logs)
 
-        return {
-            'completion_rate': completion_rate,
-            'exercise_insights': exercise_insights,
-            'performance_trends': performance_trends,
-            'recommendations': recommendations,
-            'generated_at': datetime.utcnow().isoformat()
-        }
+        return build_progress_insights(
+            completion_rate(frame),
+            performance_trends(frame),
+            exercise_progressions
+        )
 
     except Exception as e:
         logging.error(f"Error analyzing client progress: {str(e)}")
         raise
 
-def calculate_completion_rate(progress_logs: List[Dict]) -> Dict:
-    """Calculate workout completion rate and trends"""
-    total_workouts = len(progress_logs)
-    if total_workouts == 0:
-        return {'rate': 0, 'trend': 'neutral', 'recent_rate': 0}
-
-    completed = sum(1 for log in progress_logs if log.get('workout_completed', False))
-    completion_rate = (completed / total_workouts) * 100
+def build_progress_insights(completion_rate_data: Dict, performance_trend_data: Dict, exercise_progressions: List[Dict]) -> Dict:
+    """Combine precomputed completion and trend analyses with exercise insights and recommendations"""
+    exercise_insights = {}
+    for progression in exercise_progressions:
+        exercise_name = progression['exercise_name']
+        exercise_insights[exercise_name] = analyze_exercise_progression(progression)
 
-    # Calculate trend over last 4 weeks
-    recent_logs = [log for log in progress_logs 
-                  if datetime.fromisoformat(log['log_date']) > datetime.utcnow() - timedelta(weeks=4)]
-    recent_rate = 0
-    if recent_logs:
-        recent_completed = sum(1 for log in recent_logs if log.get('workout_completed', False))
-        recent_rate = (recent_completed / len(recent_logs)) * 100
-
-    trend = 'improving' if recent_rate > completion_rate else 'declining' if recent_rate < completion_rate else 'stable'
+    recommendations = generate_adaptive_recommendations(
+        completion_rate_data,
+        exercise_insights,
+        performance_trend_data
+    )
 
     return {
-        'rate': round(completion_rate, 1),
-        'trend': trend,
-        'recent_rate': round(recent_rate, 1)
+        'completion_rate': completion_rate_data,
+        'exercise_insights': exercise_insights,
+        'performance_trends': performance_trend_data,
+        'recommendations': recommendations,
+        'generated_at': datetime.utcnow().isoformat()
     }
 
+def calculate_completion_rate(progress_logs: List[Dict]) -> Dict:
+    """Calculate workout completion rate and trends"""
+    return completion_rate(ProgressFrame.from_logs(progress_logs))
+
 def analyze_exercise_progression(progression: Dict) -> Dict:
     """Analyze progression patterns for a single exercise"""
     history = progression.get('progression_data', [])
@@ -96,45 +82,7 @@ def analyze_exercise_progression(progression: Dict) -> Dict:
 
 def calculate_performance_trends(progress_logs: List[Dict]) -> Dict:
     """Calculate overall performance trends from progress logs"""
-    if not progress_logs:
-        return {
-            'trend': 'neutral',
-            'indicators': {
-                'intensity': 'neutral',
-                'volume': 'neutral',
-                'consistency': 'neutral'
-            }
-        }
-
-    # Group logs by week
-    weekly_metrics = {}
-    for log in progress_logs:
-        log_date = datetime.fromisoformat(log['log_date'])
-        week_key = log_date.strftime('%Y-%W')
-
-        metrics = log.get('metrics', {})
-        if week_key not in weekly_metrics:
-            weekly_metrics[week_key] = []
-        weekly_metrics[week_key].append(metrics)
-
-    # Calculate trends for each metric
-    trends = {
-        'intensity': analyze_metric_trend([sum(m.get('intensity', 0) for m in metrics) / len(metrics)
-                                        for metrics in weekly_metrics.values()]),
-        'volume': analyze_metric_trend([sum(m.get('volume', 0) for m in metrics) / len(metrics)
-                                      for metrics in weekly_metrics.values()]),
-        'consistency': analyze_metric_trend([sum(m.get('consistency', 0) for m in metrics) / len(metrics)
-                                          for metrics in weekly_metrics.values()])
-    }
-
-    # Overall trend is improving if majority of indicators are improving
-    improving_count = sum(1 for t in trends.values() if t == 'improving')
-    overall_trend = 'improving' if improving_count > 1 else 'neutral'
-
-    return {
-        'trend': overall_trend,
-        'indicators': trends
-    }
+    return performance_trends(ProgressFrame.from_logs(progress_logs))
 
 def generate_adaptive_recommendations(completion_rate: Dict, exercise_insights: Dict, performance_trends: Dict) -> List[Dict]:
     """Generate personalized recommendations based on progress analysis"""
@@ -181,12 +129,4 @@ def analyze_trend(history: List[Dict]) -> str:
 
 def analyze_metric_trend(values: List[float]) -> str:
     """Analyze trend from metric values"""
-    if len(values) < 2:
-        return 'neutral'
-
-    recent_values = values[-3:]
-    if all(recent_values[i] < recent_values[i+1] for i in range(len(recent_values)-1)):
-        return 'improving'
-    elif all(recent_values[i] > recent_values[i+1] for i in range(len(recent_values)-1)):
-        return 'declining'
-    return 'neutral'
\ No newline at end of file
+    return classify_trend(np.asarray(values, dtype=float))
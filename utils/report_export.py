@@ -0,0 +1,397 @@
+"""
+Bulk Report Export for FitFuel
+Exports a progress report for every client on a trainer's roster as one ZIP.
+Reports render in a pool of worker processes and the parent appends each
+finished PDF to the archive as it arrives, closing the archive after every
+entry so the file on disk is always a valid ZIP. A stopped export resumes by
+skipping the clients already in its archive, a lock file keeps a second run of
+the same export from writing to it, a marker file cancels a running export from
+any process, and progress reaches the trainer over Socket.IO. Export files are
+deleted EXPORT_TTL seconds after they were last written
+"""
+
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import date
+from multiprocessing import get_context
+from typing import Callable, Dict, Optional, Set
+from flask import Flask
+from sqlalchemy import select
+from werkzeug.utils import secure_filename
+from extensions import db
+from models import Client
+from utils.notifications import send_notification
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETE = 'complete'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+DEFAULT_WORKERS = 2
+
+# Workers start from a clean interpreter: exports run on a background thread,
+# and forking a threaded process can copy locks other threads are holding
+START_METHOD = 'spawn'
+
+DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'exports')
+
+# Seconds between progress notifications
+PROGRESS_INTERVAL = 1.0
+
+# An export whose status hasn't been written for this long is assumed dead and may be restarted
+STALE_AFTER = 5 * 60
+
+# Seconds an export's files are kept after they were last written
+DEFAULT_TTL = 24 * 60 * 60
+
+export_dir = DEFAULT_EXPORT_DIR
+workers = DEFAULT_WORKERS
+export_ttl = DEFAULT_TTL
+
+# Exports started from a web request run one at a time per web worker
+_export_threads = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-export')
+
+# Set in worker processes by _init_worker
+_worker_app = None
+
+
+class ExportRunning(Exception):
+    """Another run of the same export holds its lock"""
+
+
+def init_report_export(app):
+    global export_dir, workers, export_ttl
+
+    export_dir = app.config.get('REPORT_EXPORT_DIR') or DEFAULT_EXPORT_DIR
+    workers = app.config.get('REPORT_EXPORT_WORKERS', DEFAULT_WORKERS)
+    export_ttl = app.config.get('REPORT_EXPORT_TTL', DEFAULT_TTL)
+
+
+def export_key(trainer_id: int, start: date, end: date) -> str:
+    data = json.dumps([trainer_id, start.isoformat(), end.isoformat()], separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def archive_path(export_id: str) -> str:
+    return os.path.join(export_dir, f"{export_id}.zip")
+
+
+def _part_path(export_id: str) -> str:
+    return os.path.join(export_dir, f"{export_id}.zip.part")
+
+
+def _status_path(export_id: str) -> str:
+    return os.path.join(export_dir, f"{export_id}.json")
+
+
+def _cancel_path(export_id: str) -> str:
+    return os.path.join(export_dir, f"{export_id}.cancel")
+
+
+def _lock_path(export_id: str) -> str:
+    return os.path.join(export_dir, f"{export_id}.lock")
+
+
+def _lock(export_id: str) -> Optional[int]:
+    """Take an export's lock without waiting; None when another process holds it.
+    The lock is released when the descriptor is closed or its process dies"""
+    fd = os.open(_lock_path(export_id), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def read_status(export_id: str) -> Optional[Dict]:
+    try:
+        with open(_status_path(export_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_status(status: Dict):
+    status['updated_at'] = time.time()
+    fd, tmp_path = tempfile.mkstemp(dir=export_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(status, f)
+    os.replace(tmp_path, _status_path(status['export_id']))
+
+
+def is_active(status: Optional[Dict]) -> bool:
+    """Queued or running, and still writing its status"""
+    return bool(status) and status['status'] in (QUEUED, RUNNING) \
+        and time.time() - status['updated_at'] < STALE_AFTER
+
+
+def cancel_export(export_id: str):
+    """Ask a running export to stop after its current reports; its archive so far is kept"""
+    with open(_cancel_path(export_id), 'w'):
+        pass
+
+
+def _entry_name(client_id: int, name: str) -> str:
+    return f"{client_id:06d}_{secure_filename(name or '') or 'client'}.pdf"
+
+
+def _exported_client_ids(part: str) -> Set[int]:
+    """Clients already in a partial archive; a damaged archive is discarded"""
+    if not os.path.exists(part):
+        return set()
+    try:
+        with zipfile.ZipFile(part) as archive:
+            return {int(name.split('_', 1)[0]) for name in archive.namelist()}
+    except (zipfile.BadZipFile, ValueError) as e:
+        logging.error(f"Discarding damaged partial export {part}: {str(e)}")
+        os.remove(part)
+        return set()
+
+
+def _notify(status: Dict):
+    messages = {
+        COMPLETE: f"Exported reports for {status['done']} clients",
+        CANCELLED: f"Export cancelled after {status['done']} of {status['total']} client reports",
+        FAILED: f"Export stopped: {len(status['failed'])} client reports failed"
+    }
+    try:
+        send_notification(
+            status['trainer_id'],
+            'report_export',
+            messages.get(status['status'], f"Exported {status['done']} of {status['total']} client reports"),
+            {key: status[key] for key in ('export_id', 'status', 'done', 'total', 'failed')}
+        )
+    except Exception as e:
+        logging.error(f"Error sending export progress: {str(e)}")
+
+
+def _worker_config(app) -> Dict:
+    """The settings a worker needs to reach the database; the full config isn't picklable"""
+    return {key: value for key, value in app.config.items() if key.startswith('SQLALCHEMY_')}
+
+
+def _init_worker(config: Dict, directory: str):
+    """Pool initializer: a bare app on the parent's database, rather than building the whole web app"""
+    global _worker_app, export_dir
+
+    _worker_app = Flask(__name__)
+    _worker_app.config.update(config)
+    db.init_app(_worker_app)
+    export_dir = directory
+
+
+def _render_client(render: Optional[Callable], export_id: str, client_id: int, start: str, end: str,
+                   directory: str) -> str:
+    """Render one client's report to a temp file in the export directory and return its path"""
+    if render is None:
+        from utils.report_jobs import render_client_report as render
+
+    fd, path = tempfile.mkstemp(dir=directory, prefix=f"{export_id}-", suffix='.pdf.tmp')
+    with _worker_app.app_context():
+        try:
+            with os.fdopen(fd, 'wb') as output:
+                render({'client_id': client_id, 'start': start, 'end': end}, output)
+        except Exception:
+            os.unlink(path)
+            raise
+        finally:
+            db.session.remove()
+    return path
+
+
+def export_client_reports(app, trainer_id: int, start: date, end: date, max_workers: Optional[int] = None,
+                          render: Optional[Callable] = None) -> Dict:
+    """
+    Export (or resume exporting) every client report of a trainer for start..end
+    into archive_path(export_id). Returns the final status: complete, cancelled,
+    or failed when some reports could not be rendered; running it again retries
+    whatever is missing from the archive. Raises ExportRunning when the export is
+    already running elsewhere. `render` replaces the progress report renderer; it
+    runs in the worker processes, so it must be picklable.
+    """
+    export_id = export_key(trainer_id, start, end)
+    os.makedirs(export_dir, exist_ok=True)
+    lock = _lock(export_id)
+    if lock is None:
+        raise ExportRunning(f"Export {export_id} is already running")
+    try:
+        return _export(app, export_id, trainer_id, start, end, max_workers, render)
+    finally:
+        os.close(lock)
+
+
+def _export(app, export_id: str, trainer_id: int, start: date, end: date, max_workers: Optional[int],
+            render: Optional[Callable]) -> Dict:
+    if os.path.exists(archive_path(export_id)) and (read_status(export_id) or {}).get('status') == COMPLETE:
+        return read_status(export_id)
+    if os.path.exists(_cancel_path(export_id)):
+        os.remove(_cancel_path(export_id))
+
+    part = _part_path(export_id)
+    clients = dict(db.session.execute(
+        select(Client.id, Client.name).where(Client.trainer_id == trainer_id).order_by(Client.id)
+    ).all())
+    exported = _exported_client_ids(part)
+    pending = [client_id for client_id in clients if client_id not in exported]
+
+    status = {
+        'export_id': export_id,
+        'trainer_id': trainer_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'status': RUNNING,
+        'total': len(clients),
+        'done': len(exported.intersection(clients)),
+        'failed': {},
+        'started_at': time.time()
+    }
+    _write_status(status)
+    _notify(status)
+
+    if pending:
+        executor = ProcessPoolExecutor(
+            max_workers=min(max_workers or workers, len(pending)),
+            mp_context=get_context(START_METHOD),
+            initializer=_init_worker,
+            initargs=(_worker_config(app), export_dir)
+        )
+        try:
+            futures = {
+                executor.submit(_render_client, render, export_id, client_id, status['start'], status['end'],
+                                export_dir): client_id
+                for client_id in pending
+            }
+            last_notice = time.time()
+            for future in as_completed(futures):
+                client_id = futures[future]
+                try:
+                    path = future.result()
+                except Exception as e:
+                    logging.error(f"Error exporting report for client {client_id}: {str(e)}")
+                    status['failed'][str(client_id)] = str(e)
+                else:
+                    try:
+                        # PDF streams are already compressed
+                        with zipfile.ZipFile(part, 'a', compression=zipfile.ZIP_STORED) as archive:
+                            archive.write(path, _entry_name(client_id, clients[client_id]))
+                    finally:
+                        os.remove(path)
+                    status['done'] += 1
+
+                if os.path.exists(_cancel_path(export_id)):
+                    status['status'] = CANCELLED
+                    break
+                _write_status(status)
+                if time.time() - last_notice >= PROGRESS_INTERVAL:
+                    _notify(status)
+                    last_notice = time.time()
+        except KeyboardInterrupt:
+            # Interrupted CLI run: leave it resumable straight away rather than stale
+            status['status'] = CANCELLED
+            _write_status(status)
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            # Reports that finished after a cancel were never added
+            for path in glob.glob(os.path.join(export_dir, f"{export_id}-*.pdf.tmp")):
+                os.remove(path)
+
+    if status['status'] == RUNNING:
+        if status['failed']:
+            status['status'] = FAILED
+        else:
+            if not os.path.exists(part):
+                zipfile.ZipFile(part, 'w').close()  # empty roster
+            os.replace(part, archive_path(export_id))
+            status['status'] = COMPLETE
+    _write_status(status)
+    _notify(status)
+    return status
+
+
+def _run_export(app, trainer_id: int, start: date, end: date):
+    with app.app_context():
+        try:
+            export_client_reports(app, trainer_id, start, end)
+        except ExportRunning as e:
+            logging.info(str(e))
+        except Exception as e:
+            logging.error(f"Error exporting client reports for trainer {trainer_id}: {str(e)}")
+            status = read_status(export_key(trainer_id, start, end))
+            if status is not None:
+                status['status'] = FAILED
+                _write_status(status)
+        finally:
+            db.session.remove()
+
+
+def start_export(app, trainer_id: int, start: date, end: date) -> Dict:
+    """Run an export in the background unless it is already running or complete; returns its status"""
+    expire_exports()
+    export_id = export_key(trainer_id, start, end)
+    status = read_status(export_id)
+    if is_active(status) or (status and status['status'] == COMPLETE and os.path.exists(archive_path(export_id))):
+        return status
+
+    os.makedirs(export_dir, exist_ok=True)
+    status = {
+        'export_id': export_id,
+        'trainer_id': trainer_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'status': QUEUED,
+        'total': (status or {}).get('total', 0),
+        'done': (status or {}).get('done', 0),
+        'failed': {},
+        'started_at': time.time()
+    }
+    _write_status(status)
+    _export_threads.submit(_run_export, app, trainer_id, start, end)
+    return status
+
+
+_last_expiry = 0.0
+
+
+def expire_exports(min_interval: float = 60):
+    """Delete the files of exports not written for export_ttl seconds; scans at most once per min_interval seconds"""
+    global _last_expiry
+
+    now = time.time()
+    if now - _last_expiry < min_interval:
+        return
+    _last_expiry = now
+    if not os.path.isdir(export_dir):
+        return
+    expired = {}
+    for name in os.listdir(export_dir):
+        path = os.path.join(export_dir, name)
+        try:
+            if os.path.getmtime(path) < now - export_ttl:
+                # Files are named <export id>.<kind>, or <export id>-<random> while rendering
+                expired.setdefault(name.split('.', 1)[0].split('-', 1)[0], []).append(path)
+        except FileNotFoundError:
+            pass
+    for export_id, paths in expired.items():
+        # A running export keeps writing its status, but a slow report may outlast the TTL
+        lock = _lock(export_id)
+        if lock is None:
+            continue
+        try:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        finally:
+            os.close(lock)
@@ -1,37 +1,38 @@
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from datetime import datetime
 import io
 import logging
+import math
+
+# Weekly table rows per table; each table repeats its header across page breaks
+WEEKS_PER_TABLE = 52
+
+# Metrics given a trend chart and a weekly table column, most frequently logged first
+MAX_REPORT_METRICS = 3
+
+def generate_client_report(client, achievements, weekly, goals, output=None, brand=None):
+    """
+    Write a comprehensive PDF report for a client to `output` (a binary file,
+    or a new BytesIO when omitted) and return it. Progress is reported from
+    `weekly`, a WeeklySummary of the report's date range, so the report's size
+    grows with the number of weeks, not the number of logs.
+    """
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, Spacer, Table
+    from utils.report_templates import DEFAULT_BRAND, build_report, report_theme, trend_chart
 
-def generate_client_report(client, achievements, progress_logs, goals):
-    """Generate a comprehensive PDF report for a client"""
     try:
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
+        buffer = output if output is not None else io.BytesIO()
+        theme = report_theme(brand or DEFAULT_BRAND)
+        styles = theme.styles
         story = []
 
-        # Custom styles
-        styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30
-        ))
-        styles.add(ParagraphStyle(
-            name='SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=16,
-            spaceAfter=12
-        ))
-
         # Header
         story.append(Paragraph(f"Progress Report - {client.name}", styles['CustomTitle']))
-        story.append(Paragraph(f"Generated on {datetime.utcnow().strftime('%B %d, %Y')}", styles['Normal']))
+        story.append(Paragraph(
+            f"{weekly.start.strftime('%B %d, %Y')} to {weekly.end.strftime('%B %d, %Y')} · "
+            f"generated on {datetime.utcnow().strftime('%B %d, %Y')}",
+            styles['Normal']
+        ))
         story.append(Spacer(1, 20))
 
         # Client Information
@@ -42,11 +43,7 @@ def generate_client_report(client, achievements, progress_logs, goals):
             ["Member Since:", client.created_at.strftime("%B %d, %Y") if client.created_at else "Not specified"]
         ]
         client_table = Table(client_info, colWidths=[2*inch, 4*inch])
-        client_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('PADDING', (0, 0), (-1, -1), 6),
-        ]))
+        client_table.setStyle(theme.table_styles['details'])
         story.append(client_table)
         story.append(Spacer(1, 20))
 
@@ -60,12 +57,8 @@ def generate_client_report(client, achievements, progress_logs, goals):
                     f"{achievement.progress}%" if hasattr(achievement, 'progress') else "0%",
                     "Completed" if getattr(achievement, 'completed', False) else "In Progress"
                 ])
-            achievement_table = Table(achievement_data, colWidths=[3*inch, 2*inch, 2*inch])
-            achievement_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                ('PADDING', (0, 0), (-1, -1), 6),
-            ]))
+            achievement_table = Table(achievement_data, colWidths=[3*inch, 2*inch, 2*inch], repeatRows=1)
+            achievement_table.setStyle(theme.table_styles['grid'])
             story.append(achievement_table)
         else:
             story.append(Paragraph("No achievements recorded yet.", styles['Normal']))
@@ -77,68 +70,61 @@ def generate_client_report(client, achievements, progress_logs, goals):
             goals_data = [["Goal Type", "Target", "Current Progress", "Due Date"]]
             for goal in goals:
                 goals_data.append([
-                    goal.goal_type or "Unknown",
+                    goal.name or "Unknown",
                     str(goal.target_value) if goal.target_value else "Not set",
                     str(goal.current_value) if goal.current_value else "Not started",
                     goal.target_date.strftime("%B %d, %Y") if goal.target_date else "Not set"
                 ])
-            goals_table = Table(goals_data, colWidths=[2*inch, 2*inch, 2*inch, 2*inch])
-            goals_table.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                ('PADDING', (0, 0), (-1, -1), 6),
-            ]))
+            goals_table = Table(goals_data, colWidths=[2*inch, 2*inch, 2*inch, 2*inch], repeatRows=1)
+            goals_table.setStyle(theme.table_styles['grid'])
             story.append(goals_table)
         else:
             story.append(Paragraph("No goals set yet.", styles['Normal']))
         story.append(Spacer(1, 20))
 
-        # Recent Progress
-        story.append(Paragraph("Recent Progress", styles['SectionTitle']))
-        if progress_logs:
-            # Last 30 days summary
-            recent_logs = progress_logs[:30]  # Get the most recent 30 logs
-            workout_completion = sum(1 for log in recent_logs if log.workout_completed)
+        # Progress over the report's range
+        story.append(Paragraph("Progress", styles['SectionTitle']))
+        if weekly.total_logs:
             story.append(Paragraph(
-                f"Last 30 Days Summary:",
+                f"• Workouts Completed: {weekly.total_completed} of {weekly.total_logs} logged days",
                 styles['Normal']
             ))
             story.append(Paragraph(
-                f"• Workouts Completed: {workout_completion}",
-                styles['Normal']
-            ))
-            story.append(Paragraph(
-                f"• Completion Rate: {(workout_completion/len(recent_logs))*100:.1f}%",
+                f"• Completion Rate: {weekly.total_completed / weekly.total_logs * 100:.1f}%",
                 styles['Normal']
             ))
+            story.append(Spacer(1, 10))
+
+            metric_names = weekly.metric_names()[:MAX_REPORT_METRICS]
+            story.append(trend_chart(theme, "Weekly completion rate", weekly.completion_rates().tolist(), unit='%'))
+            for name in metric_names:
+                story.append(Spacer(1, 6))
+                story.append(trend_chart(theme, f"Weekly average {name.replace('_', ' ')}", weekly.means(name).tolist()))
+            story.append(Spacer(1, 20))
 
-            # Add detailed metrics if available
-            if any(log.metrics for log in recent_logs):
+            # Weeks with logs, split into tables that each repeat their header row
+            header = ["Week of", "Logs", "Workouts"] + [name.replace('_', ' ').title() for name in metric_names]
+            means = [weekly.means(name) for name in metric_names]
+            rows = [
+                [str(weekly.week_starts[week]), str(weekly.logs[week]), str(weekly.completed[week])]
+                + ["-" if math.isnan(column[week]) else f"{column[week]:.1f}" for column in means]
+                for week in weekly.logs.nonzero()[0]
+            ]
+            column_width = 6.5 * inch / len(header)
+            story.append(Paragraph("Weekly Summary", styles['Heading3']))
+            for offset in range(0, len(rows), WEEKS_PER_TABLE):
+                weekly_table = Table([header] + rows[offset:offset + WEEKS_PER_TABLE],
+                                     colWidths=[column_width] * len(header), repeatRows=1)
+                weekly_table.setStyle(theme.table_styles['grid'])
+                story.append(weekly_table)
                 story.append(Spacer(1, 10))
-                story.append(Paragraph("Recent Metrics:", styles['Normal']))
-                metrics_data = [["Date", "Metric", "Value"]]
-                for log in recent_logs:
-                    if log.metrics:
-                        for metric, value in log.metrics.items():
-                            metrics_data.append([
-                                log.log_date.strftime("%Y-%m-%d"),
-                                metric,
-                                str(value)
-                            ])
-                if len(metrics_data) > 1:  # If we have any metrics besides the header
-                    metrics_table = Table(metrics_data, colWidths=[2*inch, 3*inch, 3*inch])
-                    metrics_table.setStyle(TableStyle([
-                        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-                        ('PADDING', (0, 0), (-1, -1), 6),
-                    ]))
-                    story.append(metrics_table)
         else:
-            story.append(Paragraph("No progress logs recorded yet.", styles['Normal']))
+            story.append(Paragraph("No progress logs recorded in this period.", styles['Normal']))
 
         # Build PDF
-        doc.build(story)
-        buffer.seek(0)
+        build_report(buffer, story, theme, f"Progress Report - {client.name}")
+        if output is None:
+            buffer.seek(0)
         return buffer
 
     except Exception as e:
@@ -0,0 +1,342 @@
+"""
+Report Jobs for FitFuel
+PDF reports are rendered off the request. The request enqueues a job and gets
+its id back, a worker renders the PDF into a spool directory, and the client
+downloads the finished file streamed from disk. Job ids are a hash of the
+job's inputs, so identical requests share one job while it is pending or fresh.
+Jobs run on an in-process thread pool with their records kept as JSON files in
+the spool directory, where every web worker process can read them, or on a
+local Redis list drained by `flask run-report-worker` when REPORT_QUEUE_REDIS_URL
+is set
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # optional; jobs run in-process without it
+    redis = None
+
+from extensions import db
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+DEFAULT_WORKERS = 2
+
+# Seconds a finished report is kept on disk and handed to identical requests
+DEFAULT_TTL = 15 * 60
+
+# Days covered by a client progress report when no range is given
+DEFAULT_REPORT_DAYS = 90
+
+# Longest range a progress report may cover (five years)
+MAX_REPORT_DAYS = 5 * 366
+
+DEFAULT_SPOOL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'reports')
+
+QUEUE_KEY = 'report_jobs:queue'
+JOB_KEY = 'report_jobs:job:{}'
+
+# kind -> function(payload, output file) writing the PDF
+RENDERERS: Dict[str, Callable[[Dict, BinaryIO], None]] = {}
+
+
+def report_renderer(kind: str):
+    def register(func):
+        RENDERERS[kind] = func
+        return func
+    return register
+
+
+def job_key(kind: str, payload: Dict, owner_id) -> str:
+    data = json.dumps([kind, owner_id, payload], default=str, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class LocalJobBackend:
+    """
+    Job records as JSON files in `directory`, shared by every process on the
+    host, so a poll may land on any web worker. Jobs run on a thread pool in the
+    process that submitted them.
+    """
+
+    def __init__(self, app=None, workers: int = DEFAULT_WORKERS, directory: Optional[str] = None):
+        self.app = app
+        self.directory = directory or os.path.join(DEFAULT_SPOOL_DIR, 'jobs')
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report-job')
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    @contextmanager
+    def _locked(self):
+        """Serialize read-modify-write of records across threads and processes"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(os.path.join(self.directory, '.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _write(self, job: Dict):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self._path(job['id']))
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def claim(self, job: Dict, replace: Callable[[Dict], bool]) -> Tuple[Dict, bool]:
+        """
+        Store `job` unless a record exists that `replace` rejects.
+        Returns the stored record and whether it is the new one.
+        """
+        with self._locked():
+            current = self.get(job['id'])
+            if current is not None and not replace(current):
+                return current, False
+            self._write(job)
+            return dict(job), True
+
+    def update(self, job_id: str, **fields):
+        with self._locked():
+            job = self.get(job_id)
+            if job is not None:
+                job.update(fields)
+                self._write(job)
+
+    def enqueue(self, job_id: str, kind: str, payload: Dict):
+        self._executor.submit(self._run, job_id, kind, payload)
+
+    def _run(self, job_id: str, kind: str, payload: Dict):
+        with self.app.app_context():
+            try:
+                run_job(job_id, kind, payload)
+            finally:
+                db.session.remove()
+
+    def expire(self, before: float):
+        if not os.path.isdir(self.directory):
+            return
+        with self._locked():
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                job = self.get(name[:-len('.json')])
+                if job is not None and (_finished_before(job, before) or _abandoned(job, before)):
+                    os.remove(self._path(job['id']))
+
+
+class RedisJobBackend:
+    """Job records and a FIFO queue in Redis, drained by `flask run-report-worker`"""
+
+    def __init__(self, client, ttl: int = DEFAULT_TTL):
+        self.redis = client
+        self.ttl = ttl
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        raw = self.redis.get(JOB_KEY.format(job_id))
+        return json.loads(raw) if raw else None
+
+    def claim(self, job: Dict, replace: Callable[[Dict], bool]) -> Tuple[Dict, bool]:
+        key = JOB_KEY.format(job['id'])
+        if self.redis.set(key, json.dumps(job), nx=True, ex=self.ttl):
+            return job, True
+        current = self.get(job['id'])
+        if current is not None and not replace(current):
+            return current, False
+        self.redis.set(key, json.dumps(job), ex=self.ttl)
+        return job, True
+
+    def update(self, job_id: str, **fields):
+        job = self.get(job_id)
+        if job is not None:
+            job.update(fields)
+            self.redis.set(JOB_KEY.format(job_id), json.dumps(job), ex=self.ttl)
+
+    def enqueue(self, job_id: str, kind: str, payload: Dict):
+        self.redis.rpush(QUEUE_KEY, json.dumps({'id': job_id, 'kind': kind, 'payload': payload}, default=str))
+
+    def work(self, poll_timeout: int = 5, max_jobs: Optional[int] = None) -> int:
+        """Run queued jobs until max_jobs have run (forever when None); returns the number run"""
+        count = 0
+        while max_jobs is None or count < max_jobs:
+            item = self.redis.blpop(QUEUE_KEY, timeout=poll_timeout)
+            if item is None:
+                continue
+            message = json.loads(item[1])
+            try:
+                run_job(message['id'], message['kind'], message['payload'])
+            finally:
+                db.session.remove()
+            count += 1
+        return count
+
+    def expire(self, before: float):
+        pass  # job records expire with their Redis TTL
+
+
+backend = None
+spool_dir = DEFAULT_SPOOL_DIR
+job_ttl = DEFAULT_TTL
+
+
+def init_report_jobs(app):
+    """Use the Redis queue when REPORT_QUEUE_REDIS_URL is configured, else an in-process pool"""
+    global backend, spool_dir, job_ttl
+
+    spool_dir = app.config.get('REPORT_SPOOL_DIR') or DEFAULT_SPOOL_DIR
+    job_ttl = app.config.get('REPORT_JOB_TTL', DEFAULT_TTL)
+    backend = LocalJobBackend(
+        app, app.config.get('REPORT_WORKERS', DEFAULT_WORKERS), directory=os.path.join(spool_dir, 'jobs')
+    )
+
+    url = app.config.get('REPORT_QUEUE_REDIS_URL')
+    if not url:
+        return
+    if redis is None:
+        logging.error("REPORT_QUEUE_REDIS_URL is set but the redis package is not installed")
+        return
+    backend = RedisJobBackend(redis.Redis.from_url(url), job_ttl)
+    logging.info("Report jobs use the Redis queue")
+
+
+def report_path(job_id: str) -> str:
+    return os.path.join(spool_dir, f"{job_id}.pdf")
+
+
+def _finished_before(job: Dict, before: float) -> bool:
+    return job['status'] in (DONE, FAILED) and job['finished_at'] < before
+
+
+def _abandoned(job: Dict, before: float) -> bool:
+    """
+    Pending since before `before`. A local job runs on a thread of the process
+    that submitted it, so one still pending after job_ttl most likely died with
+    its gunicorn worker and would otherwise block identical requests forever
+    """
+    return job['status'] in (QUEUED, RUNNING) and job['created_at'] < before
+
+
+def _reusable(job: Dict) -> bool:
+    """Pending jobs that aren't abandoned, and finished ones whose file is still fresh, are shared"""
+    if job['status'] in (QUEUED, RUNNING):
+        return not _abandoned(job, time.time() - job_ttl)
+    return job['status'] == DONE and time.time() - job['finished_at'] < job_ttl and os.path.exists(report_path(job['id']))
+
+
+def submit_report(kind: str, payload: Dict, owner_id, filename: str) -> Dict:
+    """Enqueue a report, or return the identical job already pending or finished"""
+    if kind not in RENDERERS:
+        raise ValueError(f"Unknown report kind: {kind}")
+    expire_reports()
+
+    job = {
+        'id': job_key(kind, payload, owner_id),
+        'kind': kind,
+        'owner_id': owner_id,
+        'filename': filename,
+        'status': QUEUED,
+        'error': None,
+        'created_at': time.time(),
+        'finished_at': None
+    }
+    stored, created = backend.claim(job, replace=lambda current: not _reusable(current))
+    if created:
+        backend.enqueue(job['id'], kind, payload)
+    return stored
+
+
+def get_report_job(job_id: str, owner_id) -> Optional[Dict]:
+    job = backend.get(job_id)
+    if job is None or job['owner_id'] != owner_id:
+        return None
+    return job
+
+
+def run_job(job_id: str, kind: str, payload: Dict):
+    """Render a job's PDF into a temp file in the spool directory, then move it into place"""
+    backend.update(job_id, status=RUNNING)
+    os.makedirs(spool_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=spool_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            RENDERERS[kind](payload, output)
+        os.replace(tmp_path, report_path(job_id))
+        backend.update(job_id, status=DONE, finished_at=time.time())
+    except Exception as e:
+        logging.error(f"Error rendering {kind} report {job_id}: {str(e)}")
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        backend.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+
+
+_last_expiry = 0.0
+
+
+def expire_reports(min_interval: float = 60):
+    """Delete reports older than the TTL; scans at most once per min_interval seconds"""
+    global _last_expiry
+
+    now = time.time()
+    if now - _last_expiry < min_interval:
+        return
+    _last_expiry = now
+    before = now - job_ttl
+    backend.expire(before)
+    if not os.path.isdir(spool_dir):
+        return
+    for name in os.listdir(spool_dir):
+        path = os.path.join(spool_dir, name)
+        try:
+            # The job records' directory is expired by the backend
+            if os.path.isfile(path) and os.path.getmtime(path) < before:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@report_renderer('fitness_plan')
+def render_fitness_plan(payload: Dict, output: BinaryIO):
+    from models import Trainer
+    from utils.pdf_generator import generate_pdf
+    from utils.report_templates import trainer_brand
+
+    trainer = db.session.get(Trainer, payload['trainer_id']) if payload.get('trainer_id') else None
+    generate_pdf(payload['client_data'], payload['workout_plan'], payload['meal_plan'], output,
+                 brand=trainer_brand(trainer))
+
+
+@report_renderer('client_report')
+def render_client_report(payload: Dict, output: BinaryIO):
+    from models import Client, ClientAchievement, Goal
+    from utils.progress_report import load_weekly_summary
+    from utils.report_generator import generate_client_report
+    from utils.report_templates import trainer_brand
+
+    client = db.session.get(Client, payload['client_id'])
+    if client is None:
+        raise ValueError(f"Client {payload['client_id']} not found")
+    achievements = ClientAchievement.query.filter_by(client_id=client.id).all()
+    goals = Goal.query.filter_by(client_id=client.id).all()
+    weekly = load_weekly_summary(client.id, date.fromisoformat(payload['start']), date.fromisoformat(payload['end']))
+    generate_client_report(client, achievements, weekly, goals, output, brand=trainer_brand(client.trainer))
@@ -0,0 +1,160 @@
+"""
+Report Templates for FitFuel
+Paragraph styles, table styles and the page decoration of PDF reports are built
+once per process for each trainer brand and shared by every report, so a report
+only lays out its own content. Documents themselves are created per report,
+since reportlab's frames hold layout state while a document builds. Trend
+charts are small vector drawings rather than long tables of values
+"""
+
+import math
+import re
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, Optional, Sequence
+
+from reportlab.graphics.shapes import Drawing, Line, PolyLine, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, TableStyle
+
+HEX_COLOR = re.compile(r'#[0-9a-f]{6}')
+
+# Height of the brand band across the top of every page
+BAND_HEIGHT = 24
+
+ReportBrand = namedtuple('ReportBrand', ['name', 'primary_color', 'accent_color'])
+
+# Accent is the table header background, reportlab's lightgrey
+DEFAULT_BRAND = ReportBrand('FitFuel', '#4f46e5', '#d3d3d3')
+
+ReportTheme = namedtuple('ReportTheme', ['brand', 'styles', 'table_styles', 'draw_page'])
+
+
+def _hex_color(value, default: str) -> str:
+    value = value.strip().lower() if isinstance(value, str) else ''
+    return value if HEX_COLOR.fullmatch(value) else default
+
+
+def report_brand(branding_settings: Optional[Dict] = None, business_name: Optional[str] = None) -> ReportBrand:
+    """Brand from a trainer's branding_settings; unset or malformed colors fall back to the defaults"""
+    settings = branding_settings or {}
+    return ReportBrand(
+        settings.get('business_name') or business_name or DEFAULT_BRAND.name,
+        _hex_color(settings.get('primary_color'), DEFAULT_BRAND.primary_color),
+        _hex_color(settings.get('accent_color'), DEFAULT_BRAND.accent_color)
+    )
+
+
+def trainer_brand(trainer) -> ReportBrand:
+    if trainer is None:
+        return DEFAULT_BRAND
+    return report_brand(trainer.branding_settings, trainer.business_name)
+
+
+def _page_decorator(brand: ReportBrand):
+    primary = colors.HexColor(brand.primary_color)
+
+    def draw_page(canvas, doc):
+        width, height = doc.pagesize
+        canvas.saveState()
+        canvas.setFillColor(primary)
+        canvas.rect(0, height - BAND_HEIGHT, width, BAND_HEIGHT, fill=1, stroke=0)
+        canvas.setFillColor(colors.white)
+        canvas.setFont('Helvetica-Bold', 10)
+        canvas.drawString(doc.leftMargin, height - BAND_HEIGHT + 8, brand.name)
+        canvas.setFillColor(colors.grey)
+        canvas.setFont('Helvetica', 8)
+        canvas.drawRightString(width - doc.rightMargin, doc.bottomMargin / 2, f"Page {doc.page}")
+        canvas.restoreState()
+
+    return draw_page
+
+
+@lru_cache(maxsize=32)
+def report_theme(brand: ReportBrand = DEFAULT_BRAND) -> ReportTheme:
+    """Styles and page decoration for a brand; shared read-only across reports and threads"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30
+    ))
+    styles.add(ParagraphStyle(
+        name='SectionTitle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        spaceAfter=12
+    ))
+
+    accent = colors.HexColor(brand.accent_color)
+    table_styles = {
+        # Label column shaded, e.g. client details
+        'details': TableStyle([
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, 0), (0, -1), accent),
+            ('PADDING', (0, 0), (-1, -1), 6),
+        ]),
+        # Header row shaded
+        'grid': TableStyle([
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('BACKGROUND', (0, 0), (-1, 0), accent),
+            ('PADDING', (0, 0), (-1, -1), 6),
+        ]),
+        # Borderless rows of a plan
+        'plain': TableStyle([
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ])
+    }
+    return ReportTheme(brand, styles, table_styles, _page_decorator(brand))
+
+
+def build_report(output, story, theme: ReportTheme, title: str = ''):
+    """Lay out `story` into `output` on letter pages decorated with the theme's brand"""
+    doc = SimpleDocTemplate(output, pagesize=letter, title=title, topMargin=72 + BAND_HEIGHT)
+    doc.build(story, onFirstPage=theme.draw_page, onLaterPages=theme.draw_page)
+
+
+def trend_chart(theme: ReportTheme, title: str, values: Sequence[Optional[float]],
+                width: float = 468, height: float = 60, unit: str = '') -> Drawing:
+    """
+    Compact line chart of a weekly series with its range and latest value.
+    Missing weeks (None or NaN) break the line rather than being drawn as zero.
+    """
+    drawing = Drawing(width, height)
+    label_height = 14
+    plot_height = height - label_height - 4
+    present = [value for value in values if value is not None and not math.isnan(value)]
+
+    drawing.add(String(0, height - 10, title, fontName='Helvetica-Bold', fontSize=8, fillColor=colors.black))
+    if not present:
+        drawing.add(String(0, plot_height / 2, 'No data in this period', fontName='Helvetica', fontSize=8,
+                           fillColor=colors.grey))
+        return drawing
+
+    low, high = min(present), max(present)
+    drawing.add(String(width, height - 10, f"latest {present[-1]:.1f}{unit}  range {low:.1f}-{high:.1f}{unit}",
+                       fontName='Helvetica', fontSize=7, fillColor=colors.grey, textAnchor='end'))
+    drawing.add(Line(0, 0, width, 0, strokeColor=colors.lightgrey, strokeWidth=0.5))
+
+    spread = (high - low) or 1
+    step = width / max(len(values) - 1, 1)
+    primary = colors.HexColor(theme.brand.primary_color)
+    segment = []
+    for i, value in enumerate(list(values) + [None]):
+        if value is None or math.isnan(value):
+            if len(segment) >= 4:
+                drawing.add(PolyLine(segment, strokeColor=primary, strokeWidth=1.2))
+            elif len(segment) == 2:  # lone week: a short tick
+                drawing.add(Line(segment[0] - 1, segment[1], segment[0] + 1, segment[1],
+                                 strokeColor=primary, strokeWidth=1.2))
+            segment = []
+            continue
+        segment += [i * step, 2 + (value - low) / spread * (plot_height - 4)]
+    return drawing
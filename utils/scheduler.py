@@ -1,10 +1,15 @@
 from datetime import datetime, timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from flask import current_app
-from models import Trainer, Client, Goal, ProgressLog
+from extensions import db
+from models import Trainer, Client, Goal, ProgressLog, ClientAdherenceSummary
 from utils.email_service import send_subscription_reminder
 from utils.notifications import notify_goal_achievement
+from utils.leaderboard import FLUSH_INTERVAL, run_rank_flush
+from utils.challenge_stats import reconcile_challenge_stats
+from utils import email_dispatcher
 import logging
 
 scheduler = BackgroundScheduler()
@@ -23,8 +28,10 @@ def check_subscription_renewals():
         for trainer in trainers:
             send_subscription_reminder(trainer)
             logging.info(f"Sent subscription reminder to trainer {trainer.id}")
+        db.session.commit()
 
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error in subscription renewal check: {str(e)}")
 
 def check_goal_progress():
@@ -66,6 +73,53 @@ def clean_old_logs():
     except Exception as e:
         logging.error(f"Error in log cleanup: {str(e)}")
 
+def run_progress_analysis(app):
+    """Refresh progress insights for every client, one chunk of clients at a time"""
+    # Imported on first run so numpy is not loaded when every worker starts
+    from utils.progress_batch import analyze_progress_batch
+    with app.app_context():
+        try:
+            total = analyze_progress_batch()
+            logging.info(f"Progress analysis completed for {total} clients")
+
+        except Exception as e:
+            logging.error(f"Error in progress analysis: {str(e)}")
+
+def run_challenge_stats_reconciliation(app):
+    """Correct any drift in the denormalized challenge aggregates"""
+    with app.app_context():
+        try:
+            corrected = reconcile_challenge_stats()
+            logging.info(f"Challenge stats reconciled, {corrected} corrected")
+
+        except Exception as e:
+            logging.error(f"Error in challenge stats reconciliation: {str(e)}")
+
+def run_adherence_roll(app):
+    """Move the adherence summaries' window counts on to the new day"""
+    with app.app_context():
+        try:
+            rolled = ClientAdherenceSummary.roll_window()
+            logging.info(f"Adherence windows rolled for {rolled} clients")
+
+        except Exception as e:
+            logging.error(f"Error in adherence roll: {str(e)}")
+
+def run_outbox_delivery():
+    """Have the dispatcher send mail left in the outbox, e.g. from before a restart or due for retry"""
+    if email_dispatcher.dispatcher is not None:
+        email_dispatcher.dispatcher.wake()
+
+def run_outbox_cleanup(app):
+    """Delete sent outbox messages past their retention"""
+    with app.app_context():
+        try:
+            deleted = email_dispatcher.purge_sent()
+            logging.info(f"Removed {deleted} sent emails from the outbox")
+
+        except Exception as e:
+            logging.error(f"Error in outbox cleanup: {str(e)}")
+
 def init_scheduler(app):
     """Initialize the scheduler with all jobs"""
     with app.app_context():
@@ -93,6 +147,71 @@ def init_scheduler(app):
             replace_existing=True
         )
 
+        # Refresh progress insights nightly at 2 AM
+        scheduler.add_job(
+            run_progress_analysis,
+            CronTrigger(hour=2),
+            args=[app],
+            id='progress_analysis',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        # Reconcile challenge aggregates nightly at 4 AM
+        scheduler.add_job(
+            run_challenge_stats_reconciliation,
+            CronTrigger(hour=4),
+            args=[app],
+            id='challenge_stats_reconciliation',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        # Roll adherence windows just after midnight UTC, when the day they count from changes
+        scheduler.add_job(
+            run_adherence_roll,
+            CronTrigger(hour=0, minute=5, timezone='UTC'),
+            args=[app],
+            id='adherence_roll',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        # Persist leaderboard rank changes in batches
+        scheduler.add_job(
+            run_rank_flush,
+            IntervalTrigger(seconds=FLUSH_INTERVAL),
+            args=[app],
+            id='leaderboard_rank_flush',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        # Deliver queued and retried email
+        scheduler.add_job(
+            run_outbox_delivery,
+            IntervalTrigger(minutes=1),
+            id='email_outbox_delivery',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
+        # Trim sent email daily at 3:30 AM
+        scheduler.add_job(
+            run_outbox_cleanup,
+            CronTrigger(hour=3, minute=30),
+            args=[app],
+            id='email_outbox_cleanup',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
         # Start the scheduler
         scheduler.start()
         logging.info("Scheduler initialized with all jobs") 
\ No newline at end of file
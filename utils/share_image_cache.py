@@ -0,0 +1,181 @@
+"""
+Share Image Cache for FitFuel
+Rendered share images are stored on local disk under a hash of everything that
+determines their pixels (the endpoint's inputs, brand settings and render
+version). A repeat share is a file read, a conditional request for an image the
+client already has gets a 304 without rendering, and the directory is kept
+under a size budget by evicting the least recently used files
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Callable, List, Optional, Tuple
+from flask import Response, request, send_file
+from prometheus_client import Counter
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'share_images')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Eviction trims the cache to this fraction of its budget so it runs rarely
+EVICT_TO = 0.9
+
+# Seconds a browser may reuse an image before revalidating with its ETag
+DEFAULT_MAX_AGE = 300
+
+SHARE_IMAGE_CACHE_HITS = Counter(
+    'share_image_cache_hits_total', 'Share images served from the disk cache', ['kind']
+)
+SHARE_IMAGE_CACHE_MISSES = Counter(
+    'share_image_cache_misses_total', 'Share images rendered because they were not cached', ['kind']
+)
+SHARE_IMAGE_NOT_MODIFIED = Counter(
+    'share_image_not_modified_total', 'Conditional share image requests answered with 304', ['kind']
+)
+SHARE_IMAGE_CACHE_EVICTIONS = Counter(
+    'share_image_cache_evictions_total', 'Share images evicted from the disk cache'
+)
+
+
+def share_image_key(kind: str, inputs, brand=None) -> str:
+    """Content address of a share image; also used as its strong ETag"""
+    # Renderer (and PIL) imported on first use rather than at app start-up
+    from utils.share_images import DEFAULT_BRAND, RENDER_VERSION
+
+    brand = brand or DEFAULT_BRAND
+    payload = json.dumps([RENDER_VERSION, kind, brand, inputs], default=str, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ShareImageCache:
+    """PNG files named by key, sharded by the key's first two characters"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None  # bytes on disk, scanned on first write
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a cached image, touched so eviction sees it as recently used"""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes):
+        """Write atomically, then evict if the cache has grown past its budget"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(mtime, size, path) of every cached image"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.png'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        # Rescan rather than trusting the running total: other workers share the directory
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            SHARE_IMAGE_CACHE_EVICTIONS.inc()
+        self._size = total
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._size = 0
+
+
+share_image_cache = ShareImageCache()
+max_age = DEFAULT_MAX_AGE
+
+
+def init_share_image_cache(app):
+    global share_image_cache, max_age
+
+    share_image_cache = ShareImageCache(
+        app.config.get('SHARE_IMAGE_CACHE_DIR') or DEFAULT_CACHE_DIR,
+        app.config.get('SHARE_IMAGE_CACHE_MAX_BYTES') or DEFAULT_MAX_BYTES
+    )
+    max_age = app.config.get('SHARE_IMAGE_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def send_share_image(kind: str, build_spec: Callable, *inputs, brand=None) -> Response:
+    """
+    Serve the share image `build_spec(*inputs)`. The inputs must determine the
+    image completely since they are all that is hashed; the spec is only built
+    and rendered when the image is neither held by the client nor cached.
+    """
+    key = share_image_key(kind, inputs, brand)
+
+    if key in request.if_none_match:
+        SHARE_IMAGE_NOT_MODIFIED.labels(kind=kind).inc()
+        response = Response(status=304)
+    else:
+        path = share_image_cache.get(key)
+        if path:
+            SHARE_IMAGE_CACHE_HITS.labels(kind=kind).inc()
+            response = send_file(path, mimetype='image/png', etag=False, conditional=False)
+        else:
+            SHARE_IMAGE_CACHE_MISSES.labels(kind=kind).inc()
+            from utils.share_images import DEFAULT_BRAND, render_share_image
+            data = render_share_image(build_spec(*inputs), brand or DEFAULT_BRAND)
+            try:
+                share_image_cache.put(key, data)
+            except OSError as e:
+                logging.error(f"Error caching share image {key}: {str(e)}")
+            response = send_file(io.BytesIO(data), mimetype='image/png', etag=False)
+
+    response.set_etag(key)
+    # Images show the client's name, so only their browser may store them
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+    return response
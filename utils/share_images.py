@@ -0,0 +1,491 @@
+"""
+Share Image Rendering for FitFuel
+Fonts are loaded once per process and the static layers of each layout (header
+and footer bands, gradient, logo) are rendered once per brand. A share image is
+described by a declarative spec of dynamic elements composited onto a copy of
+its layer, so endpoints only gather their data and build a spec. Charts are a
+handful of primitives (bars, progress ring, sparkline, stacked bar) drawn
+straight onto the card rather than rendered by matplotlib and pasted in
+"""
+
+import io
+import os
+from collections import namedtuple
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+WIDTH, HEIGHT = 1200, 630  # Standard size for social media sharing
+HEADER_HEIGHT = 120
+FOOTER_HEIGHT = 80
+MARGIN = 50
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+FONT_DIR = os.path.join(STATIC_DIR, 'fonts')
+FONT_FILES = {
+    'bold': 'OpenSans-Bold.ttf',
+    'semibold': 'OpenSans-SemiBold.ttf',
+    'regular': 'OpenSans-Regular.ttf'
+}
+
+# Font roles as (style, size)
+TITLE = ('bold', 60)
+HERO = ('bold', 70)
+SUBTITLE = ('semibold', 40)
+BODY = ('regular', 30)
+SMALL = ('regular', 24)
+CAPTION = ('regular', 18)
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+INDIGO_50 = (238, 242, 255)
+INDIGO_600 = (79, 70, 229)
+INDIGO_700 = (67, 56, 202)
+GREEN_50 = (236, 253, 245)
+GREEN_500 = (16, 185, 129)
+GREEN_800 = (6, 95, 70)
+GRAY_100 = (243, 244, 246)
+GRAY_200 = (229, 231, 235)
+GRAY_500 = (107, 114, 128)
+AMBER_500 = (245, 158, 11)
+RED_500 = (239, 68, 68)
+AMBER_400 = (251, 191, 36)
+GOLD = (255, 215, 0)
+
+# Faster than the default level 6 for a few percent larger files
+PNG_COMPRESS_LEVEL = 3
+
+# Bump when layouts or drawing change so cached renders are not reused
+RENDER_VERSION = 2
+
+Brand = namedtuple('Brand', ['name', 'color', 'website'])
+
+DEFAULT_BRAND = Brand('FitFuelGenerator', INDIGO_600, 'www.fitfuelgenerator.com')
+
+# Layout elements. Text align is 'left', 'center' or 'right' about x.
+Text = namedtuple('Text', ['xy', 'text', 'font', 'fill', 'align'], defaults=(BLACK, 'left'))
+Rect = namedtuple('Rect', ['box', 'fill'])
+ProgressBar = namedtuple('ProgressBar', ['box', 'percent'])  # box is (x, y, width, height)
+
+# Chart primitives. Boxes are (x, y, width, height); labels and titles are optional.
+BarChart = namedtuple('BarChart', ['box', 'values', 'labels', 'title', 'color'], defaults=(None, None, INDIGO_600))
+ProgressRing = namedtuple('ProgressRing', ['center', 'radius', 'width', 'percent', 'label'], defaults=(None,))
+Sparkline = namedtuple('Sparkline', ['box', 'values', 'color', 'width'], defaults=(INDIGO_600, 3))
+StackedBar = namedtuple('StackedBar', ['box', 'segments'])  # segments: [(label, value, color)]
+
+# layout: 'banner' or 'celebration'; footer: text centred in the banner footer band
+ShareImage = namedtuple('ShareImage', ['layout', 'elements', 'footer'], defaults=(None,))
+
+
+@lru_cache(maxsize=None)
+def get_font(style: str, size: int):
+    """TrueType font loaded once per process, or PIL's default when the file is missing"""
+    try:
+        return ImageFont.truetype(os.path.join(FONT_DIR, FONT_FILES[style]), size)
+    except IOError:
+        return ImageFont.load_default()
+
+
+def font(role) -> ImageFont.ImageFont:
+    return get_font(*role)
+
+
+def progress_color(percent: float):
+    if percent < 40:
+        return RED_500
+    if percent < 80:
+        return INDIGO_600
+    return GREEN_500
+
+
+def status_color(value: float, good: float, fair: float):
+    """Green at or above `good`, amber at or above `fair`, red below"""
+    if value >= good:
+        return GREEN_500
+    if value >= fair:
+        return AMBER_400
+    return RED_500
+
+
+def _text_x(draw, element: Text) -> float:
+    x = element.xy[0]
+    if element.align == 'left':
+        return x
+    text_width = draw.textlength(element.text, font=font(element.font))
+    return x - text_width // 2 if element.align == 'center' else x - text_width
+
+
+def _banner_layer(brand: Brand, footer: Optional[str]) -> Image.Image:
+    image = Image.new('RGB', (WIDTH, HEIGHT), color=WHITE)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([(0, 0), (WIDTH, HEADER_HEIGHT)], fill=brand.color)
+    draw.text((MARGIN, 40), brand.name, font=font(TITLE), fill=WHITE)
+
+    footer_y = HEIGHT - FOOTER_HEIGHT
+    draw.rectangle([(0, footer_y), (WIDTH, HEIGHT)], fill=brand.color)
+    footer = brand.website if footer is None else footer
+    footer_width = draw.textlength(footer, font=font(BODY))
+    draw.text((WIDTH // 2 - footer_width // 2, footer_y + 25), footer, font=font(BODY), fill=WHITE)
+    return image
+
+
+CELEBRATION_MARGIN = 80
+ICON_SIZE = 120
+ICON_Y = CELEBRATION_MARGIN + 50
+
+
+def _celebration_layer(brand: Brand) -> Image.Image:
+    image = Image.new('RGB', (WIDTH, HEIGHT), color=WHITE)
+    draw = ImageDraw.Draw(image)
+
+    # Vertical gradient from indigo to green, one line per row
+    for y in range(HEIGHT):
+        r = int(79 + (y / HEIGHT) * (16 - 79))
+        g = int(70 + (y / HEIGHT) * (185 - 70))
+        b = int(229 + (y / HEIGHT) * (129 - 229))
+        draw.line([(0, y), (WIDTH - 1, y)], fill=(r, g, b))
+
+    # Semi-transparent panel for the content
+    overlay = Image.new('RGBA', (WIDTH - CELEBRATION_MARGIN * 2, HEIGHT - CELEBRATION_MARGIN * 2), (255, 255, 255, 180))
+    image.paste(overlay, (CELEBRATION_MARGIN, CELEBRATION_MARGIN), overlay)
+
+    icon_x = (WIDTH - ICON_SIZE) // 2
+    try:
+        trophy = Image.open(os.path.join(STATIC_DIR, 'images', 'trophy_icon.png')).convert('RGBA')
+        trophy = trophy.resize((ICON_SIZE, ICON_SIZE))
+        image.paste(trophy, (icon_x, ICON_Y), trophy)
+    except (IOError, OSError):
+        draw.ellipse([(icon_x, ICON_Y), (icon_x + ICON_SIZE, ICON_Y + ICON_SIZE)], fill=GOLD)
+
+    logo_width = draw.textlength(brand.name, font=font(SMALL))
+    draw.text(((WIDTH - logo_width) // 2, HEIGHT - 40), brand.name, font=font(SMALL), fill=WHITE)
+    return image
+
+
+@lru_cache(maxsize=32)
+def base_layer(layout: str, brand: Brand = DEFAULT_BRAND, footer: Optional[str] = None) -> Image.Image:
+    """Pre-rendered static layer; callers composite onto a copy"""
+    if layout == 'celebration':
+        return _celebration_layer(brand)
+    return _banner_layer(brand, footer)
+
+
+def _text_size(draw, text: str, role) -> Tuple[int, int]:
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font(role))
+    return right - left, bottom
+
+
+def _draw_centered(draw, center, text: str, role, fill):
+    width, height = _text_size(draw, text, role)
+    draw.text((center[0] - width // 2, center[1] - height // 2), text, font=font(role), fill=fill)
+
+
+def draw_bar_chart(draw, chart: BarChart):
+    x, y, width, height = chart.box
+    bottom = y + height
+    if chart.title:
+        draw.text((x, y), chart.title, font=font(CAPTION), fill=GRAY_500)
+        y += _text_size(draw, chart.title, CAPTION)[1] + 8
+    if chart.labels:
+        bottom -= _text_size(draw, 'Mg', CAPTION)[1] + 6
+    values = list(chart.values)
+    if not values or bottom <= y:
+        return
+
+    peak = max(values) or 1
+    slot = width / len(values)
+    bar_width = max(1, round(slot * 0.6))
+    for i, value in enumerate(values):
+        x0 = round(x + i * slot + (slot - bar_width) / 2)
+        bar_height = round((bottom - y) * max(value, 0) / peak)
+        if bar_height:
+            draw.rectangle([(x0, bottom - bar_height), (x0 + bar_width - 1, bottom)], fill=chart.color)
+        if chart.labels:
+            label = str(chart.labels[i])
+            label_width = _text_size(draw, label, CAPTION)[0]
+            draw.text((x0 + (bar_width - label_width) // 2, bottom + 6), label, font=font(CAPTION), fill=GRAY_500)
+    draw.line([(x, bottom), (x + width - 1, bottom)], fill=GRAY_200, width=2)
+
+
+def draw_progress_ring(draw, ring: ProgressRing):
+    cx, cy = ring.center
+    r = ring.radius
+    box = [(cx - r, cy - r), (cx + r, cy + r)]
+    percent = min(max(ring.percent, 0), 100)
+    draw.ellipse(box, outline=GRAY_200, width=ring.width)
+    if percent:
+        draw.arc(box, start=-90, end=-90 + 360 * percent / 100, fill=progress_color(percent), width=ring.width)
+    if ring.label:
+        _draw_centered(draw, ring.center, ring.label, SUBTITLE, BLACK)
+
+
+def draw_sparkline(draw, line: Sparkline):
+    x, y, width, height = line.box
+    values = list(line.values)
+    if not values:
+        return
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / (len(values) - 1) if len(values) > 1 else 0
+    points = [
+        (round(x + i * step), round(y + height - (value - low) / span * height))
+        for i, value in enumerate(values)
+    ]
+    if len(points) > 1:
+        draw.line(points, fill=line.color, width=line.width, joint='curve')
+    # Mark the latest value
+    end_x, end_y = points[-1]
+    dot = line.width + 1
+    draw.ellipse([(end_x - dot, end_y - dot), (end_x + dot, end_y + dot)], fill=line.color)
+
+
+def draw_stacked_bar(draw, bar: StackedBar):
+    x, y, width, height = bar.box
+    total = sum(max(value, 0) for _, value, _ in bar.segments)
+    if not total:
+        draw.rectangle([(x, y), (x + width - 1, y + height - 1)], fill=GRAY_200)
+        return
+    left = x
+    running = 0
+    for label, value, color in bar.segments:
+        running += max(value, 0)
+        # Place edges from the running total so rounding never leaves a gap at the end
+        right = x + round(width * running / total)
+        if right > left:
+            draw.rectangle([(left, y), (right - 1, y + height - 1)], fill=color)
+            if label:
+                label_width, label_height = _text_size(draw, label, CAPTION)
+                if label_width + 16 <= right - left:
+                    draw.text((left + 8, y + (height - label_height) // 2), label, font=font(CAPTION), fill=WHITE)
+        left = right
+
+
+CHART_DRAWERS = {
+    BarChart: draw_bar_chart,
+    ProgressRing: draw_progress_ring,
+    Sparkline: draw_sparkline,
+    StackedBar: draw_stacked_bar
+}
+
+
+def draw_element(draw: ImageDraw.ImageDraw, element):
+    if type(element) in CHART_DRAWERS:
+        CHART_DRAWERS[type(element)](draw, element)
+    elif isinstance(element, Text):
+        draw.text((_text_x(draw, element), element.xy[1]), element.text, font=font(element.font), fill=element.fill)
+    elif isinstance(element, Rect):
+        x0, y0, x1, y1 = element.box
+        draw.rectangle([(x0, y0), (x1, y1)], fill=element.fill)
+    elif isinstance(element, ProgressBar):
+        x, y, width, height = element.box
+        draw.rectangle([(x, y), (x + width, y + height)], fill=GRAY_200)
+        fill_width = int((width * element.percent) / 100)
+        draw.rectangle([(x, y), (x + fill_width, y + height)], fill=progress_color(element.percent))
+    else:
+        raise TypeError(f"Unknown share image element: {element!r}")
+
+
+def compose(spec: ShareImage, brand: Brand = DEFAULT_BRAND) -> Image.Image:
+    image = base_layer(spec.layout, brand, spec.footer).copy()
+    draw = ImageDraw.Draw(image)
+    for element in spec.elements:
+        draw_element(draw, element)
+    return image
+
+
+def render_share_image(spec: ShareImage, brand: Brand = DEFAULT_BRAND) -> bytes:
+    """PNG bytes for a share image spec"""
+    buffer = io.BytesIO()
+    compose(spec, brand).save(buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+def _footer_right(text: str) -> Text:
+    return Text((WIDTH - MARGIN, HEIGHT - FOOTER_HEIGHT + 30), text, SMALL, WHITE, 'right')
+
+
+def challenge_spec(title: str, category: str, progress: float, completed_goals: int, total_goals: int,
+                   start_date, end_date, shared_by: str) -> ShareImage:
+    bar_y, bar_height = 300, 40
+    date_format = "%b %d, %Y"
+    goals_percent = completed_goals / total_goals * 100 if total_goals else 0
+    return ShareImage('banner', [
+        ProgressRing((WIDTH - MARGIN - 60, bar_y + bar_height + 130), 60, 12, goals_percent,
+                     f"{completed_goals}/{total_goals}"),
+        Text((MARGIN, 150), title, TITLE),
+        Text((MARGIN, 230), f"Category: {category.capitalize()}", SUBTITLE, GRAY_500),
+        ProgressBar((MARGIN, bar_y, WIDTH - 2 * MARGIN, bar_height), progress),
+        Text((MARGIN, bar_y + bar_height + 20), f"Progress: {progress}%", SUBTITLE),
+        Text((MARGIN, bar_y + bar_height + 80), f"Goals Completed: {completed_goals} / {total_goals}", BODY),
+        Text((MARGIN, bar_y + bar_height + 130),
+             f"Started: {start_date.strftime(date_format)} • Ends: {end_date.strftime(date_format)}", BODY, GRAY_500),
+        Text((MARGIN, bar_y + bar_height + 180), f"Shared by: {shared_by}", BODY)
+    ])
+
+
+def meal_plan_spec(day, meals: Sequence[Dict], shared_by: str) -> ShareImage:
+    """
+    meals: [{'title', 'items': [{'name', 'calories', 'protein', 'completed'}]}];
+    the first three meals and two items of each are listed
+    """
+    items = [item for meal in meals for item in meal['items']]
+    total_calories = sum(item['calories'] for item in items)
+    total_protein = sum(item['protein'] for item in items)
+    progress = sum(1 for item in items if item['completed']) / len(items) * 100 if items else 0
+
+    elements = [
+        Text((WIDTH - 300, 45), day.strftime("%B %d, %Y"), BODY, WHITE),
+        Text((MARGIN, 150), "My Daily Meal Plan", TITLE),
+        Text((MARGIN, 230), f"Total Calories: {total_calories} kcal", SUBTITLE, GRAY_500),
+        Text((MARGIN, 280), f"Total Protein: {total_protein}g", SUBTITLE, GRAY_500),
+        Text((MARGIN, 330), f"Completion: {progress:.1f}%", SUBTITLE),
+        ProgressBar((MARGIN, 380, WIDTH - 2 * MARGIN, 40), progress),
+        ProgressRing((WIDTH - MARGIN - 60, 485), 60, 12, progress, f"{progress:.0f}%")
+    ]
+
+    y = 450
+    limit = HEIGHT - 150
+    for meal in meals[:3]:
+        if y > limit:
+            break
+        elements.append(Text((MARGIN, y), meal['title'], SUBTITLE))
+        y += 50
+        for item in meal['items'][:2]:
+            if y > limit:
+                break
+            elements.append(Text(
+                (70, y), f"• {item['name']} - {item['calories']} kcal, {item['protein']}g protein", SMALL,
+                GREEN_500 if item['completed'] else BLACK
+            ))
+            y += 35
+        if len(meal['items']) > 2:
+            elements.append(Text((70, y), f"• ... and {len(meal['items']) - 2} more items", SMALL, GRAY_500))
+            y += 35
+        y += 10
+
+    elements.append(_footer_right(f"Shared by {shared_by}"))
+    return ShareImage('banner', elements)
+
+
+def workout_nutrition_spec(data: Dict, shared_by: str) -> ShareImage:
+    """data: the workout nutrition recommendations (workout_type, calories, recovery, macros)"""
+    elements = [Text((MARGIN, 150), "Workout & Nutrition Integration", TITLE)]
+    if data.get('workout_type'):
+        workout_type = data['workout_type'].replace('_', ' ').title()
+        elements.append(Text((MARGIN, 220), f"Primary Workout Type: {workout_type}", SUBTITLE, GRAY_500))
+
+    y = 300
+    elements.append(Text((MARGIN, y), "Calorie Targets", SUBTITLE))
+    macros = data.get('macros') or {}
+    if macros.get('protein_pct') is not None:
+        split_x = WIDTH // 2
+        elements.append(StackedBar((split_x, y + 5, WIDTH - MARGIN - split_x, 40), [
+            (f"Protein {macros['protein_pct']}%", macros['protein_pct'], INDIGO_600),
+            (f"Carbs {macros.get('carbs_pct', 0)}%", macros.get('carbs_pct', 0), GREEN_500),
+            (f"Fat {macros.get('fat_pct', 0)}%", macros.get('fat_pct', 0), AMBER_500)
+        ]))
+    y += 60
+
+    card_width = (WIDTH - 150) // 3
+    card_height = 140
+    calories = data['calories']
+    cards = [
+        ("Training Day", calories['training_day_target'], "calories", INDIGO_50, INDIGO_700),
+        ("Rest Day", calories['rest_day_target'], "calories", GRAY_100, GRAY_500),
+        ("Post-Workout", calories['post_workout'], "intake", GREEN_50, GREEN_800)
+    ]
+    for i, (label, value, unit, background, color) in enumerate(cards):
+        x = MARGIN + i * (card_width + 25)
+        elements += [
+            Rect((x, y, x + card_width, y + card_height), background),
+            Text((x + 20, y + 15), label, BODY, color),
+            Text((x + 20, y + 60), f"{value}", SUBTITLE, color),
+            Text((x + 20, y + 100), unit, SMALL, GRAY_500)
+        ]
+
+    y += card_height + 60
+    recovery = data.get('recovery')
+    if recovery:
+        elements.append(Text((MARGIN, y), "Recovery Status", SUBTITLE))
+        y += 60
+        protein = data['macros']['protein_goal_percent']
+        metrics = [
+            ('Muscle Recovery', recovery['muscle_recovery'], status_color(recovery['muscle_recovery'], 80, 50)),
+            ('Energy Level', recovery['energy_level'], status_color(recovery['energy_level'], 80, 50)),
+            ('Protein Intake', protein, status_color(protein, 90, 70))
+        ]
+        for i, (name, value, color) in enumerate(metrics):
+            x = MARGIN + i * ((WIDTH - 2 * MARGIN) // 3)
+            elements += [
+                Text((x, y), name, BODY),
+                Text((x, y + 40), f"{value}%", SUBTITLE, color)
+            ]
+
+    elements.append(_footer_right(f"Shared by {shared_by}"))
+    return ShareImage('banner', elements)
+
+
+def achievement_spec(title: str, description: str, date_earned, earned_by: str) -> ShareImage:
+    center = WIDTH // 2
+    text_y = CELEBRATION_MARGIN + ICON_SIZE + 70
+    title_y = text_y + 70
+    desc_y = title_y + 100
+    return ShareImage('celebration', [
+        Text((center, text_y), "Achievement Unlocked!", SUBTITLE, BLACK, 'center'),
+        Text((center, title_y), title, HERO, INDIGO_600, 'center'),
+        Text((center, desc_y), description, BODY, BLACK, 'center'),
+        Text((center, desc_y + 60), f"Achieved on {date_earned.strftime('%B %d, %Y')}", SMALL, GRAY_500, 'center'),
+        Text((center, HEIGHT - CELEBRATION_MARGIN - 50), f"Earned by {earned_by}", BODY, BLACK, 'center')
+    ])
+
+
+def weekly_summary_spec(week_start, today, workout_stats: Dict, nutrition_stats: Dict,
+                        weight_change: Optional[float], weight_gain_is_bad: bool, generated_for: str,
+                        workout_minutes: Sequence[Tuple[str, float]] = (),
+                        daily_calories: Sequence[float] = ()) -> ShareImage:
+    """
+    workout_stats: {'count', 'duration', 'calories_burned'};
+    nutrition_stats: {'avg_calories', 'avg_protein', 'completion_rate'};
+    workout_minutes: (day label, minutes) per workout; daily_calories: one value per day
+    """
+    workout_x = MARGIN
+    nutrition_x = WIDTH // 2 + MARGIN
+    summary_y = 230
+    stats_y = summary_y + 60
+    line_height = 50
+
+    elements = [
+        Text((WIDTH - MARGIN, 45), f"{week_start.strftime('%b %d')} - {today.strftime('%b %d, %Y')}", BODY, WHITE, 'right'),
+        Text((MARGIN, 150), "Weekly Progress Summary", TITLE),
+        Text((workout_x, summary_y), "Workout Summary", SUBTITLE, INDIGO_600),
+        Text((nutrition_x, summary_y), "Nutrition Summary", SUBTITLE, GREEN_500),
+        Text((workout_x, stats_y), f"Workouts Completed: {workout_stats['count']}", BODY),
+        Text((workout_x, stats_y + line_height), f"Total Duration: {workout_stats['duration']} min", BODY),
+        Text((workout_x, stats_y + line_height * 2), f"Calories Burned: {workout_stats['calories_burned']}", BODY),
+        Text((nutrition_x, stats_y), f"Avg. Daily Calories: {nutrition_stats['avg_calories']:.0f}", BODY),
+        Text((nutrition_x, stats_y + line_height), f"Avg. Daily Protein: {nutrition_stats['avg_protein']:.0f}g", BODY),
+        Text((nutrition_x, stats_y + line_height * 2),
+             f"Meal Plan Completion: {nutrition_stats['completion_rate']:.0f}%", BODY)
+    ]
+
+    if weight_change is not None:
+        prefix = "+" if weight_change > 0 else ""
+        color = RED_500 if weight_change > 0 and weight_gain_is_bad else GREEN_500
+        elements.append(Text((WIDTH - MARGIN, 170), f"Weight Change: {prefix}{weight_change:.1f} lbs", BODY, color, 'right'))
+
+    chart_y = stats_y + line_height * 3
+    chart_width = WIDTH // 2 - 2 * MARGIN
+    chart_height = HEIGHT - FOOTER_HEIGHT - 10 - chart_y
+    if workout_minutes:
+        elements.append(BarChart(
+            (workout_x, chart_y, chart_width, chart_height),
+            [minutes for _, minutes in workout_minutes], [day for day, _ in workout_minutes], "Workout minutes by day"
+        ))
+    if daily_calories:
+        elements += [
+            Text((nutrition_x, chart_y), "Daily calories", CAPTION, GRAY_500),
+            Sparkline((nutrition_x, chart_y + 35, chart_width, chart_height - 45), daily_calories, GREEN_500)
+        ]
+
+    elements.append(_footer_right(f"Generated for {generated_for}"))
+    return ShareImage('banner', elements, footer="Weekly Progress Summary")
@@ -0,0 +1,242 @@
+"""
+Substitution Graph Cache for FitFuel
+Immutable in-memory snapshot of the MealIngredient / SubstitutionRule tables,
+swapped atomically whenever the 'substitution_graph' version in the database changes
+"""
+
+import logging
+import threading
+import time
+from array import array
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import CacheVersion, MealIngredient, SubstitutionRule
+
+VERSION_NAME = 'substitution_graph'
+
+# How often (seconds) to poll the version row for changes made by other processes
+VERSION_CHECK_INTERVAL = 5
+
+# Views handed out by the graph; attribute names match the ORM models so the
+# ranking code in meal_substitution works with either
+IngredientNode = namedtuple(
+    'IngredientNode',
+    ['id', 'name', 'category', 'estimated_cost', 'common_allergens', 'nutrition_per_100g']
+)
+SubstitutionEdge = namedtuple(
+    'SubstitutionEdge',
+    ['id', 'ingredient_id', 'substitute_id', 'conversion_ratio', 'preference_tags',
+     'nutrition_difference', 'cost_difference', 'suitability_score']
+)
+
+
+class SubstitutionGraph:
+    """
+    Adjacency lists keyed by ingredient id. Node attributes are stored column-wise:
+    costs and nutrients in float arrays, allergens as interned frozensets.
+    Instances are never mutated after construction.
+    """
+
+    def __init__(self, version: int, ingredients: List, rules: List):
+        self.version = version
+        self._position: Dict[int, int] = {}
+        self._ids = array('q')
+        self._names: List[str] = []
+        self._categories: List[str] = []
+        self._costs = array('d')
+        self._allergens: List[frozenset] = []
+        self._nutrition: Dict[str, array] = {}
+        self._by_name: Dict[str, int] = {}
+
+        interned = {}
+        nutrient_keys = sorted({
+            key for ingredient in ingredients for key in (ingredient.nutrition_per_100g or {})
+        })
+        self._nutrition = {key: array('d') for key in nutrient_keys}
+
+        for position, ingredient in enumerate(ingredients):
+            self._position[ingredient.id] = position
+            self._ids.append(ingredient.id)
+            self._names.append(ingredient.name)
+            self._categories.append(ingredient.category)
+            cost = ingredient.estimated_cost
+            self._costs.append(float('nan') if cost is None else cost)
+            allergens = frozenset(ingredient.common_allergens or [])
+            self._allergens.append(interned.setdefault(allergens, allergens))
+            nutrition = ingredient.nutrition_per_100g or {}
+            for key, values in self._nutrition.items():
+                value = nutrition.get(key)
+                values.append(float('nan') if value is None else float(value))
+            # First row wins for duplicate names, like .filter_by(name=...).first()
+            self._by_name.setdefault(ingredient.name, ingredient.id)
+
+        adjacency: Dict[int, list] = {}
+        self._rules: Dict[Tuple[int, int], SubstitutionEdge] = {}
+        for rule in rules:
+            edge = SubstitutionEdge(
+                rule.id, rule.ingredient_id, rule.substitute_id, rule.conversion_ratio,
+                tuple(rule.preference_tags or ()), rule.nutrition_difference,
+                rule.cost_difference, rule.suitability_score
+            )
+            adjacency.setdefault(rule.ingredient_id, []).append(edge)
+            self._rules.setdefault((rule.ingredient_id, rule.substitute_id), edge)
+        self._adjacency = {key: tuple(edges) for key, edges in adjacency.items()}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def node(self, ingredient_id: int) -> Optional[IngredientNode]:
+        """Ingredient view for an id, or None"""
+        position = self._position.get(ingredient_id)
+        if position is None:
+            return None
+        cost = self._costs[position]
+        nutrition = {
+            key: values[position]
+            for key, values in self._nutrition.items()
+            if values[position] == values[position]  # skip NaN gaps
+        }
+        return IngredientNode(
+            ingredient_id,
+            self._names[position],
+            self._categories[position],
+            None if cost != cost else cost,
+            list(self._allergens[position]),
+            nutrition
+        )
+
+    def find(self, name: str) -> Optional[IngredientNode]:
+        """Ingredient view by exact name, or None"""
+        ingredient_id = self._by_name.get(name)
+        return self.node(ingredient_id) if ingredient_id is not None else None
+
+    def edges(self, ingredient_id: int) -> Tuple[SubstitutionEdge, ...]:
+        """Outgoing substitution rules for an ingredient"""
+        return self._adjacency.get(ingredient_id, ())
+
+    def rule(self, ingredient_id: int, substitute_id: int) -> Optional[SubstitutionEdge]:
+        """The direct rule from one ingredient to another, or None"""
+        return self._rules.get((ingredient_id, substitute_id))
+
+    def substitutes(self, ingredient_id: int) -> List[Tuple[SubstitutionEdge, IngredientNode]]:
+        """(rule, substitute) pairs for an ingredient"""
+        pairs = []
+        for edge in self.edges(ingredient_id):
+            substitute = self.node(edge.substitute_id)
+            if substitute is not None:
+                pairs.append((edge, substitute))
+        return pairs
+
+    def paths(self, ingredient_id: int, max_hops: int = 2) -> List[Dict]:
+        """
+        All acyclic substitution chains (A -> B -> C ...) up to max_hops long.
+        Conversion ratios multiply along the chain, cost differences add up and
+        suitability is the product of the per-hop scores.
+        """
+        results = []
+        stack = [(ingredient_id, (ingredient_id,), 1.0, 0.0, 1.0)]
+        while stack:
+            current, path, ratio, cost, score = stack.pop()
+            if len(path) - 1 >= max_hops:
+                continue
+            for edge in self.edges(current):
+                if edge.substitute_id in path or edge.substitute_id not in self._position:
+                    continue
+                next_path = path + (edge.substitute_id,)
+                next_ratio = ratio * (edge.conversion_ratio or 1.0)
+                next_cost = cost + (edge.cost_difference or 0.0)
+                next_score = score * (edge.suitability_score or 0.0)
+                results.append({
+                    'path': [self._names[self._position[i]] for i in next_path],
+                    'substitute_id': edge.substitute_id,
+                    'hops': len(next_path) - 1,
+                    'conversion_ratio': next_ratio,
+                    'cost_difference': next_cost,
+                    'suitability_score': next_score
+                })
+                stack.append((edge.substitute_id, next_path, next_ratio, next_cost, next_score))
+        return results
+
+
+def load_substitution_graph(version: Optional[int] = None) -> SubstitutionGraph:
+    """Build a fresh graph from the database"""
+    if version is None:
+        version = CacheVersion.get(VERSION_NAME)
+    ingredients = MealIngredient.query.order_by(MealIngredient.id).all()
+    rules = SubstitutionRule.query.order_by(SubstitutionRule.id).all()
+    graph = SubstitutionGraph(version, ingredients, rules)
+    logging.info(f"Loaded substitution graph v{version}: {len(graph)} ingredients, {len(rules)} rules")
+    return graph
+
+
+_graph: Optional[SubstitutionGraph] = None
+_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+
+def get_substitution_graph() -> SubstitutionGraph:
+    """
+    Current graph snapshot. Polls the version row at most every
+    VERSION_CHECK_INTERVAL seconds and swaps in a new graph when it changed.
+    """
+    global _graph, _checked_at
+
+    graph = _graph
+    now = time.monotonic()
+    if graph is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return graph
+
+    with _reload_lock:
+        graph = _graph
+        if graph is not None and time.monotonic() - _checked_at < VERSION_CHECK_INTERVAL:
+            return graph
+        version = CacheVersion.get(VERSION_NAME)
+        if graph is None or graph.version != version:
+            graph = load_substitution_graph(version)
+            _graph = graph
+        _checked_at = time.monotonic()
+        return graph
+
+
+def reset_substitution_graph():
+    """Drop the cached graph; the next call to get_substitution_graph reloads it"""
+    global _graph
+    _graph = None
+
+
+def init_substitution_graph(app):
+    """Load the graph at startup"""
+    with app.app_context():
+        try:
+            get_substitution_graph()
+        except Exception as e:
+            logging.error(f"Error loading substitution graph: {str(e)}")
+
+
+GRAPH_CHANGED_KEY = 'substitution_graph_changed'
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_graph_version(session, flush_context, instances):
+    """Bump the version row in the same transaction as any ingredient or rule change"""
+    if session.info.get(GRAPH_CHANGED_KEY):
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (MealIngredient, SubstitutionRule)):
+            CacheVersion.bump(session, VERSION_NAME)
+            session.info[GRAPH_CHANGED_KEY] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_local_graph(session):
+    # Other processes notice the version bump on their next poll
+    if session.info.pop(GRAPH_CHANGED_KEY, False):
+        reset_substitution_graph()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_graph_change(session):
+    session.info.pop(GRAPH_CHANGED_KEY, None)
@@ -0,0 +1,275 @@
+"""
+Recipe Substitution Index for FitFuel
+In-memory nutrition-neighbour index used to find recipe substitutions without
+scanning the recipes table for every request. Recipe changes bump a version row
+in the same transaction; the committing process applies them to its index
+incrementally and every other process rebuilds once it sees the new version
+"""
+
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from extensions import db
+from models import CacheVersion, Recipe, RecipeIngredient
+
+# Diet flag columns the index is bucketed by
+DIET_FLAGS = (
+    'vegetarian', 'vegan', 'gluten_free', 'dairy_free', 'keto', 'paleo', 'low_carb'
+)
+ALL_RECIPES = 'all'
+
+# One unit of distance is roughly 100 kcal, 10 g protein, 10 g carbs or 5 g fat
+MACRO_SCALES = (100.0, 10.0, 10.0, 5.0)
+
+VERSION_NAME = 'substitution_index'
+
+# Seconds between checks of the version row for changes committed by other processes
+VERSION_CHECK_INTERVAL = 5
+
+IndexedRecipe = namedtuple(
+    'IndexedRecipe',
+    ['id', 'calories', 'protein', 'carbs', 'fat', 'diets', 'ingredient_names']
+)
+
+
+def normalize_diet(diet_type: Optional[str]) -> Optional[str]:
+    """Map a client diet type (e.g. 'gluten-free') onto an indexed diet flag"""
+    if not diet_type:
+        return None
+    diet = diet_type.strip().lower().replace('-', '_').replace(' ', '_')
+    return diet if diet in DIET_FLAGS else None
+
+
+def macro_distance(entry: IndexedRecipe, target) -> float:
+    """Scaled Euclidean distance between a recipe and target (calories, protein, carbs, fat)"""
+    values = (entry.calories, entry.protein, entry.carbs, entry.fat)
+    return sum(
+        ((value or 0) - (goal or 0)) ** 2 / scale ** 2
+        for value, goal, scale in zip(values, target, MACRO_SCALES)
+    ) ** 0.5
+
+
+class RecipeSubstitutionIndex:
+    """
+    Recipes bucketed by diet flag, each bucket sorted by calories.
+    Queries narrow to a calorie window with bisect and rank the window by macro distance.
+    """
+
+    def __init__(self, version_check_interval: float = VERSION_CHECK_INTERVAL):
+        self.version_check_interval = version_check_interval
+        self._lock = threading.RLock()
+        self._entries: Dict[int, IndexedRecipe] = {}
+        self._buckets: Dict[str, List] = {}
+        self._stale_ids = set()
+        self._version = None
+        self._checked_at = 0.0
+
+    def _load_entries(self, recipe_ids: Optional[Iterable[int]] = None) -> Dict[int, IndexedRecipe]:
+        """Load index entries with one recipe query and one ingredient query"""
+        recipe_query = db.session.query(
+            Recipe.id, Recipe.calories, Recipe.protein, Recipe.carbs, Recipe.fat,
+            *(getattr(Recipe, f'is_{flag}') for flag in DIET_FLAGS)
+        )
+        ingredient_query = db.session.query(RecipeIngredient.recipe_id, RecipeIngredient.name)
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            recipe_query = recipe_query.filter(Recipe.id.in_(recipe_ids))
+            ingredient_query = ingredient_query.filter(RecipeIngredient.recipe_id.in_(recipe_ids))
+
+        ingredient_names = {}
+        for recipe_id, name in ingredient_query:
+            ingredient_names.setdefault(recipe_id, []).append(name.lower())
+
+        entries = {}
+        for row in recipe_query:
+            recipe_id, calories, protein, carbs, fat = row[:5]
+            diets = frozenset(flag for flag, value in zip(DIET_FLAGS, row[5:]) if value)
+            entries[recipe_id] = IndexedRecipe(
+                recipe_id, calories, protein, carbs, fat, diets,
+                tuple(ingredient_names.get(recipe_id, ()))
+            )
+        return entries
+
+    def _add_to_buckets(self, entry: IndexedRecipe):
+        for bucket in (ALL_RECIPES, *entry.diets):
+            insort(self._buckets.setdefault(bucket, []), (entry.calories, entry.id))
+
+    def _remove_from_buckets(self, entry: IndexedRecipe):
+        key = (entry.calories, entry.id)
+        for bucket in (ALL_RECIPES, *entry.diets):
+            items = self._buckets.get(bucket, [])
+            position = bisect_left(items, key)
+            if position < len(items) and items[position] == key:
+                del items[position]
+
+    def build(self):
+        """Rebuild the whole index from the database"""
+        with self._lock:
+            # Invalidations arriving while we load are kept for the next refresh
+            self._stale_ids = set()
+        # Read before loading, so a change committed meanwhile triggers another build
+        version = CacheVersion.get(VERSION_NAME)
+        entries = self._load_entries()
+        buckets = {ALL_RECIPES: []}
+        for entry in entries.values():
+            for bucket in (ALL_RECIPES, *entry.diets):
+                buckets.setdefault(bucket, []).append((entry.calories, entry.id))
+        for items in buckets.values():
+            items.sort()
+
+        with self._lock:
+            self._entries = entries
+            self._buckets = buckets
+            self._version = version
+            self._checked_at = time.monotonic()
+        logging.info(f"Built recipe substitution index with {len(entries)} recipes")
+
+    def invalidate(self, recipe_ids: Iterable[int], version: Optional[int] = None):
+        """
+        Mark recipes as changed; they are reloaded on the next query. `version` is
+        the one their commit created: when it directly follows the index's version
+        the reload brings the index up to date without a rebuild
+        """
+        with self._lock:
+            self._stale_ids.update(recipe_ids)
+            if version is not None and self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def refresh(self, recipe_ids: Iterable[int]):
+        """Reload specific recipes into the index, dropping those that no longer exist"""
+        recipe_ids = set(recipe_ids)
+        if not recipe_ids:
+            return
+        entries = self._load_entries(recipe_ids)
+
+        with self._lock:
+            for recipe_id in recipe_ids:
+                old_entry = self._entries.pop(recipe_id, None)
+                if old_entry:
+                    self._remove_from_buckets(old_entry)
+                new_entry = entries.get(recipe_id)
+                if new_entry:
+                    self._entries[recipe_id] = new_entry
+                    self._add_to_buckets(new_entry)
+
+    def ensure_fresh(self):
+        """Build on first use, rebuild when another process changed recipes and apply pending invalidations"""
+        with self._lock:
+            stale_ids, self._stale_ids = self._stale_ids, set()
+            known = self._version
+            check = known is None or time.monotonic() - self._checked_at >= self.version_check_interval
+
+        if check and (known is None or CacheVersion.get(VERSION_NAME) != known):
+            self.build()
+            return
+        if check:
+            with self._lock:
+                self._checked_at = time.monotonic()
+        if stale_ids:
+            self.refresh(stale_ids)
+
+    def nearest(
+        self,
+        calories: float,
+        protein: float,
+        carbs: float,
+        fat: float,
+        diet_type: Optional[str] = None,
+        excluded_ingredients: Iterable[str] = (),
+        k: int = 5,
+        calorie_tolerance: float = 0.2,
+        exclude_ids: Iterable[int] = ()
+    ) -> List[int]:
+        """Return ids of the k recipes nearest to the target macros within the calorie window"""
+        self.ensure_fresh()
+
+        target = (calories, protein, carbs, fat)
+        excluded = [e.lower() for e in (excluded_ingredients or []) if e]
+        exclude_ids = set(exclude_ids)
+        low = calories * (1 - calorie_tolerance)
+        high = calories * (1 + calorie_tolerance)
+
+        with self._lock:
+            items = self._buckets.get(normalize_diet(diet_type) or ALL_RECIPES, [])
+            start = bisect_left(items, (low, float('-inf')))
+            end = bisect_right(items, (high, float('inf')))
+            candidates = []
+            for _, recipe_id in items[start:end]:
+                if recipe_id in exclude_ids:
+                    continue
+                entry = self._entries[recipe_id]
+                if excluded and any(
+                    ingredient in name for ingredient in excluded for name in entry.ingredient_names
+                ):
+                    continue
+                candidates.append((macro_distance(entry, target), recipe_id))
+
+        return [recipe_id for _, recipe_id in heapq.nsmallest(k, candidates)]
+
+    def find_substitutes(
+        self,
+        recipe: Recipe,
+        diet_type: Optional[str] = None,
+        excluded_ingredients: Iterable[str] = (),
+        k: int = 5
+    ) -> List[int]:
+        """Ids of the k recipes closest to recipe's macros, honouring diet and exclusions"""
+        return self.nearest(
+            recipe.calories, recipe.protein, recipe.carbs, recipe.fat,
+            diet_type=diet_type,
+            excluded_ingredients=excluded_ingredients,
+            k=k,
+            exclude_ids=[recipe.id]
+        )
+
+
+substitution_index = RecipeSubstitutionIndex()
+
+STALE_RECIPES_KEY = 'substitution_index_stale_recipes'
+INDEX_VERSION_KEY = 'substitution_index_version'
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_index_version(session, flush_context, instances):
+    """Bump the version row in the same transaction as any recipe change, once per transaction"""
+    if INDEX_VERSION_KEY in session.info:
+        return
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Recipe, RecipeIngredient)):
+            CacheVersion.bump(session, VERSION_NAME)
+            # A first bump adds the row, which this flush hasn't written yet
+            session.info[INDEX_VERSION_KEY] = session.execute(
+                select(CacheVersion.version).where(CacheVersion.name == VERSION_NAME)
+            ).scalar() or 1
+            return
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_changed_recipes(session, flush_context):
+    """Remember recipes touched by this flush until the transaction commits"""
+    stale = session.info.setdefault(STALE_RECIPES_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Recipe) and obj.id is not None:
+            stale.add(obj.id)
+        elif isinstance(obj, RecipeIngredient) and obj.recipe_id is not None:
+            stale.add(obj.recipe_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed_recipes(session):
+    stale = session.info.pop(STALE_RECIPES_KEY, None)
+    version = session.info.pop(INDEX_VERSION_KEY, None)
+    if stale:
+        substitution_index.invalidate(stale, version)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_recipes(session):
+    session.info.pop(STALE_RECIPES_KEY, None)
+    session.info.pop(INDEX_VERSION_KEY, None)